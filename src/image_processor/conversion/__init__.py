@@ -1 +1,157 @@
-"""Conversion module for image format conversion."""
\ No newline at end of file
+"""Conversion module for image format conversion."""
+
+from image_processor.conversion.animation import (
+    AnimationFrame,
+    assemble_animation,
+    convert_animation,
+    frame_count,
+    is_animated,
+    iter_frames,
+    save_frames,
+)
+from image_processor.conversion.color import (
+    TransformCache,
+    apply_color_policy,
+    get_icc_profile,
+    to_srgb,
+)
+from image_processor.conversion.dds import (
+    DdsInfo,
+    MipLevel,
+    build_mip_chain,
+    convert_dds_files,
+    convert_to_dds_files,
+    dds_to_png,
+    decode_block_compressed,
+    encode_block_compressed,
+    encode_dds,
+    image_to_dds,
+    load_dds,
+    mip_levels,
+    parse_dds_header,
+    read_dds_info,
+    save_dds,
+    select_mip_level,
+)
+from image_processor.conversion.formats import (
+    flatten_alpha,
+    format_from_path,
+    prepare_for_format,
+    to_pillow_format,
+)
+from image_processor.conversion.gif_writer import (
+    GifWriter,
+    build_palette,
+)
+from image_processor.conversion.png_writer import (
+    ApngWriter,
+    PngStripWriter,
+    encode_png_parallel,
+    is_supported_mode,
+    save_png_parallel,
+)
+from image_processor.conversion.presets import (
+    ENCODER_PRESETS,
+    PRESET_NAMES,
+    CalibrationResult,
+    calibrate_presets,
+    get_save_options,
+    recommend_preset,
+)
+from image_processor.conversion.preview import (
+    EmbeddedPreview,
+    list_embedded_previews,
+    load_preview,
+    select_preview,
+)
+from image_processor.conversion.pyramid import (
+    DecodedImage,
+    ThumbnailResult,
+    build_pyramid,
+    decode_for_size,
+    save_pyramid,
+    save_pyramid_with_config,
+    save_thumbnails,
+    target_size,
+)
+from image_processor.conversion.quality_search import (
+    QualityConversionResult,
+    QualitySearchResult,
+    convert_files_to_target_quality,
+    convert_to_target_quality,
+    psnr,
+    search_quality,
+    ssim,
+)
+from image_processor.conversion.quantize import (
+    quantize_image,
+    save_png_quantized,
+)
+
+__all__ = [
+    "ENCODER_PRESETS",
+    "PRESET_NAMES",
+    "AnimationFrame",
+    "ApngWriter",
+    "CalibrationResult",
+    "DdsInfo",
+    "DecodedImage",
+    "EmbeddedPreview",
+    "GifWriter",
+    "MipLevel",
+    "PngStripWriter",
+    "QualityConversionResult",
+    "QualitySearchResult",
+    "ThumbnailResult",
+    "TransformCache",
+    "apply_color_policy",
+    "assemble_animation",
+    "build_mip_chain",
+    "build_palette",
+    "build_pyramid",
+    "calibrate_presets",
+    "convert_animation",
+    "convert_dds_files",
+    "convert_files_to_target_quality",
+    "convert_to_dds_files",
+    "convert_to_target_quality",
+    "dds_to_png",
+    "decode_block_compressed",
+    "decode_for_size",
+    "encode_block_compressed",
+    "encode_dds",
+    "encode_png_parallel",
+    "flatten_alpha",
+    "format_from_path",
+    "frame_count",
+    "get_icc_profile",
+    "get_save_options",
+    "image_to_dds",
+    "is_animated",
+    "is_supported_mode",
+    "iter_frames",
+    "list_embedded_previews",
+    "load_dds",
+    "load_preview",
+    "mip_levels",
+    "parse_dds_header",
+    "prepare_for_format",
+    "psnr",
+    "quantize_image",
+    "read_dds_info",
+    "recommend_preset",
+    "save_dds",
+    "save_frames",
+    "save_png_parallel",
+    "save_png_quantized",
+    "save_pyramid",
+    "save_pyramid_with_config",
+    "save_thumbnails",
+    "search_quality",
+    "select_mip_level",
+    "select_preview",
+    "ssim",
+    "target_size",
+    "to_pillow_format",
+    "to_srgb",
+]
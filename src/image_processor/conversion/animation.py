@@ -0,0 +1,486 @@
+"""アニメーション画像（GIF / WebP / APNG）のフレーム単位の変換.
+
+フレームは先頭から1枚ずつ読み込み、処理が済んだものから破棄する。
+差分フレームの破棄方法（disposal）と合成（blend）はPillowのデコーダーが
+処理するため、各フレームは合成済みのキャンバスとして得られる。デコーダーが
+保持するのは現在と直前のキャンバスだけなので、フレーム数に関係なく
+メモリ使用量は一定になる。
+
+アニメーションの再エンコードは、APNGは ``ApngWriter`` 、GIFは共通パレットの
+``GifWriter`` でフレームごとに書き出す。WebPは2フレーム目以降を
+``ApngWriter`` で一時ファイルに書き出し、それをPillowの ``save_all`` の
+``append_images`` に渡して1フレームずつ読み込ませる。
+"""
+
+import io
+import logging
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Sequence, Sized
+from contextlib import ExitStack
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, TypedDict
+
+import numpy as np
+from PIL import Image
+
+from image_processor.conversion.formats import (
+    EXTENSIONS,
+    format_from_path,
+    prepare_for_format,
+    to_pillow_format,
+)
+from image_processor.conversion.gif_writer import GifWriter, build_palette
+from image_processor.conversion.png_writer import ApngWriter
+from image_processor.conversion.presets import get_save_options
+from image_processor.types import EncoderPreset
+
+logger = logging.getLogger(__name__)
+
+# アニメーションとして書き出せるPillowの保存フォーマット
+ANIMATED_FORMATS = frozenset({"GIF", "WEBP", "PNG"})
+
+# 表示時間が記録されていないフレームの表示時間（ミリ秒）
+DEFAULT_DURATION = 100
+
+# GIFの共通パレットの作成に使うフレーム数
+DEFAULT_PALETTE_SAMPLES = 8
+
+# WebP書き出し時にフレームを一時保存するAPNGの圧縮レベル（速度を優先）
+_SPOOL_COMPRESS_LEVEL = 1
+
+
+class AnimationFrame(TypedDict):
+    """アニメーションの1フレームの型定義."""
+
+    index: int
+    image: Image.Image
+    duration: int
+
+
+def frame_count(path: Path) -> int:
+    """画素をデコードせずにフレーム数を取得。
+
+    Parameters
+    ----------
+    path : Path
+        画像ファイルのパス
+
+    Returns
+    -------
+    int
+        フレーム数（静止画は1）
+    """
+    with Image.open(path) as img:
+        return int(getattr(img, "n_frames", 1))
+
+
+def is_animated(path: Path) -> bool:
+    """複数フレームを持つアニメーション画像か判定。"""
+    return frame_count(path) > 1
+
+
+def _open(source: Path | bytes) -> Image.Image:
+    """画像ファイルのパス、または読み込み済みのバイト列から画像を開く。"""
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def iter_frames(path: Path | bytes) -> Iterator[AnimationFrame]:
+    """アニメーション画像のフレームを先頭から1枚ずつ読み込む。
+
+    Parameters
+    ----------
+    path : Path | bytes
+        画像ファイルのパス、または読み込み済みのバイト列
+
+    Yields
+    ------
+    AnimationFrame
+        合成済みのRGBAフレームと表示時間（ミリ秒）
+    """
+    with _open(path) as img:
+        for index in range(getattr(img, "n_frames", 1)):
+            img.seek(index)
+            # WebPは画素を読み込むまで表示時間がinfoに設定されない
+            img.load()
+            duration = img.info.get("duration") or DEFAULT_DURATION
+            yield AnimationFrame(
+                index=index,
+                image=img.convert("RGBA"),
+                duration=int(duration),
+            )
+
+
+def save_frames(
+    input_path: Path,
+    output_dir: Path,
+    *,
+    image_format: str = "png",
+    preset: EncoderPreset | None = None,
+    quality: int | None = None,
+) -> list[Path]:
+    """アニメーション画像をフレームごとの画像として保存。
+
+    出力ファイル名は ``<元のファイル名>_<4桁のフレーム番号>.<拡張子>``。
+
+    Parameters
+    ----------
+    input_path : Path
+        入力画像のパス
+    output_dir : Path
+        出力ディレクトリ
+    image_format : str
+        出力フォーマット
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    quality : int | None
+        JPEG/WebPの画質
+
+    Returns
+    -------
+    list[Path]
+        フレーム順の出力ファイルパス
+    """
+    pillow_format = to_pillow_format(image_format)
+    options = get_save_options(pillow_format, preset, quality=quality)
+
+    output_paths = []
+    for frame in iter_frames(input_path):
+        output_path = output_dir / (
+            f"{input_path.stem}_{frame['index']:04d}{EXTENSIONS[pillow_format]}"
+        )
+        image = prepare_for_format(frame["image"], pillow_format)
+        image.save(output_path, pillow_format, **options)
+        output_paths.append(output_path)
+    return output_paths
+
+
+def _animated_format(image_format: str | None, output_path: Path) -> str:
+    """出力フォーマットを決定し、アニメーションに対応しているか確認する。"""
+    pillow_format = to_pillow_format(image_format) if image_format else (
+        format_from_path(output_path)
+    )
+    if pillow_format not in ANIMATED_FORMATS:
+        raise ValueError(
+            f"アニメーションに対応していないフォーマットです: {pillow_format}"
+        )
+    return pillow_format
+
+
+def _has_transparency(images: Iterable[Image.Image]) -> bool:
+    """透過色で書き出すピクセル（アルファ値128未満）を含むか判定する。"""
+    for image in images:
+        if image.has_transparency_data:
+            alpha = np.asarray(image.convert("RGBA").getchannel("A"))
+            if alpha.min() < 128:
+                return True
+    return False
+
+
+def _write_gif(
+    frames: Iterator[AnimationFrame],
+    output_path: Path,
+    samples: list[Image.Image],
+    *,
+    loop: int | None,
+    dither: bool,
+) -> int:
+    """共通パレットでGIFを逐次書き出し、書き出したフレーム数を返す。"""
+    transparency = _has_transparency(samples)
+    palette = build_palette(samples, transparency=transparency)
+    first = next(frames)
+    with open(output_path, "wb") as f:
+        with GifWriter(
+            f,
+            first["image"].size,
+            palette,
+            loop=loop,
+            transparency=transparency,
+            dither=dither,
+        ) as writer:
+            writer.write(first["image"], first["duration"])
+            for frame in frames:
+                writer.write(frame["image"], frame["duration"])
+    return writer.frames_written
+
+
+def _write_animation(
+    frames: Iterator[AnimationFrame],
+    n_frames: int,
+    output_path: Path,
+    pillow_format: str,
+    options: dict[str, Any],
+    *,
+    loop: int,
+) -> None:
+    """フレーム数が既知のアニメーションをAPNG/WebPとして逐次書き出す。"""
+    first = next(frames)
+    first_image = first["image"]
+
+    if pillow_format == "PNG":
+        with open(output_path, "wb") as f:
+            with ApngWriter(
+                f,
+                first_image.size,
+                first_image.mode,
+                n_frames,
+                loop=loop,
+                compress_level=options.get("compress_level", 6),
+            ) as writer:
+                writer.write(first_image, first["duration"])
+                for frame in frames:
+                    writer.write(frame["image"], frame["duration"])
+        return
+
+    # Pillowは append_images の画像を seek で1フレームずつ読み込むため、
+    # 残りのフレームを一時APNGに逐次書き出して渡し、全フレームを保持しない。
+    # 直前と同じフレームはlibwebpが表示時間を加算して1フレームにまとめる
+    durations = [first["duration"]]
+    with ExitStack() as stack:
+        append_images: list[Image.Image] = []
+        if n_frames > 1:
+            spool = stack.enter_context(tempfile.TemporaryFile())
+            with ApngWriter(
+                spool,
+                first_image.size,
+                first_image.mode,
+                n_frames - 1,
+                compress_level=_SPOOL_COMPRESS_LEVEL,
+            ) as writer:
+                for frame in frames:
+                    writer.write(frame["image"], frame["duration"])
+                    durations.append(frame["duration"])
+            spool.seek(0)
+            append_images.append(stack.enter_context(Image.open(spool)))
+        first_image.save(
+            output_path,
+            pillow_format,
+            save_all=True,
+            append_images=append_images,
+            duration=durations,
+            loop=loop,
+            **options,
+        )
+
+
+def convert_animation(
+    input_path: Path,
+    output_path: Path,
+    *,
+    image_format: str | None = None,
+    preset: EncoderPreset | None = None,
+    quality: int | None = None,
+    loop: int | None = None,
+    transform: Callable[[Image.Image], Image.Image] | None = None,
+    data: bytes | None = None,
+) -> Path:
+    """アニメーション画像を別のアニメーション形式に変換。
+
+    GIF出力は入力から等間隔に選んだフレームで共通パレットを作成し、
+    ``GifWriter`` で逐次書き出す。
+
+    Parameters
+    ----------
+    input_path : Path
+        入力画像のパス
+    output_path : Path
+        出力ファイルのパス
+    image_format : str | None
+        出力フォーマット（gif, webp, png）。Noneの場合は出力パスの拡張子から判定
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    quality : int | None
+        WebPの画質
+    loop : int | None
+        繰り返し回数（0は無限）。Noneの場合は入力の設定を引き継ぎ、
+        入力に設定がない（ループ拡張のないGIFなど）場合は1回だけ再生する
+    transform : Callable[[Image.Image], Image.Image] | None
+        各フレームに適用する変換。全フレームで同じサイズを返すこと
+    data : bytes | None
+        読み込み済みの入力ファイルのバイト列。指定した場合は ``input_path`` を
+        読み直さずにこのバイト列からデコードする
+
+    Returns
+    -------
+    Path
+        出力ファイルのパス
+
+    Raises
+    ------
+    ValueError
+        アニメーションに対応していない出力フォーマットの場合
+    """
+    pillow_format = _animated_format(image_format, output_path)
+    options: dict[str, Any] = get_save_options(pillow_format, preset, quality=quality)
+
+    source: Path | bytes = input_path if data is None else data
+    with _open(source) as img:
+        n_frames = int(getattr(img, "n_frames", 1))
+        if loop is None and "loop" in img.info:
+            loop = int(img.info["loop"])
+
+    def prepare(frame: AnimationFrame) -> AnimationFrame:
+        if transform is not None:
+            frame["image"] = transform(frame["image"])
+        return frame
+
+    frames = map(prepare, iter_frames(source))
+
+    if pillow_format == "GIF":
+        # パレット用のフレームは別にデコードし、全フレームを保持しないようにする
+        step = max(1, n_frames // DEFAULT_PALETTE_SAMPLES)
+        stop = step * DEFAULT_PALETTE_SAMPLES
+        sampled = islice(iter_frames(source), 0, stop, step)
+        samples = [prepare(frame)["image"] for frame in sampled]
+        # loop=Noneではループ拡張を書き出さず、1回だけ再生される
+        written = _write_gif(frames, output_path, samples, loop=loop, dither=False)
+        logger.debug(
+            f"アニメーション変換 {input_path.name}: "
+            f"{n_frames}フレーム -> {written}フレーム"
+        )
+        return output_path
+
+    _write_animation(
+        frames, n_frames, output_path, pillow_format, options,
+        loop=1 if loop is None else loop,
+    )
+    logger.debug(f"アニメーション変換 {input_path.name}: {n_frames}フレーム")
+    return output_path
+
+
+def _load_frame(source: Image.Image | Path) -> Image.Image:
+    """フレームを読み込み、アニメーションで扱えるモードに揃える。"""
+    if isinstance(source, Path):
+        with Image.open(source) as img:
+            image = _load_frame(img)
+            return img.copy() if image is img else image
+    if source.mode in ("L", "LA", "RGB", "RGBA"):
+        return source
+    return source.convert("RGBA" if source.has_transparency_data else "RGB")
+
+
+def _sample_indices(count: int, samples: int) -> list[int]:
+    """0からcount-1までを等間隔に選んだ番号を返す。"""
+    if count <= samples:
+        return list(range(count))
+    return sorted({round(i * (count - 1) / (samples - 1)) for i in range(samples)})
+
+
+def assemble_animation(
+    frames: Iterable[Image.Image | Path],
+    output_path: Path,
+    *,
+    duration: int | Sequence[int] = DEFAULT_DURATION,
+    frame_count: int | None = None,
+    image_format: str | None = None,
+    loop: int = 0,
+    palette_samples: int = DEFAULT_PALETTE_SAMPLES,
+    dither: bool = False,
+    preset: EncoderPreset | None = None,
+    quality: int | None = None,
+) -> Path:
+    """フレーム列（画像またはファイルパス）からアニメーション画像を作成。
+
+    フレームは1枚ずつ読み込んで書き出すため、全フレームをメモリに保持しない。
+    GIFは共通パレットを ``palette_samples`` 枚のフレームから作成する。
+    ``frames`` がリストなどのシーケンスなら全体から等間隔に選び、
+    イテレーターなら先頭のフレームを使う（その枚数だけ先読みして保持する）。
+    GIF/WebPとも、直前と同じフレームは書き出さずに表示時間を加算する。
+
+    Parameters
+    ----------
+    frames : Iterable[Image.Image | Path]
+        フレームの画像、またはフレーム画像のファイルパス。全フレーム同じサイズであること
+    output_path : Path
+        出力ファイルのパス
+    duration : int | Sequence[int]
+        表示時間（ミリ秒）。全フレーム共通の値、またはフレームごとの値
+    frame_count : int | None
+        フレーム数。Noneの場合は ``len(frames)`` を使う。
+        WebP/APNGはフレーム数を先に決める必要があるため、
+        長さのないイテレーターを渡す場合は指定が必要
+    image_format : str | None
+        出力フォーマット（gif, webp, png）。Noneの場合は出力パスの拡張子から判定
+    loop : int
+        繰り返し回数（0は無限）
+    palette_samples : int
+        GIFのパレット作成に使うフレーム数
+    dither : bool
+        GIFの減色時にディザリングを行うか
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    quality : int | None
+        WebPの画質
+
+    Returns
+    -------
+    Path
+        出力ファイルのパス
+
+    Raises
+    ------
+    ValueError
+        アニメーション非対応の形式、フレームがない、フレーム数が不明、
+        または表示時間の数が足りない場合
+    """
+    pillow_format = _animated_format(image_format, output_path)
+    if palette_samples < 1:
+        raise ValueError(
+            f"パレットのサンプル数は1以上である必要があります: {palette_samples}"
+        )
+    if frame_count is None and isinstance(frames, Sized):
+        frame_count = len(frames)
+
+    def load(index: int, source: Image.Image | Path) -> AnimationFrame:
+        if isinstance(duration, int):
+            frame_duration = duration
+        elif index < len(duration):
+            frame_duration = duration[index]
+        else:
+            raise ValueError(
+                f"表示時間の数がフレーム数より少なくなっています: {len(duration)}"
+            )
+        return AnimationFrame(
+            index=index, image=_load_frame(source), duration=int(frame_duration)
+        )
+
+    stream: Iterator[AnimationFrame] = (
+        load(index, source) for index, source in enumerate(frames)
+    )
+
+    if pillow_format == "GIF":
+        if isinstance(frames, Sequence):
+            samples = [
+                _load_frame(frames[i])
+                for i in _sample_indices(len(frames), palette_samples)
+            ]
+        else:
+            head = list(islice(stream, palette_samples))
+            samples = [frame["image"] for frame in head]
+            stream = chain(head, stream)
+        if not samples:
+            raise ValueError("フレームがありません")
+        written = _write_gif(stream, output_path, samples, loop=loop, dither=dither)
+        logger.debug(f"アニメーション作成 {output_path.name}: {written}フレーム")
+        return output_path
+
+    if frame_count is None:
+        raise ValueError(f"{pillow_format}の出力にはフレーム数の指定が必要です")
+    if frame_count < 1:
+        raise ValueError("フレームがありません")
+    options: dict[str, Any] = get_save_options(pillow_format, preset, quality=quality)
+
+    first = next(stream)
+    mode = first["image"].mode
+
+    def match_mode(frame: AnimationFrame) -> AnimationFrame:
+        if frame["image"].mode != mode:
+            frame["image"] = frame["image"].convert(mode)
+        return frame
+
+    frames_iter = chain([first], map(match_mode, stream))
+    _write_animation(
+        frames_iter, frame_count, output_path, pillow_format, options, loop=loop
+    )
+    logger.debug(f"アニメーション作成 {output_path.name}: {frame_count}フレーム")
+    return output_path
@@ -0,0 +1,293 @@
+"""ICCプロファイルによるカラーマネジメントとメタデータの引き継ぎ.
+
+埋め込みICCプロファイルを捨てて保存すると、広色域（Display P3, Adobe RGBなど）の
+画像はsRGBとして解釈されて色がずれる。ここでは保存前に画素をsRGBに変換するか、
+元のプロファイルを出力に埋め込んで引き継ぐ。
+
+``ImageCms`` の変換オブジェクトの作成は適用よりも重いため、
+（プロファイルのハッシュ、入出力モード、変換先、レンダリングインテント）を
+キーにしてキャッシュする。同じカメラ・同じソフトで作られた画像は同じ
+プロファイルを持つため、バッチ変換ではほぼ毎回キャッシュが使われる。
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from PIL import Image, ImageCms
+
+logger = logging.getLogger(__name__)
+
+# 既定のレンダリングインテント（色域外の色を全体の階調を保って圧縮する）
+DEFAULT_INTENT = ImageCms.Intent.PERCEPTUAL
+
+# ICCプロファイルを埋め込めるPillowの保存フォーマット
+ICC_FORMATS = frozenset({"JPEG", "PNG", "WEBP", "TIFF"})
+
+# EXIFを埋め込めるPillowの保存フォーマット
+EXIF_FORMATS = frozenset({"JPEG", "PNG", "WEBP", "TIFF"})
+
+# sRGBへの変換の入力モードと出力モード（アルファは変換せずにそのまま引き継がれる）
+_SRGB_MODES = {"RGB": "RGB", "RGBA": "RGBA", "CMYK": "RGB"}
+
+# 保存フォーマットごとに、プロファイルを引き継いだまま保存できる画像モード
+# （保存時にプロファイルと異なる色空間へ変換されるモードは含めない。
+# 例: JPEGのCMYKとLAは ``prepare_for_format`` でRGBになる）
+_PRESERVABLE_MODES: dict[str, frozenset[str]] = {
+    "JPEG": frozenset({"L", "RGB", "RGBA", "P"}),
+    "PNG": frozenset({"L", "LA", "RGB", "RGBA", "P"}),
+    "WEBP": frozenset({"RGB", "RGBA", "P"}),
+    "TIFF": frozenset({"L", "LA", "RGB", "RGBA", "P", "CMYK"}),
+}
+
+_srgb_profile: ImageCms.ImageCmsProfile | None = None
+
+
+def _get_srgb_profile() -> ImageCms.ImageCmsProfile:
+    """組み込みのsRGBプロファイルを取得（初回のみ作成）。"""
+    global _srgb_profile
+    if _srgb_profile is None:
+        _srgb_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+    return _srgb_profile
+
+
+def get_icc_profile(image: Image.Image) -> bytes | None:
+    """画像に埋め込まれたICCプロファイルを取得。
+
+    Parameters
+    ----------
+    image : Image.Image
+        入力画像
+
+    Returns
+    -------
+    bytes | None
+        ICCプロファイル。埋め込まれていない場合はNone
+    """
+    profile = image.info.get("icc_profile")
+    return profile if isinstance(profile, bytes) and profile else None
+
+
+class TransformCache:
+    """sRGBへの変換オブジェクトのLRUキャッシュ.
+
+    キーはプロファイルのSHA-256、入出力モード、変換先、レンダリングインテント。
+    変換元がsRGBのプロファイルは変換不要としてNoneをキャッシュする。
+    複数スレッドから共有できる。
+
+    Parameters
+    ----------
+    maxsize : int
+        保持する変換オブジェクトの最大数
+    """
+
+    def __init__(self, maxsize: int = 32) -> None:
+        if maxsize < 1:
+            raise ValueError(f"キャッシュサイズは1以上である必要があります: {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[
+            tuple[str, str, str, str, int], ImageCms.ImageCmsTransform | None
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """キャッシュと統計を消去する。"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get(
+        self,
+        profile: bytes,
+        input_mode: str,
+        output_mode: str,
+        *,
+        intent: ImageCms.Intent = DEFAULT_INTENT,
+    ) -> ImageCms.ImageCmsTransform | None:
+        """プロファイルからsRGBへの変換オブジェクトを取得。
+
+        Parameters
+        ----------
+        profile : bytes
+            変換元のICCプロファイル
+        input_mode : str
+            入力画像のモード
+        output_mode : str
+            出力画像のモード
+        intent : ImageCms.Intent
+            レンダリングインテント
+
+        Returns
+        -------
+        ImageCms.ImageCmsTransform | None
+            変換オブジェクト。変換元がsRGBの場合はNone
+
+        Raises
+        ------
+        OSError
+            プロファイルを読み込めない場合
+        ImageCms.PyCMSError
+            画像モードとプロファイルの色空間が合わない場合
+        """
+        digest = hashlib.sha256(profile).hexdigest()
+        key = (digest, input_mode, output_mode, "srgb", int(intent))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        transform = _build_srgb_transform(profile, input_mode, output_mode, intent)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = transform
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return transform
+
+
+def _build_srgb_transform(
+    profile: bytes,
+    input_mode: str,
+    output_mode: str,
+    intent: ImageCms.Intent,
+) -> ImageCms.ImageCmsTransform | None:
+    """プロファイルからsRGBへの変換オブジェクトを作成する。"""
+    source = ImageCms.ImageCmsProfile(io.BytesIO(profile))
+    description = ImageCms.getProfileDescription(source).strip()  # type: ignore[no-untyped-call]
+    if description.startswith("sRGB") and input_mode != "CMYK":
+        return None
+    # lcmsの1画素キャッシュはスレッド間で共有できないため無効にする
+    transform: ImageCms.ImageCmsTransform = ImageCms.buildTransform(
+        source,
+        _get_srgb_profile(),
+        input_mode,
+        output_mode,
+        renderingIntent=intent,
+        flags=ImageCms.Flags.NOCACHE,  # type: ignore[attr-defined]
+    )
+    return transform
+
+
+_default_cache = TransformCache()
+
+
+def to_srgb(
+    image: Image.Image,
+    *,
+    intent: ImageCms.Intent = DEFAULT_INTENT,
+    cache: TransformCache | None = None,
+) -> Image.Image:
+    """埋め込みICCプロファイルに従って画素をsRGBに変換。
+
+    プロファイルがない画像や、変換に対応していないモード（L, P など）の画像、
+    プロファイルが壊れている画像はそのまま返す。変換後の画像は
+    ``icc_profile`` を持たない（sRGBとして扱われる）。
+
+    Parameters
+    ----------
+    image : Image.Image
+        入力画像
+    intent : ImageCms.Intent
+        レンダリングインテント
+    cache : TransformCache | None
+        変換オブジェクトのキャッシュ。Noneの場合はモジュール共通のキャッシュ
+
+    Returns
+    -------
+    Image.Image
+        sRGBの画像
+    """
+    profile = get_icc_profile(image)
+    output_mode = _SRGB_MODES.get(image.mode)
+    if profile is None or output_mode is None:
+        return image
+
+    cache = cache if cache is not None else _default_cache
+    try:
+        transform = cache.get(profile, image.mode, output_mode, intent=intent)
+    except (OSError, ImageCms.PyCMSError) as e:
+        logger.warning(f"ICCプロファイルを適用できないため無視します: {e}")
+        return image
+    if transform is None:
+        return image
+
+    converted: Image.Image = transform.apply(image)
+    converted.info = {
+        key: value for key, value in image.info.items() if key != "icc_profile"
+    }
+    return converted
+
+
+def _exif_bytes(image: Image.Image) -> bytes | None:
+    """画像のEXIFをバイト列で取得する。"""
+    exif = image.info.get("exif")
+    if isinstance(exif, bytes) and exif:
+        return exif
+    data = image.getexif()
+    return data.tobytes() if len(data) else None
+
+
+def apply_color_policy(
+    image: Image.Image,
+    pillow_format: str,
+    *,
+    preserve_metadata: bool = False,
+    intent: ImageCms.Intent = DEFAULT_INTENT,
+    cache: TransformCache | None = None,
+) -> tuple[Image.Image, dict[str, Any]]:
+    """保存フォーマットに合わせて色を管理し、保存オプションを返す。
+
+    - ``preserve_metadata`` がFalseの場合は画素をsRGBに変換し、
+      プロファイルとEXIFは出力しない
+    - Trueの場合は画素を変換せずに元のプロファイルとEXIFを出力に埋め込む。
+      フォーマットがプロファイルを保持できない場合（GIF, BMPなど）や、
+      保存時に画像モードが変わる場合（CMYKからWebPなど）はsRGBに変換する
+
+    Parameters
+    ----------
+    image : Image.Image
+        入力画像（デコード直後の ``info`` を持つもの）
+    pillow_format : str
+        Pillowの保存フォーマット名
+    preserve_metadata : bool
+        ICCプロファイルとEXIFを出力に引き継ぐか
+    intent : ImageCms.Intent
+        sRGBへ変換する場合のレンダリングインテント
+    cache : TransformCache | None
+        変換オブジェクトのキャッシュ
+
+    Returns
+    -------
+    tuple[Image.Image, dict[str, Any]]
+        保存する画像と、``Image.save`` に追加するオプション
+        （``icc_profile`` / ``exif``）
+    """
+    options: dict[str, Any] = {}
+    if preserve_metadata and pillow_format in EXIF_FORMATS:
+        exif = _exif_bytes(image)
+        if exif:
+            options["exif"] = exif
+
+    profile = get_icc_profile(image)
+    if profile is None:
+        return image, options
+
+    if (
+        preserve_metadata
+        and pillow_format in ICC_FORMATS
+        and image.mode in _PRESERVABLE_MODES[pillow_format]
+    ):
+        options["icc_profile"] = profile
+        return image, options
+
+    return to_srgb(image, intent=intent, cache=cache), options
@@ -0,0 +1,1009 @@
+"""DDS（DirectDraw Surface）テクスチャの読み込み・書き込みとPNG変換.
+
+Pillowの DDS プラグインで読み込み、Pillowが未対応の BCn 形式
+（バージョンにより DX10 ヘッダーの BC1〜BC4、sRGB/SNORM 派生など）は
+NumPy で 4x4 ブロックを一括デコードする。ImageMagick（Wand）を使わずに
+プロセス内で変換できるため、プロセスプールでの一括変換に向く。
+
+ファイルはメモリマップで開き、ヘッダーとミップテーブルから必要な
+ミップレベルの範囲だけを読み出してデコードする。
+
+書き込みは BC1（DXT1）/ BC3（DXT5）のみ対応し、ミップチェーンを含めて出力する。
+"""
+
+import io
+import logging
+import mmap
+import os
+import struct
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, TypedDict
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from image_processor.conversion.presets import get_save_options
+from image_processor.core.common import create_processing_result
+from image_processor.types import DdsCompression, EncoderPreset, ProcessingResult
+
+logger = logging.getLogger(__name__)
+
+DDS_MAGIC = b"DDS "
+HEADER_SIZE = 124
+DX10_HEADER_SIZE = 20
+
+_DDPF_FOURCC = 0x4
+_DDPF_PALETTEINDEXED8 = 0x20
+_DDSD_MIPMAPCOUNT = 0x20000
+_PALETTE_SIZE = 1024
+
+# FourCC -> BCn 形式名
+_FOURCC_FORMATS: dict[bytes, str] = {
+    b"DXT1": "BC1",
+    b"DXT2": "BC2",
+    b"DXT3": "BC2",
+    b"DXT4": "BC3",
+    b"DXT5": "BC3",
+    b"ATI1": "BC4",
+    b"BC4U": "BC4",
+    b"BC4S": "BC4S",
+    b"ATI2": "BC5",
+    b"BC5U": "BC5",
+    b"BC5S": "BC5S",
+}
+
+# DXGI_FORMAT -> BCn 形式名（TYPELESS / UNORM / UNORM_SRGB / SNORM）
+_DXGI_FORMATS: dict[int, str] = {
+    70: "BC1", 71: "BC1", 72: "BC1",
+    73: "BC2", 74: "BC2", 75: "BC2",
+    76: "BC3", 77: "BC3", 78: "BC3",
+    79: "BC4", 80: "BC4", 81: "BC4S",
+    82: "BC5", 83: "BC5", 84: "BC5S",
+    94: "BC6H", 95: "BC6H", 96: "BC6HS",
+    97: "BC7", 98: "BC7", 99: "BC7",
+}
+_DXGI_SRGB = frozenset({72, 75, 78, 99})
+
+# 非圧縮のDXGI_FORMAT -> 1画素あたりのビット数（R8G8B8A8 / B8G8R8A8 / B8G8R8X8）
+_DXGI_BIT_COUNTS: dict[int, int] = {
+    27: 32, 28: 32, 29: 32, 87: 32, 88: 32, 90: 32, 91: 32,
+}
+
+# 4x4 ブロックあたりのバイト数
+BLOCK_SIZES: dict[str, int] = {
+    "BC1": 8, "BC2": 16, "BC3": 16, "BC4": 8, "BC4S": 8,
+    "BC5": 16, "BC5S": 16, "BC6H": 16, "BC6HS": 16, "BC7": 16,
+}
+
+# NumPy でデコードできる形式
+NUMPY_FORMATS = frozenset({"BC1", "BC2", "BC3", "BC4", "BC4S", "BC5", "BC5S"})
+
+
+class DdsInfo(TypedDict):
+    """DDSヘッダー情報の型定義."""
+
+    width: int
+    height: int
+    mip_count: int
+    format: str
+    bit_count: int
+    srgb: bool
+    data_offset: int
+
+
+class MipLevel(TypedDict):
+    """ミップレベルの位置情報の型定義."""
+
+    level: int
+    width: int
+    height: int
+    offset: int
+    size: int
+
+
+def parse_dds_header(header: bytes) -> DdsInfo:
+    """DDSファイル先頭のヘッダーを解析。
+
+    Parameters
+    ----------
+    header : bytes
+        ファイル先頭のバイト列（DX10拡張ヘッダーを含め148バイト以上を推奨）
+
+    Returns
+    -------
+    DdsInfo
+        ヘッダー情報。非圧縮形式の場合 ``format`` は "RAW"（RGB/輝度マスク指定）、
+        "P8"（パレット）または "DXGI_<番号>"
+
+    Raises
+    ------
+    ValueError
+        DDSファイルでない、またはヘッダーが不完全な場合
+    """
+    if len(header) < 4 + HEADER_SIZE or header[:4] != DDS_MAGIC:
+        raise ValueError("DDSファイルではありません")
+
+    size, _flags, height, width = struct.unpack_from("<4I", header, 4)
+    if size != HEADER_SIZE:
+        raise ValueError(f"不正なDDSヘッダーサイズです: {size}")
+    (mip_count,) = struct.unpack_from("<I", header, 28)
+    pf_flags, fourcc, bit_count = struct.unpack_from("<I4sI", header, 80)
+
+    data_offset = 4 + HEADER_SIZE
+    srgb = False
+    if pf_flags & _DDPF_PALETTEINDEXED8:
+        fmt = "P8"
+        data_offset += _PALETTE_SIZE
+    elif not pf_flags & _DDPF_FOURCC:
+        fmt = "RAW"
+    elif fourcc == b"DX10":
+        if len(header) < data_offset + DX10_HEADER_SIZE:
+            raise ValueError("DX10ヘッダーが不完全です")
+        (dxgi_format,) = struct.unpack_from("<I", header, data_offset)
+        data_offset += DX10_HEADER_SIZE
+        fmt = _DXGI_FORMATS.get(dxgi_format, f"DXGI_{dxgi_format}")
+        bit_count = _DXGI_BIT_COUNTS.get(dxgi_format, 0)
+        srgb = dxgi_format in _DXGI_SRGB or dxgi_format in (29, 91)
+    else:
+        fmt = _FOURCC_FORMATS.get(fourcc, fourcc.decode("latin-1"))
+
+    return DdsInfo(
+        width=width,
+        height=height,
+        mip_count=max(mip_count, 1),
+        format=fmt,
+        bit_count=bit_count,
+        srgb=srgb,
+        data_offset=data_offset,
+    )
+
+
+def read_dds_info(path: Path) -> DdsInfo:
+    """画素データを読まずにDDSファイルのヘッダー情報を取得。
+
+    Parameters
+    ----------
+    path : Path
+        DDSファイルのパス
+
+    Returns
+    -------
+    DdsInfo
+        ヘッダー情報
+
+    Raises
+    ------
+    ValueError
+        DDSファイルでない場合
+    """
+    with path.open("rb") as f:
+        return parse_dds_header(f.read(4 + HEADER_SIZE + DX10_HEADER_SIZE))
+
+
+def _level_size(info: DdsInfo, width: int, height: int) -> int:
+    """ミップレベル1枚分のデータサイズを求める。"""
+    block_size = BLOCK_SIZES.get(info["format"])
+    if block_size is not None:
+        return max((width + 3) // 4, 1) * max((height + 3) // 4, 1) * block_size
+    if info["bit_count"] <= 0:
+        raise ValueError(f"未対応のDDS形式です: {info['format']}")
+    return (width * info["bit_count"] + 7) // 8 * height
+
+
+def mip_levels(info: DdsInfo) -> list[MipLevel]:
+    """ヘッダー情報からミップテーブル（各レベルのサイズと位置）を計算。
+
+    キューブマップやテクスチャ配列の場合は最初の面のミップのみを返す。
+
+    Parameters
+    ----------
+    info : DdsInfo
+        ヘッダー情報
+
+    Returns
+    -------
+    list[MipLevel]
+        レベル0（最大）から順のミップレベル
+
+    Raises
+    ------
+    ValueError
+        データサイズを計算できない形式の場合
+    """
+    levels: list[MipLevel] = []
+    width, height = info["width"], info["height"]
+    offset = info["data_offset"]
+    for level in range(info["mip_count"]):
+        size = _level_size(info, width, height)
+        levels.append(
+            MipLevel(level=level, width=width, height=height, offset=offset, size=size)
+        )
+        offset += size
+        if width == 1 and height == 1:
+            break
+        width, height = max(width // 2, 1), max(height // 2, 1)
+    return levels
+
+
+def select_mip_level(
+    levels: Sequence[MipLevel],
+    *,
+    level: int | None = None,
+    min_size: int | None = None,
+) -> MipLevel:
+    """デコードするミップレベルを選択。
+
+    Parameters
+    ----------
+    levels : Sequence[MipLevel]
+        ``mip_levels`` の結果
+    level : int | None
+        ミップレベル番号。範囲外の場合は最小のレベル
+    min_size : int | None
+        必要な長辺のピクセル数。長辺がこれ以上の最小のレベルを選ぶ
+        （該当がない場合はレベル0）
+
+    Returns
+    -------
+    MipLevel
+        選択したミップレベル
+
+    Raises
+    ------
+    ValueError
+        ``level`` と ``min_size`` を同時に指定した場合
+    """
+    if level is not None and min_size is not None:
+        raise ValueError("ミップレベルと最小サイズは同時に指定できません")
+    if level is not None:
+        return levels[min(max(level, 0), len(levels) - 1)]
+    if min_size is not None:
+        candidates = [m for m in levels if max(m["width"], m["height"]) >= min_size]
+        return candidates[-1] if candidates else levels[0]
+    return levels[0]
+
+
+def _unpack_565(color: npt.NDArray[np.uint16]) -> npt.NDArray[np.int32]:
+    """RGB565を8bitのRGBに展開する。"""
+    c = color.astype(np.int32)
+    r = (c >> 11) & 0x1F
+    g = (c >> 5) & 0x3F
+    b = c & 0x1F
+    return np.stack(
+        [(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1
+    )
+
+
+def _decode_color_blocks(
+    blocks: npt.NDArray[np.uint8],
+    *,
+    punchthrough: bool,
+) -> npt.NDArray[np.uint8]:
+    """BC1形式のカラーブロックをRGBAの16画素に展開する。
+
+    ``punchthrough`` がTrueの場合、c0 <= c1 のブロックは3色+透明として扱う
+    （BC1単体のみ。BC2/BC3のカラーブロックは常に4色）。
+    """
+    raw = blocks.astype(np.uint32)
+    c0 = (raw[..., 0] | (raw[..., 1] << 8)).astype(np.uint16)
+    c1 = (raw[..., 2] | (raw[..., 3] << 8)).astype(np.uint16)
+    bits = raw[..., 4] | (raw[..., 5] << 8) | (raw[..., 6] << 16) | (raw[..., 7] << 24)
+
+    p0 = _unpack_565(c0)
+    p1 = _unpack_565(c1)
+    palette = np.empty(blocks.shape[:-1] + (4, 4), dtype=np.int32)
+    palette[..., 0, :3] = p0
+    palette[..., 1, :3] = p1
+    palette[..., 2, :3] = (2 * p0 + p1) // 3
+    palette[..., 3, :3] = (p0 + 2 * p1) // 3
+    palette[..., 3] = 255
+
+    if punchthrough:
+        three_color = (c0 <= c1)[..., None]
+        palette[..., 2, :3] = np.where(three_color, (p0 + p1) // 2, palette[..., 2, :3])
+        palette[..., 3, :] = np.where(three_color, 0, palette[..., 3, :])
+
+    shifts = np.arange(16, dtype=np.uint32) * 2
+    indices = (bits[..., None] >> shifts) & 3
+    pixels = np.take_along_axis(palette, indices[..., None].astype(np.intp), axis=-2)
+    return pixels.astype(np.uint8)
+
+
+def _decode_alpha_blocks(
+    blocks: npt.NDArray[np.uint8],
+    *,
+    signed: bool = False,
+) -> npt.NDArray[np.uint8]:
+    """BC4形式（BC3のアルファ、BC5の各チャンネル）の単一チャンネルブロックを展開する。
+
+    SNORM形式は -127〜127 の値に128を加えて 0〜255 に写像する（Pillowと同じ表現）。
+    """
+    raw = blocks.astype(np.int32)
+    if signed:
+        a0 = np.maximum(raw[..., 0] - ((raw[..., 0] & 0x80) << 1), -127)
+        a1 = np.maximum(raw[..., 1] - ((raw[..., 1] & 0x80) << 1), -127)
+        low, high = -127, 127
+    else:
+        a0, a1 = raw[..., 0], raw[..., 1]
+        low, high = 0, 255
+
+    palette = np.empty(blocks.shape[:-1] + (8,), dtype=np.int32)
+    palette[..., 0] = a0
+    palette[..., 1] = a1
+    eight = (a0 > a1)
+    for i in range(2, 8):
+        palette[..., i] = ((8 - i) * a0 + (i - 1) * a1) // 7
+    six = np.empty_like(palette[..., 2:])
+    for i in range(2, 6):
+        six[..., i - 2] = ((6 - i) * a0 + (i - 1) * a1) // 5
+    six[..., 4] = low
+    six[..., 5] = high
+    palette[..., 2:] = np.where(eight[..., None], palette[..., 2:], six)
+
+    bits = np.zeros(blocks.shape[:-1], dtype=np.uint64)
+    for i in range(6):
+        bits |= blocks[..., 2 + i].astype(np.uint64) << np.uint64(8 * i)
+    shifts = np.arange(16, dtype=np.uint64) * np.uint64(3)
+    indices = ((bits[..., None] >> shifts) & np.uint64(7)).astype(np.intp)
+    values = np.take_along_axis(palette, indices, axis=-1)
+    if signed:
+        values = values + 128
+    return values.astype(np.uint8)
+
+
+def decode_block_compressed(
+    data: bytes | memoryview,
+    width: int,
+    height: int,
+    fmt: str,
+) -> Image.Image:
+    """BCn圧縮データをNumPyでデコード。
+
+    Parameters
+    ----------
+    data : bytes | memoryview
+        ミップレベル1枚分の圧縮データ
+    width : int
+        画像の幅
+    height : int
+        画像の高さ
+    fmt : str
+        BCn形式名（"BC1"〜"BC5", "BC4S", "BC5S"）
+
+    Returns
+    -------
+    Image.Image
+        BC1〜BC3はRGBA、BC4はL、BC5はRGB（Bチャンネルは0）の画像
+
+    Raises
+    ------
+    ValueError
+        未対応の形式、またはデータ長が不足している場合
+    """
+    if fmt not in NUMPY_FORMATS:
+        raise ValueError(f"未対応のDDS圧縮形式です: {fmt}")
+
+    blocks_x = max((width + 3) // 4, 1)
+    blocks_y = max((height + 3) // 4, 1)
+    block_size = BLOCK_SIZES[fmt]
+    needed = blocks_x * blocks_y * block_size
+    if len(data) < needed:
+        raise ValueError(f"DDSデータが不足しています: {len(data)} < {needed}")
+
+    blocks = np.frombuffer(data, dtype=np.uint8, count=needed).reshape(
+        blocks_y, blocks_x, block_size
+    )
+
+    if fmt == "BC1":
+        pixels = _decode_color_blocks(blocks, punchthrough=True)
+    elif fmt == "BC2":
+        pixels = _decode_color_blocks(blocks[..., 8:], punchthrough=False)
+        nibbles = np.stack([blocks[..., :8] & 0x0F, blocks[..., :8] >> 4], axis=-1)
+        pixels[..., 3] = nibbles.reshape(blocks_y, blocks_x, 16) * 17
+    elif fmt == "BC3":
+        pixels = _decode_color_blocks(blocks[..., 8:], punchthrough=False)
+        pixels[..., 3] = _decode_alpha_blocks(blocks[..., :8])
+    elif fmt in ("BC4", "BC4S"):
+        pixels = _decode_alpha_blocks(blocks, signed=fmt == "BC4S")[..., None]
+    else:
+        signed = fmt == "BC5S"
+        red = _decode_alpha_blocks(blocks[..., :8], signed=signed)
+        green = _decode_alpha_blocks(blocks[..., 8:], signed=signed)
+        pixels = np.stack([red, green, np.zeros_like(red)], axis=-1)
+
+    channels = pixels.shape[-1]
+    image = (
+        pixels.reshape(blocks_y, blocks_x, 4, 4, channels)
+        .transpose(0, 2, 1, 3, 4)
+        .reshape(blocks_y * 4, blocks_x * 4, channels)[:height, :width]
+    )
+    mode = {1: "L", 3: "RGB", 4: "RGBA"}[channels]
+    if channels == 1:
+        image = image[..., 0]
+    return Image.fromarray(np.ascontiguousarray(image), mode)
+
+
+def _single_level_header(header: bytes, mip: MipLevel) -> bytes:
+    """指定ミップレベルのみを持つDDSヘッダーを作成する（Pillowでのデコード用）。"""
+    patched = bytearray(header)
+    (flags,) = struct.unpack_from("<I", patched, 8)
+    struct.pack_into("<I", patched, 8, flags & ~_DDSD_MIPMAPCOUNT)
+    struct.pack_into("<3I", patched, 12, mip["height"], mip["width"], mip["size"])
+    struct.pack_into("<I", patched, 28, 1)
+    return bytes(patched)
+
+
+def _decode_level(
+    header: bytes, info: DdsInfo, mip: MipLevel, data: bytes
+) -> Image.Image:
+    """ミップレベル1枚をPillow、未対応の場合はNumPyでデコードする。"""
+    stream = io.BytesIO(_single_level_header(header, mip) + data)
+    try:
+        with Image.open(stream, formats=["DDS"]) as img:
+            img.load()
+            return img.copy()
+    except (OSError, NotImplementedError) as e:
+        if info["format"] not in NUMPY_FORMATS:
+            raise ValueError(f"未対応のDDS形式です: {info['format']} ({e})") from e
+        logger.debug(f"PillowでDDSを読み込めないためNumPyでデコードします: {e}")
+
+    image = decode_block_compressed(data, mip["width"], mip["height"], info["format"])
+    if info["srgb"]:
+        image.info["gamma"] = 1 / 2.2
+    return image
+
+
+def load_dds(
+    path: Path,
+    *,
+    mip_level: int | None = None,
+    min_size: int | None = None,
+) -> Image.Image:
+    """DDSファイルの指定ミップレベルをデコード。
+
+    ファイルをメモリマップで開き、選択したミップレベルのデータのみを
+    読み出す。Pillowで読み込めない BCn 形式はNumPyのデコーダーにフォールバックする。
+
+    Parameters
+    ----------
+    path : Path
+        DDSファイルのパス
+    mip_level : int | None
+        デコードするミップレベル（0が最大）
+    min_size : int | None
+        必要な長辺のピクセル数。これ以上の最小のミップレベルをデコードする
+
+    Returns
+    -------
+    Image.Image
+        デコード済みの画像（未指定の場合は最上位ミップ）
+
+    Raises
+    ------
+    ValueError
+        DDSファイルでない、データが不足している、または未対応の形式の場合
+    """
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size < 4 + HEADER_SIZE:
+            raise ValueError("DDSファイルではありません")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            info = parse_dds_header(mm[:4 + HEADER_SIZE + DX10_HEADER_SIZE])
+            levels = mip_levels(info)
+            mip = select_mip_level(levels, level=mip_level, min_size=min_size)
+            if mip["offset"] + mip["size"] > len(mm):
+                raise ValueError(f"DDSデータが不足しています: レベル{mip['level']}")
+            header = mm[:info["data_offset"]]
+            data = mm[mip["offset"]:mip["offset"] + mip["size"]]
+
+    return _decode_level(header, info, mip, data)
+
+
+def dds_to_png(
+    input_path: Path,
+    output_dir: Path,
+    *,
+    preset: EncoderPreset | None = None,
+    mip_level: int | None = None,
+    min_size: int | None = None,
+) -> Path:
+    """DDSファイルをPNGに変換。
+
+    Parameters
+    ----------
+    input_path : Path
+        DDSファイルのパス
+    output_dir : Path
+        出力ディレクトリ
+    preset : EncoderPreset | None
+        PNGのエンコーダープリセット
+    mip_level : int | None
+        出力するミップレベル（``load_dds`` を参照）
+    min_size : int | None
+        必要な長辺のピクセル数（``load_dds`` を参照）
+
+    Returns
+    -------
+    Path
+        出力したPNGファイルのパス
+    """
+    image = load_dds(input_path, mip_level=mip_level, min_size=min_size)
+    output_path = output_dir / f"{input_path.stem}.png"
+    image.save(output_path, "PNG", **get_save_options("png", preset))
+    return output_path
+
+
+def _run_batch(
+    worker: Callable[..., ProcessingResult],
+    paths: Sequence[Path],
+    workers: int | None,
+    *args: Any,
+) -> list[ProcessingResult]:
+    """ファイルごとの処理をプロセスプールで実行し、入力順の結果を返す。"""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("並列数は1以上である必要があります")
+
+    if workers == 1 or len(paths) <= 1:
+        return [worker(path, *args) for path in paths]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        futures = [pool.submit(worker, path, *args) for path in paths]
+        return [future.result() for future in futures]
+
+
+def _convert_one(
+    input_path: Path,
+    output_dir: Path,
+    preset: EncoderPreset | None,
+    mip_level: int | None,
+    min_size: int | None,
+) -> ProcessingResult:
+    """プロセスプールで実行する1ファイル分の変換。"""
+    start = time.perf_counter()
+    try:
+        output_path = dds_to_png(
+            input_path, output_dir,
+            preset=preset, mip_level=mip_level, min_size=min_size,
+        )
+    except Exception as e:
+        # 壊れたファイルは struct.error や IndexError なども送出するため、
+        # 1ファイルの失敗で一括処理全体を止めないようにすべて結果として返す
+        return create_processing_result(
+            "error", input_path, error_message=f"{type(e).__name__}: {e}",
+            processing_time=time.perf_counter() - start,
+        )
+    return create_processing_result(
+        "success", input_path, output_path,
+        processing_time=time.perf_counter() - start,
+    )
+
+
+def convert_dds_files(
+    paths: Sequence[Path],
+    output_dir: Path,
+    *,
+    workers: int | None = None,
+    preset: EncoderPreset | None = None,
+    mip_level: int | None = None,
+    min_size: int | None = None,
+) -> list[ProcessingResult]:
+    """複数のDDSファイルをプロセスプールでPNGに一括変換。
+
+    Parameters
+    ----------
+    paths : Sequence[Path]
+        DDSファイルのパス
+    output_dir : Path
+        出力ディレクトリ
+    workers : int | None
+        プロセス数。Noneの場合はCPU数（1の場合はプロセスを起動しない）
+    preset : EncoderPreset | None
+        PNGのエンコーダープリセット
+    mip_level : int | None
+        出力するミップレベル
+    min_size : int | None
+        必要な長辺のピクセル数
+
+    Returns
+    -------
+    list[ProcessingResult]
+        入力順の処理結果
+    """
+    return _run_batch(
+        _convert_one, paths, workers, output_dir, preset, mip_level, min_size
+    )
+
+
+# --- 書き込み（BC1/BC3 圧縮） -------------------------------------------------
+
+# 一度に処理する4x4ブロック数（距離計算の作業メモリを抑えるため）
+_ENCODE_CHUNK_BLOCKS = 16384
+
+_DDSD_CAPS = 0x1
+_DDSD_HEIGHT = 0x2
+_DDSD_WIDTH = 0x4
+_DDSD_PIXELFORMAT = 0x1000
+_DDSD_LINEARSIZE = 0x80000
+_DDSCAPS_COMPLEX = 0x8
+_DDSCAPS_TEXTURE = 0x1000
+_DDSCAPS_MIPMAP = 0x400000
+
+_COMPRESSION_FOURCC: dict[DdsCompression, bytes] = {"bc1": b"DXT1", "bc3": b"DXT5"}
+
+
+def _image_blocks(image: Image.Image) -> tuple[npt.NDArray[np.float32], int, int]:
+    """RGBA画像を端の画素で4の倍数に拡張し、(ブロック数, 16, 4) の配列にする。"""
+    pixels = np.asarray(image.convert("RGBA"), dtype=np.uint8)
+    blocks_y = max((image.height + 3) // 4, 1)
+    blocks_x = max((image.width + 3) // 4, 1)
+    padded = np.pad(
+        pixels,
+        ((0, blocks_y * 4 - image.height), (0, blocks_x * 4 - image.width), (0, 0)),
+        mode="edge",
+    )
+    blocks = (
+        padded.reshape(blocks_y, 4, blocks_x, 4, 4)
+        .transpose(0, 2, 1, 3, 4)
+        .reshape(blocks_y * blocks_x, 16, 4)
+    )
+    return blocks.astype(np.float32), blocks_y, blocks_x
+
+
+def _pack_565(colors: npt.NDArray[np.float32]) -> npt.NDArray[np.int32]:
+    """8bitのRGBをRGB565に量子化する。"""
+    levels = np.array([31, 63, 31], dtype=np.float32)
+    scaled = np.rint(colors * levels / 255).astype(np.int32)
+    return (scaled[:, 0] << 11) | (scaled[:, 1] << 5) | scaled[:, 2]
+
+
+def _fit_endpoints(
+    colors: npt.NDArray[np.float32],
+    weights: npt.NDArray[np.float32],
+) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+    """各ブロックの主成分軸に沿った端点色を求める（全ブロック一括）。"""
+    total = weights.sum(axis=1, keepdims=True)
+    safe_total = np.maximum(total, 1e-6)
+    mean = (colors * weights[..., None]).sum(axis=1) / safe_total
+    centered = colors - mean[:, None, :]
+    covariance = (centered * weights[..., None]).transpose(0, 2, 1) @ centered
+
+    # べき乗法で主成分軸を求める（初期値は対角方向）
+    axis = np.ones_like(mean)
+    for _ in range(4):
+        axis = (covariance @ axis[..., None])[..., 0]
+        norm = np.linalg.norm(axis, axis=1, keepdims=True)
+        axis = np.where(norm > 1e-6, axis / np.maximum(norm, 1e-6), 1 / np.sqrt(3))
+
+    projection = (centered @ axis[..., None])[..., 0]
+    active = weights > 0
+    high = np.where(active, projection, -np.inf).max(axis=1)
+    low = np.where(active, projection, np.inf).min(axis=1)
+    high = np.where(np.isfinite(high), high, 0)
+    low = np.where(np.isfinite(low), low, 0)
+
+    start = mean + axis * high[:, None]
+    end = mean + axis * low[:, None]
+    # 端点をわずかに内側に寄せ、量子化誤差を中間色で吸収しやすくする
+    inset = (start - end) / 16
+    return np.clip(start - inset, 0, 255), np.clip(end + inset, 0, 255)
+
+
+def _encode_color_blocks(
+    blocks: npt.NDArray[np.float32],
+    *,
+    punchthrough: bool,
+) -> npt.NDArray[np.uint8]:
+    """RGBAブロックをBC1形式のカラーブロック（8バイト）に圧縮する。
+
+    ``punchthrough`` がTrueの場合、アルファ128未満の画素を含むブロックは
+    3色+透明モード（c0 <= c1）で圧縮する。
+    """
+    colors = blocks[..., :3]
+    transparent = blocks[..., 3] < 128
+    if not punchthrough:
+        transparent[:] = False
+    weights = (~transparent).astype(np.float32)
+    start, end = _fit_endpoints(colors, weights)
+
+    c0 = _pack_565(start)
+    c1 = _pack_565(end)
+    three_color = transparent.any(axis=1)
+    # 4色モードは c0 > c1、3色+透明モードは c0 <= c1 となるよう端点を入れ替える
+    swap = np.where(three_color, c0 > c1, c0 < c1)
+    c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+
+    p0 = _unpack_565(c0.astype(np.uint16)).astype(np.float32)
+    p1 = _unpack_565(c1.astype(np.uint16)).astype(np.float32)
+    palette = np.stack([
+        p0,
+        p1,
+        np.where(three_color[:, None], (p0 + p1) // 2, (2 * p0 + p1) // 3),
+        (p0 + 2 * p1) // 3,
+    ], axis=1)
+
+    # |c - p|^2 の c に依存しない部分のみで比較する（-2c・p + |p|^2）
+    distances = (
+        (palette * palette).sum(axis=2)[:, None, :]
+        - 2 * (colors @ palette.transpose(0, 2, 1))
+    )
+    distances[..., 3] = np.where(three_color[:, None], np.inf, distances[..., 3])
+    indices = distances.argmin(axis=2).astype(np.uint32)
+    indices = np.where(transparent, 3, indices)
+    # 端点が同じブロックは全画素をインデックス0にする（3色モード扱いでも同じ色）
+    indices = np.where(((c0 == c1) & ~three_color)[:, None], 0, indices)
+
+    shifts = np.arange(16, dtype=np.uint32) * 2
+    bits = (indices << shifts).sum(axis=1, dtype=np.uint32)
+    out = np.empty((len(blocks), 8), dtype=np.uint8)
+    out[:, 0:2] = c0.astype("<u2").view(np.uint8).reshape(-1, 2)
+    out[:, 2:4] = c1.astype("<u2").view(np.uint8).reshape(-1, 2)
+    out[:, 4:8] = bits.astype("<u4").view(np.uint8).reshape(-1, 4)
+    return out
+
+
+def _encode_alpha_blocks(alpha: npt.NDArray[np.float32]) -> npt.NDArray[np.uint8]:
+    """単一チャンネルのブロックをBC4形式（8バイト、8段階補間モード）に圧縮する。"""
+    a0 = alpha.max(axis=1).astype(np.int32)
+    a1 = alpha.min(axis=1).astype(np.int32)
+
+    palette = np.empty((len(alpha), 8), dtype=np.int32)
+    palette[:, 0] = a0
+    palette[:, 1] = a1
+    for i in range(2, 8):
+        palette[:, i] = ((8 - i) * a0 + (i - 1) * a1) // 7
+    # a0 == a1 のブロックはデコーダーが6段階モードとして扱うため、インデックス0のみ使う
+    distances = np.abs(alpha[:, :, None] - palette[:, None, :])
+    indices = distances.argmin(axis=2).astype(np.uint64)
+    indices = np.where((a0 == a1)[:, None], np.uint64(0), indices)
+
+    bits = (indices << (np.arange(16, dtype=np.uint64) * np.uint64(3))).sum(
+        axis=1, dtype=np.uint64
+    )
+    out = np.empty((len(alpha), 8), dtype=np.uint8)
+    out[:, 0] = a0
+    out[:, 1] = a1
+    out[:, 2:8] = bits.astype("<u8").view(np.uint8).reshape(-1, 8)[:, :6]
+    return out
+
+
+def encode_block_compressed(image: Image.Image, compression: DdsCompression) -> bytes:
+    """画像をBC1またはBC3形式に圧縮。
+
+    全4x4ブロックの端点選択（主成分軸）とインデックス割り当てをNumPyで一括処理する。
+
+    Parameters
+    ----------
+    image : Image.Image
+        圧縮する画像（任意のモード。RGBAに変換して処理）
+    compression : DdsCompression
+        "bc1"（DXT1、1bitアルファ）または "bc3"（DXT5、8bitアルファ）
+
+    Returns
+    -------
+    bytes
+        ミップレベル1枚分の圧縮データ
+
+    Raises
+    ------
+    ValueError
+        未対応の圧縮形式の場合
+    """
+    if compression not in _COMPRESSION_FOURCC:
+        raise ValueError(f"未対応のDDS圧縮形式です: {compression}")
+
+    blocks, _, _ = _image_blocks(image)
+    chunks: list[bytes] = []
+    for start in range(0, len(blocks), _ENCODE_CHUNK_BLOCKS):
+        chunk = blocks[start:start + _ENCODE_CHUNK_BLOCKS]
+        if compression == "bc1":
+            encoded = _encode_color_blocks(chunk, punchthrough=True)
+        else:
+            encoded = np.concatenate([
+                _encode_alpha_blocks(chunk[..., 3]),
+                _encode_color_blocks(chunk, punchthrough=False),
+            ], axis=1)
+        chunks.append(encoded.tobytes())
+    return b"".join(chunks)
+
+
+def build_mip_chain(image: Image.Image, *, min_size: int = 1) -> list[Image.Image]:
+    """``Image.reduce`` で1/2ずつ縮小したミップチェーンを作成。
+
+    各レベルのサイズはDDSの規約どおり前レベルの半分（切り捨て、最小1）になる。
+    RGBA画像は乗算済みアルファで縮小し、透明部分の色が滲まないようにする。
+
+    Parameters
+    ----------
+    image : Image.Image
+        レベル0の画像
+    min_size : int
+        最小レベルの長辺のピクセル数（これ未満のレベルは作らない）
+
+    Returns
+    -------
+    list[Image.Image]
+        レベル0から順のミップ画像
+    """
+    premultiplied = image.mode == "RGBA"
+    current = image.convert("RGBa") if premultiplied else image
+    levels = [image]
+    while max(current.size) > max(min_size, 1):
+        width, height = current.size
+        factor = (2 if width > 1 else 1, 2 if height > 1 else 1)
+        box = (0, 0, width - width % factor[0], height - height % factor[1])
+        current = current.reduce(factor, box=box)
+        levels.append(current.convert("RGBA") if premultiplied else current)
+    return levels
+
+
+def _choose_compression(image: Image.Image) -> DdsCompression:
+    """半透明を含む画像はBC3、それ以外はBC1を選ぶ。"""
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        alpha = np.asarray(image.convert("RGBA").getchannel("A"))
+        if ((alpha > 0) & (alpha < 255)).any():
+            return "bc3"
+    return "bc1"
+
+
+def encode_dds(
+    image: Image.Image,
+    *,
+    compression: DdsCompression | None = None,
+    mipmaps: bool = True,
+) -> bytes:
+    """画像をBC1/BC3圧縮のDDSファイルにエンコード。
+
+    Parameters
+    ----------
+    image : Image.Image
+        エンコードする画像
+    compression : DdsCompression | None
+        圧縮形式。Noneの場合は半透明を含めば "bc3"、それ以外は "bc1"
+    mipmaps : bool
+        ミップチェーン（1x1まで）を含めるか
+
+    Returns
+    -------
+    bytes
+        DDSファイルのバイト列
+    """
+    if compression is None:
+        compression = _choose_compression(image)
+    levels = build_mip_chain(image) if mipmaps else [image]
+    payload = [encode_block_compressed(level, compression) for level in levels]
+
+    flags = (
+        _DDSD_CAPS | _DDSD_HEIGHT | _DDSD_WIDTH | _DDSD_PIXELFORMAT | _DDSD_LINEARSIZE
+    )
+    caps = _DDSCAPS_TEXTURE
+    if len(levels) > 1:
+        flags |= _DDSD_MIPMAPCOUNT
+        caps |= _DDSCAPS_COMPLEX | _DDSCAPS_MIPMAP
+
+    header = struct.pack(
+        "<7I44x2I4s5I5I",
+        HEADER_SIZE, flags, image.height, image.width, len(payload[0]), 0, len(levels),
+        32, _DDPF_FOURCC, _COMPRESSION_FOURCC[compression], 0, 0, 0, 0, 0,
+        caps, 0, 0, 0, 0,
+    )
+    return DDS_MAGIC + header + b"".join(payload)
+
+
+def save_dds(
+    image: Image.Image,
+    destination: Path | BinaryIO,
+    *,
+    compression: DdsCompression | None = None,
+    mipmaps: bool = True,
+) -> None:
+    """画像をBC1/BC3圧縮のDDSファイルとして保存。
+
+    Parameters
+    ----------
+    image : Image.Image
+        保存する画像
+    destination : Path | BinaryIO
+        出力先のパスまたはバイナリストリーム
+    compression : DdsCompression | None
+        圧縮形式（``encode_dds`` を参照）
+    mipmaps : bool
+        ミップチェーンを含めるか
+    """
+    data = encode_dds(image, compression=compression, mipmaps=mipmaps)
+    if isinstance(destination, Path):
+        destination.write_bytes(data)
+    else:
+        destination.write(data)
+
+
+def image_to_dds(
+    input_path: Path,
+    output_dir: Path,
+    *,
+    compression: DdsCompression | None = None,
+    mipmaps: bool = True,
+) -> Path:
+    """画像ファイルをDDSに変換。
+
+    Parameters
+    ----------
+    input_path : Path
+        入力画像のパス
+    output_dir : Path
+        出力ディレクトリ
+    compression : DdsCompression | None
+        圧縮形式（``encode_dds`` を参照）
+    mipmaps : bool
+        ミップチェーンを含めるか
+
+    Returns
+    -------
+    Path
+        出力したDDSファイルのパス
+    """
+    with Image.open(input_path) as img:
+        img.load()
+        output_path = output_dir / f"{input_path.stem}.dds"
+        save_dds(img, output_path, compression=compression, mipmaps=mipmaps)
+    return output_path
+
+
+def _encode_one(
+    input_path: Path,
+    output_dir: Path,
+    compression: DdsCompression | None,
+    mipmaps: bool,
+) -> ProcessingResult:
+    """プロセスプールで実行する1ファイル分のDDSエンコード。"""
+    start = time.perf_counter()
+    try:
+        output_path = image_to_dds(
+            input_path, output_dir, compression=compression, mipmaps=mipmaps
+        )
+    except Exception as e:
+        # 壊れたファイルは struct.error や IndexError なども送出するため、
+        # 1ファイルの失敗で一括処理全体を止めないようにすべて結果として返す
+        return create_processing_result(
+            "error", input_path, error_message=f"{type(e).__name__}: {e}",
+            processing_time=time.perf_counter() - start,
+        )
+    return create_processing_result(
+        "success", input_path, output_path,
+        processing_time=time.perf_counter() - start,
+    )
+
+
+def convert_to_dds_files(
+    paths: Sequence[Path],
+    output_dir: Path,
+    *,
+    workers: int | None = None,
+    compression: DdsCompression | None = None,
+    mipmaps: bool = True,
+) -> list[ProcessingResult]:
+    """複数の画像ファイルをプロセスプールでDDSに一括変換。
+
+    Parameters
+    ----------
+    paths : Sequence[Path]
+        入力画像のパス
+    output_dir : Path
+        出力ディレクトリ
+    workers : int | None
+        プロセス数。Noneの場合はCPU数（1の場合はプロセスを起動しない）
+    compression : DdsCompression | None
+        圧縮形式。Noneの場合は画像ごとに自動選択
+    mipmaps : bool
+        ミップチェーンを含めるか
+
+    Returns
+    -------
+    list[ProcessingResult]
+        入力順の処理結果
+    """
+    return _run_batch(_encode_one, paths, workers, output_dir, compression, mipmaps)
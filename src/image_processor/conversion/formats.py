@@ -0,0 +1,120 @@
+"""画像フォーマット名の対応表と保存前の変換処理."""
+
+from pathlib import Path
+
+from PIL import Image
+
+# フォーマット名（ImageFormat）とPillowの保存フォーマット名の対応
+PILLOW_FORMATS: dict[str, str] = {
+    "png": "PNG",
+    "jpg": "JPEG",
+    "jpeg": "JPEG",
+    "webp": "WEBP",
+    "gif": "GIF",
+    "bmp": "BMP",
+    "tiff": "TIFF",
+    "dds": "DDS",
+}
+
+# Pillowの保存フォーマット名と出力拡張子の対応
+EXTENSIONS: dict[str, str] = {
+    "PNG": ".png",
+    "JPEG": ".jpg",
+    "WEBP": ".webp",
+    "GIF": ".gif",
+    "BMP": ".bmp",
+    "TIFF": ".tiff",
+    "DDS": ".dds",
+}
+
+
+def to_pillow_format(image_format: str) -> str:
+    """フォーマット名をPillowの保存フォーマット名に正規化。
+
+    Parameters
+    ----------
+    image_format : str
+        フォーマット名（"jpg", "PNG", "JPEG" など、大文字小文字は問わない）
+
+    Returns
+    -------
+    str
+        Pillowの保存フォーマット名
+
+    Raises
+    ------
+    ValueError
+        未対応のフォーマットの場合
+    """
+    name = image_format.lower().lstrip(".")
+    if name in PILLOW_FORMATS:
+        return PILLOW_FORMATS[name]
+    if name.upper() in EXTENSIONS:
+        return name.upper()
+    raise ValueError(f"未対応のフォーマットです: {image_format}")
+
+
+def format_from_path(path: Path) -> str:
+    """ファイルの拡張子からPillowの保存フォーマット名を取得。
+
+    Parameters
+    ----------
+    path : Path
+        ファイルパス
+
+    Returns
+    -------
+    str
+        Pillowの保存フォーマット名
+    """
+    return to_pillow_format(path.suffix)
+
+
+def flatten_alpha(
+    image: Image.Image,
+    background: tuple[int, int, int] = (255, 255, 255),
+) -> Image.Image:
+    """透過画像を単色背景に合成してRGBに変換。
+
+    Parameters
+    ----------
+    image : Image.Image
+        入力画像
+    background : tuple[int, int, int]
+        背景色
+
+    Returns
+    -------
+    Image.Image
+        RGB画像
+    """
+    if image.mode in ("RGB", "L"):
+        return image
+    if image.mode == "P":
+        image = image.convert("RGBA")
+    if image.mode not in ("RGBA", "LA"):
+        return image.convert("RGB")
+
+    flattened = Image.new("RGB", image.size, background)
+    flattened.paste(image, mask=image.getchannel("A"))
+    return flattened
+
+
+def prepare_for_format(image: Image.Image, pillow_format: str) -> Image.Image:
+    """保存フォーマットが扱えるモードに画像を変換。
+
+    Parameters
+    ----------
+    image : Image.Image
+        入力画像
+    pillow_format : str
+        Pillowの保存フォーマット名
+
+    Returns
+    -------
+    Image.Image
+        保存可能なモードの画像
+    """
+    if pillow_format == "JPEG":
+        return flatten_alpha(image)
+    return image
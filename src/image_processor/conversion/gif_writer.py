@@ -0,0 +1,243 @@
+"""共通パレットでフレームを逐次書き出すGIFエンコーダー.
+
+Pillowの ``save_all`` によるGIF書き出しは、フレームごとのパレット最適化と
+差分計算のために全フレームをリストに保持する。ここではサンプリングした
+フレームから作成した1つのパレット（グローバルカラーテーブル）を全フレームで
+共有し、フレームを受け取るたびにLZW圧縮して書き出す。保持するのは
+直前に書き出したフレームと、書き出し待ちのフレームのインデックス画像だけになる。
+
+ヘッダーとフレームの符号化にはPillowのGIFプラグインのレガシーAPI
+（``getheader`` / ``getdata``）を使う。
+"""
+
+from collections.abc import Iterable, Sequence
+from types import TracebackType
+from typing import Any, BinaryIO, Self
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+# パレットの作成に使う縮小画像の長辺（ピクセル）
+_PALETTE_SAMPLE_SIZE = 128
+
+# 透過ピクセルとみなすアルファ値の上限（未満）
+_ALPHA_THRESHOLD = 128
+
+# 透過色に予約するパレット番号
+TRANSPARENT_INDEX = 255
+
+
+def build_palette(
+    samples: Iterable[Image.Image],
+    *,
+    transparency: bool = False,
+) -> list[int]:
+    """サンプルフレームから全フレーム共通のパレットを作成。
+
+    各サンプルを縮小し、不透明なピクセルだけを集めてメディアンカットで減色する。
+
+    Parameters
+    ----------
+    samples : Iterable[Image.Image]
+        パレットの作成に使うフレーム
+    transparency : bool
+        透過色用にパレット番号255を空けておくか
+
+    Returns
+    -------
+    list[int]
+        RGBを並べたパレット（最大256色、透過ありは最大255色）
+    """
+    max_colors = TRANSPARENT_INDEX if transparency else 256
+    pixels = []
+    for sample in samples:
+        thumbnail = sample.convert("RGBA")
+        thumbnail.thumbnail((_PALETTE_SAMPLE_SIZE, _PALETTE_SAMPLE_SIZE))
+        array = np.asarray(thumbnail).reshape(-1, 4)
+        pixels.append(array[array[:, 3] >= _ALPHA_THRESHOLD, :3])
+
+    opaque = np.concatenate(pixels) if pixels else np.empty((0, 3), np.uint8)
+    if len(opaque) == 0:
+        opaque = np.zeros((1, 3), np.uint8)
+    strip = Image.frombytes("RGB", (len(opaque), 1), np.ascontiguousarray(opaque))
+    quantized = strip.quantize(max_colors, method=Image.Quantize.MEDIANCUT)
+    palette = quantized.getpalette() or [0, 0, 0]
+    # 減色結果のパレットは使用色数ぶんだけ返されるが、念のため上限で切り詰める
+    return palette[: 3 * max_colors]
+
+
+class GifWriter:
+    """共通パレットでフレームを1枚ずつ逐次書き出すGIFエンコーダー.
+
+    各フレームはパレットに減色してから、直前に書き出したフレームと比較する。
+
+    - 直前と同じフレームは書き出さず、直前のフレームの表示時間に加算する
+    - 不透明なアニメーションは変化した範囲だけを切り出して書き出し、
+      残りは直前のフレームをそのまま残す（disposal 1）
+    - 透過ありのアニメーションは透過部分に前のフレームが残らないよう、
+      毎フレーム全体を書き出して背景に戻す（disposal 2）
+
+    表示時間を加算できるよう、フレームは次のフレームを受け取るか
+    ``close`` を呼ぶまで書き出しを保留する。
+
+    Parameters
+    ----------
+    destination : BinaryIO
+        出力先のバイナリファイルオブジェクト
+    size : tuple[int, int]
+        キャンバスのサイズ
+    palette : Sequence[int]
+        RGBを並べた共通パレット（``build_palette`` の戻り値）
+    loop : int | None
+        繰り返し回数（0は無限）。Noneの場合は1回だけ再生
+    transparency : bool
+        アルファ値128未満のピクセルを透過色で書き出すか
+    dither : bool
+        減色時にFloyd-Steinbergディザリングを行うか。ディザリングすると
+        静止している領域もフレーム間で変化しやすく、差分の範囲が広がる
+
+    Raises
+    ------
+    ValueError
+        パレットが空、または色数が多すぎる場合
+    """
+
+    def __init__(
+        self,
+        destination: BinaryIO,
+        size: tuple[int, int],
+        palette: Sequence[int],
+        *,
+        loop: int | None = 0,
+        transparency: bool = False,
+        dither: bool = False,
+    ) -> None:
+        n_colors = len(palette) // 3
+        max_colors = TRANSPARENT_INDEX if transparency else 256
+        if not 1 <= n_colors <= max_colors:
+            raise ValueError(
+                f"パレットの色数は1から{max_colors}の範囲である必要があります: "
+                f"{n_colors}"
+            )
+
+        self.size = size
+        self.frames_written = 0
+        self._destination = destination
+        self._n_colors = n_colors
+        self._transparency = transparency
+        self._dither = Image.Dither.FLOYDSTEINBERG if dither else Image.Dither.NONE
+        self._pending: tuple[np.ndarray, int] | None = None
+        self._previous: np.ndarray | None = None
+
+        # 未使用のパレット番号は最後の色で埋め、減色時に選ばれても同じ色になるようにする
+        colors = list(palette[: 3 * n_colors])
+        colors += colors[-3:] * (256 - n_colors)
+        self._palette_image = Image.new("P", (1, 1))
+        self._palette_image.putpalette(colors)
+
+        canvas = Image.new("P", size)
+        canvas.putpalette(colors)
+        info: dict[str, Any] = {"loop": loop}
+        if transparency:
+            info["transparency"] = TRANSPARENT_INDEX
+        header, _ = GifImagePlugin.getheader(canvas, None, info)
+        for chunk in header:
+            destination.write(chunk)
+
+    def _quantize(self, frame: Image.Image) -> np.ndarray:
+        """フレームを共通パレットのインデックス画像に変換する。"""
+        if frame.size != self.size:
+            raise ValueError(
+                f"フレームのサイズが一致しません: {frame.size} != {self.size}"
+            )
+        quantized = frame.convert("RGB").quantize(
+            palette=self._palette_image, dither=self._dither
+        )
+        indices: np.ndarray = np.minimum(np.asarray(quantized), self._n_colors - 1)
+        if self._transparency and frame.has_transparency_data:
+            alpha = np.asarray(frame.convert("RGBA").getchannel("A"))
+            indices[alpha < _ALPHA_THRESHOLD] = TRANSPARENT_INDEX
+        return indices
+
+    def write(self, frame: Image.Image, duration: int) -> None:
+        """フレームを追加する。
+
+        Parameters
+        ----------
+        frame : Image.Image
+            キャンバスと同じサイズのフレーム
+        duration : int
+            表示時間（ミリ秒）
+
+        Raises
+        ------
+        ValueError
+            フレームのサイズがキャンバスと異なる場合
+        """
+        indices = self._quantize(frame)
+        if self._pending is not None and np.array_equal(indices, self._pending[0]):
+            self._pending = (self._pending[0], self._pending[1] + duration)
+            return
+        self._flush()
+        self._pending = (indices, duration)
+
+    def _flush(self) -> None:
+        """保留中のフレームを書き出す。"""
+        if self._pending is None:
+            return
+        indices, duration = self._pending
+        height, width = indices.shape
+        left, top, right, bottom = 0, 0, width, height
+
+        if not self._transparency and self._previous is not None:
+            changed = indices != self._previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            cols = np.flatnonzero(changed.any(axis=0))
+            if len(rows):
+                top, bottom = int(rows[0]), int(rows[-1]) + 1
+                left, right = int(cols[0]), int(cols[-1]) + 1
+            else:
+                right, bottom = 1, 1
+
+        region = np.ascontiguousarray(indices[top:bottom, left:right])
+        image = Image.frombytes("P", (right - left, bottom - top), region)
+        params: dict[str, Any] = {
+            "duration": duration,
+            "disposal": 2 if self._transparency else 1,
+        }
+        if self._transparency:
+            params["transparency"] = TRANSPARENT_INDEX
+        chunks = GifImagePlugin.getdata(  # type: ignore[no-untyped-call]
+            image, (left, top), **params
+        )
+        for chunk in chunks:
+            self._destination.write(chunk)
+
+        self._previous = indices
+        self._pending = None
+        self.frames_written += 1
+
+    def close(self) -> None:
+        """保留中のフレームとトレーラーを出力する。
+
+        Raises
+        ------
+        ValueError
+            フレームが1枚も追加されていない場合
+        """
+        self._flush()
+        if self.frames_written == 0:
+            raise ValueError("フレームが1枚も追加されていません")
+        self._destination.write(b";")
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
@@ -0,0 +1,842 @@
+"""マルチスレッドPNGエンコーダー.
+
+PillowのPNGエンコードは単一スレッドで動作するため、大きな画像では
+deflate圧縮がボトルネックになる。本モジュールでは画像を行方向の
+ストリップに分割し、フィルタ処理（NumPy）とdeflate圧縮（zlib）を
+スレッドプールで並列に実行する。
+
+各ストリップは pigz と同様に、直前のストリップ末尾32KBを辞書として
+raw deflateで圧縮し、最終ストリップ以外は ``Z_SYNC_FLUSH`` でバイト境界に
+揃える。これらを連結して zlib ヘッダーと Adler-32 を付与すると、
+単一の正しい zlib ストリーム（IDAT）になる。NumPyのフィルタ演算と
+zlibの圧縮はいずれもGILを解放するため、スレッドで並列化できる。
+
+``PngStripWriter`` は画像全体を持たずに、上から順に渡されたストリップを
+フィルタ・圧縮してそのまま書き出す逐次版のエンコーダー。
+``ApngWriter`` は同様にフレームを1枚ずつ書き出すアニメーションPNGのエンコーダー。
+"""
+
+import os
+import struct
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import Any, BinaryIO, Self
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from image_processor.types import PngFilter
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# モード: (PNGカラータイプ, チャンネル数)
+SUPPORTED_MODES: dict[str, tuple[int, int]] = {
+    "L": (0, 1),
+    "RGB": (2, 3),
+    "LA": (4, 2),
+    "RGBA": (6, 4),
+}
+
+_FILTER_TYPES: dict[PngFilter, int] = {
+    "none": 0,
+    "sub": 1,
+    "up": 2,
+    "average": 3,
+    "paeth": 4,
+}
+
+_WINDOW_SIZE = 32768
+_ADLER_BASE = 65521
+_TARGET_STRIP_BYTES = 1 << 20
+# 逐次書き出し時に1つのIDATチャンクにまとめる圧縮データのサイズ
+_IDAT_CHUNK_BYTES = 1 << 16
+
+
+def is_supported_mode(mode: str) -> bool:
+    """並列エンコーダーが扱える画像モードかを判定。
+
+    Parameters
+    ----------
+    mode : str
+        Pillowの画像モード
+
+    Returns
+    -------
+    bool
+        対応モードの場合True
+    """
+    return mode in SUPPORTED_MODES
+
+
+def filter_scanlines(
+    rows: npt.NDArray[np.uint8],
+    previous: npt.NDArray[np.uint8] | None,
+    bpp: int,
+    method: PngFilter = "adaptive",
+) -> npt.NDArray[np.uint8]:
+    """走査線にPNGフィルタを適用。
+
+    Parameters
+    ----------
+    rows : npt.NDArray[np.uint8]
+        (行数, 1行のバイト数) の画素データ
+    previous : npt.NDArray[np.uint8] | None
+        ``rows`` の直前の行。画像先頭の場合はNone
+    bpp : int
+        1画素のバイト数
+    method : PngFilter
+        フィルタの種類。``"adaptive"`` の場合は行ごとに
+        符号付き絶対値和が最小のフィルタを選択する
+
+    Returns
+    -------
+    npt.NDArray[np.uint8]
+        先頭にフィルタ種別バイトを付与した (行数, 1行のバイト数 + 1) の配列
+    """
+    height, row_bytes = rows.shape
+    up = np.empty_like(rows)
+    up[0] = 0 if previous is None else previous
+    up[1:] = rows[:-1]
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+
+    candidates: dict[PngFilter, npt.NDArray[np.uint8]] = {}
+    wanted = list(_FILTER_TYPES) if method == "adaptive" else [method]
+    for name in wanted:
+        if name == "none":
+            candidates[name] = rows
+        elif name == "sub":
+            candidates[name] = rows - left
+        elif name == "up":
+            candidates[name] = rows - up
+        elif name == "average":
+            average = (left.astype(np.uint16) + up) >> 1
+            candidates[name] = rows - average.astype(np.uint8)
+        elif name == "paeth":
+            candidates[name] = rows - _paeth_predictor(left, up, bpp)
+
+    output = np.empty((height, row_bytes + 1), dtype=np.uint8)
+    if method != "adaptive":
+        output[:, 0] = _FILTER_TYPES[method]
+        output[:, 1:] = candidates[method]
+        return output
+
+    stacked = np.stack(list(candidates.values()))
+    scores = np.abs(stacked.view(np.int8).astype(np.int16)).sum(axis=2)
+    choice = scores.argmin(axis=0)
+    filter_codes = np.array([_FILTER_TYPES[name] for name in candidates], np.uint8)
+    output[:, 0] = filter_codes[choice]
+    output[:, 1:] = stacked[choice, np.arange(height)]
+    return output
+
+
+def _paeth_predictor(
+    left: npt.NDArray[np.uint8],
+    up: npt.NDArray[np.uint8],
+    bpp: int,
+) -> npt.NDArray[np.uint8]:
+    """Paeth予測値をベクトル演算で計算."""
+    up_left = np.zeros_like(up)
+    up_left[:, bpp:] = up[:, :-bpp]
+
+    a = left.astype(np.int16)
+    b = up.astype(np.int16)
+    c = up_left.astype(np.int16)
+    pa = np.abs(b - c)
+    pb = np.abs(a - c)
+    pc = np.abs(a + b - 2 * c)
+    predicted = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+    return predicted.astype(np.uint8)
+
+
+def adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """2つのAdler-32を連結データのAdler-32に合成（zlibのadler32_combine相当）。
+
+    Parameters
+    ----------
+    adler1 : int
+        前半データのAdler-32
+    adler2 : int
+        後半データのAdler-32
+    length2 : int
+        後半データのバイト数
+
+    Returns
+    -------
+    int
+        連結データのAdler-32
+    """
+    remainder = length2 % _ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (remainder * sum1) % _ADLER_BASE
+    sum1 += (adler2 & 0xFFFF) + _ADLER_BASE - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + _ADLER_BASE
+    sum2 -= remainder
+    sum1 %= _ADLER_BASE
+    sum2 %= _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def zlib_header(compress_level: int) -> bytes:
+    """圧縮レベルに対応するzlibヘッダー（2バイト）を生成。
+
+    Parameters
+    ----------
+    compress_level : int
+        圧縮レベル（0-9）
+
+    Returns
+    -------
+    bytes
+        zlibヘッダー
+    """
+    cmf = 0x78  # deflate, 32KBウィンドウ
+    if compress_level < 2:
+        flevel = 0
+    elif compress_level < 6:
+        flevel = 1
+    elif compress_level == 6:
+        flevel = 2
+    else:
+        flevel = 3
+    flg = flevel << 6
+    flg += (31 - (cmf * 256 + flg) % 31) % 31
+    return bytes((cmf, flg))
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """PNGチャンクを生成。
+
+    Parameters
+    ----------
+    chunk_type : bytes
+        4バイトのチャンク種別
+    data : bytes
+        チャンクデータ
+
+    Returns
+    -------
+    bytes
+        長さ・種別・データ・CRCを含むチャンク
+    """
+    crc = zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+
+def header_chunks(image: Image.Image) -> list[bytes]:
+    """IHDRと付随情報（pHYs, iCCP, eXIf, tRNS）のチャンクを生成。
+
+    Parameters
+    ----------
+    image : Image.Image
+        エンコード対象の画像
+
+    Returns
+    -------
+    list[bytes]
+        IDATより前に書き出すチャンク
+
+    Raises
+    ------
+    ValueError
+        未対応の画像モードの場合
+    """
+    return _header_chunks(image.mode, image.size, image.info)
+
+
+def _header_chunks(
+    mode: str,
+    size: tuple[int, int],
+    info: dict[str, Any],
+) -> list[bytes]:
+    """モード・サイズ・付随情報からIDATより前のチャンクを生成する。"""
+    if not is_supported_mode(mode):
+        raise ValueError(f"未対応の画像モードです: {mode}")
+
+    color_type, _ = SUPPORTED_MODES[mode]
+    width, height = size
+    chunks = [
+        png_chunk(
+            b"IHDR",
+            struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0),
+        )
+    ]
+
+    icc_profile = info.get("icc_profile")
+    if icc_profile:
+        chunks.append(
+            png_chunk(b"iCCP", b"ICC Profile\x00\x00" + zlib.compress(icc_profile))
+        )
+
+    dpi = info.get("dpi")
+    if dpi:
+        ppm_x, ppm_y = (int(d / 0.0254 + 0.5) for d in dpi)
+        chunks.append(png_chunk(b"pHYs", struct.pack(">IIB", ppm_x, ppm_y, 1)))
+
+    exif = info.get("exif")
+    if exif:
+        # eXIfチャンクには "Exif\0\0" の識別子を付けない
+        if exif.startswith(b"Exif\x00\x00"):
+            exif = exif[6:]
+        chunks.append(png_chunk(b"eXIf", exif))
+
+    transparency = info.get("transparency")
+    if mode == "L" and isinstance(transparency, int):
+        chunks.append(png_chunk(b"tRNS", struct.pack(">H", transparency)))
+    elif mode == "RGB" and isinstance(transparency, tuple):
+        chunks.append(png_chunk(b"tRNS", struct.pack(">HHH", *transparency)))
+
+    return chunks
+
+
+def image_rows(image: Image.Image) -> tuple[npt.NDArray[np.uint8], int]:
+    """画像を (高さ, 1行のバイト数) の配列に変換。
+
+    Parameters
+    ----------
+    image : Image.Image
+        対応モードの画像
+
+    Returns
+    -------
+    tuple[npt.NDArray[np.uint8], int]
+        画素配列と1画素のバイト数
+    """
+    _, channels = SUPPORTED_MODES[image.mode]
+    pixels = np.asarray(image, dtype=np.uint8)
+    return pixels.reshape(image.height, image.width * channels), channels
+
+
+def compress_strip(
+    pixels: npt.NDArray[np.uint8],
+    start: int,
+    stop: int,
+    bpp: int,
+    *,
+    compress_level: int,
+    method: PngFilter,
+    last: bool,
+) -> tuple[bytes, int, int]:
+    """1ストリップ分の行をフィルタしてraw deflateで圧縮。
+
+    直前のストリップ末尾のフィルタ済みデータを辞書として使うため、
+    ストリップ境界でも圧縮率がほとんど低下しない。
+
+    Parameters
+    ----------
+    pixels : npt.NDArray[np.uint8]
+        画像全体の (高さ, 1行のバイト数) 配列
+    start : int
+        ストリップの開始行
+    stop : int
+        ストリップの終了行（この行を含まない）
+    bpp : int
+        1画素のバイト数
+    compress_level : int
+        圧縮レベル
+    method : PngFilter
+        フィルタの種類
+    last : bool
+        最終ストリップの場合True
+
+    Returns
+    -------
+    tuple[bytes, int, int]
+        圧縮データ、未圧縮データのAdler-32、未圧縮データのバイト数
+    """
+    previous = pixels[start - 1] if start > 0 else None
+    data = filter_scanlines(pixels[start:stop], previous, bpp, method).tobytes()
+
+    if start > 0:
+        dict_rows = -(-_WINDOW_SIZE // (pixels.shape[1] + 1))
+        dict_start = max(0, start - dict_rows)
+        dict_previous = pixels[dict_start - 1] if dict_start > 0 else None
+        zdict = filter_scanlines(
+            pixels[dict_start:start], dict_previous, bpp, method
+        ).tobytes()[-_WINDOW_SIZE:]
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+
+    flush_mode = zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    compressed = compressor.compress(data) + compressor.flush(flush_mode)
+    return compressed, zlib.adler32(data), len(data)
+
+
+def _strip_ranges(height: int, strip_rows: int) -> list[tuple[int, int]]:
+    """ストリップの行範囲を列挙."""
+    return [
+        (start, min(start + strip_rows, height))
+        for start in range(0, height, strip_rows)
+    ]
+
+
+def _default_strip_rows(row_bytes: int, height: int, workers: int) -> int:
+    """ワーカー数に対して十分な数のストリップができる行数を決定."""
+    by_size = max(1, _TARGET_STRIP_BYTES // max(row_bytes, 1))
+    by_workers = max(1, -(-height // (workers * 4)))
+    return max(8, min(by_size, by_workers))
+
+
+def iter_png_chunks(
+    image: Image.Image,
+    *,
+    compress_level: int = 6,
+    filter_type: PngFilter = "adaptive",
+    strip_rows: int | None = None,
+    workers: int | None = None,
+    icc_profile: bytes | None = None,
+    exif: bytes | None = None,
+) -> Iterator[bytes]:
+    """PNGファイルを構成するバイト列を先頭から順に生成。
+
+    Parameters
+    ----------
+    image : Image.Image
+        L, LA, RGB, RGBA モードの画像
+    compress_level : int
+        圧縮レベル（0-9）
+    filter_type : PngFilter
+        フィルタの種類
+    strip_rows : int | None
+        1ストリップの行数。Noneの場合は自動決定
+    workers : int | None
+        スレッド数。Noneの場合はCPUコア数
+    icc_profile : bytes | None
+        埋め込むICCプロファイル。Noneの場合は ``image.info`` のものを使う
+    exif : bytes | None
+        埋め込むEXIF。Noneの場合は埋め込まない
+
+    Yields
+    ------
+    bytes
+        シグネチャ、各チャンク
+
+    Raises
+    ------
+    ValueError
+        未対応の画像モードや不正なパラメータの場合
+    """
+    if not 0 <= compress_level <= 9:
+        raise ValueError("圧縮レベルは0から9の範囲である必要があります")
+    if strip_rows is not None and strip_rows < 1:
+        raise ValueError("ストリップの行数は1以上である必要があります")
+
+    # Image.save と同じく、EXIFは明示した場合だけ書き出す
+    info = {key: value for key, value in image.info.items() if key != "exif"}
+    if icc_profile is not None:
+        info["icc_profile"] = icc_profile
+    if exif is not None:
+        info["exif"] = exif
+    chunks = _header_chunks(image.mode, image.size, info)
+    pixels, bpp = image_rows(image)
+    workers = workers or os.cpu_count() or 1
+    rows = strip_rows or _default_strip_rows(pixels.shape[1], image.height, workers)
+    ranges = _strip_ranges(image.height, rows)
+
+    yield PNG_SIGNATURE
+    yield from chunks
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                compress_strip,
+                pixels,
+                start,
+                stop,
+                bpp,
+                compress_level=compress_level,
+                method=filter_type,
+                last=index == len(ranges) - 1,
+            )
+            for index, (start, stop) in enumerate(ranges)
+        ]
+
+        adler = 1
+        for index, future in enumerate(futures):
+            compressed, strip_adler, length = future.result()
+            adler = adler32_combine(adler, strip_adler, length)
+            payload = compressed
+            if index == 0:
+                payload = zlib_header(compress_level) + payload
+            if index == len(futures) - 1:
+                payload += struct.pack(">I", adler)
+            yield png_chunk(b"IDAT", payload)
+
+    yield png_chunk(b"IEND", b"")
+
+
+def encode_png_parallel(
+    image: Image.Image,
+    *,
+    compress_level: int = 6,
+    filter_type: PngFilter = "adaptive",
+    strip_rows: int | None = None,
+    workers: int | None = None,
+    icc_profile: bytes | None = None,
+    exif: bytes | None = None,
+) -> bytes:
+    """画像を並列にPNGエンコードしてバイト列を返す。
+
+    Parameters
+    ----------
+    image : Image.Image
+        L, LA, RGB, RGBA モードの画像
+    compress_level : int
+        圧縮レベル（0-9）
+    filter_type : PngFilter
+        フィルタの種類
+    strip_rows : int | None
+        1ストリップの行数
+    workers : int | None
+        スレッド数
+    icc_profile : bytes | None
+        埋め込むICCプロファイル。Noneの場合は ``image.info`` のものを使う
+    exif : bytes | None
+        埋め込むEXIF。Noneの場合は埋め込まない
+
+    Returns
+    -------
+    bytes
+        PNGファイルのバイト列
+    """
+    return b"".join(
+        iter_png_chunks(
+            image,
+            compress_level=compress_level,
+            filter_type=filter_type,
+            strip_rows=strip_rows,
+            workers=workers,
+            icc_profile=icc_profile,
+            exif=exif,
+        )
+    )
+
+
+def save_png_parallel(
+    image: Image.Image,
+    destination: Path | BinaryIO,
+    *,
+    compress_level: int = 6,
+    filter_type: PngFilter = "adaptive",
+    strip_rows: int | None = None,
+    workers: int | None = None,
+    icc_profile: bytes | None = None,
+    exif: bytes | None = None,
+) -> None:
+    """画像を並列にPNGエンコードして保存。
+
+    圧縮済みのストリップから順にファイルへ書き出す。
+
+    Parameters
+    ----------
+    image : Image.Image
+        L, LA, RGB, RGBA モードの画像
+    destination : Path | BinaryIO
+        出力先のパスまたはバイナリファイルオブジェクト
+    compress_level : int
+        圧縮レベル（0-9）
+    filter_type : PngFilter
+        フィルタの種類
+    strip_rows : int | None
+        1ストリップの行数
+    workers : int | None
+        スレッド数
+    icc_profile : bytes | None
+        埋め込むICCプロファイル。Noneの場合は ``image.info`` のものを使う
+    exif : bytes | None
+        埋め込むEXIF。Noneの場合は埋め込まない
+    """
+    chunks = iter_png_chunks(
+        image,
+        compress_level=compress_level,
+        filter_type=filter_type,
+        strip_rows=strip_rows,
+        workers=workers,
+        icc_profile=icc_profile,
+        exif=exif,
+    )
+    if isinstance(destination, Path):
+        with destination.open("wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    else:
+        for chunk in chunks:
+            destination.write(chunk)
+
+
+class PngStripWriter:
+    """上から順に渡されたストリップを逐次PNGに書き出すエンコーダー.
+
+    画像全体をメモリに持たずに済むため、縦に非常に長い画像の変換に使う。
+    ストリップ間では直前の行をフィルタの参照行として引き継ぎ、
+    圧縮は単一のzlibストリームで行う。
+
+    Parameters
+    ----------
+    destination : BinaryIO
+        出力先のバイナリファイルオブジェクト
+    size : tuple[int, int]
+        画像全体のサイズ
+    mode : str
+        画像モード（L, LA, RGB, RGBA）
+    info : dict[str, Any] | None
+        dpi / icc_profile / transparency などの付随情報
+    compress_level : int
+        圧縮レベル（0-9）
+    filter_type : PngFilter
+        フィルタの種類
+
+    Raises
+    ------
+    ValueError
+        未対応の画像モードや不正な圧縮レベルの場合
+    """
+
+    def __init__(
+        self,
+        destination: BinaryIO,
+        size: tuple[int, int],
+        mode: str,
+        *,
+        info: dict[str, Any] | None = None,
+        compress_level: int = 6,
+        filter_type: PngFilter = "adaptive",
+    ) -> None:
+        if not 0 <= compress_level <= 9:
+            raise ValueError("圧縮レベルは0から9の範囲である必要があります")
+        chunks = _header_chunks(mode, size, info or {})
+
+        self.size = size
+        self.mode = mode
+        self.rows_written = 0
+        self._destination = destination
+        self._filter_type = filter_type
+        self._compressor = zlib.compressobj(compress_level)
+        self._previous: npt.NDArray[np.uint8] | None = None
+        self._pending: list[bytes] = []
+        self._pending_bytes = 0
+
+        destination.write(PNG_SIGNATURE)
+        for chunk in chunks:
+            destination.write(chunk)
+
+    def write(self, strip: Image.Image) -> None:
+        """ストリップ（画像の続きの行）をフィルタ・圧縮して書き出す。
+
+        Parameters
+        ----------
+        strip : Image.Image
+            画像全体と同じ幅・モードのストリップ
+
+        Raises
+        ------
+        ValueError
+            幅・モードが異なる、または行数が画像の高さを超える場合
+        """
+        if strip.mode != self.mode or strip.width != self.size[0]:
+            raise ValueError(
+                f"ストリップの幅またはモードが一致しません: {strip.mode} {strip.size}"
+            )
+        if self.rows_written + strip.height > self.size[1]:
+            raise ValueError("ストリップの行数が画像の高さを超えています")
+
+        rows, bpp = image_rows(strip)
+        filtered = filter_scanlines(rows, self._previous, bpp, self._filter_type)
+        self._previous = rows[-1].copy()
+        self.rows_written += strip.height
+        self._emit(self._compressor.compress(filtered.tobytes()))
+
+    def close(self) -> None:
+        """圧縮データを書き切り、IENDチャンクを出力する。
+
+        Raises
+        ------
+        ValueError
+            書き出した行数が画像の高さに満たない場合
+        """
+        if self.rows_written != self.size[1]:
+            raise ValueError(
+                f"書き出した行数が不足しています: {self.rows_written}/{self.size[1]}"
+            )
+        self._emit(self._compressor.flush(), final=True)
+        self._destination.write(png_chunk(b"IEND", b""))
+
+    def _emit(self, data: bytes, *, final: bool = False) -> None:
+        """圧縮データをある程度まとめてからIDATチャンクとして書き出す。"""
+        if data:
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+        if self._pending and (final or self._pending_bytes >= _IDAT_CHUNK_BYTES):
+            self._destination.write(png_chunk(b"IDAT", b"".join(self._pending)))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
+
+
+class ApngWriter:
+    """フレームを1枚ずつ逐次書き出すアニメーションPNG（APNG）エンコーダー.
+
+    フレームはキャンバス全体（オフセット0、破棄・合成なし）として書き出すため、
+    書き出し中にメモリに保持するのは現在のフレームだけになる。
+    フレーム数はacTLチャンクに先に書き込む必要があるため、生成時に指定する。
+
+    Parameters
+    ----------
+    destination : BinaryIO
+        出力先のバイナリファイルオブジェクト
+    size : tuple[int, int]
+        キャンバスのサイズ
+    mode : str
+        画像モード（L, LA, RGB, RGBA）
+    num_frames : int
+        フレーム数
+    loop : int
+        繰り返し回数（0は無限）
+    compress_level : int
+        圧縮レベル（0-9）
+    filter_type : PngFilter
+        フィルタの種類
+
+    Raises
+    ------
+    ValueError
+        未対応の画像モード、フレーム数が1未満、または不正な圧縮レベルの場合
+    """
+
+    def __init__(
+        self,
+        destination: BinaryIO,
+        size: tuple[int, int],
+        mode: str,
+        num_frames: int,
+        *,
+        loop: int = 0,
+        compress_level: int = 6,
+        filter_type: PngFilter = "adaptive",
+    ) -> None:
+        if num_frames < 1:
+            raise ValueError(f"フレーム数は1以上である必要があります: {num_frames}")
+        if not 0 <= compress_level <= 9:
+            raise ValueError("圧縮レベルは0から9の範囲である必要があります")
+        chunks = _header_chunks(mode, size, {})
+
+        self.size = size
+        self.mode = mode
+        self.num_frames = num_frames
+        self.frames_written = 0
+        self._destination = destination
+        self._compress_level = compress_level
+        self._filter_type = filter_type
+        self._sequence = 0
+
+        destination.write(PNG_SIGNATURE)
+        destination.write(chunks[0])
+        destination.write(png_chunk(b"acTL", struct.pack(">II", num_frames, loop)))
+        for chunk in chunks[1:]:
+            destination.write(chunk)
+
+    def write(self, frame: Image.Image, duration: int) -> None:
+        """フレームを圧縮して書き出す。
+
+        Parameters
+        ----------
+        frame : Image.Image
+            キャンバスと同じサイズ・モードのフレーム
+        duration : int
+            表示時間（ミリ秒）
+
+        Raises
+        ------
+        ValueError
+            サイズ・モードが異なる、またはフレーム数を超える場合
+        """
+        if frame.mode != self.mode or frame.size != self.size:
+            raise ValueError(
+                f"フレームのサイズまたはモードが一致しません: {frame.mode} {frame.size}"
+            )
+        if self.frames_written >= self.num_frames:
+            raise ValueError(f"フレーム数が指定を超えています: {self.num_frames}")
+
+        control = struct.pack(
+            ">IIIIIHHBB",
+            self._next_sequence(),
+            *self.size,
+            0,
+            0,
+            min(max(duration, 0), 0xFFFF),
+            1000,
+            0,
+            0,
+        )
+        self._destination.write(png_chunk(b"fcTL", control))
+
+        data = self._compress_frame(frame)
+        if self.frames_written == 0:
+            self._destination.write(png_chunk(b"IDAT", data))
+        else:
+            sequence = struct.pack(">I", self._next_sequence())
+            self._destination.write(png_chunk(b"fdAT", sequence + data))
+        self.frames_written += 1
+
+    def close(self) -> None:
+        """IENDチャンクを出力する。
+
+        Raises
+        ------
+        ValueError
+            書き出したフレーム数が指定と異なる場合
+        """
+        if self.frames_written != self.num_frames:
+            raise ValueError(
+                f"フレーム数が一致しません: {self.frames_written}/{self.num_frames}"
+            )
+        self._destination.write(png_chunk(b"IEND", b""))
+
+    def _next_sequence(self) -> int:
+        """fcTL/fdAT共通の通し番号を払い出す。"""
+        sequence = self._sequence
+        self._sequence += 1
+        return sequence
+
+    def _compress_frame(self, frame: Image.Image) -> bytes:
+        """フレームを行の塊ごとにフィルタし、1つのzlibストリームに圧縮する。"""
+        pixels, bpp = image_rows(frame)
+        rows = max(_TARGET_STRIP_BYTES // pixels.shape[1], 1)
+        compressor = zlib.compressobj(self._compress_level)
+        parts = []
+        for start in range(0, frame.height, rows):
+            previous = pixels[start - 1] if start > 0 else None
+            filtered = filter_scanlines(
+                pixels[start:start + rows], previous, bpp, self._filter_type
+            )
+            parts.append(compressor.compress(filtered.tobytes()))
+        parts.append(compressor.flush())
+        return b"".join(parts)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
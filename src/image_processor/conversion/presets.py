@@ -0,0 +1,206 @@
+"""出力フォーマット別のエンコーダープリセットとキャリブレーション.
+
+PNGの ``compress_level``、JPEGの ``optimize``/``progressive``/``subsampling``、
+WebPの ``method`` はエンコード時間を最大10倍程度、出力サイズを3割程度
+変化させる。用途に応じて fastest / balanced / smallest の3段階から選択する。
+"""
+
+import io
+import logging
+import random
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, TypedDict
+
+from PIL import Image
+
+from image_processor.conversion.formats import prepare_for_format, to_pillow_format
+from image_processor.types import EncoderPreset
+
+logger = logging.getLogger(__name__)
+
+PRESET_NAMES: tuple[EncoderPreset, ...] = ("fastest", "balanced", "smallest")
+
+# 画質（quality）は別途指定する前提で、速度とサイズに関わる設定のみを持つ
+ENCODER_PRESETS: dict[str, dict[EncoderPreset, dict[str, Any]]] = {
+    "PNG": {
+        "fastest": {"compress_level": 1},
+        "balanced": {"compress_level": 6},
+        "smallest": {"compress_level": 9, "optimize": True},
+    },
+    "JPEG": {
+        "fastest": {"optimize": False, "progressive": False, "subsampling": 2},
+        "balanced": {"optimize": True, "progressive": False, "subsampling": 2},
+        "smallest": {"optimize": True, "progressive": True, "subsampling": 2},
+    },
+    "WEBP": {
+        "fastest": {"method": 0},
+        "balanced": {"method": 4},
+        "smallest": {"method": 6},
+    },
+}
+
+
+class CalibrationResult(TypedDict):
+    """プリセットのキャリブレーション結果の型定義."""
+
+    preset: EncoderPreset
+    image_count: int
+    encode_time: float
+    total_bytes: int
+
+
+def get_save_options(
+    image_format: str,
+    preset: EncoderPreset | None = None,
+    *,
+    quality: int | None = None,
+) -> dict[str, Any]:
+    """``Image.save`` に渡すエンコードオプションを取得。
+
+    Parameters
+    ----------
+    image_format : str
+        出力フォーマット（"png", "jpg", "WEBP" など）
+    preset : EncoderPreset | None
+        プリセット名。Noneの場合はPillowのデフォルト設定
+    quality : int | None
+        JPEG/WebPの画質。Noneの場合はPillowのデフォルト値
+
+    Returns
+    -------
+    dict[str, Any]
+        保存オプション
+
+    Raises
+    ------
+    ValueError
+        未知のプリセット名が指定された場合
+    """
+    pillow_format = to_pillow_format(image_format)
+    options: dict[str, Any] = {}
+
+    if preset is not None:
+        if preset not in PRESET_NAMES:
+            raise ValueError(f"未知のプリセットです: {preset}")
+        options.update(ENCODER_PRESETS.get(pillow_format, {}).get(preset, {}))
+
+    if quality is not None and pillow_format in ("JPEG", "WEBP"):
+        options["quality"] = quality
+
+    return options
+
+
+def calibrate_presets(
+    files: Sequence[Path],
+    image_format: str,
+    *,
+    sample_size: int = 20,
+    quality: int | None = None,
+    seed: int = 0,
+) -> list[CalibrationResult]:
+    """手元の画像サンプルで各プリセットのエンコード時間とサイズを測定。
+
+    デコードは1画像につき1回のみ行い、エンコード結果はメモリ上で破棄する。
+
+    Parameters
+    ----------
+    files : Sequence[Path]
+        候補となる画像ファイル
+    image_format : str
+        測定する出力フォーマット
+    sample_size : int
+        サンプリングする画像数
+    quality : int | None
+        JPEG/WebPの画質
+    seed : int
+        サンプリングの乱数シード
+
+    Returns
+    -------
+    list[CalibrationResult]
+        プリセットごとの測定結果（PRESET_NAMESの順）
+
+    Raises
+    ------
+    ValueError
+        サンプル数が1未満、または対象ファイルがない場合
+    """
+    if sample_size < 1:
+        raise ValueError("サンプル数は1以上である必要があります")
+    if not files:
+        raise ValueError("キャリブレーション対象のファイルがありません")
+
+    pillow_format = to_pillow_format(image_format)
+    samples = random.Random(seed).sample(list(files), min(sample_size, len(files)))
+
+    times: dict[EncoderPreset, float] = dict.fromkeys(PRESET_NAMES, 0.0)
+    sizes: dict[EncoderPreset, int] = dict.fromkeys(PRESET_NAMES, 0)
+    image_count = 0
+
+    for path in samples:
+        try:
+            with Image.open(path) as img:
+                img.load()
+                image = prepare_for_format(img, pillow_format)
+        except OSError as e:
+            logger.warning(f"キャリブレーション対象外 {path.name}: {e}")
+            continue
+
+        image_count += 1
+        for preset in PRESET_NAMES:
+            options = get_save_options(pillow_format, preset, quality=quality)
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            image.save(buffer, pillow_format, **options)
+            times[preset] += time.perf_counter() - start
+            sizes[preset] += buffer.tell()
+
+    return [
+        CalibrationResult(
+            preset=preset,
+            image_count=image_count,
+            encode_time=times[preset],
+            total_bytes=sizes[preset],
+        )
+        for preset in PRESET_NAMES
+    ]
+
+
+def recommend_preset(
+    results: Sequence[CalibrationResult],
+    *,
+    max_slowdown: float = 3.0,
+) -> EncoderPreset:
+    """測定結果から推奨プリセットを選択。
+
+    最速プリセットに対するエンコード時間の倍率が ``max_slowdown`` 以内の
+    プリセットのうち、出力サイズが最小のものを選ぶ。
+
+    Parameters
+    ----------
+    results : Sequence[CalibrationResult]
+        ``calibrate_presets`` の測定結果
+    max_slowdown : float
+        許容するエンコード時間の倍率
+
+    Returns
+    -------
+    EncoderPreset
+        推奨プリセット
+
+    Raises
+    ------
+    ValueError
+        測定結果が空の場合
+    """
+    if not results:
+        raise ValueError("測定結果がありません")
+
+    fastest_time = min(r["encode_time"] for r in results)
+    candidates = [
+        r for r in results if r["encode_time"] <= fastest_time * max_slowdown
+    ]
+    best = min(candidates, key=lambda r: (r["total_bytes"], r["encode_time"]))
+    return best["preset"]
@@ -0,0 +1,191 @@
+"""JPEGに埋め込まれたプレビュー画像（EXIFサムネイル・MPFプレビュー）の取り出し.
+
+カメラのJPEGには、本画像とは別に縮小済みのプレビューが埋め込まれていることが多い。
+
+- EXIFサムネイル: APP1のIFD1に格納された160×120px程度のJPEG
+- MPFプレビュー: APP2のMPF（Multi-Picture Format）で本画像の後ろに連結された
+  1920px程度のJPEG。PillowではMPO形式の2枚目以降のフレームとして読める
+
+要求サイズ以上のプレビューがあれば、2400万画素の本画像をデコードする代わりに
+プレビューだけをデコードすればよい。ここではプレビューの一覧（サイズのみ、
+画素はデコードしない）と、プレビューの読み込みを提供する。
+"""
+
+import io
+import logging
+from typing import TypedDict
+
+from PIL import ExifTags, Image
+
+from image_processor.types import DecodeSource
+
+logger = logging.getLogger(__name__)
+
+# プレビューを本画像の代わりに使う縦横比の許容誤差（相対値）。
+# EXIFサムネイルは160×120に黒帯付きで縮小されていることがあり、その場合は使わない
+ASPECT_TOLERANCE = 0.01
+
+# EXIFのIFD1のサムネイルの位置と長さのタグ
+_THUMBNAIL_OFFSET = 0x0201
+_THUMBNAIL_LENGTH = 0x0202
+
+# プレビューに引き継ぐ本画像の付随情報
+_INHERITED_INFO = ("icc_profile", "exif")
+
+
+class EmbeddedPreview(TypedDict):
+    """埋め込みプレビューの型定義（``frame`` はMPFのフレーム番号、EXIFは0）."""
+
+    source: DecodeSource
+    width: int
+    height: int
+    frame: int
+
+
+def _exif_thumbnail_bytes(image: Image.Image) -> bytes | None:
+    """EXIFのIFD1に格納されたサムネイルのJPEGバイト列を取得する。"""
+    exif_data = image.info.get("exif")
+    if not isinstance(exif_data, bytes):
+        return None
+    tiff = exif_data[6:] if exif_data.startswith(b"Exif\x00\x00") else exif_data
+    try:
+        ifd1 = image.getexif().get_ifd(ExifTags.IFD.IFD1)
+    except (OSError, SyntaxError, ValueError) as e:
+        logger.debug(f"EXIFのIFD1を読み込めません: {e}")
+        return None
+    offset = ifd1.get(_THUMBNAIL_OFFSET)
+    length = ifd1.get(_THUMBNAIL_LENGTH)
+    if not isinstance(offset, int) or not isinstance(length, int) or length <= 0:
+        return None
+    data = tiff[offset : offset + length]
+    return data if len(data) == length and data.startswith(b"\xff\xd8") else None
+
+
+def list_embedded_previews(image: Image.Image) -> list[EmbeddedPreview]:
+    """開いたJPEG/MPOに埋め込まれたプレビューの一覧を取得（画素はデコードしない）。
+
+    本画像以上のサイズのフレーム（ステレオ画像の2枚目など）は含めない。
+    呼び出し後、MPOのフレーム位置は先頭に戻す。
+
+    Parameters
+    ----------
+    image : Image.Image
+        ``Image.open`` で開いた画像
+
+    Returns
+    -------
+    list[EmbeddedPreview]
+        面積の小さい順のプレビュー
+    """
+    if image.format not in ("JPEG", "MPO"):
+        return []
+    main_width, main_height = image.size
+    previews: list[EmbeddedPreview] = []
+
+    thumbnail = _exif_thumbnail_bytes(image)
+    if thumbnail is not None:
+        try:
+            with Image.open(io.BytesIO(thumbnail)) as thumb:
+                width, height = thumb.size
+            previews.append(
+                EmbeddedPreview(
+                    source="exif_thumbnail", width=width, height=height, frame=0
+                )
+            )
+        except OSError as e:
+            logger.debug(f"EXIFサムネイルを読み込めません: {e}")
+
+    n_frames = getattr(image, "n_frames", 1)
+    if image.format == "MPO" and n_frames > 1:
+        try:
+            for frame in range(1, n_frames):
+                image.seek(frame)
+                width, height = image.size
+                if width * height < main_width * main_height:
+                    previews.append(
+                        EmbeddedPreview(
+                            source="mpf_preview",
+                            width=width,
+                            height=height,
+                            frame=frame,
+                        )
+                    )
+        except (OSError, EOFError) as e:
+            logger.debug(f"MPFプレビューを読み込めません: {e}")
+        finally:
+            image.seek(0)
+
+    return sorted(previews, key=lambda p: p["width"] * p["height"])
+
+
+def select_preview(
+    previews: list[EmbeddedPreview],
+    image_size: tuple[int, int],
+    required: tuple[int, int],
+) -> EmbeddedPreview | None:
+    """要求サイズ以上で本画像と縦横比が同じ、最も小さいプレビューを選ぶ。
+
+    Parameters
+    ----------
+    previews : list[EmbeddedPreview]
+        ``list_embedded_previews`` の結果
+    image_size : tuple[int, int]
+        本画像のサイズ
+    required : tuple[int, int]
+        必要な最小サイズ
+
+    Returns
+    -------
+    EmbeddedPreview | None
+        使えるプレビュー。ない場合はNone
+    """
+    aspect = image_size[0] / image_size[1]
+    for preview in previews:
+        if preview["width"] < required[0] or preview["height"] < required[1]:
+            continue
+        if abs(preview["width"] / preview["height"] / aspect - 1) > ASPECT_TOLERANCE:
+            continue
+        return preview
+    return None
+
+
+def load_preview(image: Image.Image, preview: EmbeddedPreview) -> Image.Image:
+    """埋め込みプレビューをデコードする。
+
+    本画像のICCプロファイルとEXIFを引き継ぐ（プレビューは本画像と同じ色空間で
+    作られるため）。MPOのフレーム位置は先頭に戻す。
+
+    Parameters
+    ----------
+    image : Image.Image
+        ``Image.open`` で開いた本画像
+    preview : EmbeddedPreview
+        ``list_embedded_previews`` で取得したプレビュー
+
+    Returns
+    -------
+    Image.Image
+        デコード済みのプレビュー
+
+    Raises
+    ------
+    OSError
+        プレビューをデコードできない場合
+    """
+    inherited = {key: image.info[key] for key in _INHERITED_INFO if key in image.info}
+    if preview["source"] == "exif_thumbnail":
+        data = _exif_thumbnail_bytes(image)
+        if data is None:
+            raise OSError("EXIFサムネイルが見つかりません")
+        with Image.open(io.BytesIO(data)) as thumb:
+            thumb.load()
+            result = thumb.copy()
+    else:
+        try:
+            image.seek(preview["frame"])
+            image.load()
+            result = image.copy()
+        finally:
+            image.seek(0)
+    result.info.update(inherited)
+    return result
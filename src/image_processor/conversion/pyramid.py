@@ -0,0 +1,471 @@
+"""1回のデコードから複数サイズの画像（サムネイルピラミッド）を出力.
+
+元画像をサイズごとに読み直す代わりに1回だけデコードし、大きいサイズから順に
+``Image.reduce`` による整数倍縮小と最終リサンプルで各サイズを作る。
+最大サイズが元画像より小さいJPEGは、最大サイズ以上の解像度を持つ
+最も安価な方法でデコードする。
+
+1. EXIFサムネイル（160px程度）
+2. MPFプレビュー（1920px程度）
+3. ``Image.draft`` による1/2, 1/4, 1/8の縮小デコード
+4. 全体のデコード
+
+各サイズのエンコードはスレッドで並行して行う（Pillowのエンコーダーは
+実行中にGILを解放する）。
+"""
+
+import logging
+import os
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, TypedDict
+
+from PIL import Image
+
+from image_processor.conversion.color import apply_color_policy
+from image_processor.conversion.formats import (
+    EXTENSIONS,
+    prepare_for_format,
+    to_pillow_format,
+)
+from image_processor.conversion.presets import get_save_options
+from image_processor.conversion.preview import (
+    list_embedded_previews,
+    load_preview,
+    select_preview,
+)
+from image_processor.core.common import create_processing_result
+from image_processor.processing.scheduler import check_pixels
+from image_processor.types import (
+    ConversionConfig,
+    DecodeSource,
+    EncoderPreset,
+    ProcessingResult,
+)
+
+logger = logging.getLogger(__name__)
+
+# reduceで縮小した後、最終リサンプルの入力として残す倍率
+# （Pillowの thumbnail / resize の reducing_gap と同じ考え方）
+REDUCING_GAP = 2.0
+
+
+def target_size(source: tuple[int, int], size: int | None) -> tuple[int, int]:
+    """長辺を ``size`` にした縦横比維持のサイズを計算（拡大はしない）。
+
+    Parameters
+    ----------
+    source : tuple[int, int]
+        元画像のサイズ
+    size : int | None
+        長辺のピクセル数。Noneの場合は元のサイズ
+
+    Returns
+    -------
+    tuple[int, int]
+        出力サイズ
+
+    Raises
+    ------
+    ValueError
+        サイズが1未満の場合
+    """
+    if size is None:
+        return source
+    if size < 1:
+        raise ValueError(f"サイズは1以上である必要があります: {size}")
+    width, height = source
+    scale = size / max(width, height)
+    if scale >= 1:
+        return source
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+def size_label(size: int | None) -> str:
+    """出力ファイル名に付けるサイズのラベルを取得。"""
+    return "full" if size is None else str(size)
+
+
+class DecodedImage(TypedDict):
+    """出力サイズに合わせてデコードした画像の型定義."""
+
+    image: Image.Image
+    original_size: tuple[int, int]
+    source: DecodeSource
+
+
+class ThumbnailResult(ProcessingResult):
+    """複数サイズ出力の処理結果の型定義（エラーの場合 ``decode_source`` はNone）."""
+
+    output_paths: list[Path]
+    decode_source: DecodeSource | None
+
+
+def decode_for_size(
+    path: Path,
+    size: int | None,
+    *,
+    use_embedded_preview: bool = True,
+) -> DecodedImage:
+    """長辺 ``size`` の出力に必要な解像度だけ画像をデコード。
+
+    JPEGは要求サイズ以上で縦横比が同じ埋め込みプレビュー（EXIFサムネイル、
+    MPFプレビュー）があればそれをデコードし、なければ ``Image.draft`` で
+    縮小デコードする。それ以外の形式や ``size`` がNoneの場合は全体をデコードする。
+
+    Parameters
+    ----------
+    path : Path
+        入力画像のパス
+    size : int | None
+        出力の長辺のピクセル数。Noneは元のサイズ
+    use_embedded_preview : bool
+        埋め込みプレビューを使うか
+
+    Returns
+    -------
+    DecodedImage
+        デコードした画像、元画像のサイズ、デコード方法
+
+    Raises
+    ------
+    Image.DecompressionBombError
+        画素数が ``Image.MAX_IMAGE_PIXELS`` を超えている場合
+    """
+    with Image.open(path) as img:
+        check_pixels(*img.size)
+        original_size = img.size
+        source: DecodeSource = "full"
+        if img.format in ("JPEG", "MPO") and size is not None:
+            required = target_size(original_size, size)
+            if use_embedded_preview:
+                previews = list_embedded_previews(img)
+                preview = select_preview(previews, original_size, required)
+                if preview is not None:
+                    try:
+                        image = load_preview(img, preview)
+                    except OSError as e:
+                        logger.debug(f"埋め込みプレビューを使えません {path.name}: {e}")
+                    else:
+                        logger.debug(
+                            f"埋め込みプレビュー {path.name}: {preview['source']} "
+                            f"{image.size}"
+                        )
+                        return DecodedImage(
+                            image=image,
+                            original_size=original_size,
+                            source=preview["source"],
+                        )
+            # draftは要求サイズ以上となる1/2, 1/4, 1/8のスケールでデコードする
+            img.draft(img.mode, required)
+        img.load()
+        if img.size != original_size:
+            source = "draft"
+            logger.debug(f"縮小デコード {path.name}: {original_size} -> {img.size}")
+        return DecodedImage(
+            image=img.copy(), original_size=original_size, source=source
+        )
+
+
+def _decode_for_sizes(
+    path: Path,
+    sizes: Sequence[int | None],
+    use_embedded_preview: bool,
+) -> DecodedImage:
+    """最大の出力サイズに合わせて画像を1回だけデコードする。"""
+    largest = None if None in sizes else max(size for size in sizes if size)
+    return decode_for_size(path, largest, use_embedded_preview=use_embedded_preview)
+
+
+def _validate_sizes(sizes: Sequence[int | None]) -> None:
+    """出力サイズの指定を検証する。"""
+    if not sizes:
+        raise ValueError("出力サイズが指定されていません")
+    if any(size is not None and size < 1 for size in sizes):
+        raise ValueError(f"サイズは1以上である必要があります: {list(sizes)}")
+
+
+def _downscale(image: Image.Image, size: tuple[int, int]) -> Image.Image:
+    """整数倍のreduceで粗く縮小してから、最終サイズにリサンプルする。"""
+    if image.size == size:
+        return image
+    factor = int(min(image.width / size[0], image.height / size[1]) / REDUCING_GAP)
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def build_pyramid(
+    source: Path | Image.Image,
+    sizes: Sequence[int | None],
+    *,
+    use_embedded_preview: bool = True,
+) -> dict[int | None, Image.Image]:
+    """1回のデコードから複数サイズの画像を作成。
+
+    Parameters
+    ----------
+    source : Path | Image.Image
+        入力画像のパス、またはデコード済みの画像
+    sizes : Sequence[int | None]
+        長辺のピクセル数のリスト。Noneは元のサイズ
+    use_embedded_preview : bool
+        JPEGの埋め込みプレビューを使うか（パスを指定した場合のみ）
+
+    Returns
+    -------
+    dict[int | None, Image.Image]
+        サイズ指定ごとの画像
+
+    Raises
+    ------
+    ValueError
+        サイズの指定が空、または1未満のサイズを含む場合
+    """
+    _validate_sizes(sizes)
+    if isinstance(source, Image.Image):
+        return _pyramid_from(source, source.size, sizes)
+    decoded = _decode_for_sizes(source, sizes, use_embedded_preview)
+    return _pyramid_from(decoded["image"], decoded["original_size"], sizes)
+
+
+def _pyramid_from(
+    image: Image.Image,
+    base_size: tuple[int, int],
+    sizes: Sequence[int | None],
+) -> dict[int | None, Image.Image]:
+    """デコード済みの画像から各サイズを作る。
+
+    縮小デコードした場合も、出力サイズは元画像の寸法 ``base_size`` を基準に計算する。
+    """
+    dimensions_of = {size: target_size(base_size, size) for size in sizes}
+    ordered = sorted(
+        dimensions_of,
+        key=lambda s: dimensions_of[s][0] * dimensions_of[s][1],
+        reverse=True,
+    )
+
+    pyramid: dict[int | None, Image.Image] = {}
+    current = image
+    for size in ordered:
+        dimensions = dimensions_of[size]
+        if current.width < dimensions[0] or current.height < dimensions[1]:
+            # 縮小デコードで足りない場合（通常は発生しない）は最大の画像から作る
+            current = image
+        current = _downscale(current, dimensions)
+        pyramid[size] = current
+    return pyramid
+
+
+def save_pyramid(
+    input_path: Path,
+    output_dir: Path,
+    sizes: Sequence[int | None],
+    *,
+    image_format: str = "png",
+    preset: EncoderPreset | None = None,
+    quality: int | None = None,
+    workers: int | None = None,
+    preserve_metadata: bool = False,
+    use_embedded_preview: bool = True,
+) -> list[Path]:
+    """1回のデコードで複数サイズの画像を作成し、並行してエンコード・保存。
+
+    出力ファイル名は ``<元のファイル名>_<長辺サイズ または full>.<拡張子>``。
+
+    Parameters
+    ----------
+    input_path : Path
+        入力画像のパス
+    output_dir : Path
+        出力ディレクトリ
+    sizes : Sequence[int | None]
+        長辺のピクセル数のリスト。Noneは元のサイズ
+    image_format : str
+        出力フォーマット
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    quality : int | None
+        JPEG/WebPの画質
+    workers : int | None
+        エンコードのスレッド数。Noneの場合はサイズの数
+    preserve_metadata : bool
+        ICCプロファイルとEXIFを出力に引き継ぐか。Falseの場合は
+        埋め込みプロファイルに従ってsRGBに変換する
+    use_embedded_preview : bool
+        JPEGの埋め込みプレビュー（EXIFサムネイル・MPFプレビュー）を使うか
+
+    Returns
+    -------
+    list[Path]
+        ``sizes`` の順の出力ファイルパス
+    """
+    pillow_format = to_pillow_format(image_format)
+    options = get_save_options(pillow_format, preset, quality=quality)
+    paths, _ = _save_pyramid(
+        input_path,
+        output_dir,
+        sizes,
+        pillow_format,
+        options,
+        workers=workers,
+        preserve_metadata=preserve_metadata,
+        use_embedded_preview=use_embedded_preview,
+    )
+    return paths
+
+
+def _save_pyramid(
+    input_path: Path,
+    output_dir: Path,
+    sizes: Sequence[int | None],
+    pillow_format: str,
+    options: dict[str, Any],
+    *,
+    workers: int | None,
+    preserve_metadata: bool,
+    use_embedded_preview: bool,
+) -> tuple[list[Path], DecodeSource]:
+    """複数サイズの画像を保存し、出力パスとデコード方法を返す。"""
+    _validate_sizes(sizes)
+    decoded = _decode_for_sizes(input_path, sizes, use_embedded_preview)
+    pyramid = _pyramid_from(decoded["image"], decoded["original_size"], sizes)
+
+    def encode(size: int | None) -> Path:
+        output_path = output_dir / (
+            f"{input_path.stem}_{size_label(size)}{EXTENSIONS[pillow_format]}"
+        )
+        image, metadata = apply_color_policy(
+            pyramid[size], pillow_format, preserve_metadata=preserve_metadata
+        )
+        image = prepare_for_format(image, pillow_format)
+        image.save(output_path, pillow_format, **options, **metadata)
+        return output_path
+
+    unique_sizes = list(dict.fromkeys(sizes))
+    with ThreadPoolExecutor(max_workers=workers or len(unique_sizes)) as pool:
+        paths = dict(zip(unique_sizes, pool.map(encode, unique_sizes), strict=True))
+    return [paths[size] for size in sizes], decoded["source"]
+
+
+def save_thumbnails(
+    paths: Sequence[Path],
+    output_dir: Path,
+    sizes: Sequence[int | None],
+    *,
+    image_format: str = "png",
+    preset: EncoderPreset | None = None,
+    quality: int | None = None,
+    preserve_metadata: bool = False,
+    use_embedded_preview: bool = True,
+    workers: int | None = None,
+) -> list[ThumbnailResult]:
+    """複数の画像から複数サイズの画像を並列に出力し、デコード方法を記録。
+
+    プレビュー用の小さいサイズだけを出力する場合、カメラのJPEGは
+    埋め込みプレビューか縮小デコードで済むため、全体のデコードに比べて
+    大幅に速くなる。各結果の ``decode_source`` に使ったデコード方法を記録する。
+
+    Parameters
+    ----------
+    paths : Sequence[Path]
+        入力画像のパス
+    output_dir : Path
+        出力ディレクトリ
+    sizes : Sequence[int | None]
+        長辺のピクセル数のリスト。Noneは元のサイズ
+    image_format : str
+        出力フォーマット
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    quality : int | None
+        JPEG/WebPの画質
+    preserve_metadata : bool
+        ICCプロファイルとEXIFを出力に引き継ぐか
+    use_embedded_preview : bool
+        JPEGの埋め込みプレビューを使うか
+    workers : int | None
+        並列に処理する画像の数。Noneの場合はCPUコア数
+
+    Returns
+    -------
+    list[ThumbnailResult]
+        入力順の処理結果
+
+    Raises
+    ------
+    ValueError
+        サイズの指定が空、または1未満のサイズを含む場合
+    """
+    _validate_sizes(sizes)
+    pillow_format = to_pillow_format(image_format)
+    options = get_save_options(pillow_format, preset, quality=quality)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    def save(path: Path) -> ThumbnailResult:
+        start = time.perf_counter()
+        try:
+            # 画像単位で並列に処理するため、1枚のサイズごとのエンコードは順に行う
+            output_paths, source = _save_pyramid(
+                path,
+                output_dir,
+                sizes,
+                pillow_format,
+                options,
+                workers=1,
+                preserve_metadata=preserve_metadata,
+                use_embedded_preview=use_embedded_preview,
+            )
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.error(f"変換エラー {path.name}: {e}")
+            result = create_processing_result(
+                "error",
+                path,
+                error_message=str(e),
+                processing_time=time.perf_counter() - start,
+            )
+            return ThumbnailResult(**result, output_paths=[], decode_source=None)
+
+        result = create_processing_result(
+            "success",
+            path,
+            output_paths[0],
+            processing_time=time.perf_counter() - start,
+        )
+        return ThumbnailResult(
+            **result, output_paths=output_paths, decode_source=source
+        )
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return list(pool.map(save, paths))
+
+
+def save_pyramid_with_config(input_path: Path, config: ConversionConfig) -> list[Path]:
+    """``ConversionConfig`` の設定で複数サイズの画像を出力。
+
+    ``sizes`` 未指定の場合は元のサイズのみを出力する。
+
+    Parameters
+    ----------
+    input_path : Path
+        入力画像のパス
+    config : ConversionConfig
+        変換設定（format, quality, preset, output_dir, sizes,
+        preserve_metadata を使用）
+
+    Returns
+    -------
+    list[Path]
+        出力ファイルパス
+    """
+    return save_pyramid(
+        input_path,
+        config.get("output_dir", input_path.parent),
+        config.get("sizes", [None]),
+        image_format=config.get("format", "png"),
+        preset=config.get("preset"),
+        quality=config.get("quality"),
+        preserve_metadata=config.get("preserve_metadata", False),
+    )
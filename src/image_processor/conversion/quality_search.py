@@ -0,0 +1,457 @@
+"""目標画質（SSIM/PSNR）・目標サイズを満たすエンコード画質の探索.
+
+JPEG/WebPの画質を固定すると、単純な画像では無駄にサイズが大きくなり、
+複雑な画像では細部が失われる。ここでは画質を二分探索し、
+
+- 目標のSSIM/PSNRを満たす最小の画質
+- 目標のバイト数に収まる最大の画質
+
+を画像ごとに選ぶ。試行のエンコードはメモリ上で行い、画質の評価は
+元画像とデコード結果を同じ倍率で縮小したプロキシ画像に対してNumPyで計算する。
+試行回数は画質の範囲に対して対数回（既定の範囲で7回程度）になる。
+"""
+
+import io
+import logging
+import math
+import os
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, TypedDict
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from image_processor.conversion.color import apply_color_policy
+from image_processor.conversion.formats import (
+    EXTENSIONS,
+    prepare_for_format,
+    to_pillow_format,
+)
+from image_processor.conversion.presets import get_save_options
+from image_processor.core.common import create_processing_result
+from image_processor.processing.scheduler import check_pixels
+from image_processor.types import EncoderPreset, ProcessingResult, QualityTarget
+
+logger = logging.getLogger(__name__)
+
+# 画質を探索できる（qualityで圧縮率が変わる）Pillowの保存フォーマット
+SEARCHABLE_FORMATS = frozenset({"JPEG", "WEBP"})
+
+# 画質の探索範囲の既定値
+DEFAULT_MIN_QUALITY = 20
+DEFAULT_MAX_QUALITY = 95
+
+# 画質の評価に使うプロキシ画像の長辺の既定値（ピクセル）
+DEFAULT_PROXY_SIZE = 1024
+
+# SSIMの窓サイズと安定化定数（Wang et al. 2004 の K1=0.01, K2=0.03, L=255）
+_SSIM_WINDOW = 7
+_SSIM_C1 = (0.01 * 255) ** 2
+_SSIM_C2 = (0.03 * 255) ** 2
+
+# RGBから輝度への変換係数（ITU-R BT.601）
+_LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114])
+
+# 透過のある画像を評価する前に合成する背景色
+_METRIC_BACKGROUND = (255, 255, 255, 255)
+
+
+class QualitySearchResult(TypedDict):
+    """画質探索の結果の型定義."""
+
+    quality: int
+    size: int
+    ssim: float
+    psnr: float
+    trials: int
+    target_met: bool
+
+
+class QualityConversionResult(ProcessingResult):
+    """画質探索付きの変換結果の型定義（エラーの場合 ``search`` はNone）."""
+
+    search: QualitySearchResult | None
+
+
+def _box_mean(values: npt.NDArray[np.float64], window: int) -> npt.NDArray[np.float64]:
+    """積分画像で ``window`` × ``window`` の窓の平均を計算する（有効範囲のみ）。"""
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    integral[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+    sums = (
+        integral[window:, window:]
+        - integral[:-window, window:]
+        - integral[window:, :-window]
+        + integral[:-window, :-window]
+    )
+    result: npt.NDArray[np.float64] = sums / (window * window)
+    return result
+
+
+def _luma(array: npt.NDArray[Any]) -> npt.NDArray[np.float64]:
+    """RGB配列を輝度に変換する（2次元配列はそのまま浮動小数点にする）。"""
+    values = np.asarray(array, dtype=np.float64)
+    if values.ndim == 3:
+        values = values[..., :3] @ _LUMA_WEIGHTS
+    return values
+
+
+def ssim(reference: npt.NDArray[Any], candidate: npt.NDArray[Any]) -> float:
+    """2つの画像の輝度の平均SSIMを計算。
+
+    7×7の一様な窓で局所的な平均・分散・共分散を求める。
+
+    Parameters
+    ----------
+    reference : npt.NDArray[Any]
+        基準画像（H×W の輝度、または H×W×3 のRGB。値の範囲は0-255）
+    candidate : npt.NDArray[Any]
+        比較する画像（``reference`` と同じ形状）
+
+    Returns
+    -------
+    float
+        平均SSIM（1.0で完全一致）
+
+    Raises
+    ------
+    ValueError
+        画像の形状が一致しない場合
+    """
+    if reference.shape != candidate.shape:
+        raise ValueError(
+            f"画像の形状が一致しません: {reference.shape} != {candidate.shape}"
+        )
+    x = _luma(reference)
+    y = _luma(candidate)
+    window = max(1, min(_SSIM_WINDOW, *x.shape))
+
+    mu_x = _box_mean(x, window)
+    mu_y = _box_mean(y, window)
+    var_x = _box_mean(x * x, window) - mu_x * mu_x
+    var_y = _box_mean(y * y, window) - mu_y * mu_y
+    cov = _box_mean(x * y, window) - mu_x * mu_y
+
+    numerator = (2 * mu_x * mu_y + _SSIM_C1) * (2 * cov + _SSIM_C2)
+    denominator = (mu_x * mu_x + mu_y * mu_y + _SSIM_C1) * (var_x + var_y + _SSIM_C2)
+    return float(np.mean(numerator / denominator))
+
+
+def psnr(reference: npt.NDArray[Any], candidate: npt.NDArray[Any]) -> float:
+    """2つの画像のPSNR（dB）を計算。
+
+    Parameters
+    ----------
+    reference : npt.NDArray[Any]
+        基準画像（値の範囲は0-255）
+    candidate : npt.NDArray[Any]
+        比較する画像（``reference`` と同じ形状）
+
+    Returns
+    -------
+    float
+        PSNR。完全に一致する場合は無限大
+
+    Raises
+    ------
+    ValueError
+        画像の形状が一致しない場合
+    """
+    if reference.shape != candidate.shape:
+        raise ValueError(
+            f"画像の形状が一致しません: {reference.shape} != {candidate.shape}"
+        )
+    diff = np.asarray(reference, dtype=np.float64) - np.asarray(
+        candidate, dtype=np.float64
+    )
+    mse = float(np.mean(diff * diff))
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255.0**2 / mse)
+
+
+def _proxy(image: Image.Image, proxy_size: int) -> npt.NDArray[np.uint8]:
+    """画像を長辺が ``proxy_size`` 以下になるよう整数倍で縮小したRGB配列にする。
+
+    透過のある画像は固定の背景色に合成してから縮小する。WebPは完全に透明な
+    画素の色を保存しないため、合成せずに比較すると見えない画素の差で
+    目標を満たせなくなる。
+    """
+    if image.has_transparency_data:
+        rgba = image.convert("RGBA")
+        background = Image.new("RGBA", rgba.size, _METRIC_BACKGROUND)
+        rgb = Image.alpha_composite(background, rgba).convert("RGB")
+    else:
+        rgb = image if image.mode == "RGB" else image.convert("RGB")
+    factor = math.ceil(max(rgb.size) / proxy_size)
+    if factor > 1:
+        rgb = rgb.reduce(factor)
+    return np.asarray(rgb)
+
+
+def _lowest_passing(
+    low: int,
+    high: int,
+    predicate: Callable[[int], bool],
+) -> int | None:
+    """``predicate`` を満たす最小の値を二分探索する（単調性を仮定）。"""
+    found = None
+    while low <= high:
+        middle = (low + high) // 2
+        if predicate(middle):
+            found = middle
+            high = middle - 1
+        else:
+            low = middle + 1
+    return found
+
+
+def _validate_target(target: QualityTarget) -> tuple[int, int, int]:
+    """目標の設定を検証し、（最小画質, 最大画質, プロキシサイズ）を返す。"""
+    if not any(key in target for key in ("ssim", "psnr", "max_bytes")):
+        raise ValueError(
+            "目標画質（ssim/psnr）または目標サイズ（max_bytes）を指定してください"
+        )
+    min_quality = target.get("min_quality", DEFAULT_MIN_QUALITY)
+    max_quality = target.get("max_quality", DEFAULT_MAX_QUALITY)
+    if not 1 <= min_quality <= max_quality <= 100:
+        raise ValueError(
+            f"画質の範囲は1 <= 最小 <= 最大 <= 100 である必要があります: "
+            f"{min_quality}-{max_quality}"
+        )
+    if "max_bytes" in target and target["max_bytes"] < 1:
+        raise ValueError(
+            f"目標サイズは1以上である必要があります: {target['max_bytes']}"
+        )
+    proxy_size = target.get("proxy_size", DEFAULT_PROXY_SIZE)
+    if proxy_size < 1:
+        raise ValueError(f"プロキシサイズは1以上である必要があります: {proxy_size}")
+    return min_quality, max_quality, proxy_size
+
+
+def search_quality(
+    image: Image.Image,
+    image_format: str,
+    target: QualityTarget,
+    *,
+    preset: EncoderPreset | None = None,
+    save_options: dict[str, Any] | None = None,
+) -> tuple[bytes, QualitySearchResult]:
+    """目標を満たす画質を二分探索し、その画質でエンコードしたバイト列を返す。
+
+    - ``ssim`` / ``psnr`` を指定した場合は、すべてを満たす最小の画質を選ぶ
+    - ``max_bytes`` を指定した場合は、そのバイト数に収まる最大の画質を選ぶ
+    - 両方を指定した場合は、画質の目標を満たす画質とサイズに収まる画質の
+      低い方を選ぶ（サイズの上限を優先する）
+
+    範囲内に目標を満たす画質がない場合は、画質の目標なら最大画質、
+    サイズの目標なら最小画質を使い、``target_met`` をFalseにする。
+    透過のある画像のSSIM/PSNRは、白の背景に合成したRGBで評価する。
+
+    Parameters
+    ----------
+    image : Image.Image
+        エンコードする画像
+    image_format : str
+        出力フォーマット（JPEGまたはWebP）
+    target : QualityTarget
+        目標画質・目標サイズと探索範囲
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    save_options : dict[str, Any] | None
+        すべての試行に追加する保存オプション（``icc_profile`` など）
+
+    Returns
+    -------
+    tuple[bytes, QualitySearchResult]
+        エンコード済みのバイト列と探索結果
+
+    Raises
+    ------
+    ValueError
+        画質を探索できないフォーマット、または目標の設定が不正な場合
+    """
+    pillow_format = to_pillow_format(image_format)
+    if pillow_format not in SEARCHABLE_FORMATS:
+        raise ValueError(f"画質を探索できないフォーマットです: {image_format}")
+    min_quality, max_quality, proxy_size = _validate_target(target)
+
+    image = prepare_for_format(image, pillow_format)
+    base_options = dict(get_save_options(pillow_format, preset), **(save_options or {}))
+    reference = _proxy(image, proxy_size)
+    encoded: dict[int, bytes] = {}
+    metrics: dict[int, tuple[float, float]] = {}
+
+    def encode(quality: int) -> bytes:
+        if quality not in encoded:
+            buffer = io.BytesIO()
+            image.save(buffer, pillow_format, **base_options, quality=quality)
+            encoded[quality] = buffer.getvalue()
+        return encoded[quality]
+
+    def measure(quality: int) -> tuple[float, float]:
+        if quality not in metrics:
+            with Image.open(io.BytesIO(encode(quality))) as decoded:
+                candidate = _proxy(decoded, proxy_size)
+            metrics[quality] = (ssim(reference, candidate), psnr(reference, candidate))
+        return metrics[quality]
+
+    def meets_metrics(quality: int) -> bool:
+        ssim_value, psnr_value = measure(quality)
+        return bool(
+            ssim_value >= target.get("ssim", -math.inf)
+            and psnr_value >= target.get("psnr", -math.inf)
+        )
+
+    def exceeds_size(quality: int) -> bool:
+        return len(encode(quality)) > target["max_bytes"]
+
+    # サイズの上限に収まる最大の画質を先に求め、画質の目標はその範囲で探索する
+    upper = max_quality
+    if "max_bytes" in target:
+        too_large = _lowest_passing(min_quality, max_quality, exceeds_size)
+        if too_large is not None:
+            upper = max(too_large - 1, min_quality)
+    has_metric = "ssim" in target or "psnr" in target
+    quality = upper
+    if has_metric:
+        quality = _lowest_passing(min_quality, upper, meets_metrics) or upper
+
+    target_met = not (has_metric and not meets_metrics(quality)) and not (
+        "max_bytes" in target and exceeds_size(quality)
+    )
+    ssim_value, psnr_value = measure(quality)
+    data = encode(quality)
+    return data, QualitySearchResult(
+        quality=quality,
+        size=len(data),
+        ssim=ssim_value,
+        psnr=psnr_value,
+        trials=len(encoded),
+        target_met=target_met,
+    )
+
+
+def convert_to_target_quality(
+    input_path: Path,
+    output_dir: Path,
+    image_format: str,
+    target: QualityTarget,
+    *,
+    preset: EncoderPreset | None = None,
+    preserve_metadata: bool = False,
+) -> QualityConversionResult:
+    """画像1枚を目標画質・目標サイズを満たす画質で変換。
+
+    Parameters
+    ----------
+    input_path : Path
+        入力画像のパス
+    output_dir : Path
+        出力ディレクトリ
+    image_format : str
+        出力フォーマット（JPEGまたはWebP）
+    target : QualityTarget
+        目標画質・目標サイズと探索範囲
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    preserve_metadata : bool
+        ICCプロファイルとEXIFを出力に引き継ぐか
+
+    Returns
+    -------
+    QualityConversionResult
+        選んだ画質を含む処理結果。読み込みや変換に失敗した場合はエラー
+    """
+    start = time.perf_counter()
+    pillow_format = to_pillow_format(image_format)
+    output_path = output_dir / f"{input_path.stem}{EXTENSIONS[pillow_format]}"
+    try:
+        with Image.open(input_path) as img:
+            check_pixels(*img.size)
+            img.load()
+            image, metadata = apply_color_policy(
+                img, pillow_format, preserve_metadata=preserve_metadata
+            )
+            data, search = search_quality(
+                image, pillow_format, target, preset=preset, save_options=metadata
+            )
+        output_path.write_bytes(data)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.error(f"変換エラー {input_path.name}: {e}")
+        result = create_processing_result(
+            "error",
+            input_path,
+            error_message=str(e),
+            processing_time=time.perf_counter() - start,
+        )
+        return QualityConversionResult(**result, search=None)
+
+    result = create_processing_result(
+        "success", input_path, output_path, processing_time=time.perf_counter() - start
+    )
+    return QualityConversionResult(**result, search=search)
+
+
+def convert_files_to_target_quality(
+    paths: Sequence[Path],
+    output_dir: Path,
+    image_format: str,
+    target: QualityTarget,
+    *,
+    preset: EncoderPreset | None = None,
+    preserve_metadata: bool = False,
+    workers: int | None = None,
+) -> list[QualityConversionResult]:
+    """複数の画像を並列に、画像ごとに探索した画質で変換。
+
+    1枚の画質探索は順に試行し、複数の画像をスレッドで並列に処理する
+    （Pillowのエンコード・デコードとNumPyの計算はGILを解放する）。
+
+    Parameters
+    ----------
+    paths : Sequence[Path]
+        入力画像のパス
+    output_dir : Path
+        出力ディレクトリ
+    image_format : str
+        出力フォーマット（JPEGまたはWebP）
+    target : QualityTarget
+        目標画質・目標サイズと探索範囲
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    preserve_metadata : bool
+        ICCプロファイルとEXIFを出力に引き継ぐか
+    workers : int | None
+        並列数。Noneの場合はCPUコア数
+
+    Returns
+    -------
+    list[QualityConversionResult]
+        入力順の処理結果
+
+    Raises
+    ------
+    ValueError
+        画質を探索できないフォーマット、または目標の設定が不正な場合
+    """
+    if to_pillow_format(image_format) not in SEARCHABLE_FORMATS:
+        raise ValueError(f"画質を探索できないフォーマットです: {image_format}")
+    _validate_target(target)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    def convert(path: Path) -> QualityConversionResult:
+        return convert_to_target_quality(
+            path,
+            output_dir,
+            image_format,
+            target,
+            preset=preset,
+            preserve_metadata=preserve_metadata,
+        )
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        return list(pool.map(convert, paths))
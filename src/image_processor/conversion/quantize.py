@@ -0,0 +1,249 @@
+"""パレット減色によるPNG-8出力.
+
+アニメ調・イラスト画像は色数が少ないため、RGBAのまま保存するより
+透過付きパレット（PNG-8 + tRNS）で保存した方がファイルサイズが数分の1になる。
+パレットは縮小したプロキシ画像から計算し、減色誤差が許容値を超える画像は
+Noneを返して呼び出し側でフルカラー保存にフォールバックさせる。
+写真のように減色に向かない画像は、全画素の一意色を求める前に
+無作為に抽出した画素で誤差を見積もって早期に判定する。
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 一意色と最近傍パレットの距離計算を分割する単位（メモリ使用量の上限）
+_CHUNK_COLORS = 4096
+
+# 減色誤差の見積もりに使う画素数（これより小さい画像は見積もらない）
+_SAMPLE_PIXELS = 65536
+
+# 見積もりの誤差が許容値のこの倍数を超えたら全画素を調べずにNoneを返す
+# （抽出のばらつきで許容値付近の画像を誤って除外しないための余裕）
+_SAMPLE_ERROR_MARGIN = 1.5
+
+
+def _normalize_mode(image: Image.Image) -> Image.Image:
+    """RGB/RGBAに正規化し、完全不透明なRGBAはRGBとして扱う。"""
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = image.mode in ("LA", "PA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    if image.mode == "RGBA" and np.asarray(image.getchannel("A")).min() == 255:
+        image = image.convert("RGB")
+    return image
+
+
+def _weighted(colors: npt.NDArray[np.int32]) -> npt.NDArray[np.int32]:
+    """距離計算用に色をアルファで乗算する（透明部分の色差を無視するため）。"""
+    if colors.shape[1] < 4:
+        return colors
+    alpha = colors[:, 3:4]
+    return np.concatenate([colors[:, :3] * alpha // 255, alpha], axis=1)
+
+
+def _nearest_palette(
+    colors: npt.NDArray[np.int32],
+    palette: npt.NDArray[np.int32],
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.int64]]:
+    """各色に最も近いパレット番号と二乗誤差を求める。"""
+    weighted_palette = _weighted(palette)
+    indices = np.empty(len(colors), dtype=np.intp)
+    errors = np.empty(len(colors), dtype=np.int64)
+    for start in range(0, len(colors), _CHUNK_COLORS):
+        chunk = _weighted(colors[start:start + _CHUNK_COLORS])
+        diff = chunk[:, None, :] - weighted_palette[None, :, :]
+        distances = np.einsum("ijk,ijk->ij", diff, diff)
+        nearest = distances.argmin(axis=1)
+        indices[start:start + len(chunk)] = nearest
+        errors[start:start + len(chunk)] = distances[np.arange(len(chunk)), nearest]
+    return indices, errors
+
+
+def _pack(pixels: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint32]:
+    """画素を32bit整数に詰める（一意色を求めるため）。"""
+    packed = np.zeros(len(pixels), dtype=np.uint32)
+    for channel in range(pixels.shape[1]):
+        packed |= pixels[:, channel].astype(np.uint32) << (8 * (3 - channel))
+    return packed
+
+
+def _unpack(packed: npt.NDArray[np.uint32], channels: int) -> npt.NDArray[np.int32]:
+    """``_pack`` で詰めた整数を色の配列に戻す。"""
+    return np.stack(
+        [(packed >> (8 * (3 - c))) & 0xFF for c in range(channels)], axis=1
+    ).astype(np.int32)
+
+
+def _rmse(
+    errors: npt.NDArray[np.int64], counts: npt.NDArray[np.intp], channels: int
+) -> float:
+    """色ごとの二乗誤差と画素数からチャンネル平均のRMSEを求める。"""
+    return float(np.sqrt((errors * counts).sum() / (counts.sum() * channels)))
+
+
+def _proxy_palette(
+    image: Image.Image,
+    max_colors: int,
+    proxy_size: int,
+) -> npt.NDArray[np.int32]:
+    """縮小プロキシ画像から適応パレットを計算する。"""
+    proxy = image.copy()
+    # 最近傍法で縮小し、元画像に存在しない中間色を作らない
+    proxy.thumbnail((proxy_size, proxy_size), Image.Resampling.NEAREST)
+    if image.mode == "RGBA":
+        method = Image.Quantize.FASTOCTREE
+    else:
+        method = Image.Quantize.MEDIANCUT
+    quantized = proxy.quantize(max_colors, method=method, dither=Image.Dither.NONE)
+
+    channels = len(image.mode)
+    raw = quantized.getpalette(image.mode) or []
+    palette = np.asarray(raw, dtype=np.int32).reshape(-1, channels)
+    used = np.unique(np.asarray(quantized))
+    used_palette: npt.NDArray[np.int32] = palette[used[used < len(palette)]]
+    return used_palette
+
+
+def quantize_image(
+    image: Image.Image,
+    *,
+    max_colors: int = 256,
+    dither: bool = False,
+    max_error: float = 4.0,
+    proxy_size: int = 512,
+) -> Image.Image | None:
+    """画像を透過付きパレット画像（Pモード）に減色。
+
+    色数が ``max_colors`` 以下の画像は無劣化でパレット化する。
+    それ以上の場合は縮小プロキシからパレットを計算し、全画素を
+    最近傍のパレット色に割り当てる。
+
+    Parameters
+    ----------
+    image : Image.Image
+        減色する画像
+    max_colors : int
+        パレットの最大色数（2〜256）
+    dither : bool
+        Floyd-Steinbergディザリングを行うか。透過画像では無視される
+    max_error : float
+        許容する減色誤差（チャンネル平均のRMSE, 0〜255）
+    proxy_size : int
+        パレット計算に使うプロキシ画像の長辺ピクセル数
+
+    Returns
+    -------
+    Image.Image | None
+        パレット画像。誤差が ``max_error`` を超える場合はNone
+
+    Raises
+    ------
+    ValueError
+        色数またはプロキシサイズが範囲外の場合
+    """
+    if not 2 <= max_colors <= 256:
+        raise ValueError(f"色数は2〜256である必要があります: {max_colors}")
+    if proxy_size < 1:
+        raise ValueError(f"プロキシサイズは1以上である必要があります: {proxy_size}")
+
+    image = _normalize_mode(image)
+    channels = len(image.mode)
+    pixels = np.asarray(image, dtype=np.uint8).reshape(-1, channels)
+
+    packed = _pack(pixels)
+
+    # 全画素の一意色と最近傍の割り当ては色数の多い画像ほど遅いため、
+    # 先に抽出した画素で誤差を見積もり、明らかに超える場合は打ち切る
+    palette = None
+    if len(packed) > _SAMPLE_PIXELS:
+        rng = np.random.default_rng(0)
+        sample = packed[rng.integers(0, len(packed), _SAMPLE_PIXELS)]
+        sample_unique, sample_counts = np.unique(sample, return_counts=True)
+        if len(sample_unique) > max_colors:
+            palette = _proxy_palette(image, max_colors, proxy_size)
+            _, errors = _nearest_palette(_unpack(sample_unique, channels), palette)
+            estimate = _rmse(errors, sample_counts, channels)
+            if estimate > max_error * _SAMPLE_ERROR_MARGIN:
+                logger.debug(
+                    f"減色誤差の見積もりが許容値を超えました: "
+                    f"{estimate:.2f} > {max_error}"
+                )
+                return None
+
+    unique, inverse, counts = np.unique(packed, return_inverse=True, return_counts=True)
+    unique_colors = _unpack(unique, channels)
+
+    if len(unique) <= max_colors:
+        palette = unique_colors
+        mapping = np.arange(len(unique), dtype=np.intp)
+        rmse = 0.0
+    else:
+        if palette is None:
+            palette = _proxy_palette(image, max_colors, proxy_size)
+        mapping, errors = _nearest_palette(unique_colors, palette)
+        rmse = _rmse(errors, counts, channels)
+        if rmse > max_error:
+            logger.debug(f"減色誤差が許容値を超えました: {rmse:.2f} > {max_error}")
+            return None
+
+    palette_bytes = palette.astype(np.uint8).ravel().tobytes()
+    if dither and image.mode == "RGB" and rmse > 0:
+        palette_image = Image.new("P", (1, 1))
+        palette_image.putpalette(palette_bytes, "RGB")
+        return image.quantize(palette=palette_image, dither=Image.Dither.FLOYDSTEINBERG)
+
+    indices = mapping[inverse.ravel()].astype(np.uint8)
+    indices = indices.reshape(image.height, image.width)
+    result = Image.fromarray(indices, "P")
+    # RGBAパレットを設定するとPNG保存時にtRNSチャンクが書き出される
+    result.putpalette(palette_bytes, image.mode)
+    return result
+
+
+def save_png_quantized(
+    image: Image.Image,
+    destination: Path | BinaryIO,
+    *,
+    max_colors: int = 256,
+    dither: bool = False,
+    max_error: float = 4.0,
+    proxy_size: int = 512,
+    **save_options: Any,
+) -> bool:
+    """画像を減色してPNG-8で保存。
+
+    Parameters
+    ----------
+    image : Image.Image
+        保存する画像
+    destination : Path | BinaryIO
+        出力先のパスまたはバイナリストリーム
+    max_colors, dither, max_error, proxy_size
+        ``quantize_image`` を参照
+    **save_options : Any
+        ``Image.save`` に渡すPNGの保存オプション
+
+    Returns
+    -------
+    bool
+        減色して保存した場合True。誤差が大きく保存しなかった場合False
+    """
+    quantized = quantize_image(
+        image,
+        max_colors=max_colors,
+        dither=dither,
+        max_error=max_error,
+        proxy_size=proxy_size,
+    )
+    if quantized is None:
+        return False
+    quantized.save(destination, "PNG", **save_options)
+    return True
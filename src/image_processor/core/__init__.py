@@ -10,6 +10,14 @@ from image_processor.core.common import (
     create_processing_result,
     format_file_size,
 )
+from image_processor.core.catalog import (
+    MediaCatalog,
+    MediaRecord,
+    RefreshStats,
+    read_image_header,
+    probe_video,
+    parse_query,
+)
 
 __all__ = [
     "setup_logging",
@@ -20,4 +28,10 @@ __all__ = [
     "remove_file_safely",
     "create_processing_result",
     "format_file_size",
+    "MediaCatalog",
+    "MediaRecord",
+    "RefreshStats",
+    "read_image_header",
+    "probe_video",
+    "parse_query",
 ]
\ No newline at end of file
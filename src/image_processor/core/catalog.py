@@ -0,0 +1,549 @@
+"""ヘッダーのみを読むメディアカタログ（SQLite）.
+
+バッチ処理の前に、入力ファイルごとのサイズ・モード・形式・フレーム数・
+ファイルサイズを把握するためのカタログ。画像はPillowの遅延オープン
+（``load()`` を呼ばずにヘッダーだけを解析）、動画はffprobeで情報を取得し、
+読み込みはスレッドプールで並行して行う。結果はSQLiteに保存し、
+更新日時とファイルサイズが変わったファイルだけを読み直す。
+
+``"width > 2000 and format = png"`` のような条件式でファイルを絞り込める。
+条件式は独自の構文解析でプレースホルダ付きのSQLに変換するため、
+任意のSQLは実行されない。
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import subprocess
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Literal, Self, TypedDict
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+type MediaKind = Literal["image", "video"]
+
+# ffprobeで情報を取得する動画の拡張子
+VIDEO_EXTENSIONS = frozenset({".mp4", ".avi", ".mov", ".mkv", ".webm"})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    format TEXT,
+    width INTEGER,
+    height INTEGER,
+    mode TEXT,
+    frames INTEGER,
+    duration REAL,
+    size_bytes INTEGER NOT NULL,
+    mtime REAL NOT NULL
+)
+"""
+
+_COLUMNS = (
+    "path",
+    "kind",
+    "format",
+    "width",
+    "height",
+    "mode",
+    "frames",
+    "duration",
+    "size_bytes",
+    "mtime",
+)
+
+# 条件式で使えるフィールド名とSQLの式の対応
+QUERY_FIELDS: dict[str, str] = {
+    "name": "name",
+    "kind": "kind",
+    "format": "format",
+    "width": "width",
+    "height": "height",
+    "mode": "mode",
+    "frames": "frames",
+    "duration": "duration",
+    "size": "size_bytes",
+    "pixels": "width * height",
+}
+
+# 文字列として比較するフィールド（大文字小文字を区別しない）
+_TEXT_FIELDS = frozenset({"name", "kind", "format", "mode"})
+
+# 形式名の別名（拡張子で指定された場合に揃える）
+_FORMAT_ALIASES = {"jpg": "jpeg", "tif": "tiff"}
+
+_SIZE_UNITS = {"": 1, "kb": 1024, "mb": 1024**2, "gb": 1024**3}
+
+_TOKEN_PATTERN = re.compile(
+    r"""\s*(?:
+        (?P<op><=|>=|!=|==|=|<|>|~)
+        |(?P<paren>[()])
+        |(?P<number>\d+(?:\.\d+)?)(?P<unit>[kKmMgG][bB])?(?![\w.])
+        |'(?P<squote>[^']*)'
+        |"(?P<dquote>[^"]*)"
+        |(?P<word>[\w.*\-]+)
+    )""",
+    re.VERBOSE,
+)
+
+
+class MediaRecord(TypedDict):
+    """カタログに保存するメディア情報の型定義."""
+
+    path: Path
+    kind: MediaKind
+    format: str | None
+    width: int | None
+    height: int | None
+    mode: str | None
+    frames: int | None
+    duration: float | None
+    size_bytes: int
+    mtime: float
+
+
+class RefreshStats(TypedDict):
+    """カタログ更新結果の型定義."""
+
+    added: int
+    updated: int
+    unchanged: int
+    removed: int
+    failed: int
+
+
+def read_image_header(path: Path) -> MediaRecord:
+    """画像のヘッダーだけを読み、サイズ・モード・形式・フレーム数を取得。
+
+    Parameters
+    ----------
+    path : Path
+        画像ファイルのパス
+
+    Returns
+    -------
+    MediaRecord
+        メディア情報
+
+    Raises
+    ------
+    OSError
+        画像として開けない場合
+    """
+    stat = path.stat()
+    with Image.open(path) as img:
+        # n_framesはGIFでも画素をデコードせずにフレームを数える
+        frames = getattr(img, "n_frames", 1)
+        return MediaRecord(
+            path=path,
+            kind="image",
+            format=(img.format or path.suffix.lstrip(".")).lower(),
+            width=img.width,
+            height=img.height,
+            mode=img.mode,
+            frames=frames,
+            duration=None,
+            size_bytes=stat.st_size,
+            mtime=stat.st_mtime,
+        )
+
+
+def probe_video(path: Path, ffprobe_path: str = "ffprobe") -> MediaRecord:
+    """ffprobeで動画の情報（サイズ・フレーム数・長さ）を取得。
+
+    Parameters
+    ----------
+    path : Path
+        動画ファイルのパス
+    ffprobe_path : str
+        ffprobeの実行パス
+
+    Returns
+    -------
+    MediaRecord
+        メディア情報
+
+    Raises
+    ------
+    OSError
+        ffprobeを実行できない、または動画を解析できない場合
+    """
+    stat = path.stat()
+    cmd = [
+        ffprobe_path,
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries",
+        "stream=width,height,pix_fmt,nb_frames,avg_frame_rate:format=duration",
+        "-of", "json",
+        str(path),
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except subprocess.TimeoutExpired as e:
+        raise OSError(f"ffprobeがタイムアウトしました: {path.name}") from e
+    if result.returncode != 0:
+        raise OSError(f"ffprobeで解析できません: {path.name}: {result.stderr.strip()}")
+
+    probe = json.loads(result.stdout or "{}")
+    streams = probe.get("streams") or [{}]
+    stream = streams[0]
+    duration_text = probe.get("format", {}).get("duration")
+    duration = float(duration_text) if duration_text else None
+
+    frames_text = stream.get("nb_frames")
+    frames = int(frames_text) if frames_text and frames_text.isdigit() else None
+    rate = stream.get("avg_frame_rate", "0/0")
+    numerator, _, denominator = rate.partition("/")
+    if frames is None and duration and denominator not in ("", "0"):
+        # コンテナにフレーム数がない場合は平均フレームレートから概算する
+        frames = round(duration * int(numerator) / int(denominator))
+
+    return MediaRecord(
+        path=path,
+        kind="video",
+        format=path.suffix.lstrip(".").lower(),
+        width=stream.get("width"),
+        height=stream.get("height"),
+        mode=stream.get("pix_fmt"),
+        frames=frames,
+        duration=duration,
+        size_bytes=stat.st_size,
+        mtime=stat.st_mtime,
+    )
+
+
+def read_media_header(path: Path, ffprobe_path: str = "ffprobe") -> MediaRecord:
+    """拡張子に応じて画像のヘッダーまたは動画の情報を読み込む。"""
+    if path.suffix.lower() in VIDEO_EXTENSIONS:
+        return probe_video(path, ffprobe_path)
+    return read_image_header(path)
+
+
+def _tokenize(expression: str) -> list[tuple[str, str]]:
+    """条件式を (種類, 値) のトークン列に分割する。"""
+    tokens: list[tuple[str, str]] = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_PATTERN.match(expression, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"条件式を解析できません: {expression[position:]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "unit":
+            kind = "number"
+        if kind == "number":
+            unit = (match.group("unit") or "").lower()
+            tokens.append(("number", f"{match.group('number')}:{_SIZE_UNITS[unit]}"))
+        elif kind in ("squote", "dquote"):
+            tokens.append(("string", match.group(kind)))
+        elif kind == "word" and match.group(kind).lower() in ("and", "or", "not"):
+            tokens.append(("logic", match.group(kind).lower()))
+        elif kind is not None:
+            tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+class _QueryParser:
+    """条件式の再帰下降パーサー（SQLのWHERE句とパラメータを生成）."""
+
+    def __init__(self, expression: str) -> None:
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.params: list[Any] = []
+
+    def parse(self) -> str:
+        if not self.tokens:
+            raise ValueError("条件式が空です")
+        sql = self._or()
+        if self.position != len(self.tokens):
+            rest = self.tokens[self.position][1]
+            raise ValueError(f"条件式の末尾が不正です: {rest!r}")
+        return sql
+
+    def _peek(self) -> tuple[str, str] | None:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take(self) -> tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise ValueError("条件式が途中で終わっています")
+        self.position += 1
+        return token
+
+    def _or(self) -> str:
+        parts = [self._and()]
+        while self._peek() == ("logic", "or"):
+            self.position += 1
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else "(" + " OR ".join(parts) + ")"
+
+    def _and(self) -> str:
+        parts = [self._not()]
+        while self._peek() == ("logic", "and"):
+            self.position += 1
+            parts.append(self._not())
+        return parts[0] if len(parts) == 1 else "(" + " AND ".join(parts) + ")"
+
+    def _not(self) -> str:
+        if self._peek() == ("logic", "not"):
+            self.position += 1
+            return f"NOT {self._not()}"
+        if self._peek() == ("paren", "("):
+            self.position += 1
+            sql = self._or()
+            if self._take() != ("paren", ")"):
+                raise ValueError("括弧が閉じられていません")
+            return f"({sql})"
+        return self._comparison()
+
+    def _comparison(self) -> str:
+        kind, field = self._take()
+        if kind != "word" or field.lower() not in QUERY_FIELDS:
+            raise ValueError(
+                f"不明なフィールドです: {field!r} (使用可能: {', '.join(QUERY_FIELDS)})"
+            )
+        field = field.lower()
+        op_kind, op = self._take()
+        if op_kind != "op":
+            raise ValueError(f"比較演算子が必要です: {op!r}")
+        value_kind, value = self._take()
+        if value_kind not in ("number", "string", "word"):
+            raise ValueError(f"比較する値が必要です: {value!r}")
+
+        column = QUERY_FIELDS[field]
+        if field in _TEXT_FIELDS:
+            if value_kind == "number":
+                value = value.split(":")[0]
+            if op == "~":
+                # 「~」はワイルドカード（*）による部分一致
+                self.params.append(value.replace("*", "%"))
+                return f"{column} LIKE ? COLLATE NOCASE"
+            if op not in ("=", "==", "!="):
+                raise ValueError(
+                    f"文字列のフィールドには = / != / ~ のみ使えます: {field}"
+                )
+            if field == "format":
+                value = _FORMAT_ALIASES.get(value.lower(), value)
+            self.params.append(value)
+            sql_op = "!=" if op == "!=" else "="
+            return f"{column} {sql_op} ? COLLATE NOCASE"
+
+        if value_kind != "number" or op == "~":
+            raise ValueError(
+                f"数値のフィールドには数値を比較してください: {field} {op} {value}"
+            )
+        number, multiplier = value.split(":")
+        self.params.append(float(number) * int(multiplier))
+        return f"{column} {'=' if op == '==' else op} ?"
+
+
+def parse_query(expression: str) -> tuple[str, list[Any]]:
+    """条件式をSQLのWHERE句とパラメータに変換。
+
+    構文は ``<フィールド> <演算子> <値>`` を ``and`` / ``or`` / ``not`` と括弧で
+    組み合わせたもの。数値には ``KB`` / ``MB`` / ``GB`` の単位を付けられ、
+    文字列は ``~`` でワイルドカード（``*``）による一致を指定できる。
+
+    Parameters
+    ----------
+    expression : str
+        条件式（例: ``"width > 2000 and format = png"``）
+
+    Returns
+    -------
+    tuple[str, list[Any]]
+        プレースホルダ付きのWHERE句とパラメータ
+
+    Raises
+    ------
+    ValueError
+        条件式の構文が不正、または不明なフィールドを含む場合
+    """
+    parser = _QueryParser(expression)
+    return parser.parse(), parser.params
+
+
+class MediaCatalog:
+    """メディアファイルのヘッダー情報を保存するSQLiteカタログ."""
+
+    def __init__(
+        self,
+        db_path: Path | str = ":memory:",
+        *,
+        ffprobe_path: str = "ffprobe",
+    ) -> None:
+        """カタログを開く（存在しない場合は作成）。
+
+        Parameters
+        ----------
+        db_path : Path | str
+            SQLiteデータベースのパス。``":memory:"`` の場合はメモリ上に作成
+        ffprobe_path : str
+            動画の情報取得に使うffprobeの実行パス
+        """
+        self.db_path = db_path
+        self.ffprobe_path = ffprobe_path
+        self.connection = sqlite3.connect(str(db_path))
+        self.connection.execute(_SCHEMA)
+        self.connection.commit()
+
+    def refresh(
+        self,
+        paths: Iterable[Path],
+        *,
+        workers: int | None = None,
+        prune: bool = False,
+    ) -> RefreshStats:
+        """ファイルのヘッダー情報を読み込み、カタログを更新。
+
+        更新日時とファイルサイズがカタログと同じファイルは読み直さない。
+
+        Parameters
+        ----------
+        paths : Iterable[Path]
+            対象ファイルのパス
+        workers : int | None
+            ヘッダー読み込みのスレッド数。Noneの場合はThreadPoolExecutorの既定値
+        prune : bool
+            存在しなくなったファイルをカタログから削除するか
+
+        Returns
+        -------
+        RefreshStats
+            追加・更新・変更なし・削除・失敗の件数
+        """
+        stats = RefreshStats(added=0, updated=0, unchanged=0, removed=0, failed=0)
+        rows = self.connection.execute("SELECT path, mtime, size_bytes FROM media")
+        known = {path: (mtime, size) for path, mtime, size in rows}
+
+        stale: list[Path] = []
+        for path in dict.fromkeys(p.resolve() for p in paths):
+            try:
+                stat = path.stat()
+            except OSError as e:
+                logger.warning(f"ファイル情報を取得できません {path.name}: {e}")
+                stats["failed"] += 1
+                continue
+            if known.get(str(path)) == (stat.st_mtime, stat.st_size):
+                stats["unchanged"] += 1
+            else:
+                stale.append(path)
+
+        def read(path: Path) -> MediaRecord | None:
+            try:
+                return read_media_header(path, self.ffprobe_path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"ヘッダーを読み込めません {path.name}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            records = list(pool.map(read, stale))
+
+        for record in records:
+            if record is None:
+                stats["failed"] += 1
+                continue
+            stats["updated" if str(record["path"]) in known else "added"] += 1
+            row: dict[str, Any] = {**record, "path": str(record["path"])}
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO media (name, {', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})",
+                [record["path"].name, *(row[column] for column in _COLUMNS)],
+            )
+
+        if prune:
+            missing = [(p,) for p in known if not Path(p).exists()]
+            self.connection.executemany("DELETE FROM media WHERE path = ?", missing)
+            stats["removed"] = len(missing)
+
+        self.connection.commit()
+        return stats
+
+    def query(self, expression: str | None = None) -> list[MediaRecord]:
+        """条件式に一致するメディア情報をパス順に取得。
+
+        Parameters
+        ----------
+        expression : str | None
+            条件式（``parse_query`` を参照）。Noneの場合はすべて
+
+        Returns
+        -------
+        list[MediaRecord]
+            一致したメディア情報
+        """
+        where, params = ("1", []) if expression is None else parse_query(expression)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM media WHERE {where} ORDER BY path",
+            params,
+        )
+        return [
+            MediaRecord(
+                path=Path(path),
+                kind=kind,
+                format=image_format,
+                width=width,
+                height=height,
+                mode=mode,
+                frames=frames,
+                duration=duration,
+                size_bytes=size_bytes,
+                mtime=mtime,
+            )
+            for (
+                path,
+                kind,
+                image_format,
+                width,
+                height,
+                mode,
+                frames,
+                duration,
+                size_bytes,
+                mtime,
+            ) in cursor
+        ]
+
+    def select(self, paths: Sequence[Path], expression: str) -> list[Path]:
+        """ファイルを更新してから、条件式に一致するものを元の順序で返す。
+
+        Parameters
+        ----------
+        paths : Sequence[Path]
+            対象ファイルのパス
+        expression : str
+            条件式
+
+        Returns
+        -------
+        list[Path]
+            条件に一致したファイルのパス
+        """
+        self.refresh(paths)
+        matched = {record["path"] for record in self.query(expression)}
+        return [path for path in paths if path.resolve() in matched]
+
+    def close(self) -> None:
+        """データベース接続を閉じる。"""
+        self.connection.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
@@ -1 +1,161 @@
-"""Processing module for image processing and manipulation."""
\ No newline at end of file
+"""Processing module for image processing and manipulation."""
+
+from image_processor.conversion.formats import flatten_alpha
+from image_processor.processing.background import (
+    DEFAULT_AUTO_THRESHOLD,
+    DEFAULT_PROXY_SIZE,
+    DEFAULT_TOLERANCE,
+    AutoBackend,
+    ChromaKeyBackend,
+    FlatBackgroundBackend,
+    ProxyBackend,
+    RembgBackend,
+    SegmentationBackend,
+    SegmentationResult,
+    apply_mask,
+    box_sum,
+    create_backend,
+    flood_fill_from_border,
+    gather_pixels,
+    refine_mask_edges,
+    remove_background,
+)
+from image_processor.processing.compositing import (
+    MASK_SUFFIX,
+    Background,
+    composite,
+    composite_files,
+    load_mask,
+    mask_path_for,
+    save_mask,
+)
+from image_processor.processing.convert_pipeline import (
+    EncodedFile,
+    FileData,
+    convert_files_pipelined,
+    read_file,
+)
+from image_processor.processing.mask_cache import (
+    DEFAULT_MASK_CACHE_BYTES,
+    CachedBackend,
+    MaskCache,
+    content_hash,
+)
+from image_processor.processing.matting import (
+    DEFAULT_GUIDED_EPSILON,
+    DEFAULT_GUIDED_RADIUS,
+    MattingBackend,
+    clean_mask,
+    guided_refine,
+)
+from image_processor.processing.pipeline import (
+    ImageFileSink,
+    Pipeline,
+    PipelineItem,
+    Stage,
+    image_file_source,
+    video_frame_source,
+)
+from image_processor.processing.scheduler import (
+    WORKING_SET_FACTORS,
+    MemoryBudget,
+    MemoryEstimate,
+    check_pixels,
+    estimate_memory,
+    run_with_memory_budget,
+    working_set_bytes,
+)
+from image_processor.processing.session_pool import (
+    DEFAULT_MIN_THREADS_PER_WORKER,
+    BackendCost,
+    SessionPoolPlan,
+    measure_backend_cost,
+    plan_session_pool,
+    preload_backend,
+    run_with_session_pool,
+)
+from image_processor.processing.temporal import (
+    DEFAULT_KEYFRAME_INTERVAL,
+    DEFAULT_REUSE_THRESHOLD,
+    TemporalMaskBackend,
+    estimate_shift,
+    shift_mask,
+    shifted_difference,
+)
+from image_processor.processing.tiled import (
+    DEFAULT_TILE_MEMORY,
+    iter_strips,
+    process_tiled,
+    strip_rows_for_budget,
+)
+
+__all__ = [
+    "DEFAULT_AUTO_THRESHOLD",
+    "DEFAULT_GUIDED_EPSILON",
+    "DEFAULT_GUIDED_RADIUS",
+    "DEFAULT_KEYFRAME_INTERVAL",
+    "DEFAULT_MASK_CACHE_BYTES",
+    "DEFAULT_MIN_THREADS_PER_WORKER",
+    "DEFAULT_PROXY_SIZE",
+    "DEFAULT_REUSE_THRESHOLD",
+    "DEFAULT_TILE_MEMORY",
+    "DEFAULT_TOLERANCE",
+    "MASK_SUFFIX",
+    "WORKING_SET_FACTORS",
+    "AutoBackend",
+    "BackendCost",
+    "Background",
+    "CachedBackend",
+    "ChromaKeyBackend",
+    "EncodedFile",
+    "FileData",
+    "FlatBackgroundBackend",
+    "ImageFileSink",
+    "MaskCache",
+    "MattingBackend",
+    "MemoryBudget",
+    "MemoryEstimate",
+    "Pipeline",
+    "PipelineItem",
+    "ProxyBackend",
+    "RembgBackend",
+    "SegmentationBackend",
+    "SegmentationResult",
+    "SessionPoolPlan",
+    "Stage",
+    "TemporalMaskBackend",
+    "apply_mask",
+    "box_sum",
+    "check_pixels",
+    "clean_mask",
+    "composite",
+    "composite_files",
+    "content_hash",
+    "convert_files_pipelined",
+    "create_backend",
+    "estimate_memory",
+    "estimate_shift",
+    "flatten_alpha",
+    "flood_fill_from_border",
+    "gather_pixels",
+    "guided_refine",
+    "image_file_source",
+    "iter_strips",
+    "load_mask",
+    "mask_path_for",
+    "measure_backend_cost",
+    "plan_session_pool",
+    "preload_backend",
+    "process_tiled",
+    "read_file",
+    "refine_mask_edges",
+    "remove_background",
+    "run_with_memory_budget",
+    "run_with_session_pool",
+    "save_mask",
+    "shift_mask",
+    "shifted_difference",
+    "strip_rows_for_budget",
+    "video_frame_source",
+    "working_set_bytes",
+]
@@ -0,0 +1,863 @@
+"""背景透過のセグメンテーションバックエンド.
+
+背景透過はマスク（前景255・背景0のLモード画像）を求める処理と、それを
+アルファとして合成する処理に分けられる。マスクを求める方法をバックエンドとして
+差し替えられるようにする。
+
+- ``rembg``: rembgのニューラルネットワークモデル。写真など一般の画像向け
+- ``flat``: 単色背景の除去。画像の外周から背景色を推定し、許容誤差内で外周と
+  つながった領域を背景とする。スプライトや白背景のイラスト向けで、rembgより
+  数桁速い
+- ``chroma``: クロマキー。指定色（既定は緑）に近い画素を色差（Cb/Cr）で判定する
+- ``auto``: まず ``flat`` を試し、信頼度が閾値以上ならその結果を使い、
+  そうでなければ ``rembg`` に切り替える
+
+``ProxyBackend`` は任意のバックエンドを包み、``Image.reduce`` で縮小した画像で
+推論してマスクだけを元のサイズに拡大する。rembgのモデルは内部で1024px程度に
+縮小して推論するため、6000pxの画像を渡しても前処理・後処理の分だけ遅く、
+メモリも使う。
+
+NumPyのバックエンドは追加の依存関係なしで動作する。rembgは使うときにだけ
+読み込むため、未インストールの環境でも ``flat`` / ``chroma`` は使える。
+"""
+
+import importlib.util
+import logging
+import threading
+from typing import Any, Protocol, TypedDict
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from image_processor.types import BackgroundMethod, MattingConfig
+
+logger = logging.getLogger(__name__)
+
+# 単色背景とみなす色の許容誤差（チャンネルごとの最大差、0-255）
+DEFAULT_TOLERANCE = 24
+
+# クロマキーの既定の色と、色差平面での許容誤差
+DEFAULT_KEY_COLOR = (0, 255, 0)
+DEFAULT_KEY_TOLERANCE = 48
+
+# autoでNumPyの結果を採用する信頼度の下限
+DEFAULT_AUTO_THRESHOLD = 0.98
+
+DEFAULT_REMBG_MODEL = "isnet-anime"
+
+# 縮小推論の既定の長辺（rembgのモデルの入力解像度程度）
+DEFAULT_PROXY_SIZE = 1024
+
+# 境界の補正で前景・背景の色を集める窓の半径（縮小画像のピクセル数）
+_REFINE_RADIUS = 4
+
+# 補正で確実な前景・背景とみなすマスクの値（0-1）
+_SURE_MARGIN = 0.05
+
+# 前景と背景の色の差がこれ未満の画素は補正しない（色で分離できないため）
+_MIN_REFINE_CONTRAST = 16.0
+
+# 補正で元画像の画素を読む単位の行数（元画像全体の配列を作らないため）
+_REFINE_STRIP_ROWS = 256
+
+# 前景・背景のどちらかがこの割合未満の場合、単色背景の推定は失敗とみなす
+_MIN_REGION_FRACTION = 0.005
+
+type BoolArray = npt.NDArray[np.bool_]
+
+
+class SegmentationResult(TypedDict):
+    """セグメンテーション結果の型定義（``mask`` は前景255のLモード画像）."""
+
+    mask: Image.Image
+    confidence: float
+    backend: BackgroundMethod
+
+
+class SegmentationBackend(Protocol):
+    """背景透過のマスクを求めるバックエンドのインターフェース.
+
+    ``cache_id`` はマスクを左右するモデル名とパラメータを表す文字列、
+    ``resolution`` は推論する画像の長辺（0は元のサイズ）で、マスクのキャッシュの
+    キーに使う。
+    """
+
+    name: BackgroundMethod
+
+    @property
+    def cache_id(self) -> str:
+        """モデル名とパラメータを表す文字列。"""
+        ...
+
+    @property
+    def resolution(self) -> int:
+        """推論する画像の長辺（0は元のサイズ）。"""
+        ...
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """画像の前景マスクを求める。"""
+        ...
+
+
+def _rgb_array(image: Image.Image) -> npt.NDArray[np.int16]:
+    """RGBの画素配列（差を取れるよう符号付き）を取得。"""
+    return np.asarray(image.convert("RGB"), dtype=np.int16)
+
+
+def _max_channel_distance(
+    array: npt.NDArray[np.int16], color: npt.NDArray[np.int16]
+) -> npt.NDArray[np.int16]:
+    """チャンネルごとの差の最大値を計算（軸方向のmaxよりチャンネル単位の方が速い）。"""
+    distance: npt.NDArray[np.int16] = np.abs(array[..., 0] - color[0])
+    for channel in range(1, array.shape[-1]):
+        np.maximum(distance, np.abs(array[..., channel] - color[channel]), out=distance)
+    return distance
+
+
+def _border(array: npt.NDArray[Any]) -> npt.NDArray[Any]:
+    """画像の外周1ピクセルの画素を (N, チャンネル) で取得。"""
+    if array.shape[0] <= 2 or array.shape[1] <= 2:
+        return array.reshape(-1, *array.shape[2:])
+    return np.concatenate(
+        [array[0], array[-1], array[1:-1, 0], array[1:-1, -1]], axis=0
+    )
+
+
+def _border_mask(shape: tuple[int, int]) -> BoolArray:
+    mask = np.zeros(shape, dtype=bool)
+    mask[0, :] = mask[-1, :] = mask[:, 0] = mask[:, -1] = True
+    return mask
+
+
+def _row_run_ids(candidate: BoolArray) -> tuple[npt.NDArray[np.int32], int]:
+    """各行の候補画素の連続区間に1からの番号を振る（候補でない画素は0）。"""
+    starts = candidate.copy()
+    starts[:, 1:] &= ~candidate[:, :-1]
+    run_ids = np.cumsum(starts, axis=None, dtype=np.int32).reshape(candidate.shape)
+    n_runs = int(run_ids[-1, -1])
+    run_ids[~candidate] = 0
+    return run_ids, n_runs
+
+
+def _propagate(
+    reached: BoolArray, run_ids: npt.NDArray[np.int32], n_runs: int
+) -> BoolArray:
+    """到達済みの画素を含む連続区間全体を到達済みにする。"""
+    reached_runs = np.zeros(n_runs + 1, dtype=bool)
+    reached_runs[run_ids[reached]] = True
+    reached_runs[0] = False
+    result: BoolArray = reached_runs[run_ids]
+    return result
+
+
+def flood_fill_from_border(candidate: BoolArray) -> BoolArray:
+    """外周から候補画素だけを通ってつながる領域を求める（4近傍）。
+
+    行方向と列方向に、候補画素の連続区間単位で到達範囲を広げることを
+    収束するまで繰り返す。区間の番号付けは最初に1回だけ行い、各パスは
+    ベクトル化された O(画素数) の処理で、反復回数は経路が曲がる回数程度で済む。
+
+    Parameters
+    ----------
+    candidate : numpy.ndarray
+        背景の候補画素（2次元のbool配列）
+
+    Returns
+    -------
+    numpy.ndarray
+        外周とつながった候補画素
+    """
+    row_ids, n_row_runs = _row_run_ids(candidate)
+    column_ids, n_column_runs = _row_run_ids(np.ascontiguousarray(candidate.T))
+    column_ids = column_ids.T
+
+    # 到達範囲は単調に広がるだけなので、回数の上限なしで必ず収束する
+    reached = candidate & _border_mask(candidate.shape)
+    while True:
+        expanded = _propagate(reached, row_ids, n_row_runs)
+        expanded = _propagate(expanded, column_ids, n_column_runs)
+        if np.array_equal(expanded, reached):
+            return reached
+        reached = expanded
+
+
+def _soft_edge(
+    background: BoolArray, distance: npt.NDArray[np.int16], tolerance: int
+) -> npt.NDArray[np.uint8]:
+    """背景に接する前景画素を背景色からの距離に応じて半透明にしたアルファを作る。"""
+    near = np.zeros_like(background)
+    near[1:, :] |= background[:-1, :]
+    near[:-1, :] |= background[1:, :]
+    near[:, 1:] |= background[:, :-1]
+    near[:, :-1] |= background[:, 1:]
+    edge = near & ~background
+
+    alpha = np.where(background, 0, 255).astype(np.float32)
+    ramp = np.clip((distance - tolerance) / max(tolerance, 1), 0.0, 1.0) * 255
+    alpha[edge] = ramp[edge]
+    return alpha.round().astype(np.uint8)
+
+
+class FlatBackgroundBackend:
+    """単色背景を外周からの塗りつぶしで除去するバックエンド."""
+
+    name: BackgroundMethod = "flat"
+
+    def __init__(self, tolerance: int = DEFAULT_TOLERANCE) -> None:
+        """バックエンドを初期化。
+
+        Parameters
+        ----------
+        tolerance : int
+            背景色とみなすチャンネルごとの最大差（0-255）
+
+        Raises
+        ------
+        ValueError
+            許容誤差が範囲外の場合
+        """
+        if not 0 <= tolerance <= 255:
+            raise ValueError(
+                f"許容誤差は0から255の範囲である必要があります: {tolerance}"
+            )
+        self.tolerance = tolerance
+        self.cache_id = f"flat:{tolerance}"
+        self.resolution = 0
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """外周の中央値を背景色として前景マスクを求める。
+
+        信頼度は外周のうち背景色の許容誤差内にある画素の割合。前景または背景が
+        ほとんどない場合（被写体が外周に接している・背景が単色でない）は0とする。
+
+        Parameters
+        ----------
+        image : Image.Image
+            対象画像
+
+        Returns
+        -------
+        SegmentationResult
+            前景マスクと信頼度
+        """
+        array = _rgb_array(image)
+        border = _border(array)
+        background_color = np.median(border, axis=0).astype(np.int16)
+
+        distance = _max_channel_distance(array, background_color)
+        candidate = distance <= self.tolerance
+        background = flood_fill_from_border(candidate)
+
+        uniformity = float(
+            (_max_channel_distance(border, background_color) <= self.tolerance).mean()
+        )
+        fraction = float(background.mean())
+        if min(fraction, 1 - fraction) < _MIN_REGION_FRACTION:
+            uniformity = 0.0
+
+        alpha = _soft_edge(background, distance, self.tolerance)
+        return SegmentationResult(
+            mask=Image.fromarray(alpha, "L"), confidence=uniformity, backend=self.name
+        )
+
+
+def _chroma(array: npt.NDArray[np.int16]) -> npt.NDArray[np.float32]:
+    """RGB配列をBT.601の色差（Cb, Cr）に変換。"""
+    rgb = array.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    cb = -0.168736 * r - 0.331264 * g + 0.5 * b
+    cr = 0.5 * r - 0.418688 * g - 0.081312 * b
+    return np.stack([cb, cr], axis=-1)
+
+
+class ChromaKeyBackend:
+    """指定色の背景を色差で除去するクロマキーのバックエンド."""
+
+    name: BackgroundMethod = "chroma"
+
+    def __init__(
+        self,
+        key_color: tuple[int, int, int] = DEFAULT_KEY_COLOR,
+        tolerance: int = DEFAULT_KEY_TOLERANCE,
+    ) -> None:
+        """バックエンドを初期化。
+
+        Parameters
+        ----------
+        key_color : tuple[int, int, int]
+            背景のRGB色
+        tolerance : int
+            色差平面（Cb/Cr）で背景とみなす距離。この2倍の距離まで半透明になる
+
+        Raises
+        ------
+        ValueError
+            許容誤差が1未満の場合
+        """
+        if tolerance < 1:
+            raise ValueError(f"許容誤差は1以上である必要があります: {tolerance}")
+        self.key_color = key_color
+        self.tolerance = tolerance
+        self.cache_id = "chroma:{},{},{}:{}".format(*key_color, tolerance)
+        self.resolution = 0
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """キー色からの色差の距離でアルファを求める。
+
+        明るさ（Y）を使わないため、背景に多少の影や照明のむらがあっても除去できる。
+        信頼度は外周のうちキー色と判定された画素の割合。
+
+        Parameters
+        ----------
+        image : Image.Image
+            対象画像
+
+        Returns
+        -------
+        SegmentationResult
+            前景マスクと信頼度
+        """
+        array = _rgb_array(image)
+        key = _chroma(np.array([[self.key_color]], dtype=np.int16))[0, 0]
+        distance = np.linalg.norm(_chroma(array) - key, axis=-1)
+
+        alpha = np.clip((distance - self.tolerance) / self.tolerance, 0.0, 1.0) * 255
+        confidence = float((_border(distance) <= self.tolerance).mean())
+        return SegmentationResult(
+            mask=Image.fromarray(alpha.round().astype(np.uint8), "L"),
+            confidence=confidence,
+            backend=self.name,
+        )
+
+
+def _new_rembg_session(
+    model: str, intra_op_threads: int | None, inter_op_threads: int | None
+) -> Any:
+    """スレッド数を指定してrembgのセッションを作成する。
+
+    ``rembg.new_session`` はスレッド数を ``OMP_NUM_THREADS`` からしか設定できず、
+    演算内・演算間の両方に同じ値を使う。指定がある場合はセッションのクラスを
+    直接作成する。
+    """
+    from rembg import new_session
+
+    if intra_op_threads is None and inter_op_threads is None:
+        return new_session(model)
+
+    import onnxruntime as ort
+    from rembg.sessions import sessions_class
+
+    options = ort.SessionOptions()
+    # 0はONNX Runtimeの既定（全コア）
+    options.intra_op_num_threads = intra_op_threads or 0
+    options.inter_op_num_threads = inter_op_threads or 0
+    for session_class in sessions_class:
+        if session_class.name() == model:
+            return session_class(model, options)
+    raise ValueError(f"未対応のrembgモデルです: {model}")
+
+
+class RembgBackend:
+    """rembgのモデルで前景マスクを求めるバックエンド."""
+
+    name: BackgroundMethod = "rembg"
+
+    def __init__(
+        self,
+        model: str = DEFAULT_REMBG_MODEL,
+        *,
+        intra_op_threads: int | None = None,
+        inter_op_threads: int | None = None,
+    ) -> None:
+        """バックエンドを初期化。
+
+        rembgの読み込みとセッション（ONNXモデル）の作成は最初の推論まで遅らせる
+        （マスクがすべてキャッシュにあればモデルを読み込まない）。
+
+        Parameters
+        ----------
+        model : str
+            rembgのモデル名
+        intra_op_threads : int | None
+            ONNX Runtimeの演算内の並列スレッド数。Noneの場合は全コア
+        inter_op_threads : int | None
+            ONNX Runtimeの演算間の並列スレッド数。Noneの場合は既定値
+
+        Raises
+        ------
+        ImportError
+            rembgがインストールされていない場合
+        ValueError
+            スレッド数が1未満の場合
+        """
+        if importlib.util.find_spec("rembg") is None:
+            raise ImportError(
+                "rembgライブラリがインストールされていません。"
+                "pip install rembg を実行してインストールしてください。"
+            )
+        for threads in (intra_op_threads, inter_op_threads):
+            if threads is not None and threads < 1:
+                raise ValueError(f"スレッド数は1以上である必要があります: {threads}")
+        self.model = model
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.cache_id = f"rembg:{model}"
+        self.resolution = 0
+        self._session: Any = None
+        self._lock = threading.Lock()
+
+    def load_session(self) -> Any:
+        """セッションを返す（未作成の場合はモデルを読み込む）。"""
+        with self._lock:
+            if self._session is None:
+                logger.info(f"rembgモデル '{self.model}' を読み込みます")
+                self._session = _new_rembg_session(
+                    self.model, self.intra_op_threads, self.inter_op_threads
+                )
+            return self._session
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """モデルの推論で前景マスクを求める（信頼度は常に1）。"""
+        from rembg import remove
+
+        session = self.load_session()
+        mask = remove(image.convert("RGB"), session=session, only_mask=True)
+        return SegmentationResult(
+            mask=mask.convert("L"), confidence=1.0, backend=self.name
+        )
+
+
+class AutoBackend:
+    """信頼度が高い場合だけ単色背景の除去を使い、それ以外はrembgを使うバックエンド."""
+
+    name: BackgroundMethod = "auto"
+
+    def __init__(
+        self,
+        *,
+        tolerance: int = DEFAULT_TOLERANCE,
+        threshold: float = DEFAULT_AUTO_THRESHOLD,
+        model: str = DEFAULT_REMBG_MODEL,
+        fallback: SegmentationBackend | None = None,
+        intra_op_threads: int | None = None,
+        inter_op_threads: int | None = None,
+    ) -> None:
+        """バックエンドを初期化。
+
+        rembgのセッションは最初に必要になったときに作成する（単色背景の画像だけなら
+        rembgは読み込まない）。
+
+        Parameters
+        ----------
+        tolerance : int
+            単色背景の許容誤差
+        threshold : float
+            単色背景の結果を採用する信頼度の下限（0-1）
+        model : str
+            フォールバックに使うrembgのモデル名
+        fallback : SegmentationBackend | None
+            フォールバックのバックエンド。Noneの場合はrembgを使う
+        intra_op_threads : int | None
+            rembgのセッションの演算内の並列スレッド数
+        inter_op_threads : int | None
+            rembgのセッションの演算間の並列スレッド数
+
+        Raises
+        ------
+        ValueError
+            閾値が0から1の範囲外の場合
+        """
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"閾値は0から1の範囲である必要があります: {threshold}")
+        self.threshold = threshold
+        self.model = model
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._flat = FlatBackgroundBackend(tolerance)
+        self._fallback = fallback
+        self._lock = threading.Lock()
+        fallback_id = f"rembg:{model}" if fallback is None else fallback.cache_id
+        self.cache_id = f"auto:{tolerance}:{threshold}:{fallback_id}"
+        self.resolution = 0
+
+    def _get_fallback(self) -> SegmentationBackend:
+        with self._lock:
+            if self._fallback is None:
+                self._fallback = RembgBackend(
+                    self.model,
+                    intra_op_threads=self.intra_op_threads,
+                    inter_op_threads=self.inter_op_threads,
+                )
+            return self._fallback
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """単色背景の結果か、フォールバックの結果を返す。
+
+        ``backend`` には実際に使ったバックエンドの名前が入る。
+
+        Parameters
+        ----------
+        image : Image.Image
+            対象画像
+
+        Returns
+        -------
+        SegmentationResult
+            前景マスクと信頼度
+        """
+        result = self._flat.segment(image)
+        if result["confidence"] >= self.threshold:
+            return result
+        logger.debug(
+            f"単色背景の信頼度が低いためフォールバック: {result['confidence']:.3f}"
+        )
+        return self._get_fallback().segment(image)
+
+
+def box_sum(values: npt.NDArray[np.float64], radius: int) -> npt.NDArray[np.float64]:
+    """積分画像で各画素を中心とする (2*radius+1) 四方の窓の和を計算。
+
+    計算量は窓の大きさによらず O(画素数)。画像の外側は0として扱う。
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        2次元の配列
+    radius : int
+        窓の半径（0以上）
+
+    Returns
+    -------
+    numpy.ndarray
+        ``values`` と同じ形状の窓の和
+    """
+    window = 2 * radius + 1
+    integral = np.pad(values, (radius + 1, radius)).cumsum(axis=0).cumsum(axis=1)
+    result: npt.NDArray[np.float64] = (
+        integral[window:, window:]
+        - integral[:-window, window:]
+        - integral[window:, :-window]
+        + integral[:-window, :-window]
+    )
+    return result
+
+
+def _local_colors(
+    proxy: npt.NDArray[np.float64], sure: BoolArray
+) -> tuple[npt.NDArray[np.float64], BoolArray]:
+    """各画素の近傍にある確実な領域の平均色と、近傍にその領域があるかを求める。"""
+    weights = sure.astype(np.float64)
+    counts = box_sum(weights, _REFINE_RADIUS)
+    means = np.empty_like(proxy)
+    for channel in range(proxy.shape[-1]):
+        sums = box_sum(proxy[..., channel] * weights, _REFINE_RADIUS)
+        means[..., channel] = sums / np.maximum(counts, 1)
+    return means, counts > 0
+
+
+def gather_pixels(
+    image: Image.Image, ys: npt.NDArray[np.intp], xs: npt.NDArray[np.intp]
+) -> npt.NDArray[np.float64]:
+    """指定した座標の画素のRGBを、元画像全体の配列を作らずに読み出す。
+
+    ストリップ単位で切り出してRGBに変換するため、作業メモリはストリップ1つ分で済む。
+
+    Parameters
+    ----------
+    image : Image.Image
+        元画像
+    ys : numpy.ndarray
+        画素の行番号（昇順に並んでいること）
+    xs : numpy.ndarray
+        画素の列番号（``ys`` と同じ長さ）
+
+    Returns
+    -------
+    numpy.ndarray
+        座標順のRGB（要素数×3の浮動小数点配列）
+    """
+    pixels = np.empty((ys.size, 3))
+    for top in range(int(ys[0]), int(ys[-1]) + 1, _REFINE_STRIP_ROWS):
+        bottom = min(top + _REFINE_STRIP_ROWS, image.height)
+        start, stop = np.searchsorted(ys, [top, bottom])
+        if start == stop:
+            continue
+        strip = image.crop((0, top, image.width, bottom)).convert("RGB")
+        pixels[start:stop] = np.asarray(strip)[ys[start:stop] - top, xs[start:stop]]
+    return pixels
+
+
+def refine_mask_edges(
+    image: Image.Image, proxy: Image.Image, proxy_mask: Image.Image
+) -> Image.Image:
+    """縮小画像のマスクを元のサイズに拡大し、境界付近だけを元画像の色で補正する。
+
+    拡大したマスクが0でも255でもない画素（境界の幅はおよそ縮小率のピクセル数）
+    だけを対象に、縮小画像の近傍の確実な前景・背景の平均色を求め、元画像の画素を
+    背景色から前景色への線分に射影した位置をアルファとする。補正は境界の画素の
+    分だけのメモリと計算で済む。
+
+    Parameters
+    ----------
+    image : Image.Image
+        元画像
+    proxy : Image.Image
+        推論に使った縮小画像
+    proxy_mask : Image.Image
+        縮小画像のマスク（Lモード）
+
+    Returns
+    -------
+    Image.Image
+        元のサイズのマスク（Lモード）
+    """
+    mask = proxy_mask.convert("L").resize(image.size, Image.Resampling.BILINEAR)
+    alpha = np.array(mask)
+    # uint8の桁あふれで 1-254 だけが 0-253 になる（一時配列を減らすため）
+    ys, xs = np.nonzero(alpha - np.uint8(1) < 254)
+    if ys.size == 0:
+        return mask
+
+    proxy_rgb = np.asarray(proxy.convert("RGB"), dtype=np.float64)
+    proxy_alpha = np.asarray(proxy_mask.convert("L"), dtype=np.float64) / 255
+    sure_foreground = proxy_alpha > 1 - _SURE_MARGIN
+    foreground, has_foreground = _local_colors(proxy_rgb, sure_foreground)
+    background, has_background = _local_colors(proxy_rgb, proxy_alpha < _SURE_MARGIN)
+
+    scale_x = proxy_mask.width / image.width
+    scale_y = proxy_mask.height / image.height
+    py = np.minimum((ys * scale_y).astype(np.intp), proxy_mask.height - 1)
+    px = np.minimum((xs * scale_x).astype(np.intp), proxy_mask.width - 1)
+
+    pixels = gather_pixels(image, ys, xs)
+    fg = foreground[py, px]
+    bg = background[py, px]
+    direction = fg - bg
+    length2 = (direction**2).sum(axis=-1)
+    projected = ((pixels - bg) * direction).sum(axis=-1) / np.maximum(length2, 1e-6)
+
+    usable = (
+        has_foreground[py, px]
+        & has_background[py, px]
+        & (length2 >= _MIN_REFINE_CONTRAST**2)
+    )
+    refined = np.clip(projected, 0.0, 1.0) * 255
+    alpha[ys[usable], xs[usable]] = refined[usable].round().astype(np.uint8)
+    return Image.fromarray(alpha, "L")
+
+
+class ProxyBackend:
+    """縮小画像で推論し、マスクだけを元のサイズに拡大するバックエンド."""
+
+    def __init__(
+        self,
+        inner: SegmentationBackend,
+        *,
+        proxy_size: int = DEFAULT_PROXY_SIZE,
+        refine_edges: bool = False,
+    ) -> None:
+        """バックエンドを初期化。
+
+        Parameters
+        ----------
+        inner : SegmentationBackend
+            縮小画像に使うバックエンド
+        proxy_size : int
+            縮小後の長辺の下限。``Image.reduce`` の整数倍の縮小で、長辺がこの値を
+            下回らない最大の倍率を使う
+        refine_edges : bool
+            Trueの場合、境界付近のアルファを元画像の色で補正する
+
+        Raises
+        ------
+        ValueError
+            縮小後の長辺が1未満の場合
+        """
+        if proxy_size < 1:
+            raise ValueError(
+                f"縮小後の長辺は1以上である必要があります: {proxy_size}"
+            )
+        self.inner = inner
+        self.name: BackgroundMethod = inner.name
+        self.proxy_size = proxy_size
+        self.refine_edges = refine_edges
+        self.cache_id = inner.cache_id + (":refine" if refine_edges else "")
+        self.resolution = proxy_size
+
+    def reduce_factor(self, size: tuple[int, int]) -> int:
+        """画像サイズに対する縮小率を計算（1の場合は縮小しない）。"""
+        return max(max(size) // self.proxy_size, 1)
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """縮小画像のマスクを求め、元のサイズに拡大する。
+
+        元画像が ``proxy_size`` の2倍未満の場合は縮小せずにそのまま推論する。
+
+        Parameters
+        ----------
+        image : Image.Image
+            対象画像
+
+        Returns
+        -------
+        SegmentationResult
+            元のサイズの前景マスクと、縮小画像での信頼度
+        """
+        factor = self.reduce_factor(image.size)
+        if factor == 1:
+            return self.inner.segment(image)
+
+        rgb = image if image.mode in ("RGB", "RGBA") else image.convert("RGB")
+        proxy = rgb.reduce(factor)
+        result = self.inner.segment(proxy)
+        if self.refine_edges:
+            mask = refine_mask_edges(image, proxy, result["mask"])
+        else:
+            mask = result["mask"].convert("L").resize(
+                image.size, Image.Resampling.BILINEAR
+            )
+        return SegmentationResult(
+            mask=mask, confidence=result["confidence"], backend=result["backend"]
+        )
+
+
+def create_backend(
+    method: BackgroundMethod = "rembg",
+    *,
+    model: str = DEFAULT_REMBG_MODEL,
+    tolerance: int | None = None,
+    key_color: tuple[int, int, int] = DEFAULT_KEY_COLOR,
+    threshold: float = DEFAULT_AUTO_THRESHOLD,
+    proxy_size: int | None = None,
+    refine_edges: bool = False,
+    intra_op_threads: int | None = None,
+    inter_op_threads: int | None = None,
+    matting: MattingConfig | None = None,
+) -> SegmentationBackend:
+    """名前からバックエンドを作成。
+
+    Parameters
+    ----------
+    method : BackgroundMethod
+        ``"rembg"`` / ``"flat"`` / ``"chroma"`` / ``"auto"``
+    model : str
+        rembgのモデル名（``rembg`` / ``auto``）
+    tolerance : int | None
+        許容誤差。Noneの場合はバックエンドごとの既定値
+    key_color : tuple[int, int, int]
+        クロマキーの色（``chroma``）
+    threshold : float
+        単色背景の結果を採用する信頼度の下限（``auto``）
+    proxy_size : int | None
+        指定した場合、長辺がこの値程度の縮小画像で推論する（``ProxyBackend``）
+    refine_edges : bool
+        縮小推論で、境界付近のアルファを元画像の色で補正する
+    intra_op_threads : int | None
+        rembgのセッションの演算内の並列スレッド数（``rembg`` / ``auto``）
+    inter_op_threads : int | None
+        rembgのセッションの演算間の並列スレッド数（``rembg`` / ``auto``）
+    matting : MattingConfig | None
+        指定した場合、元のサイズのマスクの境界をガイデッドフィルタで補正する
+        （``MattingBackend``）
+
+    Returns
+    -------
+    SegmentationBackend
+        バックエンド
+
+    Raises
+    ------
+    ValueError
+        未対応の方法の場合、またはパラメータが範囲外の場合
+    ImportError
+        ``rembg`` でrembgがインストールされていない場合
+    """
+    backend: SegmentationBackend
+    if method == "rembg":
+        backend = RembgBackend(
+            model,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+        )
+    elif method == "flat":
+        backend = FlatBackgroundBackend(
+            DEFAULT_TOLERANCE if tolerance is None else tolerance
+        )
+    elif method == "chroma":
+        backend = ChromaKeyBackend(
+            key_color, DEFAULT_KEY_TOLERANCE if tolerance is None else tolerance
+        )
+    elif method == "auto":
+        backend = AutoBackend(
+            tolerance=DEFAULT_TOLERANCE if tolerance is None else tolerance,
+            threshold=threshold,
+            model=model,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+        )
+    else:
+        raise ValueError(f"未対応の背景透過の方法です: {method}")
+    if proxy_size is not None:
+        backend = ProxyBackend(
+            backend, proxy_size=proxy_size, refine_edges=refine_edges
+        )
+    if matting is not None:
+        # matting.pyはこのモジュールのバックエンドの型を使うため、ここで読み込む
+        from image_processor.processing.matting import MattingBackend
+
+        backend = MattingBackend(backend, **matting)
+    return backend
+
+
+def apply_mask(image: Image.Image, mask: Image.Image) -> Image.Image:
+    """マスクをアルファとして合成したRGBA画像を作成。
+
+    元画像にアルファがある場合は、元のアルファとマスクの小さい方を使う。
+
+    Parameters
+    ----------
+    image : Image.Image
+        元画像
+    mask : Image.Image
+        前景255のLモードのマスク（元画像と同じサイズ）
+
+    Returns
+    -------
+    Image.Image
+        RGBA画像
+
+    Raises
+    ------
+    ValueError
+        マスクのサイズが元画像と異なる場合
+    """
+    if mask.size != image.size:
+        raise ValueError(
+            f"マスクのサイズが画像と異なります: {mask.size} != {image.size}"
+        )
+    rgba = image.convert("RGBA")
+    alpha = np.minimum(np.asarray(rgba.getchannel("A")), np.asarray(mask.convert("L")))
+    rgba.putalpha(Image.fromarray(alpha, "L"))
+    return rgba
+
+
+def remove_background(
+    image: Image.Image, backend: SegmentationBackend
+) -> tuple[Image.Image, SegmentationResult]:
+    """バックエンドでマスクを求めて背景を透過する。
+
+    Parameters
+    ----------
+    image : Image.Image
+        元画像
+    backend : SegmentationBackend
+        使用するバックエンド
+
+    Returns
+    -------
+    tuple[Image.Image, SegmentationResult]
+        背景を透過したRGBA画像とセグメンテーション結果
+    """
+    result = backend.segment(image)
+    return apply_mask(image, result["mask"]), result
@@ -0,0 +1,203 @@
+"""背景透過のマスクの保存と、元画像への後からの合成.
+
+背景透過の結果をRGBAのPNGで元画像と並べて保存すると、元画像とほぼ同じ量の
+画素をもう一度書き込むことになる。合成の前段としては前景マスクだけがあれば
+十分で、マスクは1チャンネルで値の種類も少ないため、PNGでは数分の1の
+サイズに収まる。
+
+- ``save_mask``: マスクを8bitグレースケール、または1bit（2値）のPNGで保存する。
+  1bitのPNGは行ごとのフィルタとDeflateで長い同じ値の並びがまとめて圧縮され、
+  ランレングス符号化と同程度に小さくなる
+- ``composite``: 元画像にマスクを適用し、透過のまま、または指定した背景色・
+  背景画像に合成する（合成はPillowの画像単位の演算で行う）
+- ``composite_files``: 元画像とマスクのディレクトリから一括で合成する
+"""
+
+import logging
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from image_processor.conversion.formats import flatten_alpha, to_pillow_format
+from image_processor.conversion.presets import get_save_options
+from image_processor.processing.background import apply_mask
+from image_processor.processing.scheduler import run_with_memory_budget
+from image_processor.types import EncoderPreset, MaskBits, ProcessingResult
+
+logger = logging.getLogger(__name__)
+
+# マスクのファイル名の接尾辞（``<元画像の名前>_mask.png``）
+MASK_SUFFIX = "_mask.png"
+
+# 透過を保持できる出力フォーマット
+_ALPHA_FORMATS = frozenset({"PNG", "WEBP", "TIFF"})
+
+type Background = tuple[int, int, int] | Image.Image | None
+
+
+def mask_path_for(image_path: Path, mask_dir: Path) -> Path:
+    """元画像に対応するマスクのパスを返す。"""
+    return mask_dir / f"{image_path.stem}{MASK_SUFFIX}"
+
+
+def save_mask(
+    mask: Image.Image,
+    output_path: Path,
+    *,
+    bits: MaskBits = 8,
+    preset: EncoderPreset | None = None,
+) -> Path:
+    """マスクをPNGで保存する。
+
+    Parameters
+    ----------
+    mask : Image.Image
+        前景255のマスク
+    output_path : Path
+        出力ファイルのパス
+    bits : MaskBits
+        8の場合はグレースケール（半透明の境界を保持）、1の場合は128以上を
+        前景とする2値
+    preset : EncoderPreset | None
+        PNGのエンコードのプリセット
+
+    Returns
+    -------
+    Path
+        出力ファイルのパス
+
+    Raises
+    ------
+    ValueError
+        ビット数が8でも1でもない場合
+    """
+    gray = mask.convert("L")
+    if bits == 1:
+        # convert("1")はディザリングするため、閾値で2値にする
+        saved = gray.point(lambda value: 255 if value >= 128 else 0, mode="1")
+    elif bits == 8:
+        saved = gray
+    else:
+        raise ValueError(f"マスクのビット数は8または1である必要があります: {bits}")
+    saved.save(output_path, "PNG", **get_save_options("png", preset))
+    return output_path
+
+
+def load_mask(path: Path) -> Image.Image:
+    """保存したマスクを前景255のLモード画像として読み込む。"""
+    with Image.open(path) as img:
+        return img.convert("L")
+
+
+def composite(
+    image: Image.Image, mask: Image.Image, background: Background = None
+) -> Image.Image:
+    """元画像にマスクを適用し、背景に合成する。
+
+    Parameters
+    ----------
+    image : Image.Image
+        元画像
+    mask : Image.Image
+        前景255のマスク（元画像と同じサイズ）
+    background : Background
+        Noneの場合は透過のままのRGBA画像を返す。色を指定した場合はその色、
+        画像を指定した場合は元画像のサイズに中央で切り抜いて拡大縮小した画像に合成する
+
+    Returns
+    -------
+    Image.Image
+        RGBA画像（背景なし）またはRGB画像（背景あり）
+
+    Raises
+    ------
+    ValueError
+        マスクのサイズが元画像と異なる場合
+    """
+    rgba = apply_mask(image, mask)
+    if background is None:
+        return rgba
+    if not isinstance(background, Image.Image):
+        return flatten_alpha(rgba, background)
+    canvas = ImageOps.fit(
+        background.convert("RGB"), image.size, Image.Resampling.LANCZOS
+    )
+    canvas.paste(rgba, mask=rgba.getchannel("A"))
+    return canvas
+
+
+def composite_files(
+    image_paths: Sequence[Path],
+    mask_dir: Path,
+    output_dir: Path,
+    *,
+    background: Background = None,
+    output_format: str = "png",
+    preset: EncoderPreset | None = None,
+    workers: int | None = None,
+    memory_budget: int | None = None,
+) -> list[ProcessingResult]:
+    """元画像に保存済みのマスクを適用して一括で出力する。
+
+    Parameters
+    ----------
+    image_paths : Sequence[Path]
+        元画像のパス
+    mask_dir : Path
+        ``mask_path_for`` の名前でマスクを保存したディレクトリ
+    output_dir : Path
+        出力ディレクトリ（``<元画像の名前>.<出力フォーマットの拡張子>``）
+    background : Background
+        合成する背景（``composite`` を参照）
+    output_format : str
+        出力フォーマット（png, webp, jpg など）
+    preset : EncoderPreset | None
+        エンコードのプリセット
+    workers : int | None
+        並列数。Noneの場合はCPUコア数
+    memory_budget : int | None
+        同時に処理する画像の作業メモリの上限（バイト）。Noneの場合は制限しない
+
+    Returns
+    -------
+    list[ProcessingResult]
+        入力順の処理結果。マスクがない画像はエラーになる
+
+    Raises
+    ------
+    ValueError
+        背景を指定せずに透過を保持できないフォーマットを指定した場合
+    """
+    pillow_format = to_pillow_format(output_format)
+    if background is None and pillow_format not in _ALPHA_FORMATS:
+        raise ValueError(
+            f"{pillow_format}は透過を保持できないため、背景の指定が必要です"
+        )
+    extension = output_format.lower().lstrip(".")
+    save_options = get_save_options(pillow_format, preset)
+
+    def composite_one(image_path: Path) -> Path:
+        mask_path = mask_path_for(image_path, mask_dir)
+        if not mask_path.exists():
+            raise FileNotFoundError(f"マスクがありません: {mask_path.name}")
+        output_path = output_dir / f"{image_path.stem}.{extension}"
+        with Image.open(image_path) as img:
+            result = composite(img, load_mask(mask_path), background)
+        result.save(output_path, pillow_format, **save_options)
+        return output_path
+
+    results = run_with_memory_budget(
+        composite_one,
+        image_paths,
+        memory_budget=memory_budget or sys.maxsize,
+        workers=workers,
+        operation="remove_background",
+    )
+    for result in results:
+        if result["status"] == "error":
+            logger.error(
+                f"合成エラー {result['input_path'].name}: {result['error_message']}"
+            )
+    return results
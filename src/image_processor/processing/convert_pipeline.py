@@ -0,0 +1,315 @@
+"""読み込み・変換・書き出しを重ねて実行するスレッドパイプライン変換.
+
+NFSなど遅延の大きいストレージでは、ファイルを1つずつ読み込み → デコード →
+エンコード → 書き出し と順に処理すると、CPUは読み書きの完了待ちで
+ほとんど遊んでしまう。ここでは ``Pipeline`` の3つのステージで
+
+- read: 複数スレッドでファイルのバイト列を先読みする
+- encode: ワーカースレッドでデコード・変換・エンコードを行う
+  （Pillowはコーデックの処理中にGILを解放する）
+- write: 専用の書き出しスレッドでエンコード済みのバイト列を書き出す
+
+を並行に実行し、各ステージの入力キューの上限で先読みの深さと
+メモリ使用量を抑える。スループットは概ねストレージの読み書きの上限で決まる。
+メモリ上限を指定した場合、encodeステージはヘッダーのサイズから見積もった
+作業メモリが上限に収まるまでデコードを待つ。
+"""
+
+import io
+import logging
+import os
+from collections.abc import Callable, Iterable
+from contextlib import nullcontext
+from pathlib import Path
+from typing import TypedDict
+
+from PIL import Image
+
+from image_processor.conversion.animation import ANIMATED_FORMATS, convert_animation
+from image_processor.conversion.color import apply_color_policy
+from image_processor.conversion.formats import (
+    EXTENSIONS,
+    prepare_for_format,
+    to_pillow_format,
+)
+from image_processor.conversion.presets import get_save_options
+from image_processor.processing.pipeline import Pipeline
+from image_processor.processing.scheduler import (
+    MemoryBudget,
+    check_pixels,
+    working_set_bytes,
+)
+from image_processor.types import EncoderPreset, ProcessingResult
+from image_processor.utils.profiling import PerformanceMonitor
+
+logger = logging.getLogger(__name__)
+
+# ファイル読み込みのスレッド数の既定値（遅延を隠すための並列数）
+DEFAULT_READ_WORKERS = 4
+
+
+class FileData(TypedDict):
+    """読み込み済みのファイルのバイト列の型定義."""
+
+    name: str
+    source: Path
+    data: bytes
+
+
+class EncodedFile(TypedDict):
+    """エンコード済みのバイト列の型定義（直接書き出し済みの場合はNone）."""
+
+    name: str
+    source: Path
+    data: bytes | None
+
+
+def read_file(path: Path) -> FileData:
+    """ファイル全体をバイト列として読み込む（readステージ）。
+
+    Parameters
+    ----------
+    path : Path
+        入力ファイルのパス
+
+    Returns
+    -------
+    FileData
+        読み込んだバイト列
+    """
+    return FileData(name=path.stem, source=path, data=path.read_bytes())
+
+
+class ImageEncoder:
+    """読み込み済みのバイト列をデコード・変換・エンコードする（encodeステージ）.
+
+    アニメーション画像を対応形式に変換する場合は、フレームを1枚ずつ扱う
+    ``convert_animation`` で出力ディレクトリに直接書き出し、
+    ``data`` がNoneの ``EncodedFile`` を返す。
+
+    Parameters
+    ----------
+    output_dir : Path
+        出力ディレクトリ（アニメーションの直接書き出し用）
+    image_format : str
+        出力フォーマット
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    quality : int | None
+        JPEG/WebPの画質
+    transform : Callable[[Image.Image], Image.Image] | None
+        デコード後、エンコード前に適用する変換
+    budget : MemoryBudget | None
+        デコード前に作業メモリを確保するメモリ上限
+    preserve_metadata : bool
+        ICCプロファイルとEXIFを出力に引き継ぐか。Falseの場合は
+        埋め込みプロファイルに従ってsRGBに変換する
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        image_format: str,
+        *,
+        preset: EncoderPreset | None = None,
+        quality: int | None = None,
+        transform: Callable[[Image.Image], Image.Image] | None = None,
+        budget: MemoryBudget | None = None,
+        preserve_metadata: bool = False,
+    ) -> None:
+        self.output_dir = output_dir
+        self.pillow_format = to_pillow_format(image_format)
+        self.preset = preset
+        self.quality = quality
+        self.transform = transform
+        self.budget = budget
+        self.preserve_metadata = preserve_metadata
+        self.save_options = get_save_options(
+            self.pillow_format, preset, quality=quality
+        )
+
+    def output_path(self, name: str) -> Path:
+        """出力ファイルのパスを返す。"""
+        return self.output_dir / f"{name}{EXTENSIONS[self.pillow_format]}"
+
+    def __call__(self, item: FileData) -> EncodedFile:
+        """バイト列をデコードして出力フォーマットにエンコードする。
+
+        Parameters
+        ----------
+        item : FileData
+            読み込み済みのファイル
+
+        Returns
+        -------
+        EncodedFile
+            エンコード済みのバイト列
+
+        Raises
+        ------
+        Image.DecompressionBombError
+            画素数が ``Image.MAX_IMAGE_PIXELS`` を超えている場合
+        """
+        with Image.open(io.BytesIO(item["data"])) as img:
+            check_pixels(*img.size)
+            reservation = (
+                self.budget.reserve(working_set_bytes(*img.size))
+                if self.budget is not None
+                else nullcontext()
+            )
+            with reservation:
+                if (
+                    getattr(img, "n_frames", 1) > 1
+                    and self.pillow_format in ANIMATED_FORMATS
+                    and self.transform is None
+                ):
+                    # readステージで読み込んだバイト列を使い、ファイルを読み直さない
+                    convert_animation(
+                        item["source"],
+                        self.output_path(item["name"]),
+                        image_format=self.pillow_format,
+                        preset=self.preset,
+                        quality=self.quality,
+                        data=item["data"],
+                    )
+                    return EncodedFile(
+                        name=item["name"], source=item["source"], data=None
+                    )
+
+                img.load()
+                image = self.transform(img) if self.transform is not None else img
+                image, metadata = apply_color_policy(
+                    image,
+                    self.pillow_format,
+                    preserve_metadata=self.preserve_metadata,
+                )
+                image = prepare_for_format(image, self.pillow_format)
+                buffer = io.BytesIO()
+                image.save(
+                    buffer, self.pillow_format, **self.save_options, **metadata
+                )
+
+        return EncodedFile(
+            name=item["name"], source=item["source"], data=buffer.getvalue()
+        )
+
+
+class FileWriter:
+    """エンコード済みのバイト列をファイルに書き出す（writeステージ）.
+
+    Parameters
+    ----------
+    encoder : ImageEncoder
+        出力パスの決定に使うエンコーダー
+    """
+
+    def __init__(self, encoder: ImageEncoder) -> None:
+        self.encoder = encoder
+
+    def __call__(self, item: EncodedFile) -> Path:
+        """バイト列を書き出して出力パスを返す。"""
+        output_path = self.encoder.output_path(item["name"])
+        if item["data"] is not None:
+            output_path.write_bytes(item["data"])
+        return output_path
+
+
+def convert_files_pipelined(
+    paths: Iterable[Path],
+    output_dir: Path,
+    image_format: str,
+    *,
+    preset: EncoderPreset | None = None,
+    quality: int | None = None,
+    transform: Callable[[Image.Image], Image.Image] | None = None,
+    read_workers: int = DEFAULT_READ_WORKERS,
+    encode_workers: int | None = None,
+    read_ahead: int = 8,
+    encode_queue: int | None = None,
+    write_queue: int = 8,
+    memory_budget: int | None = None,
+    preserve_metadata: bool = False,
+    monitor: PerformanceMonitor | None = None,
+) -> list[ProcessingResult]:
+    """読み込み・デコード/エンコード・書き出しを並行に実行して画像を変換。
+
+    各ステージの入力キューの上限が先読みの深さになる。メモリ上に保持する
+    ファイルは概ね ``read_ahead + encode_queue + write_queue`` 件と、
+    処理中のワーカーの件数までに制限される。
+
+    Parameters
+    ----------
+    paths : Iterable[Path]
+        入力画像ファイルのパス
+    output_dir : Path
+        出力ディレクトリ
+    image_format : str
+        出力フォーマット
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    quality : int | None
+        JPEG/WebPの画質
+    transform : Callable[[Image.Image], Image.Image] | None
+        デコード後、エンコード前に適用する変換
+    read_workers : int
+        ファイル読み込みのスレッド数
+    encode_workers : int | None
+        デコード・エンコードのスレッド数。Noneの場合はCPUコア数
+    read_ahead : int
+        読み込みステージの入力キューの上限（読み込み待ちのパス数）
+    encode_queue : int | None
+        エンコードステージの入力キューの上限（読み込み済みのファイル数）。
+        Noneの場合はエンコードのスレッド数の2倍
+    write_queue : int
+        書き出しステージの入力キューの上限（エンコード済みのファイル数）
+    memory_budget : int | None
+        同時にデコード・エンコードする画像の作業メモリの上限（バイト）。
+        Noneの場合は制限しない
+    preserve_metadata : bool
+        ICCプロファイルとEXIFを出力に引き継ぐか
+    monitor : PerformanceMonitor | None
+        ステージごとの処理時間の記録先
+
+    Returns
+    -------
+    list[ProcessingResult]
+        ファイルごとの処理結果（完了順）
+
+    Raises
+    ------
+    ValueError
+        スレッド数やキューの上限が1未満の場合
+    """
+    encode_workers = encode_workers or os.cpu_count() or 1
+    if encode_queue is None:
+        encode_queue = encode_workers * 2
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    budget = (
+        MemoryBudget(memory_budget, max_tasks=encode_workers)
+        if memory_budget is not None
+        else None
+    )
+    encoder = ImageEncoder(
+        output_dir,
+        image_format,
+        preset=preset,
+        quality=quality,
+        transform=transform,
+        budget=budget,
+        preserve_metadata=preserve_metadata,
+    )
+    pipeline = (
+        Pipeline(paths, source_name="list", monitor=monitor)
+        .add_transform("read", read_file, workers=read_workers, queue_size=read_ahead)
+        .add_transform(
+            "encode", encoder, workers=encode_workers, queue_size=encode_queue
+        )
+        .add_sink("write", FileWriter(encoder), queue_size=write_queue)
+    )
+    results = pipeline.run()
+    logger.debug(
+        f"パイプライン変換: {len(results)}件 "
+        f"(read={read_workers}, encode={encode_workers})"
+    )
+    return results
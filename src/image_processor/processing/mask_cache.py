@@ -0,0 +1,296 @@
+"""背景透過のマスクの永続キャッシュ.
+
+ほとんどの画像が変わっていないライブラリに対して、出力形式や合成の設定だけを
+変えて背景透過をやり直すことがある。マスクの推論（rembgのモデル）は画像1枚で
+数秒かかるが、結果の8bitのマスクはPNGで数十KB程度に収まる。
+
+ここではマスクを ``(画素の内容のハッシュ, モデル名とパラメータ, 推論解像度)``
+をキーにディレクトリへ保存する。索引はSQLiteに置き、合計サイズが上限を
+超えたら最後に使われた日時の古いものから削除する（LRU）。
+``CachedBackend`` でバックエンドを包むと、キャッシュにあるマスクはモデルを
+呼ばずに返す。rembgのセッションは最初の推論まで作成されないため、すべての入力が
+キャッシュにあればONNXモデルは読み込まれない。
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+from PIL import Image
+
+from image_processor.processing.background import (
+    SegmentationBackend,
+    SegmentationResult,
+)
+from image_processor.types import BackgroundMethod
+
+logger = logging.getLogger(__name__)
+
+# キャッシュの既定の上限（バイト）
+DEFAULT_MASK_CACHE_BYTES = 1024 * 1024 * 1024
+
+# 画素のハッシュを計算する単位の行数（画像全体のバイト列を作らないため）
+_HASH_STRIP_ROWS = 256
+
+_INDEX_NAME = "index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS masks (
+    key TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    backend TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+def content_hash(image: Image.Image) -> str:
+    """画像のモード・サイズ・画素からハッシュを計算。
+
+    ファイルのバイト列ではなく画素を使うため、メタデータだけの変更や
+    可逆な形式変換ではハッシュは変わらない。
+
+    Parameters
+    ----------
+    image : Image.Image
+        対象画像
+
+    Returns
+    -------
+    str
+        16進数のハッシュ
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{image.mode}:{image.width}x{image.height}".encode())
+    for top in range(0, image.height, _HASH_STRIP_ROWS):
+        bottom = min(top + _HASH_STRIP_ROWS, image.height)
+        digest.update(image.crop((0, top, image.width, bottom)).tobytes())
+    return digest.hexdigest()
+
+
+class MaskCache:
+    """マスクをPNGで保存し、SQLiteの索引でLRU管理する永続キャッシュ."""
+
+    def __init__(
+        self, cache_dir: Path | str, *, max_bytes: int = DEFAULT_MASK_CACHE_BYTES
+    ) -> None:
+        """キャッシュを開く（存在しない場合は作成）。
+
+        Parameters
+        ----------
+        cache_dir : Path | str
+            キャッシュのディレクトリ
+        max_bytes : int
+            保存するマスクの合計サイズの上限（バイト）
+
+        Raises
+        ------
+        ValueError
+            上限が1未満の場合
+        """
+        if max_bytes < 1:
+            raise ValueError(
+                f"キャッシュの上限は1以上である必要があります: {max_bytes}"
+            )
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            str(self.cache_dir / _INDEX_NAME), check_same_thread=False
+        )
+        self.connection.execute(_SCHEMA)
+        self.connection.commit()
+
+    @staticmethod
+    def _key(content: str, model: str, resolution: int) -> str:
+        return hashlib.sha256(f"{content}\0{model}\0{resolution}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.png"
+
+    def get(
+        self, content: str, model: str, resolution: int
+    ) -> SegmentationResult | None:
+        """キャッシュからマスクを取得。
+
+        Parameters
+        ----------
+        content : str
+            ``content_hash`` で計算した画像のハッシュ
+        model : str
+            モデル名とパラメータ（バックエンドの ``cache_id``）
+        resolution : int
+            推論解像度（0は元のサイズ）
+
+        Returns
+        -------
+        SegmentationResult | None
+            保存されていたマスク。ない場合はNone
+        """
+        key = self._key(content, model, resolution)
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT backend, confidence FROM masks WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            try:
+                with Image.open(self._path(key)) as img:
+                    mask = img.convert("L")
+            except OSError as e:
+                logger.warning(f"キャッシュのマスクを読み込めません: {e}")
+                self.connection.execute("DELETE FROM masks WHERE key = ?", (key,))
+                self.connection.commit()
+                self.misses += 1
+                return None
+            self.connection.execute(
+                "UPDATE masks SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.connection.commit()
+            self.hits += 1
+        backend: BackgroundMethod = row[0]
+        return SegmentationResult(mask=mask, confidence=row[1], backend=backend)
+
+    def put(
+        self, content: str, model: str, resolution: int, result: SegmentationResult
+    ) -> None:
+        """マスクを保存し、上限を超えた分を古いものから削除する。
+
+        Parameters
+        ----------
+        content : str
+            ``content_hash`` で計算した画像のハッシュ
+        model : str
+            モデル名とパラメータ（バックエンドの ``cache_id``）
+        resolution : int
+            推論解像度（0は元のサイズ）
+        result : SegmentationResult
+            保存するセグメンテーション結果
+        """
+        key = self._key(content, model, resolution)
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        result["mask"].convert("L").save(temp_path, "PNG")
+        temp_path.replace(path)
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO masks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    content,
+                    model,
+                    resolution,
+                    result["backend"],
+                    result["confidence"],
+                    path.stat().st_size,
+                    time.time(),
+                ),
+            )
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self) -> None:
+        """合計サイズが上限以下になるまで、最後に使われた日時の古いものを削除する。"""
+        (total,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM masks"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self.connection.execute(
+            "SELECT key, size_bytes FROM masks ORDER BY last_used, rowid"
+        ).fetchall()
+        evicted: list[tuple[str]] = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._path(key).unlink(missing_ok=True)
+            evicted.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM masks WHERE key = ?", evicted)
+        logger.debug(f"マスクのキャッシュから{len(evicted)}件を削除しました")
+
+    @property
+    def total_bytes(self) -> int:
+        """保存されているマスクの合計サイズ（バイト）。"""
+        with self._lock:
+            (total,) = self.connection.execute(
+                "SELECT COALESCE(SUM(size_bytes), 0) FROM masks"
+            ).fetchone()
+        return int(total)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self.connection.execute("SELECT COUNT(*) FROM masks").fetchone()
+        return int(count)
+
+    def close(self) -> None:
+        """データベース接続を閉じる。"""
+        self.connection.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class CachedBackend:
+    """マスクのキャッシュを先に引き、ない場合だけ推論するバックエンド."""
+
+    def __init__(self, inner: SegmentationBackend, cache: MaskCache) -> None:
+        """バックエンドを初期化。
+
+        Parameters
+        ----------
+        inner : SegmentationBackend
+            キャッシュにない場合に使うバックエンド
+        cache : MaskCache
+            マスクのキャッシュ
+        """
+        self.inner = inner
+        self.cache = cache
+        self.name: BackgroundMethod = inner.name
+        self.cache_id = inner.cache_id
+        self.resolution = inner.resolution
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """キャッシュのマスクか、推論したマスク（キャッシュに保存する）を返す。
+
+        キャッシュのマスクのサイズが画像と異なる場合は推論し直す。
+
+        Parameters
+        ----------
+        image : Image.Image
+            対象画像
+
+        Returns
+        -------
+        SegmentationResult
+            前景マスクと信頼度
+        """
+        content = content_hash(image)
+        cached = self.cache.get(content, self.cache_id, self.resolution)
+        if cached is not None and cached["mask"].size == image.size:
+            return cached
+        result = self.inner.segment(image)
+        self.cache.put(content, self.cache_id, self.resolution, result)
+        return result
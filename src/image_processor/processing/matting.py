@@ -0,0 +1,325 @@
+"""ガイデッドフィルタによるマスクの境界の高速な補正.
+
+rembgの ``alpha_matting``（pymatting）は髪の毛や線画の境界をきれいにするが、
+画像1枚に数十秒かかり一括処理には使えない。ここでは元画像の色をガイドにした
+ガイデッドフィルタ（He et al.）でマスクの境界を補正する。
+
+- フィルタの係数は ``Image.reduce`` で縮小した画像で計算し（Fast Guided Filter）、
+  境界付近の帯の画素でだけ元の解像度の色から求めたアルファに置き換える
+- 帯から離れた画素は元のマスクの値のまま
+- ``clean_mask`` はグレースケールのモルフォロジー演算（オープニング・
+  クロージング）で、小さな誤検出や穴を境界の補正の前に取り除く
+
+計算量は縮小画像の画素数と帯の画素数に比例する。マッティングのように
+大きな疎行列の方程式は解かないため、6000×4000の画像でも1秒程度で済む。
+"""
+
+import logging
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from image_processor.processing.background import (
+    SegmentationBackend,
+    SegmentationResult,
+    box_sum,
+    gather_pixels,
+)
+from image_processor.types import BackgroundMethod
+
+logger = logging.getLogger(__name__)
+
+# ガイデッドフィルタの既定の窓の半径（元画像のピクセル数）
+DEFAULT_GUIDED_RADIUS = 8
+
+# ガイデッドフィルタの既定の正則化（色は0-1。大きいほど境界がなめらかになる）
+DEFAULT_GUIDED_EPSILON = 1e-3
+
+# 縮小画像のマスクの値がこの範囲なら、その画素は境界の帯に含める（0-1）
+_SOFT_MARGIN = 0.02
+
+type FloatArray = npt.NDArray[np.float64]
+type UInt8Array = npt.NDArray[np.uint8]
+type BoolArray = npt.NDArray[np.bool_]
+
+
+def _morph(array: UInt8Array, radius: int, *, dilate: bool) -> UInt8Array:
+    """(2*radius+1) 四方の正方形で膨張または収縮する（行・列に分けて計算）。"""
+    if radius < 1:
+        return array
+    reduce = np.maximum if dilate else np.minimum
+    height, width = array.shape
+    padded = np.pad(array, radius, mode="edge")
+    rows = padded[:, :width].copy()
+    for offset in range(1, 2 * radius + 1):
+        reduce(rows, padded[:, offset : offset + width], out=rows)
+    result = rows[:height].copy()
+    for offset in range(1, 2 * radius + 1):
+        reduce(result, rows[offset : offset + height], out=result)
+    return result
+
+
+def clean_mask(
+    mask: Image.Image, *, open_radius: int = 0, close_radius: int = 0
+) -> Image.Image:
+    """モルフォロジー演算でマスクの小さな誤検出と穴を取り除く。
+
+    Parameters
+    ----------
+    mask : Image.Image
+        前景255のマスク
+    open_radius : int
+        オープニング（収縮してから膨張）の半径。この幅以下の前景の点や
+        細い突起を取り除く。0の場合は行わない
+    close_radius : int
+        クロージング（膨張してから収縮）の半径。この幅以下の穴や
+        切れ目を埋める。0の場合は行わない
+
+    Returns
+    -------
+    Image.Image
+        Lモードのマスク
+
+    Raises
+    ------
+    ValueError
+        半径が負の場合
+    """
+    if open_radius < 0 or close_radius < 0:
+        raise ValueError(
+            f"半径は0以上である必要があります: {open_radius}, {close_radius}"
+        )
+    gray = mask.convert("L")
+    if open_radius == 0 and close_radius == 0:
+        return gray
+    array = np.asarray(gray)
+    if open_radius:
+        array = _morph(
+            _morph(array, open_radius, dilate=False), open_radius, dilate=True
+        )
+    if close_radius:
+        array = _morph(
+            _morph(array, close_radius, dilate=True), close_radius, dilate=False
+        )
+    return Image.fromarray(array, "L")
+
+
+def _guided_coefficients(
+    guide: FloatArray, target: FloatArray, radius: int, epsilon: float
+) -> FloatArray:
+    """カラーのガイデッドフィルタの係数 (a_r, a_g, a_b, b) の窓平均を求める。"""
+    counts = box_sum(np.ones(target.shape), radius)
+
+    def mean(values: FloatArray) -> FloatArray:
+        return box_sum(values, radius) / counts
+
+    channels = [guide[..., c] for c in range(3)]
+    mean_i = [mean(channel) for channel in channels]
+    mean_p = mean(target)
+    cov_ip = [mean(channels[c] * target) - mean_i[c] * mean_p for c in range(3)]
+
+    def var(i: int, j: int) -> FloatArray:
+        value = mean(channels[i] * channels[j]) - mean_i[i] * mean_i[j]
+        return value + epsilon if i == j else value
+
+    s00, s01, s02 = var(0, 0), var(0, 1), var(0, 2)
+    s11, s12, s22 = var(1, 1), var(1, 2), var(2, 2)
+    # 対称な3x3行列の逆行列を余因子で求める
+    c00 = s11 * s22 - s12 * s12
+    c01 = s02 * s12 - s01 * s22
+    c02 = s01 * s12 - s02 * s11
+    c11 = s00 * s22 - s02 * s02
+    c12 = s01 * s02 - s00 * s12
+    c22 = s00 * s11 - s01 * s01
+    det = s00 * c00 + s01 * c01 + s02 * c02
+
+    a0 = (c00 * cov_ip[0] + c01 * cov_ip[1] + c02 * cov_ip[2]) / det
+    a1 = (c01 * cov_ip[0] + c11 * cov_ip[1] + c12 * cov_ip[2]) / det
+    a2 = (c02 * cov_ip[0] + c12 * cov_ip[1] + c22 * cov_ip[2]) / det
+    b = mean_p - a0 * mean_i[0] - a1 * mean_i[1] - a2 * mean_i[2]
+    return np.stack([mean(a0), mean(a1), mean(a2), mean(b)], axis=-1)
+
+
+def _bilinear(grid: FloatArray, fy: FloatArray, fx: FloatArray) -> FloatArray:
+    """格子の値を小数の座標で双線形補間する（座標は格子の範囲に丸める）。"""
+    height, width = grid.shape[:2]
+    fy = np.clip(fy, 0, height - 1)
+    fx = np.clip(fx, 0, width - 1)
+    y0 = np.minimum(fy.astype(np.intp), height - 2 if height > 1 else 0)
+    x0 = np.minimum(fx.astype(np.intp), width - 2 if width > 1 else 0)
+    y1 = np.minimum(y0 + 1, height - 1)
+    x1 = np.minimum(x0 + 1, width - 1)
+    wy = (fy - y0)[:, None]
+    wx = (fx - x0)[:, None]
+    top = grid[y0, x0] * (1 - wx) + grid[y0, x1] * wx
+    bottom = grid[y1, x0] * (1 - wx) + grid[y1, x1] * wx
+    result: FloatArray = top * (1 - wy) + bottom * wy
+    return result
+
+
+def guided_refine(
+    image: Image.Image,
+    mask: Image.Image,
+    *,
+    radius: int = DEFAULT_GUIDED_RADIUS,
+    epsilon: float = DEFAULT_GUIDED_EPSILON,
+) -> Image.Image:
+    """元画像の色をガイドにしたガイデッドフィルタでマスクの境界を補正する。
+
+    係数は ``radius // 2`` 倍に縮小した画像で、境界の帯を含む範囲だけ計算する。
+    帯（二値化したマスクの境界から ``radius`` 程度の範囲と、半透明の画素）の
+    画素だけを、元の解像度の色と補間した係数から求めたアルファに置き換える。
+
+    Parameters
+    ----------
+    image : Image.Image
+        元画像
+    mask : Image.Image
+        前景255のマスク（元画像と同じサイズ）
+    radius : int
+        フィルタの窓の半径（元画像のピクセル数）。境界の帯の幅もこの程度になる
+    epsilon : float
+        正則化。小さいほど元画像の色の境界に沿い、大きいほど元のマスクに近い
+
+    Returns
+    -------
+    Image.Image
+        Lモードのマスク
+
+    Raises
+    ------
+    ValueError
+        マスクのサイズが元画像と異なる場合、またはパラメータが範囲外の場合
+    """
+    if mask.size != image.size:
+        raise ValueError(
+            f"マスクのサイズが画像と異なります: {mask.size} != {image.size}"
+        )
+    if radius < 1 or epsilon <= 0:
+        raise ValueError(
+            f"半径は1以上、正則化は正の値である必要があります: {radius}, {epsilon}"
+        )
+    gray = mask.convert("L")
+    factor = max(radius // 2, 1)
+    small_radius = max(radius // factor, 1)
+
+    small_mask = np.asarray(gray.reduce(factor), dtype=np.float64) / 255
+    binary = (small_mask >= 0.5).astype(np.uint8)
+    dilated = _morph(binary, small_radius, dilate=True)
+    band: BoolArray = dilated != _morph(binary, small_radius, dilate=False)
+    band |= (small_mask > _SOFT_MARGIN) & (small_mask < 1 - _SOFT_MARGIN)
+    cell_ys, cell_xs = np.nonzero(band)
+    if cell_ys.size == 0:
+        return gray
+
+    # 係数の窓平均が帯の外の画素を参照するため、窓2つ分の余白を付けて切り出す
+    margin = 2 * small_radius + 1
+    top = max(int(cell_ys.min()) - margin, 0)
+    left = max(int(cell_xs.min()) - margin, 0)
+    bottom = min(int(cell_ys.max()) + margin + 1, band.shape[0])
+    right = min(int(cell_xs.max()) + margin + 1, band.shape[1])
+
+    rgb = image if image.mode == "RGB" else image.convert("RGB")
+    box = (
+        left * factor,
+        top * factor,
+        min(right * factor, image.width),
+        min(bottom * factor, image.height),
+    )
+    guide = np.asarray(rgb.reduce(factor, box), dtype=np.float64) / 255
+    coefficients = _guided_coefficients(
+        guide, small_mask[top:bottom, left:right], small_radius, epsilon
+    )
+
+    # 帯のセルに含まれる元の解像度の画素（行の昇順）
+    full_band = np.repeat(np.repeat(band, factor, axis=0), factor, axis=1)
+    ys, xs = np.nonzero(full_band[: image.height, : image.width])
+    pixels = gather_pixels(rgb, ys, xs) / 255
+    sampled = _bilinear(
+        coefficients,
+        (ys + 0.5) / factor - 0.5 - top,
+        (xs + 0.5) / factor - 0.5 - left,
+    )
+    refined = (sampled[:, :3] * pixels).sum(axis=-1) + sampled[:, 3]
+
+    alpha = np.array(gray)
+    alpha[ys, xs] = (np.clip(refined, 0.0, 1.0) * 255).round().astype(np.uint8)
+    logger.debug(f"境界の補正: {ys.size}画素 ({ys.size / alpha.size:.1%})")
+    return Image.fromarray(alpha, "L")
+
+
+class MattingBackend:
+    """マスクのモルフォロジー処理とガイデッドフィルタで境界を補正するバックエンド."""
+
+    def __init__(
+        self,
+        inner: SegmentationBackend,
+        *,
+        radius: int = DEFAULT_GUIDED_RADIUS,
+        epsilon: float = DEFAULT_GUIDED_EPSILON,
+        open_radius: int = 0,
+        close_radius: int = 0,
+    ) -> None:
+        """バックエンドを初期化。
+
+        Parameters
+        ----------
+        inner : SegmentationBackend
+            マスクを求めるバックエンド
+        radius : int
+            ガイデッドフィルタの窓の半径（元画像のピクセル数）
+        epsilon : float
+            ガイデッドフィルタの正則化
+        open_radius : int
+            補正の前に行うオープニングの半径（0の場合は行わない）
+        close_radius : int
+            補正の前に行うクロージングの半径（0の場合は行わない）
+
+        Raises
+        ------
+        ValueError
+            パラメータが範囲外の場合
+        """
+        if radius < 1 or epsilon <= 0:
+            raise ValueError(
+                f"半径は1以上、正則化は正の値である必要があります: {radius}, {epsilon}"
+            )
+        if open_radius < 0 or close_radius < 0:
+            raise ValueError(
+                f"半径は0以上である必要があります: {open_radius}, {close_radius}"
+            )
+        self.inner = inner
+        self.name: BackgroundMethod = inner.name
+        self.radius = radius
+        self.epsilon = epsilon
+        self.open_radius = open_radius
+        self.close_radius = close_radius
+        self.cache_id = (
+            f"{inner.cache_id}:guided:{radius}:{epsilon}:{open_radius}:{close_radius}"
+        )
+        self.resolution = inner.resolution
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """内側のバックエンドのマスクを整え、境界を補正する。
+
+        Parameters
+        ----------
+        image : Image.Image
+            対象画像
+
+        Returns
+        -------
+        SegmentationResult
+            補正した前景マスクと、内側のバックエンドの信頼度
+        """
+        result = self.inner.segment(image)
+        mask = clean_mask(
+            result["mask"],
+            open_radius=self.open_radius,
+            close_radius=self.close_radius,
+        )
+        mask = guided_refine(image, mask, radius=self.radius, epsilon=self.epsilon)
+        return SegmentationResult(
+            mask=mask, confidence=result["confidence"], backend=result["backend"]
+        )
@@ -0,0 +1,516 @@
+"""メモリ上で画像を受け渡す多段処理パイプライン.
+
+ソース → 変換 → … → シンク の各ステージを有界キューで接続し、
+中間結果をディスクに書き出さずに処理する。各ステージは個別の
+並列数と実行方式（スレッド／プロセス）を持ち、ステージごとの処理時間は
+``PerformanceMonitor`` に記録される。
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, TypedDict
+
+from PIL import Image
+
+from image_processor.conversion.formats import (
+    EXTENSIONS,
+    prepare_for_format,
+    to_pillow_format,
+)
+from image_processor.core.common import create_processing_result
+from image_processor.types import (
+    ExecutorKind,
+    ImageFormat,
+    ProcessingResult,
+    VideoConfig,
+)
+from image_processor.utils.profiling import PerformanceMonitor
+from image_processor.video.frame_extractor import FrameExtractor
+
+logger = logging.getLogger(__name__)
+
+class PipelineItem(TypedDict):
+    """パイプライン内を流れる画像データの型定義."""
+
+    name: str
+    source: Path
+    image: Image.Image
+
+
+class _Envelope:
+    """ステージ間で要素を運ぶ内部コンテナ（元ファイルと開始時刻を保持）."""
+
+    __slots__ = ("item", "source", "started")
+
+    def __init__(self, item: Any, source: Path, started: float) -> None:
+        self.item = item
+        self.source = source
+        self.started = started
+
+
+_END = object()
+
+
+class Stage:
+    """パイプラインの1ステージ."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        *,
+        workers: int = 1,
+        executor: ExecutorKind = "thread",
+        queue_size: int = 8,
+        expand: bool = False,
+        sink: bool = False,
+    ) -> None:
+        """ステージを初期化。
+
+        Parameters
+        ----------
+        name : str
+            ステージ名（処理時間の測定項目名にも使用）
+        func : Callable[[Any], Any]
+            要素を1つ受け取る処理関数。``None`` を返した要素は破棄される
+        workers : int
+            並列数
+        executor : ExecutorKind
+            ``"thread"`` または ``"process"``。プロセスの場合 ``func`` と要素は
+            pickle可能である必要がある
+        queue_size : int
+            このステージの入力キューの上限
+        expand : bool
+            Trueの場合、``func`` の戻り値を複数要素のイテラブルとして展開する
+        sink : bool
+            Trueの場合、``func`` は出力パスを返す最終ステージとして扱う
+
+        Raises
+        ------
+        ValueError
+            並列数やキューサイズが1未満の場合
+        """
+        if workers < 1:
+            raise ValueError("並列数は1以上である必要があります")
+        if queue_size < 1:
+            raise ValueError("キューサイズは1以上である必要があります")
+
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.executor = executor
+        self.queue_size = queue_size
+        self.expand = expand
+        self.sink = sink
+
+
+class Pipeline:
+    """ソース・変換・シンクを有界キューで接続するパイプライン.
+
+    Examples
+    --------
+    >>> pipeline = Pipeline(image_file_source(paths))
+    >>> pipeline.add_transform("resize", resize_item, workers=4)
+    >>> pipeline.add_sink("save", ImageFileSink(output_dir, "webp"), workers=2)
+    >>> results = pipeline.run()
+    """
+
+    def __init__(
+        self,
+        source: Iterable[Any],
+        *,
+        source_name: str = "source",
+        monitor: PerformanceMonitor | None = None,
+    ) -> None:
+        """パイプラインを初期化。
+
+        Parameters
+        ----------
+        source : Iterable[Any]
+            要素を生成するイテラブル（単一スレッドで消費される）
+        source_name : str
+            ソースステージの測定項目名
+        monitor : PerformanceMonitor | None
+            処理時間の記録先。Noneの場合は新規作成
+        """
+        self.source = source
+        self.source_name = source_name
+        self.monitor = monitor if monitor is not None else PerformanceMonitor()
+        self.stages: list[Stage] = []
+        self._lock = threading.Lock()
+        self._results: list[ProcessingResult] = []
+
+    def add_transform(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        *,
+        workers: int = 1,
+        executor: ExecutorKind = "thread",
+        queue_size: int = 8,
+        expand: bool = False,
+    ) -> "Pipeline":
+        """変換ステージを追加。
+
+        Parameters
+        ----------
+        name : str
+            ステージ名
+        func : Callable[[Any], Any]
+            変換関数
+        workers : int
+            並列数
+        executor : ExecutorKind
+            実行方式
+        queue_size : int
+            入力キューの上限
+        expand : bool
+            戻り値を複数要素として展開するか
+
+        Returns
+        -------
+        Pipeline
+            メソッドチェーン用の自身
+        """
+        self._check_open()
+        self.stages.append(
+            Stage(
+                name,
+                func,
+                workers=workers,
+                executor=executor,
+                queue_size=queue_size,
+                expand=expand,
+            )
+        )
+        return self
+
+    def add_sink(
+        self,
+        name: str,
+        func: Callable[[Any], Path],
+        *,
+        workers: int = 1,
+        executor: ExecutorKind = "thread",
+        queue_size: int = 8,
+    ) -> "Pipeline":
+        """最終ステージ（シンク）を追加。
+
+        Parameters
+        ----------
+        name : str
+            ステージ名
+        func : Callable[[Any], Path]
+            要素を書き出して出力パスを返す関数
+        workers : int
+            並列数
+        executor : ExecutorKind
+            実行方式
+        queue_size : int
+            入力キューの上限
+
+        Returns
+        -------
+        Pipeline
+            メソッドチェーン用の自身
+        """
+        self._check_open()
+        self.stages.append(
+            Stage(
+                name,
+                func,
+                workers=workers,
+                executor=executor,
+                queue_size=queue_size,
+                sink=True,
+            )
+        )
+        return self
+
+    def run(self) -> list[ProcessingResult]:
+        """パイプラインを実行。
+
+        Returns
+        -------
+        list[ProcessingResult]
+            シンクに到達した要素と、途中で失敗した要素の処理結果
+
+        Raises
+        ------
+        ValueError
+            シンクが設定されていない場合
+        """
+        if not self.stages or not self.stages[-1].sink:
+            raise ValueError("パイプラインにシンクが設定されていません")
+
+        self._results = []
+        queues: list[queue.Queue[Any]] = [
+            queue.Queue(maxsize=stage.queue_size) for stage in self.stages
+        ]
+        pools = {
+            index: ProcessPoolExecutor(max_workers=stage.workers)
+            for index, stage in enumerate(self.stages)
+            if stage.executor == "process"
+        }
+
+        threads: list[threading.Thread] = [
+            threading.Thread(
+                target=self._run_source,
+                args=(queues[0],),
+                name=f"pipeline-{self.source_name}",
+                daemon=True,
+            )
+        ]
+        for index, stage in enumerate(self.stages):
+            out_queue = queues[index + 1] if index + 1 < len(queues) else None
+            remaining = [stage.workers]
+            for worker_id in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._run_stage,
+                        args=(
+                            stage,
+                            queues[index],
+                            out_queue,
+                            pools.get(index),
+                            remaining,
+                        ),
+                        name=f"pipeline-{stage.name}-{worker_id}",
+                        daemon=True,
+                    )
+                )
+
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for pool in pools.values():
+                pool.shutdown()
+
+        return list(self._results)
+
+    def _check_open(self) -> None:
+        """シンク追加後のステージ追加を禁止."""
+        if self.stages and self.stages[-1].sink:
+            raise ValueError("シンクの後にステージは追加できません")
+
+    def _measure(self, name: str, duration: float) -> None:
+        """スレッドセーフに処理時間を記録."""
+        with self._lock:
+            self.monitor.measure(name, duration)
+
+    def _record(self, result: ProcessingResult) -> None:
+        """スレッドセーフに処理結果を記録."""
+        with self._lock:
+            self._results.append(result)
+
+    def _run_source(self, out_queue: "queue.Queue[Any]") -> None:
+        """ソースを消費して最初のキューに投入."""
+        iterator = iter(self.source)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                self._measure(self.source_name, time.perf_counter() - start)
+                out_queue.put(_Envelope(item, _source_of(item), start))
+        except Exception as e:
+            logger.error(f"ソースエラー ({self.source_name}): {e}")
+            self._record(
+                create_processing_result(
+                    status="error",
+                    input_path=Path(self.source_name),
+                    error_message=f"{self.source_name}: {e}",
+                )
+            )
+        finally:
+            out_queue.put(_END)
+
+    def _run_stage(
+        self,
+        stage: Stage,
+        in_queue: "queue.Queue[Any]",
+        out_queue: "queue.Queue[Any] | None",
+        pool: ProcessPoolExecutor | None,
+        remaining: list[int],
+    ) -> None:
+        """1ワーカー分のステージ処理ループ."""
+        try:
+            while True:
+                envelope = in_queue.get()
+                if envelope is _END:
+                    # 同じステージの他ワーカーにも終了を伝える
+                    in_queue.put(_END)
+                    break
+                self._process_envelope(stage, envelope, out_queue, pool)
+        finally:
+            # 例外で抜けた場合も後段に終了を伝え、run() が待ち続けないようにする
+            with self._lock:
+                remaining[0] -= 1
+                is_last = remaining[0] == 0
+            if is_last and out_queue is not None:
+                out_queue.put(_END)
+
+    def _process_envelope(
+        self,
+        stage: Stage,
+        envelope: _Envelope,
+        out_queue: "queue.Queue[Any] | None",
+        pool: ProcessPoolExecutor | None,
+    ) -> None:
+        """1要素をステージで処理し、結果を記録または後段のキューに渡す."""
+        try:
+            start = time.perf_counter()
+            try:
+                if pool is not None:
+                    output = pool.submit(stage.func, envelope.item).result()
+                else:
+                    output = stage.func(envelope.item)
+            finally:
+                self._measure(stage.name, time.perf_counter() - start)
+
+            if stage.sink:
+                self._record(
+                    create_processing_result(
+                        status="success",
+                        input_path=envelope.source,
+                        output_path=output,
+                        processing_time=time.perf_counter() - envelope.started,
+                    )
+                )
+                return
+
+            if out_queue is None or output is None:
+                return
+            # 展開ステージのジェネレータは途中で例外を送出しうるため、try内で消費する
+            outputs = output if stage.expand else (output,)
+            for item in outputs:
+                out_queue.put(_Envelope(item, envelope.source, envelope.started))
+        except Exception as e:
+            logger.error(f"ステージエラー ({stage.name}) {envelope.source.name}: {e}")
+            self._record(
+                create_processing_result(
+                    status="error",
+                    input_path=envelope.source,
+                    error_message=f"{stage.name}: {e}",
+                    processing_time=time.perf_counter() - envelope.started,
+                )
+            )
+
+
+def _source_of(item: Any) -> Path:
+    """要素から元ファイルのパスを取得."""
+    if isinstance(item, Mapping):
+        source = item.get("source")
+        if isinstance(source, Path):
+            return source
+    return Path(str(item))
+
+
+def image_file_source(paths: Iterable[Path]) -> Iterator[PipelineItem]:
+    """画像ファイルを読み込んで ``PipelineItem`` を生成するソース。
+
+    Parameters
+    ----------
+    paths : Iterable[Path]
+        入力画像ファイルのパス
+
+    Yields
+    ------
+    PipelineItem
+        デコード済みの画像
+    """
+    for path in paths:
+        with Image.open(path) as img:
+            img.load()
+            yield PipelineItem(name=path.stem, source=path, image=img)
+
+
+def video_frame_source(
+    video_path: Path,
+    *,
+    config: VideoConfig | None = None,
+    ffmpeg_path: str = "ffmpeg",
+) -> Iterator[PipelineItem]:
+    """動画のフレームをPNGに書き出さずに生成するソース。
+
+    Parameters
+    ----------
+    video_path : Path
+        入力動画ファイルのパス
+    config : VideoConfig | None
+        動画処理設定（frame_interval, start_time, end_time を使用）
+    ffmpeg_path : str
+        FFmpegの実行パス
+
+    Yields
+    ------
+    PipelineItem
+        RGBフレーム
+    """
+    extractor = FrameExtractor(ffmpeg_path)
+    for index, frame in enumerate(extractor.iter_frames(video_path, config=config), 1):
+        yield PipelineItem(
+            name=f"{video_path.stem}_frame_{index:04d}",
+            source=video_path,
+            image=frame,
+        )
+
+
+class ImageFileSink:
+    """``PipelineItem`` を画像ファイルとして書き出すシンク.
+
+    プロセス実行でも使えるよう、クロージャではなくpickle可能なクラスとして実装。
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        image_format: ImageFormat = "png",
+        **save_options: Any,
+    ) -> None:
+        """シンクを初期化。
+
+        Parameters
+        ----------
+        output_dir : Path
+            出力ディレクトリ
+        image_format : ImageFormat
+            出力フォーマット
+        **save_options : Any
+            ``Image.save`` に渡す追加オプション
+        """
+        self.output_dir = output_dir
+        self.image_format = image_format
+        self.save_options = save_options
+
+    def __call__(self, item: PipelineItem) -> Path:
+        """画像を保存して出力パスを返す。
+
+        Parameters
+        ----------
+        item : PipelineItem
+            保存する要素
+
+        Returns
+        -------
+        Path
+            出力ファイルのパス
+        """
+        pillow_format = to_pillow_format(self.image_format)
+        image = prepare_for_format(item["image"], pillow_format)
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        extension = EXTENSIONS[pillow_format]
+        output_path = self.output_dir / f"{item['name']}{extension}"
+        image.save(output_path, pillow_format, **self.save_options)
+        return output_path
@@ -0,0 +1,260 @@
+"""セッションを読み込んだワーカープロセスによる背景透過の並列実行.
+
+ONNX Runtimeのセッションは既定で全コアを使うため、背景透過を複数プロセスで
+同時に実行するとスレッドがコア数の何倍にもなり、並列にしても速くならない。
+ここではCPUコアの予算をワーカーに分け、各ワーカーは初期化時に一度だけ
+演算内・演算間のスレッド数を指定したセッションを読み込む。
+
+- 画像はまとめて（チャンク単位で）ワーカーに渡し、1枚ごとの通信を減らす
+- ワーカー数は、コア数と、1枚あたりの推論時間・セッションの読み込み時間の
+  実測値から決める（読み込み時間に見合うだけの枚数がないワーカーは作らない）
+"""
+
+import functools
+import logging
+import math
+import multiprocessing
+import os
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TypedDict
+
+from PIL import Image
+
+from image_processor.core.common import create_processing_result
+from image_processor.processing.background import RembgBackend, SegmentationBackend
+from image_processor.types import ProcessingResult
+
+logger = logging.getLogger(__name__)
+
+# ワーカー1つに割り当てる演算内スレッド数の下限（推論は数スレッドまではよく速くなる）
+DEFAULT_MIN_THREADS_PER_WORKER = 2
+
+# ワーカーあたりのチャンク数（最後のチャンクの待ち時間と通信回数の兼ね合い）
+_CHUNKS_PER_WORKER = 4
+
+# ワーカーのバックエンド（プロセスごとに初期化時に作成する）
+_worker_backend: SegmentationBackend | None = None
+
+
+class SessionPoolPlan(TypedDict):
+    """ワーカープールの構成の型定義."""
+
+    workers: int
+    intra_op_threads: int
+    inter_op_threads: int
+    chunksize: int
+
+
+class BackendCost(TypedDict):
+    """バックエンドの処理時間の実測値の型定義."""
+
+    load_seconds: float
+    per_image_seconds: float
+
+
+def plan_session_pool(
+    image_count: int,
+    *,
+    per_image_seconds: float = 0.0,
+    load_seconds: float = 0.0,
+    cores: int | None = None,
+    workers: int | None = None,
+    min_threads: int = DEFAULT_MIN_THREADS_PER_WORKER,
+) -> SessionPoolPlan:
+    """コアの予算と処理時間からワーカー数とスレッド数を決める。
+
+    ワーカー数は ``cores // min_threads`` と画像数を上限とし、さらに
+    ワーカー1つあたりの推論時間の合計がセッションの読み込み時間を下回らない
+    範囲に抑える。コアはワーカーに均等に分け、演算間の並列は使わない
+    （rembgのモデルは演算を順に実行するため）。
+
+    Parameters
+    ----------
+    image_count : int
+        処理する画像の数
+    per_image_seconds : float
+        1枚あたりの推論時間（秒）。0の場合は読み込み時間による制限をしない
+    load_seconds : float
+        セッションの読み込み時間（秒）
+    cores : int | None
+        使ってよいCPUコア数。Noneの場合はCPU数
+    workers : int | None
+        ワーカー数。Noneの場合は自動で決める
+    min_threads : int
+        ワーカー1つに割り当てる演算内スレッド数の下限（自動の場合）
+
+    Returns
+    -------
+    SessionPoolPlan
+        ワーカー数・スレッド数・チャンクの大きさ
+
+    Raises
+    ------
+    ValueError
+        画像数・コア数・ワーカー数・スレッド数が1未満の場合
+    """
+    cores = cores or os.cpu_count() or 1
+    if image_count < 1:
+        raise ValueError(f"画像数は1以上である必要があります: {image_count}")
+    if cores < 1 or min_threads < 1 or (workers is not None and workers < 1):
+        raise ValueError(
+            f"コア数・ワーカー数・スレッド数は1以上である必要があります: "
+            f"{cores}, {workers}, {min_threads}"
+        )
+    if workers is None:
+        workers = min(max(cores // min_threads, 1), image_count)
+        if per_image_seconds > 0 and load_seconds > 0:
+            amortized = int(image_count * per_image_seconds / load_seconds)
+            workers = min(workers, max(amortized, 1))
+    workers = min(workers, image_count)
+    return SessionPoolPlan(
+        workers=workers,
+        intra_op_threads=max(cores // workers, 1),
+        inter_op_threads=1,
+        chunksize=max(math.ceil(image_count / (workers * _CHUNKS_PER_WORKER)), 1),
+    )
+
+
+def preload_backend(backend: SegmentationBackend) -> None:
+    """包まれたバックエンドをたどり、rembgのセッションがあれば読み込んでおく。
+
+    ``auto`` のフォールバックは必要になるまで読み込まない。
+    """
+    current: object = backend
+    while current is not None:
+        if isinstance(current, RembgBackend):
+            current.load_session()
+            return
+        current = getattr(current, "inner", None)
+
+
+def measure_backend_cost(
+    backend_factory: Callable[..., SegmentationBackend],
+    image: Image.Image,
+    *,
+    threads: int = DEFAULT_MIN_THREADS_PER_WORKER,
+) -> BackendCost:
+    """ワーカー1つ分のスレッド数でバックエンドを作成し、処理時間を測る。
+
+    推論時間は、初回の推論（メモリの確保などを含む）を除いた2回目で測る。
+
+    Parameters
+    ----------
+    backend_factory : Callable[..., SegmentationBackend]
+        ``intra_op_threads`` と ``inter_op_threads`` をキーワード引数で受け取って
+        バックエンドを作成する関数
+    image : Image.Image
+        計測に使う画像
+    threads : int
+        演算内スレッド数
+
+    Returns
+    -------
+    BackendCost
+        セッションの読み込み時間と1枚あたりの推論時間（秒）
+    """
+    start = time.perf_counter()
+    backend = backend_factory(intra_op_threads=threads, inter_op_threads=1)
+    preload_backend(backend)
+    load_seconds = time.perf_counter() - start
+    backend.segment(image)
+    start = time.perf_counter()
+    backend.segment(image)
+    return BackendCost(
+        load_seconds=load_seconds, per_image_seconds=time.perf_counter() - start
+    )
+
+
+def _initialize_worker(
+    backend_factory: Callable[..., SegmentationBackend],
+    intra_op_threads: int,
+    inter_op_threads: int,
+) -> None:
+    """ワーカーの初期化: スレッド数を指定してバックエンドを作成し、読み込む。"""
+    global _worker_backend
+    # ONNX Runtime以外（OpenMPを使う拡張モジュール）もコアの割り当てに従わせる
+    os.environ["OMP_NUM_THREADS"] = str(intra_op_threads)
+    _worker_backend = backend_factory(
+        intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads
+    )
+    preload_backend(_worker_backend)
+
+
+def _run_in_worker(
+    func: Callable[[Path, SegmentationBackend], Path | None], path: Path
+) -> ProcessingResult:
+    """ワーカーのバックエンドで1ファイルを処理する（例外は結果に変換する）。"""
+    if _worker_backend is None:
+        raise RuntimeError("ワーカーが初期化されていません")
+    start = time.perf_counter()
+    try:
+        output_path = func(path, _worker_backend)
+    except Exception as e:
+        return create_processing_result(
+            "error",
+            path,
+            error_message=str(e),
+            processing_time=time.perf_counter() - start,
+        )
+    return create_processing_result(
+        "success", path, output_path, processing_time=time.perf_counter() - start
+    )
+
+
+def run_with_session_pool(
+    func: Callable[[Path, SegmentationBackend], Path | None],
+    paths: Sequence[Path],
+    *,
+    backend_factory: Callable[..., SegmentationBackend],
+    plan: SessionPoolPlan,
+) -> list[ProcessingResult]:
+    """セッションを読み込んだワーカープロセスでファイルごとの処理を並列実行。
+
+    ワーカーは ``spawn`` で起動する（親プロセスが計測でONNX Runtimeの
+    スレッドを作成した後にforkすると、子プロセスがロックを引き継いで止まることがある）。
+
+    Parameters
+    ----------
+    func : Callable[[Path, SegmentationBackend], Path | None]
+        入力ファイルとワーカーのバックエンドを受け取り、出力パスを返す関数。
+        pickle可能である必要がある
+    paths : Sequence[Path]
+        入力ファイルのパス
+    backend_factory : Callable[..., SegmentationBackend]
+        ``intra_op_threads`` と ``inter_op_threads`` をキーワード引数で受け取って
+        バックエンドを作成する関数（pickle可能であること。例:
+        ``functools.partial(create_backend, "rembg", model="isnet-anime")``）
+    plan : SessionPoolPlan
+        ``plan_session_pool`` で決めたワーカープールの構成
+
+    Returns
+    -------
+    list[ProcessingResult]
+        入力順の処理結果
+    """
+    if not paths:
+        return []
+    logger.info(
+        f"ワーカー{plan['workers']}個（各{plan['intra_op_threads']}スレッド）で"
+        f"{len(paths)}ファイルを処理します"
+    )
+    with ProcessPoolExecutor(
+        max_workers=plan["workers"],
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initialize_worker,
+        initargs=(
+            backend_factory,
+            plan["intra_op_threads"],
+            plan["inter_op_threads"],
+        ),
+    ) as pool:
+        return list(
+            pool.map(
+                functools.partial(_run_in_worker, func),
+                paths,
+                chunksize=plan["chunksize"],
+            )
+        )
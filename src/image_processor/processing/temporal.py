@@ -0,0 +1,247 @@
+"""動画の背景透過でのマスクの時間方向の再利用.
+
+アニメの止め絵のように連続するフレームがほぼ同じ場合、フレームごとに
+セグメンテーションを行うのは無駄が大きい。``TemporalMaskBackend`` は
+最後に推論したフレーム（キーフレーム）と現在のフレームを縮小した輝度で比較し、
+差が閾値未満ならキーフレームのマスクを再利用する。
+
+- カメラのパンなど画面全体の平行移動は、位相限定相関（FFT）で移動量を推定し、
+  移動を補正した上で差を測る。再利用するマスクも同じだけ移動させる
+- 差はキーフレームとの間で測るため、少しずつ変化するシーンでも誤差は蓄積しない
+- ``max_interval`` フレームごとに必ず推論し直す
+"""
+
+import logging
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from image_processor.processing.background import (
+    SegmentationBackend,
+    SegmentationResult,
+)
+from image_processor.types import BackgroundMethod
+
+logger = logging.getLogger(__name__)
+
+# 比較に使う縮小画像の長辺
+DEFAULT_COMPARE_SIZE = 256
+
+# キーフレームとの輝度の平均絶対差（0-1）がこれ未満ならマスクを再利用する
+DEFAULT_REUSE_THRESHOLD = 0.01
+
+# この数のフレームごとに必ず推論し直す
+DEFAULT_KEYFRAME_INTERVAL = 12
+
+# 移動量の推定を信頼する、重なり部分の面積の割合の下限
+_MIN_OVERLAP = 0.5
+
+type FloatArray = npt.NDArray[np.float64]
+
+
+def _small_luma(image: Image.Image, size: int) -> FloatArray:
+    """長辺が ``size`` 以下になるよう縮小した輝度（0-1）を取得。"""
+    gray = image.convert("L")
+    gray.thumbnail((size, size), Image.Resampling.BILINEAR)
+    return np.asarray(gray, dtype=np.float64) / 255
+
+
+def estimate_shift(reference: FloatArray, target: FloatArray) -> tuple[int, int]:
+    """位相限定相関で画面全体の平行移動量を推定する。
+
+    Parameters
+    ----------
+    reference : numpy.ndarray
+        基準の輝度（2次元）
+    target : numpy.ndarray
+        比較する輝度（``reference`` と同じ形状）
+
+    Returns
+    -------
+    tuple[int, int]
+        ``target`` が ``reference`` からずれている量 ``(dx, dy)``（画素）
+
+    Raises
+    ------
+    ValueError
+        形状が異なる場合
+    """
+    if reference.shape != target.shape:
+        raise ValueError(f"形状が異なります: {reference.shape} != {target.shape}")
+    # 端の不連続が相関の山を作らないよう窓関数をかける
+    window = np.outer(np.hanning(reference.shape[0]), np.hanning(reference.shape[1]))
+    spectrum_ref = np.fft.rfft2((reference - reference.mean()) * window)
+    spectrum_tgt = np.fft.rfft2((target - target.mean()) * window)
+    cross = spectrum_tgt * np.conj(spectrum_ref)
+    cross /= np.maximum(np.abs(cross), 1e-12)
+    correlation = np.fft.irfft2(cross, s=reference.shape)
+
+    dy, dx = np.unravel_index(int(np.argmax(correlation)), correlation.shape)
+    height, width = reference.shape
+    if dy > height // 2:
+        dy -= height
+    if dx > width // 2:
+        dx -= width
+    return int(dx), int(dy)
+
+
+def shifted_difference(
+    reference: FloatArray, target: FloatArray, shift: tuple[int, int] = (0, 0)
+) -> float:
+    """``reference`` を ``shift`` だけ移動したときの ``target`` との平均絶対差。
+
+    重なり部分だけで測る。重なりが面積の半分未満の場合は1（最大の差）を返す。
+
+    Parameters
+    ----------
+    reference : numpy.ndarray
+        基準の輝度（0-1）
+    target : numpy.ndarray
+        比較する輝度（0-1、``reference`` と同じ形状）
+    shift : tuple[int, int]
+        移動量 ``(dx, dy)``
+
+    Returns
+    -------
+    float
+        平均絶対差（0-1）
+    """
+    dx, dy = shift
+    height, width = reference.shape
+    if (height - abs(dy)) * (width - abs(dx)) < _MIN_OVERLAP * height * width:
+        return 1.0
+    ref = reference[max(-dy, 0) : height - max(dy, 0), max(-dx, 0) : width - max(dx, 0)]
+    tgt = target[max(dy, 0) : height - max(-dy, 0), max(dx, 0) : width - max(-dx, 0)]
+    return float(np.abs(ref - tgt).mean())
+
+
+def shift_mask(mask: Image.Image, shift: tuple[int, int]) -> Image.Image:
+    """マスクを平行移動する（はみ出した分は捨て、空いた部分は端の値で埋める）。"""
+    dx, dy = shift
+    if dx == 0 and dy == 0:
+        return mask
+    array = np.asarray(mask)
+    height, width = array.shape
+    rows = np.clip(np.arange(height) - dy, 0, height - 1)
+    columns = np.clip(np.arange(width) - dx, 0, width - 1)
+    return Image.fromarray(np.ascontiguousarray(array[rows][:, columns]), "L")
+
+
+class TemporalMaskBackend:
+    """キーフレームとの差が小さいフレームでマスクを再利用するバックエンド.
+
+    フレームを順番に渡す前提の状態を持つため、動画ごとに作成するか
+    ``reset`` を呼ぶ。
+    """
+
+    def __init__(
+        self,
+        inner: SegmentationBackend,
+        *,
+        threshold: float = DEFAULT_REUSE_THRESHOLD,
+        max_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+        motion: bool = True,
+        compare_size: int = DEFAULT_COMPARE_SIZE,
+    ) -> None:
+        """バックエンドを初期化。
+
+        Parameters
+        ----------
+        inner : SegmentationBackend
+            キーフレームの推論に使うバックエンド
+        threshold : float
+            マスクを再利用する、縮小した輝度の平均絶対差（0-1）の上限
+        max_interval : int
+            この数のフレームごとに必ず推論し直す（1の場合は毎フレーム推論）
+        motion : bool
+            Trueの場合、画面全体の平行移動を推定して補正する
+        compare_size : int
+            比較に使う縮小画像の長辺
+
+        Raises
+        ------
+        ValueError
+            パラメータが範囲外の場合
+        """
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"閾値は0から1の範囲である必要があります: {threshold}")
+        if max_interval < 1:
+            raise ValueError(
+                f"キーフレームの間隔は1以上である必要があります: {max_interval}"
+            )
+        if compare_size < 8:
+            raise ValueError(
+                f"比較画像の長辺は8以上である必要があります: {compare_size}"
+            )
+        self.inner = inner
+        self.name: BackgroundMethod = inner.name
+        self.cache_id = inner.cache_id
+        self.resolution = inner.resolution
+        self.threshold = threshold
+        self.max_interval = max_interval
+        self.motion = motion
+        self.compare_size = compare_size
+        self.inferred = 0
+        self.reused = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """キーフレームを破棄する（次のフレームは必ず推論する）。"""
+        self._key_luma: FloatArray | None = None
+        self._key_result: SegmentationResult | None = None
+        self._key_size: tuple[int, int] = (0, 0)
+        self._since_key = 0
+
+    def _reusable_shift(self, luma: FloatArray) -> tuple[int, int] | None:
+        """キーフレームのマスクを再利用できる場合、縮小画像での移動量を返す。"""
+        if self._key_luma is None or self._key_luma.shape != luma.shape:
+            return None
+        if self._since_key >= self.max_interval - 1:
+            return None
+        if shifted_difference(self._key_luma, luma) < self.threshold:
+            return (0, 0)
+        if not self.motion:
+            return None
+        shift = estimate_shift(self._key_luma, luma)
+        if shifted_difference(self._key_luma, luma, shift) < self.threshold:
+            return shift
+        return None
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        """キーフレームのマスクを再利用するか、推論してキーフレームを更新する。
+
+        Parameters
+        ----------
+        image : Image.Image
+            動画のフレーム（順番に渡す）
+
+        Returns
+        -------
+        SegmentationResult
+            前景マスクと信頼度
+        """
+        luma = _small_luma(image, self.compare_size)
+        shift = None
+        if image.size == self._key_size:
+            shift = self._reusable_shift(luma)
+
+        if shift is not None and self._key_result is not None:
+            self._since_key += 1
+            self.reused += 1
+            scale = image.width / luma.shape[1]
+            full_shift = (round(shift[0] * scale), round(shift[1] * scale))
+            mask = shift_mask(self._key_result["mask"], full_shift)
+            return SegmentationResult(
+                mask=mask,
+                confidence=self._key_result["confidence"],
+                backend=self._key_result["backend"],
+            )
+
+        result = self.inner.segment(image)
+        self.inferred += 1
+        self._key_luma = luma
+        self._key_result = result
+        self._key_size = image.size
+        self._since_key = 0
+        return result
@@ -0,0 +1,460 @@
+"""縦に長い巨大画像をストリップ単位で処理する省メモリ変換.
+
+スキャン画像や縦読み漫画のページ（高さ20000px超）を全体のままデコード・変換
+すると、元画像・モード変換後・エンコーダーの作業領域がそれぞれ画像全体分の
+メモリを使う。ここでは画像を固定行数のストリップに分け、
+読み込み → 変換（切り抜き・透過の合成） → エンコード を順に流す。
+
+- 非圧縮の形式（BMP, PPM, 非圧縮TIFF, 非圧縮TGA）はファイルから必要な行だけを読む。
+- 非インターレース・ビット深度8のPNGは、IDATを ``zlib.decompressobj`` で
+  先頭から逐次展開し、ストリップ1つ分ずつフィルタを解除する
+  （``PngStripWriter`` の逆の処理）。
+- それ以外の形式（JPEGなど）は1回だけ全体をデコードしてからストリップに分けるため、
+  メモリ上限には収まらない（警告を出す）。
+- PNG出力は ``PngStripWriter`` で逐次書き出すため、出力側は画像全体を持たない。
+  JPEG/WebPなど逐次書き出しできない形式は、変換済みのストリップを出力画像に
+  貼り合わせてから保存するため、出力画像全体のメモリを使う（警告を出す）。
+"""
+
+import logging
+import struct
+import zlib
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from PIL import Image
+
+from image_processor.conversion.color import apply_color_policy
+from image_processor.conversion.formats import (
+    flatten_alpha,
+    format_from_path,
+    to_pillow_format,
+)
+from image_processor.conversion.png_writer import (
+    PNG_SIGNATURE,
+    PngStripWriter,
+    is_supported_mode,
+)
+from image_processor.conversion.presets import get_save_options
+from image_processor.processing.scheduler import check_pixels
+from image_processor.types import EncoderPreset
+
+logger = logging.getLogger(__name__)
+
+# ストリップ処理のデフォルトのメモリ上限（バイト）
+DEFAULT_TILE_MEMORY = 64 * 1024 * 1024
+
+# 1行あたりの作業領域の見積もり（元データ・変換後に加え、PNGの適応フィルタが
+# 5種類の候補と符号付きの評価値を、PNGの逐次展開が展開データとフィルタ解除前後の
+# 画像を行ごとに持つため、行のバイト数の数十倍になる）
+_WORKING_COPIES = 42
+
+# 逐次展開できるPNGのカラータイプ（ビット深度8）とモード
+_PNG_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+
+type Box = tuple[int, int, int, int]
+
+
+def strip_rows_for_budget(width: int, mode: str, budget: int) -> int:
+    """メモリ上限に収まるストリップの行数を計算。
+
+    Parameters
+    ----------
+    width : int
+        画像の幅
+    mode : str
+        画像モード
+    budget : int
+        ストリップ処理に使うメモリの上限（バイト）
+
+    Returns
+    -------
+    int
+        1ストリップの行数（1以上）
+
+    Raises
+    ------
+    ValueError
+        幅またはメモリ上限が1未満の場合
+    """
+    if width < 1 or budget < 1:
+        raise ValueError(
+            f"幅とメモリ上限は1以上である必要があります: {width}, {budget}"
+        )
+    # 変換でRGBAになる場合を見込み、1画素4バイト以上として見積もる
+    pixel_bytes = max(Image.getmodebands(mode), 4)
+    return max(budget // (width * pixel_bytes * _WORKING_COPIES), 1)
+
+
+def _resolve_box(size: tuple[int, int], box: Box | None) -> Box:
+    """切り抜き範囲を検証し、未指定なら画像全体を返す。"""
+    if box is None:
+        return (0, 0, *size)
+    x0, y0, x1, y1 = box
+    if not (0 <= x0 < x1 <= size[0] and 0 <= y0 < y1 <= size[1]):
+        raise ValueError(f"切り抜き範囲が画像の範囲外です: {box} (画像サイズ {size})")
+    return box
+
+
+def _raw_layout(img: Image.Image) -> list[tuple[Box, int, str, int, int]] | None:
+    """非圧縮タイルの配置（範囲・オフセット・rawmode・行バイト数・向き）を取得。
+
+    行単位で読めない形式（圧縮・横方向に分割されたタイル）の場合はNone。
+    """
+    tiles = getattr(img, "tile", None)
+    if not tiles:
+        return None
+    layout = []
+    for tile in tiles:
+        codec, extents, offset, args = tile[:4]
+        if codec != "raw" or extents is None:
+            return None
+        x0, y0, x1, y1 = extents
+        if x0 != 0 or x1 != img.width:
+            return None
+        if isinstance(args, str):
+            args = (args,)
+        rawmode = args[0]
+        stride = args[1] if len(args) > 1 else 0
+        orientation = args[2] if len(args) > 2 else 1
+        if stride <= 0:
+            try:
+                row = Image.new(img.mode, (img.width, 1))
+                stride = len(row.tobytes("raw", rawmode))
+            except ValueError:
+                return None
+        layout.append(((x0, y0, x1, y1), offset, rawmode, stride, orientation))
+    return layout
+
+
+def _read_raw_rows(
+    path: Path,
+    img: Image.Image,
+    layout: list[tuple[Box, int, str, int, int]],
+    top: int,
+    bottom: int,
+) -> Image.Image:
+    """非圧縮タイルから ``[top, bottom)`` 行だけを読み込む。"""
+    strip = Image.new(img.mode, (img.width, bottom - top))
+    with open(path, "rb") as f:
+        for (_, ty0, _, ty1), offset, rawmode, stride, orientation in layout:
+            start, end = max(top, ty0), min(bottom, ty1)
+            if start >= end:
+                continue
+            # 下から上に格納されたタイルは、ファイル上の行位置を反転して読む
+            if orientation < 0:
+                first_row = (ty1 - ty0) - (end - ty0)
+            else:
+                first_row = start - ty0
+            f.seek(offset + first_row * stride)
+            data = f.read((end - start) * stride)
+            if len(data) < (end - start) * stride:
+                raise ValueError(f"画像データが不足しています: {path.name}")
+            piece = Image.frombytes(
+                img.mode,
+                (img.width, end - start),
+                data,
+                "raw",
+                rawmode,
+                stride,
+                orientation,
+            )
+            strip.paste(piece, (0, start - top))
+    return strip
+
+
+def _png_layout(path: Path) -> str | None:
+    """逐次展開できるPNG（ビット深度8・非インターレース）のモードを取得。
+
+    それ以外のPNG（16bit・1/2/4bit・インターレース）や、PNG以外の場合はNone。
+    """
+    # シグネチャ8バイト、IHDRの長さ・種別8バイト、IHDRのデータ13バイト
+    with open(path, "rb") as f:
+        header = f.read(29)
+    if len(header) < 29 or header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        return None
+    depth, color_type, _, _, interlace = struct.unpack(">5B", header[24:29])
+    if depth != 8 or interlace:
+        return None
+    return _PNG_MODES.get(color_type)
+
+
+def _iter_idat(f: BinaryIO) -> Iterator[bytes]:
+    """PNGのIDATチャンクのデータを先頭から順に読む。"""
+    f.seek(len(PNG_SIGNATURE))
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        length, chunk_type = struct.unpack(">I4s", head)
+        if chunk_type == b"IEND":
+            return
+        if chunk_type == b"IDAT":
+            yield f.read(length)
+            f.seek(4, 1)
+        else:
+            f.seek(length + 4, 1)
+
+
+def _iter_png_rows(
+    path: Path,
+    mode: str,
+    width: int,
+    y0: int,
+    y1: int,
+    strip_rows: int,
+) -> Iterator[Image.Image]:
+    """PNGのIDATを逐次展開し、``[y0, y1)`` 行を ``strip_rows`` 行ずつ返す。
+
+    フィルタはストリップごとにPillowのzipデコーダーで解除する。直前の行を
+    フィルタなしの行として先頭に付けると、Up/Average/Paethが参照する前の行が
+    つながるため、ストリップ1つ分のデータだけで正しく復元できる。
+    """
+    row_bytes = width * Image.getmodebands(mode)
+    stride = row_bytes + 1
+    decompressor = zlib.decompressobj()
+    previous = bytes(row_bytes)
+
+    with open(path, "rb") as f:
+        chunks = _iter_idat(f)
+
+        def read_rows(count: int) -> Image.Image:
+            nonlocal previous
+            wanted = count * stride
+            parts: list[bytes] = []
+            size = 0
+            while size < wanted:
+                data = decompressor.unconsumed_tail or next(chunks, None)
+                if data is None:
+                    raise ValueError(f"画像データが不足しています: {path.name}")
+                # 展開するのはストリップ1つ分まで（残りは unconsumed_tail に残る）
+                out = decompressor.decompress(data, wanted - size)
+                parts.append(out)
+                size += len(out)
+            # 無圧縮のzlibストリームに包み直し、フィルタの解除だけをデコーダーに任せる
+            stream = zlib.compress(b"\0" + previous + b"".join(parts), 0)
+            rows = Image.frombytes(mode, (width, count + 1), stream, "zip", mode)
+            strip = rows.crop((0, 1, width, count + 1))
+            previous = strip.crop((0, count - 1, width, count)).tobytes()
+            return strip
+
+        # 切り抜き範囲より上の行も、次の行のフィルタの参照のために展開する
+        for top in range(0, y0, strip_rows):
+            read_rows(min(strip_rows, y0 - top))
+        for top in range(y0, y1, strip_rows):
+            yield read_rows(min(strip_rows, y1 - top))
+
+
+def iter_strips(
+    path: Path,
+    strip_rows: int,
+    *,
+    box: Box | None = None,
+) -> Iterator[Image.Image]:
+    """画像を上から順に ``strip_rows`` 行ずつのストリップとして読み込む。
+
+    非圧縮の形式とビット深度8の非インターレースPNGは必要な行だけを読む。
+    それ以外の形式は全体をデコードするため、警告を出す。
+
+    Parameters
+    ----------
+    path : Path
+        入力画像のパス
+    strip_rows : int
+        1ストリップの行数
+    box : Box | None
+        切り抜き範囲 (x0, y0, x1, y1)。Noneの場合は画像全体
+
+    Yields
+    ------
+    Image.Image
+        ストリップ画像（Pモードの場合はパレットと透過情報を引き継ぐ）
+
+    Raises
+    ------
+    ValueError
+        行数が1未満、または切り抜き範囲が画像の範囲外の場合
+    """
+    if strip_rows < 1:
+        raise ValueError(f"ストリップの行数は1以上である必要があります: {strip_rows}")
+
+    with Image.open(path) as img:
+        x0, y0, x1, y1 = _resolve_box(img.size, box)
+        # getpalette() は画像全体をデコードするため、読み込み済みのパレットを使う
+        palette = img.palette.getdata() if img.mode == "P" and img.palette else None
+        transparency = img.info.get("transparency")
+        layout = _raw_layout(img)
+        png_mode = _png_layout(path) if layout is None else None
+
+        strips: Iterator[Image.Image]
+        if layout is not None:
+            strips = (
+                _read_raw_rows(path, img, layout, top, min(top + strip_rows, y1))
+                for top in range(y0, y1, strip_rows)
+            )
+        elif png_mode == img.mode:
+            strips = _iter_png_rows(path, img.mode, img.width, y0, y1, strip_rows)
+        else:
+            logger.warning(
+                f"行単位で読めない形式のため全体をデコードします"
+                f"（メモリ上限を超える場合があります）: {path.name}"
+            )
+            img.load()
+            strips = (
+                img.crop((0, top, img.width, min(top + strip_rows, y1)))
+                for top in range(y0, y1, strip_rows)
+            )
+
+        for strip in strips:
+            if (x0, x1) != (0, img.width):
+                strip = strip.crop((x0, 0, x1, strip.height))
+            if palette is not None:
+                strip.putpalette(palette[1], palette[0])
+            if transparency is not None:
+                strip.info["transparency"] = transparency
+            yield strip
+
+
+def _png_mode(image: Image.Image) -> Image.Image:
+    """ストリップをPNGの逐次書き出しが扱えるモードに変換する。"""
+    if is_supported_mode(image.mode):
+        return image
+    if image.mode in ("P", "PA"):
+        has_alpha = image.mode == "PA" or "transparency" in image.info
+        return image.convert("RGBA" if has_alpha else "RGB")
+    if image.mode in ("1", "I;16", "I", "F"):
+        return image.convert("L")
+    return image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+
+def _match_mode(image: Image.Image, mode: str) -> Image.Image:
+    """先頭のストリップとモードが異なる場合に揃える。"""
+    return image if image.mode == mode else image.convert(mode)
+
+
+def process_tiled(
+    input_path: Path,
+    output_path: Path,
+    *,
+    image_format: str | None = None,
+    box: Box | None = None,
+    background: tuple[int, int, int] = (255, 255, 255),
+    memory_budget: int = DEFAULT_TILE_MEMORY,
+    preset: EncoderPreset | None = None,
+    quality: int | None = None,
+    transform: Callable[[Image.Image], Image.Image] | None = None,
+    preserve_metadata: bool = False,
+) -> Path:
+    """画像をストリップ単位で切り抜き・変換して保存。
+
+    作業メモリが ``memory_budget`` 程度に収まるのは、入力が非圧縮の形式または
+    ビット深度8の非インターレースPNGで、出力がPNGの場合に限る。それ以外の入力は
+    全体をデコードし、PNG以外の出力は出力画像全体を持つ（いずれも警告を出す）。
+
+    Parameters
+    ----------
+    input_path : Path
+        入力画像のパス
+    output_path : Path
+        出力ファイルのパス
+    image_format : str | None
+        出力フォーマット。Noneの場合は出力パスの拡張子から判定
+    box : Box | None
+        切り抜き範囲 (x0, y0, x1, y1)。Noneの場合は画像全体
+    background : tuple[int, int, int]
+        JPEG出力時に透過部分を合成する背景色
+    memory_budget : int
+        ストリップ処理に使うメモリの上限（バイト）
+    preset : EncoderPreset | None
+        エンコーダープリセット
+    quality : int | None
+        JPEG/WebPの画質
+    transform : Callable[[Image.Image], Image.Image] | None
+        各ストリップに適用する変換（行数と幅を変えないこと）
+    preserve_metadata : bool
+        ICCプロファイルとEXIFを出力に引き継ぐか。Falseの場合は各ストリップを
+        埋め込みプロファイルに従ってsRGBに変換する（``apply_color_policy`` を参照）
+
+    Returns
+    -------
+    Path
+        出力ファイルのパス
+
+    Raises
+    ------
+    ValueError
+        切り抜き範囲が不正、または変換でストリップのサイズが変わった場合
+    Image.DecompressionBombError
+        画素数が ``Image.MAX_IMAGE_PIXELS`` を超えている場合
+    """
+    pillow_format = to_pillow_format(image_format) if image_format else (
+        format_from_path(output_path)
+    )
+    options: dict[str, Any] = get_save_options(pillow_format, preset, quality=quality)
+
+    with Image.open(input_path) as img:
+        check_pixels(*img.size)
+        source_mode = img.mode
+        x0, y0, x1, y1 = _resolve_box(img.size, box)
+        info: dict[str, Any] = {"dpi": img.info["dpi"]} if "dpi" in img.info else {}
+        source_info = {
+            key: img.info[key] for key in ("icc_profile", "exif") if key in img.info
+        }
+    size = (x1 - x0, y1 - y0)
+    strip_rows = strip_rows_for_budget(size[0], source_mode, memory_budget)
+    logger.debug(f"ストリップ処理 {input_path.name}: {size}, {strip_rows}行/ストリップ")
+
+    def prepare(strip: Image.Image) -> Image.Image:
+        # 画像全体と同じ方針で色を管理する（sRGBへの変換はストリップごと、
+        # 変換オブジェクトはキャッシュされるため作成は1回）
+        strip.info.update(source_info)
+        strip, metadata = apply_color_policy(
+            strip, pillow_format, preserve_metadata=preserve_metadata
+        )
+        info.update(metadata)
+        if transform is not None:
+            transformed = transform(strip)
+            if transformed.size != strip.size:
+                raise ValueError("変換でストリップのサイズが変わっています")
+            strip = transformed
+        if pillow_format == "JPEG":
+            strip = flatten_alpha(strip, background)
+        elif pillow_format == "PNG":
+            strip = _png_mode(strip)
+        return strip
+
+    strips = (prepare(strip) for strip in iter_strips(input_path, strip_rows, box=box))
+
+    if pillow_format == "PNG":
+        first = next(strips)
+        compress_level = options.get("compress_level", 6)
+        with open(output_path, "wb") as f:
+            with PngStripWriter(
+                f, size, first.mode, info=info, compress_level=compress_level
+            ) as writer:
+                writer.write(first)
+                for strip in strips:
+                    writer.write(_match_mode(strip, first.mode))
+        return output_path
+
+    # 逐次書き出しできない形式は、変換済みストリップを貼り合わせてから保存する
+    logger.warning(
+        f"{pillow_format}は逐次書き出しできないため、出力画像全体をメモリに持ちます: "
+        f"{output_path.name}"
+    )
+    output: Image.Image | None = None
+    top = 0
+    for strip in strips:
+        if output is None:
+            output = Image.new(strip.mode, size)
+        output.paste(_match_mode(strip, output.mode), (0, top))
+        top += strip.height
+    assert output is not None
+    output.info.update(info)
+    for key in ("icc_profile", "exif"):
+        if key in info:
+            options.setdefault(key, info[key])
+    output.save(output_path, pillow_format, **options)
+    return output_path
+
@@ -5,14 +5,50 @@ from pathlib import Path
 
 # PEP 695型構文の使用
 type ProcessorStatus = Literal["success", "error", "pending"]
-type ImageFormat = Literal["png", "jpg", "jpeg", "webp", "dds", "bmp", "tiff"]
+type ImageFormat = Literal["png", "jpg", "jpeg", "webp", "gif", "dds", "bmp", "tiff"]
 type ProcessingMode = Literal["single", "batch", "recursive"]
 type BackgroundModel = Literal["u2net", "u2netp", "silueta", "isnet-general-use"]
+type BackgroundMethod = Literal["rembg", "flat", "chroma", "auto"]
+type ExecutorKind = Literal["thread", "process"]
+type EncoderPreset = Literal["fastest", "balanced", "smallest"]
+type PngFilter = Literal["none", "sub", "up", "average", "paeth", "adaptive"]
+type DdsCompression = Literal["bc1", "bc3"]
+type MemoryOperation = Literal["decode", "convert", "remove_background"]
+type DecodeSource = Literal["exif_thumbnail", "mpf_preview", "draft", "full"]
+type AlphaVideoCodec = Literal["vp9", "prores", "qtrle", "webp"]
+type MaskBits = Literal[8, 1]
+
+class QuantizeConfig(TypedDict, total=False):
+    """パレット減色（PNG-8）出力設定の型定義."""
+    max_colors: int
+    dither: bool
+    max_error: float
+    proxy_size: int
+
+class QualityTarget(TypedDict, total=False):
+    """目標画質・目標サイズによる画質探索の設定の型定義."""
+    ssim: float
+    psnr: float
+    max_bytes: int
+    min_quality: int
+    max_quality: int
+    proxy_size: int
+
+class MattingConfig(TypedDict, total=False):
+    """マスクの境界の補正（ガイデッドフィルタ）設定の型定義."""
+    radius: int
+    epsilon: float
+    open_radius: int
+    close_radius: int
 
 class ConversionConfig(TypedDict, total=False):
     """画像変換設定の型定義."""
     format: ImageFormat
     quality: int
+    preset: EncoderPreset
+    quantize: QuantizeConfig
+    quality_target: QualityTarget
+    sizes: list[int | None]
     remove_background: bool
     background_model: BackgroundModel
     output_dir: Path
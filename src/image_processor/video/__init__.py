@@ -1 +1,21 @@
-"""Video module for video processing."""
\ No newline at end of file
+"""Video module for video processing."""
+
+from image_processor.video.alpha_encoder import (
+    ALPHA_CODECS,
+    MIN_CHUNK_FRAMES,
+    build_encode_command,
+    concat_chunks,
+    encode_alpha_video,
+    plan_chunks,
+    video_extension,
+)
+
+__all__ = [
+    "ALPHA_CODECS",
+    "MIN_CHUNK_FRAMES",
+    "build_encode_command",
+    "concat_chunks",
+    "encode_alpha_video",
+    "plan_chunks",
+    "video_extension",
+]
@@ -0,0 +1,302 @@
+"""透過付き動画のチャンク並列エンコード.
+
+背景透過したフレーム列を、アルファチャンネルを保持できる形式で動画にする。
+
+- ``vp9``: WebM（VP9、yuva420p）。ブラウザで再生できる
+- ``prores``: QuickTime（ProRes 4444、yuva444p10le）。動画編集ソフト向け
+- ``qtrle``: QuickTime（Animation、argb）。可逆
+- ``webp``: アニメーションWebP（Pillowで作成、FFmpeg不要）
+
+FFmpegのエンコーダーは1プロセスでは全コアを使い切れないことが多い。
+フレーム列を連続した区間（チャンク）に分けて複数のFFmpegを同時に実行し、
+できたチャンクをconcatデマルチプレクサで再エンコードせずに連結する。
+各チャンクは独立したエンコードなので先頭は必ずキーフレームになり、
+ストリームコピーで連結できる。
+"""
+
+import logging
+import math
+import os
+import subprocess
+import tempfile
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from image_processor.conversion.animation import assemble_animation
+from image_processor.types import AlphaVideoCodec
+
+logger = logging.getLogger(__name__)
+
+# コーデックごとの拡張子とFFmpegの出力オプション
+ALPHA_CODECS: dict[AlphaVideoCodec, tuple[str, list[str]]] = {
+    "vp9": (
+        ".webm",
+        [
+            "-c:v", "libvpx-vp9", "-pix_fmt", "yuva420p",
+            "-b:v", "0", "-crf", "30", "-row-mt", "1", "-auto-alt-ref", "0",
+        ],
+    ),
+    "prores": (
+        ".mov",
+        ["-c:v", "prores_ks", "-profile:v", "4444", "-pix_fmt", "yuva444p10le"],
+    ),
+    "qtrle": (".mov", ["-c:v", "qtrle", "-pix_fmt", "argb"]),
+    "webp": (".webp", []),
+}
+
+# 1チャンクの最小フレーム数（短すぎるとプロセス起動とキーフレームの分だけ損をする）
+MIN_CHUNK_FRAMES = 48
+
+_ERROR_TAIL = 2000
+
+
+def video_extension(codec: AlphaVideoCodec) -> str:
+    """コーデックに対応する出力ファイルの拡張子を返す。"""
+    return ALPHA_CODECS[codec][0]
+
+
+def plan_chunks(
+    frame_count: int, workers: int, *, min_chunk_frames: int = MIN_CHUNK_FRAMES
+) -> list[tuple[int, int]]:
+    """フレーム列を同時にエンコードするチャンクに分ける。
+
+    Parameters
+    ----------
+    frame_count : int
+        フレーム数
+    workers : int
+        同時に実行するエンコーダーの数の上限
+    min_chunk_frames : int
+        1チャンクの最小フレーム数
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        各チャンクの (先頭のフレーム番号（0始まり）, フレーム数)
+
+    Raises
+    ------
+    ValueError
+        フレーム数や並列数が1未満の場合
+    """
+    if frame_count < 1:
+        raise ValueError(f"フレーム数は1以上である必要があります: {frame_count}")
+    if workers < 1 or min_chunk_frames < 1:
+        raise ValueError(
+            f"並列数と最小フレーム数は1以上である必要があります: "
+            f"{workers}, {min_chunk_frames}"
+        )
+    chunks = max(min(workers, frame_count // min_chunk_frames), 1)
+    size = math.ceil(frame_count / chunks)
+    return [
+        (start, min(size, frame_count - start))
+        for start in range(0, frame_count, size)
+    ]
+
+
+def build_encode_command(
+    frame_pattern: str,
+    start_number: int,
+    frame_count: int,
+    output_path: Path,
+    *,
+    fps: float,
+    codec: AlphaVideoCodec,
+    threads: int | None = None,
+    ffmpeg_path: str = "ffmpeg",
+) -> list[str]:
+    """連番画像の一部を透過付き動画にエンコードするFFmpegのコマンドを作成。
+
+    Parameters
+    ----------
+    frame_pattern : str
+        連番画像のパターン（例: ``"frames/clip_%04d.png"``）
+    start_number : int
+        先頭のフレームの番号
+    frame_count : int
+        エンコードするフレーム数
+    output_path : Path
+        出力ファイルのパス
+    fps : float
+        フレームレート
+    codec : AlphaVideoCodec
+        ``"vp9"`` / ``"prores"`` / ``"qtrle"``
+    threads : int | None
+        エンコーダーのスレッド数。Noneの場合はFFmpegの既定値
+    ffmpeg_path : str
+        FFmpegの実行パス
+
+    Returns
+    -------
+    list[str]
+        コマンドの引数
+
+    Raises
+    ------
+    ValueError
+        FFmpegでエンコードしないコーデックの場合
+    """
+    if codec == "webp":
+        raise ValueError("webpはFFmpegではなくPillowで作成します")
+    command = [
+        ffmpeg_path, "-hide_banner", "-loglevel", "error",
+        "-framerate", str(fps),
+        "-start_number", str(start_number),
+        "-i", frame_pattern,
+        "-frames:v", str(frame_count),
+        *ALPHA_CODECS[codec][1],
+    ]
+    if threads is not None:
+        command.extend(["-threads", str(threads)])
+    command.extend(["-y", str(output_path)])
+    return command
+
+
+def _run(command: list[str]) -> None:
+    """FFmpegを実行し、失敗した場合は標準エラーの末尾を含めて例外にする。"""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError as e:
+        raise RuntimeError(f"FFmpegが見つかりません: {command[0]}") from e
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"FFmpegの実行に失敗しました: {result.stderr[-_ERROR_TAIL:]}"
+        )
+
+
+def concat_chunks(
+    chunk_paths: Sequence[Path], output_path: Path, *, ffmpeg_path: str = "ffmpeg"
+) -> Path:
+    """同じ設定でエンコードしたチャンクを再エンコードせずに連結する。
+
+    Parameters
+    ----------
+    chunk_paths : Sequence[Path]
+        チャンクのファイルパス（再生順）
+    output_path : Path
+        出力ファイルのパス
+    ffmpeg_path : str
+        FFmpegの実行パス
+
+    Returns
+    -------
+    Path
+        出力ファイルのパス
+
+    Raises
+    ------
+    RuntimeError
+        FFmpegの実行に失敗した場合
+    """
+    list_path = output_path.with_name(f".{output_path.stem}_chunks.txt")
+    lines = [f"file '{path.resolve().as_posix()}'" for path in chunk_paths]
+    list_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    try:
+        _run(
+            [
+                ffmpeg_path, "-hide_banner", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", str(list_path),
+                "-c", "copy", "-y", str(output_path),
+            ]
+        )
+    finally:
+        list_path.unlink(missing_ok=True)
+    return output_path
+
+
+def encode_alpha_video(
+    frame_pattern: str,
+    frame_count: int,
+    output_path: Path,
+    *,
+    fps: float = 30,
+    codec: AlphaVideoCodec = "vp9",
+    start_number: int = 1,
+    workers: int | None = None,
+    ffmpeg_path: str = "ffmpeg",
+) -> Path:
+    """透過付きの連番画像を、アルファを保持した動画にエンコードする。
+
+    FFmpegのコーデックでは、フレーム列をチャンクに分けて最大 ``workers`` 個の
+    FFmpegで同時にエンコードし、ストリームコピーで連結する。スレッド数は
+    CPU数をチャンク数で分ける。``webp`` はPillowで1枚ずつ書き出す。
+
+    Parameters
+    ----------
+    frame_pattern : str
+        連番画像のパターン（例: ``"frames/clip_%04d.png"``）
+    frame_count : int
+        フレーム数
+    output_path : Path
+        出力ファイルのパス
+    fps : float
+        フレームレート
+    codec : AlphaVideoCodec
+        出力のコーデック
+    start_number : int
+        先頭のフレームの番号
+    workers : int | None
+        同時に実行するエンコーダーの数。Noneの場合はCPU数
+    ffmpeg_path : str
+        FFmpegの実行パス
+
+    Returns
+    -------
+    Path
+        出力ファイルのパス
+
+    Raises
+    ------
+    ValueError
+        フレーム数・フレームレート・並列数が不正な場合
+    RuntimeError
+        FFmpegの実行に失敗した場合
+    """
+    if fps <= 0:
+        raise ValueError(f"フレームレートは正の値である必要があります: {fps}")
+    cpu_count = os.cpu_count() or 1
+    chunks = plan_chunks(frame_count, workers or cpu_count)
+
+    if codec == "webp":
+        frames = [
+            Path(frame_pattern % (start_number + i)) for i in range(frame_count)
+        ]
+        return assemble_animation(
+            frames,
+            output_path,
+            duration=round(1000 / fps),
+            image_format="webp",
+        )
+
+    if len(chunks) == 1:
+        _run(
+            build_encode_command(
+                frame_pattern, start_number, frame_count, output_path,
+                fps=fps, codec=codec, ffmpeg_path=ffmpeg_path,
+            )
+        )
+        return output_path
+
+    threads = max(cpu_count // len(chunks), 1)
+    extension = video_extension(codec)
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as temp_dir:
+        chunk_paths = [
+            Path(temp_dir) / f"chunk_{index:04d}{extension}"
+            for index in range(len(chunks))
+        ]
+        commands = [
+            build_encode_command(
+                frame_pattern, start_number + start, count, chunk_path,
+                fps=fps, codec=codec, threads=threads, ffmpeg_path=ffmpeg_path,
+            )
+            for (start, count), chunk_path in zip(chunks, chunk_paths, strict=True)
+        ]
+        logger.debug(
+            f"{output_path.name}: {frame_count}フレームを{len(chunks)}チャンクで"
+            f"エンコード（各{threads}スレッド）"
+        )
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            list(pool.map(_run, commands))
+        concat_chunks(chunk_paths, output_path, ffmpeg_path=ffmpeg_path)
+    return output_path
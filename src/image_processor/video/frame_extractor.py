@@ -2,13 +2,19 @@
 
 import subprocess
 import logging
+import tempfile
 from pathlib import Path
 from typing import Iterator
 import time
 
+from PIL import Image
+
 from image_processor.types import ProcessorStatus, ProcessingResult, VideoConfig
 from image_processor.core.common import create_processing_result, format_file_size
 
+# エラー時に例外メッセージへ含めるFFmpegの標準エラー出力の末尾のバイト数
+_ERROR_TAIL = 2000
+
 
 class FrameExtractor:
     """動画からフレームを抽出するクラス."""
@@ -232,6 +238,86 @@ class FrameExtractor:
                 processing_time=time.perf_counter() - start_time,
             )
 
+    def iter_frames(
+        self,
+        video_path: Path,
+        *,
+        config: VideoConfig | None = None,
+    ) -> Iterator[Image.Image]:
+        """動画のフレームをファイルに書き出さずに順次取得。
+
+        FFmpegの生フレーム出力（rgb24）をパイプで読み込むため、
+        PNGのエンコード・デコードが発生しない。
+
+        Parameters
+        ----------
+        video_path : Path
+            入力動画ファイルのパス
+        config : VideoConfig | None
+            動画処理設定
+
+        Yields
+        ------
+        Image.Image
+            RGBフレーム
+
+        Raises
+        ------
+        RuntimeError
+            動画の解像度が取得できない場合、またはFFmpegが異常終了した場合
+        """
+        info = self.get_video_info(video_path)
+        if not info or "width" not in info or "height" not in info:
+            raise RuntimeError(f"動画の解像度を取得できません: {video_path}")
+        width, height = int(info["width"]), int(info["height"])
+
+        frame_interval = config.get("frame_interval", 30) if config else 30
+        start_sec = config.get("start_time", 0.0) if config else 0.0
+        end_sec = config.get("end_time") if config else None
+
+        cmd = [
+            self.ffmpeg_path,
+            "-loglevel", "error",
+            "-i", str(video_path),
+            "-vf", f"select='not(mod(n,{frame_interval}))'",
+            "-vsync", "vfr",
+        ]
+        if start_sec > 0:
+            cmd.extend(["-ss", str(start_sec)])
+        if end_sec is not None:
+            cmd.extend(["-t", str(end_sec - start_sec)])
+        cmd.extend(["-f", "rawvideo", "-pix_fmt", "rgb24", "-"])
+
+        frame_size = width * height * 3
+        # 標準エラー出力をパイプにすると、読み出さない間にFFmpegが書き込みで
+        # 止まるため一時ファイルに受ける
+        with tempfile.TemporaryFile() as errors:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+            stdout = process.stdout
+            if stdout is None:
+                process.kill()
+                process.wait()
+                raise RuntimeError("FFmpegの出力を読み込めません")
+            try:
+                while True:
+                    data = stdout.read(frame_size)
+                    if len(data) < frame_size:
+                        break
+                    yield Image.frombytes("RGB", (width, height), data)
+                # 途中で読むのをやめた場合は終了コードを見ない（こちらで終了させるため）
+                if process.wait() != 0:
+                    errors.seek(0)
+                    message = errors.read()[-_ERROR_TAIL:].decode(errors="replace")
+                    raise RuntimeError(
+                        f"フレームの抽出に失敗しました ({video_path.name}): "
+                        f"{message.strip()}"
+                    )
+            finally:
+                stdout.close()
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+
     def extract_frames_batch(
         self,
         video_paths: list[Path],
@@ -0,0 +1,173 @@
+"""透過付き動画のチャンク並列エンコードのテストモジュール."""
+
+import shutil
+import subprocess
+from itertools import pairwise
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from image_processor.conversion.animation import iter_frames
+from image_processor.video.alpha_encoder import (
+    build_encode_command,
+    encode_alpha_video,
+    plan_chunks,
+    video_extension,
+)
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="ffmpegがインストールされていません"
+)
+
+
+def _write_frames(directory: Path, count: int) -> str:
+    """左から右へ動く半透明の四角形の連番PNG（1始まり）を作成し、パターンを返す。"""
+    for index in range(count):
+        frame = Image.new("RGBA", (64, 48), (0, 0, 0, 0))
+        frame.paste((200, 60, 30, 160), (index % 48, 10, index % 48 + 16, 38))
+        frame.save(directory / f"clip_{index + 1:04d}.png")
+    return str(directory / "clip_%04d.png")
+
+
+class TestPlanChunks:
+    """plan_chunks関数のテストクラス."""
+
+    def test_正常系_連続した区間で全フレームを覆う(self) -> None:
+        """チャンクが隙間なく重ならずに全フレームを覆うことを確認。"""
+        chunks = plan_chunks(1000, 4, min_chunk_frames=48)
+
+        assert len(chunks) == 4
+        assert chunks[0][0] == 0
+        for (start, count), (next_start, _) in pairwise(chunks):
+            assert start + count == next_start
+        assert sum(count for _, count in chunks) == 1000
+
+    def test_正常系_短い動画はチャンク数を減らす(self) -> None:
+        """最小フレーム数を下回らないようにチャンク数が減ることを確認。"""
+        assert plan_chunks(100, 8, min_chunk_frames=48) == [(0, 50), (50, 50)]
+        assert plan_chunks(30, 8, min_chunk_frames=48) == [(0, 30)]
+
+    def test_異常系_フレーム数が0(self) -> None:
+        """フレーム数が0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="フレーム数"):
+            plan_chunks(0, 4)
+
+    def test_異常系_並列数が0(self) -> None:
+        """並列数が0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="並列数"):
+            plan_chunks(100, 0)
+
+
+class TestBuildEncodeCommand:
+    """build_encode_command関数のテストクラス."""
+
+    @pytest.mark.parametrize(
+        ("codec", "pix_fmt", "extension"),
+        [
+            ("vp9", "yuva420p", ".webm"),
+            ("prores", "yuva444p10le", ".mov"),
+            ("qtrle", "argb", ".mov"),
+        ],
+    )
+    def test_正常系_アルファ付きの画素形式(
+        self, codec: str, pix_fmt: str, extension: str
+    ) -> None:
+        """各コーデックでアルファを保持する画素形式が指定されることを確認。"""
+        command = build_encode_command(
+            "frames/clip_%04d.png",
+            1,
+            10,
+            Path(f"out{extension}"),
+            fps=24,
+            codec=codec,  # type: ignore[arg-type]
+        )
+
+        assert command[command.index("-pix_fmt") + 1] == pix_fmt
+        assert video_extension(codec) == extension  # type: ignore[arg-type]
+        assert "yuv420p" not in command
+
+    def test_正常系_区間とフレームレートを指定(self) -> None:
+        """開始番号・フレーム数・フレームレート・スレッド数が渡ることを確認。"""
+        command = build_encode_command(
+            "frames/clip_%04d.png",
+            251,
+            250,
+            Path("chunk.webm"),
+            fps=24,
+            codec="vp9",
+            threads=2,
+        )
+
+        assert command[command.index("-framerate") + 1] == "24"
+        assert command[command.index("-start_number") + 1] == "251"
+        assert command[command.index("-frames:v") + 1] == "250"
+        assert command[command.index("-threads") + 1] == "2"
+        assert command[-1] == "chunk.webm"
+
+    def test_異常系_webpはFFmpegを使わない(self) -> None:
+        """webpを指定した場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="webp"):
+            build_encode_command(
+                "clip_%04d.png", 1, 10, Path("out.webp"), fps=24, codec="webp"
+            )
+
+
+class TestEncodeAlphaVideo:
+    """encode_alpha_video関数のテストクラス."""
+
+    def test_正常系_アニメーションWebPでアルファを保持(self, temp_dir: Path) -> None:
+        """webpでは全フレームが透過付きで書き出されることを確認。"""
+        pattern = _write_frames(temp_dir, 5)
+        output = temp_dir / "out.webp"
+
+        result = encode_alpha_video(pattern, 5, output, fps=20, codec="webp")
+
+        frames = list(iter_frames(result))
+        assert [f["duration"] for f in frames] == [50] * 5
+        first = frames[0]["image"]
+        assert first.getpixel((40, 0))[3] == 0
+        assert first.getpixel((8, 20))[3] == 160
+
+    def test_異常系_フレームレートが0(self, temp_dir: Path) -> None:
+        """フレームレートが0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="フレームレート"):
+            encode_alpha_video("clip_%04d.png", 5, temp_dir / "out.webm", fps=0)
+
+    def test_異常系_FFmpegが見つからない(self, temp_dir: Path) -> None:
+        """FFmpegの実行パスが存在しない場合にRuntimeErrorが発生することを確認。"""
+        pattern = _write_frames(temp_dir, 3)
+
+        with pytest.raises(RuntimeError, match="FFmpeg"):
+            encode_alpha_video(
+                pattern,
+                3,
+                temp_dir / "out.webm",
+                ffmpeg_path=str(temp_dir / "missing-ffmpeg"),
+            )
+
+    @requires_ffmpeg
+    @pytest.mark.parametrize("codec", ["vp9", "prores", "qtrle"])
+    def test_正常系_チャンクを連結しても全フレームが残る(
+        self, temp_dir: Path, codec: str
+    ) -> None:
+        """複数チャンクで並列にエンコードして連結した動画のフレーム数を確認。"""
+        pattern = _write_frames(temp_dir, 120)
+        output = temp_dir / f"out{video_extension(codec)}"  # type: ignore[arg-type]
+
+        encode_alpha_video(
+            pattern, 120, output, fps=24, codec=codec, workers=2  # type: ignore[arg-type]
+        )
+
+        probe = subprocess.run(
+            [
+                "ffprobe", "-v", "error", "-count_frames", "-select_streams", "v:0",
+                "-show_entries", "stream=nb_read_frames", "-of", "csv=p=0",
+                str(output),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert int(probe.stdout.strip()) == 120
+        assert not list(temp_dir.glob("tmp*"))
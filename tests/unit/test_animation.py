@@ -0,0 +1,225 @@
+"""アニメーション画像の変換のテストモジュール."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_processor.conversion.animation import (
+    assemble_animation,
+    convert_animation,
+    frame_count,
+    is_animated,
+    iter_frames,
+    save_frames,
+)
+
+DURATIONS = [50, 60, 70, 80, 90]
+
+
+def _sprite_frames() -> list[Image.Image]:
+    """透過背景の上を赤い四角が移動するフレームを作成。"""
+    frames = []
+    for i in range(len(DURATIONS)):
+        frame = Image.new("RGBA", (40, 30), (0, 0, 0, 0))
+        frame.paste((255, i * 50, 0, 255), (i * 5, 0, i * 5 + 10, 10))
+        frames.append(frame)
+    return frames
+
+
+@pytest.fixture
+def animated_gif(temp_dir: Path) -> Path:
+    """前フレームを背景に戻す（disposal=2）アニメーションGIF。"""
+    path = temp_dir / "sprite.gif"
+    frames = _sprite_frames()
+    frames[0].save(
+        path,
+        save_all=True,
+        append_images=frames[1:],
+        duration=DURATIONS,
+        loop=0,
+        disposal=2,
+    )
+    return path
+
+
+class TestIterFrames:
+    """iter_frames関数のテストクラス."""
+
+    def test_正常系_合成済みフレームと表示時間(self, animated_gif: Path) -> None:
+        """破棄方法を反映したフレームと表示時間が順に得られることを確認。"""
+        frames = list(iter_frames(animated_gif))
+
+        assert [f["index"] for f in frames] == list(range(len(DURATIONS)))
+        assert [f["duration"] for f in frames] == DURATIONS
+        for frame, expected in zip(frames, _sprite_frames(), strict=True):
+            assert frame["image"].mode == "RGBA"
+            # 前のフレームの四角が残っていないこと
+            assert np.array_equal(
+                np.asarray(frame["image"])[..., 3], np.asarray(expected)[..., 3]
+            )
+
+    def test_正常系_WebPの表示時間(self, temp_dir: Path) -> None:
+        """WebPでもフレームごとの表示時間が得られることを確認。"""
+        path = temp_dir / "sprite.webp"
+        frames = _sprite_frames()
+        frames[0].save(
+            path, save_all=True, append_images=frames[1:], duration=DURATIONS
+        )
+
+        assert [f["duration"] for f in iter_frames(path)] == DURATIONS
+
+    def test_エッジケース_静止画(self, temp_dir: Path) -> None:
+        """静止画は1フレームとして扱われることを確認。"""
+        path = temp_dir / "still.png"
+        Image.new("RGB", (8, 8)).save(path)
+
+        assert frame_count(path) == 1
+        assert not is_animated(path)
+        assert len(list(iter_frames(path))) == 1
+
+
+class TestConvertAnimation:
+    """convert_animation関数のテストクラス."""
+
+    @pytest.mark.parametrize("suffix", [".png", ".gif", ".webp"])
+    def test_正常系_フレーム数と表示時間を維持(
+        self, temp_dir: Path, animated_gif: Path, suffix: str
+    ) -> None:
+        """変換後もフレーム数・表示時間・透過が維持されることを確認。"""
+        output = temp_dir / f"converted{suffix}"
+
+        convert_animation(animated_gif, output, quality=100)
+
+        assert is_animated(output)
+        frames = list(iter_frames(output))
+        assert [f["duration"] for f in frames] == DURATIONS
+        for frame, expected in zip(frames, _sprite_frames(), strict=True):
+            alpha = np.asarray(frame["image"])[..., 3].astype(int)
+            assert np.abs(alpha - np.asarray(expected)[..., 3]).max() <= 8
+
+    @pytest.mark.parametrize(
+        ("suffix", "expected"), [(".gif", None), (".webp", 1), (".png", 1)]
+    )
+    def test_正常系_ループ指定のないGIFは1回再生(
+        self, temp_dir: Path, suffix: str, expected: int | None
+    ) -> None:
+        """ループ拡張のないGIFが無限ループに変換されないことを確認。"""
+        source = temp_dir / "once.gif"
+        frames = _sprite_frames()
+        frames[0].save(
+            source, save_all=True, append_images=frames[1:], duration=DURATIONS
+        )
+        output = temp_dir / f"converted{suffix}"
+
+        convert_animation(source, output)
+
+        with Image.open(output) as result:
+            assert result.info.get("loop") == expected
+            assert result.n_frames == len(DURATIONS)
+
+    def test_正常系_フレームごとの変換(self, temp_dir: Path, animated_gif: Path) -> None:
+        """各フレームに変換が適用されることを確認。"""
+        output = temp_dir / "half.png"
+
+        convert_animation(
+            animated_gif, output, transform=lambda image: image.resize((20, 15))
+        )
+
+        with Image.open(output) as result:
+            assert result.size == (20, 15)
+            assert result.n_frames == len(DURATIONS)
+
+    def test_異常系_アニメーション非対応の形式(
+        self, temp_dir: Path, animated_gif: Path
+    ) -> None:
+        """JPEGへの変換でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="アニメーションに対応していない"):
+            convert_animation(animated_gif, temp_dir / "out.jpg")
+
+
+class TestSaveFrames:
+    """save_frames関数のテストクラス."""
+
+    def test_正常系_フレームごとの出力(self, temp_dir: Path, animated_gif: Path) -> None:
+        """フレーム番号付きのファイル名で全フレームが保存されることを確認。"""
+        output_dir = temp_dir / "frames"
+        output_dir.mkdir()
+
+        paths = save_frames(animated_gif, output_dir, image_format="jpg")
+
+        assert [p.name for p in paths] == [
+            f"sprite_{i:04d}.jpg" for i in range(len(DURATIONS))
+        ]
+        with Image.open(paths[0]) as first:
+            assert first.mode == "RGB"
+
+
+class TestAssembleAnimation:
+    """assemble_animation関数のテストクラス."""
+
+    @pytest.mark.parametrize("suffix", [".gif", ".webp"])
+    def test_正常系_ファイルのフレーム列から作成(
+        self, temp_dir: Path, suffix: str
+    ) -> None:
+        """保存済みのフレーム画像から表示時間付きのアニメーションを作成できることを確認。"""
+        paths = []
+        for i, frame in enumerate(_sprite_frames()):
+            path = temp_dir / f"frame_{i:04d}.png"
+            frame.save(path)
+            paths.append(path)
+        output = temp_dir / f"preview{suffix}"
+
+        assemble_animation(paths, output, duration=DURATIONS)
+
+        frames = list(iter_frames(output))
+        assert [f["duration"] for f in frames] == DURATIONS
+        for frame, expected in zip(frames, _sprite_frames(), strict=True):
+            alpha = np.asarray(frame["image"])[..., 3].astype(int)
+            assert np.abs(alpha - np.asarray(expected)[..., 3]).max() <= 8
+
+    @pytest.mark.parametrize("suffix", [".gif", ".webp"])
+    def test_正常系_同じフレームをまとめる(self, temp_dir: Path, suffix: str) -> None:
+        """連続する同じフレームが表示時間を加算した1フレームになることを確認。"""
+        red = Image.new("RGB", (16, 16), (255, 0, 0))
+        blue = Image.new("RGB", (16, 16), (0, 0, 255))
+        output = temp_dir / f"dedup{suffix}"
+
+        assemble_animation(
+            iter([red, red.copy(), red.copy(), blue]),
+            output,
+            duration=100,
+            frame_count=4,
+        )
+
+        assert [f["duration"] for f in iter_frames(output)] == [300, 100]
+
+    def test_正常系_イテレーターからGIFを作成(self, temp_dir: Path) -> None:
+        """フレーム数の分からないイテレーターからGIFを作成できることを確認。"""
+        def frames() -> Iterator[Image.Image]:
+            for i in range(20):
+                frame = Image.new("L", (40, 8), 0)
+                frame.paste(255, (i * 2, 0, i * 2 + 4, 8))
+                yield frame
+
+        output = temp_dir / "moving.gif"
+
+        assemble_animation(frames(), output, palette_samples=4)
+
+        assert frame_count(output) == 20
+
+    def test_異常系_WebPでフレーム数が不明(self, temp_dir: Path) -> None:
+        """長さのないイテレーターからWebPを作成するとValueErrorが発生することを確認。"""
+        frames = iter([Image.new("RGB", (8, 8))])
+
+        with pytest.raises(ValueError, match="フレーム数の指定"):
+            assemble_animation(frames, temp_dir / "out.webp")
+
+    def test_異常系_表示時間が不足(self, temp_dir: Path) -> None:
+        """表示時間の数がフレーム数より少ない場合にValueErrorが発生することを確認。"""
+        frames = [Image.new("RGB", (8, 8), (i, 0, 0)) for i in range(3)]
+
+        with pytest.raises(ValueError, match="表示時間の数"):
+            assemble_animation(frames, temp_dir / "out.gif", duration=[100, 100])
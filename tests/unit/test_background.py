@@ -0,0 +1,380 @@
+"""背景透過のセグメンテーションバックエンドのテストモジュール."""
+
+import importlib.util
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from image_processor.processing.background import (
+    AutoBackend,
+    ChromaKeyBackend,
+    FlatBackgroundBackend,
+    ProxyBackend,
+    RembgBackend,
+    SegmentationResult,
+    apply_mask,
+    box_sum,
+    create_backend,
+    flood_fill_from_border,
+    gather_pixels,
+    refine_mask_edges,
+    remove_background,
+)
+from image_processor.types import BackgroundMethod
+
+
+def _sprite(background: tuple[int, int, int] = (255, 255, 255)) -> Image.Image:
+    """単色背景に、背景と同じ色の穴を持つ円を描いた画像を作成。"""
+    image = Image.new("RGB", (120, 80), background)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((20, 10, 100, 70), fill=(200, 40, 40))
+    draw.ellipse((50, 30, 70, 50), fill=background)
+    return image
+
+
+def _noise(width: int = 120, height: int = 80) -> Image.Image:
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+
+class _FixedBackend:
+    """常に全体を前景とするフォールバック用のバックエンド."""
+
+    name: BackgroundMethod = "rembg"
+    cache_id = "fake"
+    resolution = 0
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        self.calls += 1
+        return SegmentationResult(
+            mask=Image.new("L", image.size, 255), confidence=1.0, backend="rembg"
+        )
+
+
+class TestFloodFillFromBorder:
+    """flood_fill_from_border関数のテストクラス."""
+
+    def test_正常系_外周とつながった領域だけを塗る(self) -> None:
+        """囲まれた候補画素は塗られないことを確認。"""
+        candidate = np.ones((7, 7), dtype=bool)
+        candidate[1:6, 1:6] = False
+        candidate[3, 3] = True
+
+        filled = flood_fill_from_border(candidate)
+
+        assert filled[0, 0] and filled[6, 3]
+        assert not filled[3, 3]
+        assert not filled[2, 2]
+
+    def test_正常系_曲がりくねった経路(self) -> None:
+        """行方向と列方向を何度も折り返す経路の奥まで塗られることを確認。"""
+        candidate = np.zeros((9, 9), dtype=bool)
+        # 左上の外周から入る渦巻き状の通路
+        for y, x in [(0, 1), (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7),
+                     (2, 7), (3, 7), (4, 7), (5, 7), (6, 7), (7, 7), (7, 6), (7, 5),
+                     (7, 4), (7, 3), (7, 2), (6, 2), (5, 2), (4, 2), (3, 2), (3, 3),
+                     (3, 4), (3, 5), (4, 5), (5, 5), (5, 4)]:
+            candidate[y, x] = True
+
+        filled = flood_fill_from_border(candidate)
+
+        assert np.array_equal(filled, candidate)
+
+    def test_正常系_折り返しの多い経路(self) -> None:
+        """折り返しが100回ある蛇行した通路の奥まで塗られることを確認。"""
+        turns = 100
+        candidate = np.zeros((2 * turns + 3, 12), dtype=bool)
+        candidate[0, 1] = True
+        for i in range(turns + 1):
+            y = 2 * i + 1
+            candidate[y, 1:11] = True
+            if i < turns:
+                # 通路の端を左右交互に次の通路とつなぐ
+                candidate[y + 1, 10 if i % 2 == 0 else 1] = True
+
+        filled = flood_fill_from_border(candidate)
+
+        assert np.array_equal(filled, candidate)
+
+    def test_エッジケース_候補なし(self) -> None:
+        """候補画素がない場合は何も塗られないことを確認。"""
+        assert not flood_fill_from_border(np.zeros((4, 5), dtype=bool)).any()
+
+
+class TestBoxSum:
+    """box_sum / gather_pixels関数のテストクラス."""
+
+    def test_正常系_窓の和(self) -> None:
+        """各画素の窓の和が素朴な計算と一致し、画像外は0として扱うことを確認。"""
+        values = np.arange(30, dtype=np.float64).reshape(5, 6)
+        padded = np.pad(values, 1)
+        expected = np.array(
+            [[padded[y:y + 3, x:x + 3].sum() for x in range(6)] for y in range(5)]
+        )
+
+        assert np.array_equal(box_sum(values, 1), expected)
+
+    def test_正常系_座標の画素を読み出す(self) -> None:
+        """ストリップをまたぐ座標でも各画素のRGBが得られることを確認。"""
+        rng = np.random.default_rng(0)
+        array = rng.integers(0, 256, (600, 40, 3), dtype=np.uint8)
+        ys = np.array([0, 5, 255, 256, 599])
+        xs = np.array([3, 39, 0, 17, 20])
+
+        pixels = gather_pixels(Image.fromarray(array), ys, xs)
+
+        assert np.array_equal(pixels, array[ys, xs])
+
+
+class TestFlatBackgroundBackend:
+    """FlatBackgroundBackendクラスのテストクラス."""
+
+    def test_正常系_単色背景を除去(self) -> None:
+        """外周とつながった背景だけが透明になり、穴は不透明のまま残ることを確認。"""
+        result = FlatBackgroundBackend().segment(_sprite())
+        mask = np.asarray(result["mask"])
+
+        assert result["backend"] == "flat"
+        assert result["confidence"] == pytest.approx(1.0)
+        assert mask[0, 0] == 0
+        assert mask[40, 30] == 255
+        assert mask[40, 60] == 255
+
+    def test_正常系_許容誤差内の色むらも背景(self) -> None:
+        """JPEGの圧縮ノイズ程度の色むらがあっても背景になることを確認。"""
+        rng = np.random.default_rng(1)
+        array = np.asarray(_sprite()).astype(np.int16)
+        array = np.clip(array + rng.integers(-8, 9, array.shape), 0, 255)
+        image = Image.fromarray(array.astype(np.uint8))
+
+        result = FlatBackgroundBackend().segment(image)
+
+        assert result["confidence"] == pytest.approx(1.0)
+        assert (np.asarray(result["mask"])[:5] == 0).all()
+
+    def test_エッジケース_単色でない背景は信頼度が低い(self) -> None:
+        """ノイズ画像では信頼度が0になることを確認。"""
+        assert FlatBackgroundBackend().segment(_noise())["confidence"] == 0.0
+
+    def test_エッジケース_前景がない画像は信頼度が低い(self) -> None:
+        """全体が単色の画像では信頼度が0になることを確認。"""
+        image = Image.new("RGB", (50, 50), "white")
+
+        assert FlatBackgroundBackend().segment(image)["confidence"] == 0.0
+
+    def test_異常系_許容誤差が範囲外(self) -> None:
+        """許容誤差が0-255の範囲外の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="許容誤差"):
+            FlatBackgroundBackend(256)
+
+
+class TestChromaKeyBackend:
+    """ChromaKeyBackendクラスのテストクラス."""
+
+    def test_正常系_キー色を除去(self) -> None:
+        """薄い影になったキー色も除去され、前景は残ることを確認。"""
+        image = _sprite(background=(0, 255, 0))
+        ImageDraw.Draw(image).rectangle((0, 0, 10, 10), fill=(0, 190, 0))
+
+        result = ChromaKeyBackend().segment(image)
+        mask = np.asarray(result["mask"])
+
+        assert result["confidence"] == pytest.approx(1.0)
+        assert mask[5, 5] == 0
+        assert mask[40, 30] == 255
+        # クロマキーは外周とのつながりを問わないため、穴も透明になる
+        assert mask[40, 60] == 0
+
+    def test_正常系_キー色を指定(self) -> None:
+        """青のキー色を指定できることを確認。"""
+        result = ChromaKeyBackend(key_color=(0, 0, 255)).segment(
+            _sprite(background=(0, 0, 255))
+        )
+
+        assert np.asarray(result["mask"])[0, 0] == 0
+
+
+class TestAutoBackend:
+    """AutoBackendクラスのテストクラス."""
+
+    def test_正常系_信頼度が高ければ単色背景の除去(self) -> None:
+        """単色背景の画像ではフォールバックを使わないことを確認。"""
+        fallback = _FixedBackend()
+        backend = AutoBackend(fallback=fallback)
+
+        result = backend.segment(_sprite())
+
+        assert result["backend"] == "flat"
+        assert fallback.calls == 0
+
+    def test_正常系_信頼度が低ければフォールバック(self) -> None:
+        """単色でない背景の画像ではフォールバックを使うことを確認。"""
+        fallback = _FixedBackend()
+        backend = AutoBackend(fallback=fallback)
+
+        result = backend.segment(_noise())
+
+        assert result["backend"] == "rembg"
+        assert fallback.calls == 1
+
+    def test_異常系_閾値が範囲外(self) -> None:
+        """閾値が0-1の範囲外の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="閾値"):
+            AutoBackend(threshold=1.5)
+
+
+class _SizeRecorder:
+    """受け取った画像のサイズを記録し、単色背景の除去を行うバックエンド."""
+
+    name: BackgroundMethod = "rembg"
+    cache_id = "fake"
+    resolution = 0
+
+    def __init__(self) -> None:
+        self.sizes: list[tuple[int, int]] = []
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        self.sizes.append(image.size)
+        result = FlatBackgroundBackend().segment(image)
+        result["backend"] = "rembg"
+        return result
+
+
+def _large_sprite() -> Image.Image:
+    """縮小推論の対象になる、くっきりした境界を持つ大きな画像を作成。"""
+    image = Image.new("RGB", (2400, 1600), "white")
+    ImageDraw.Draw(image).rectangle((601, 401, 1799, 1199), fill=(200, 40, 40))
+    return image
+
+
+class TestProxyBackend:
+    """ProxyBackendクラスとrefine_mask_edges関数のテストクラス."""
+
+    def test_正常系_縮小画像で推論して元のサイズのマスク(self) -> None:
+        """推論は縮小画像で行い、マスクは元のサイズになることを確認。"""
+        inner = _SizeRecorder()
+        backend = ProxyBackend(inner, proxy_size=512)
+
+        result = backend.segment(_large_sprite())
+
+        assert inner.sizes == [(600, 400)]
+        assert result["mask"].size == (2400, 1600)
+        assert result["backend"] == "rembg"
+        mask = np.asarray(result["mask"])
+        assert mask[0, 0] == 0
+        assert mask[800, 1200] == 255
+
+    def test_正常系_縮小率は長辺が下限を下回らない最大の整数(self) -> None:
+        """縮小後の長辺がproxy_size以上に保たれることを確認。"""
+        backend = ProxyBackend(_SizeRecorder(), proxy_size=1024)
+
+        assert backend.reduce_factor((6000, 4000)) == 5
+        assert backend.reduce_factor((2047, 100)) == 1
+
+    def test_正常系_小さい画像は縮小しない(self) -> None:
+        """proxy_sizeの2倍未満の画像はそのまま推論することを確認。"""
+        inner = _SizeRecorder()
+
+        ProxyBackend(inner, proxy_size=1024).segment(_sprite())
+
+        assert inner.sizes == [(120, 80)]
+
+    def test_正常系_境界の補正でくっきりした境界に戻る(self) -> None:
+        """拡大でぼけた境界が、補正で元画像の境界に一致することを確認。"""
+        image = _large_sprite()
+        plain = ProxyBackend(_SizeRecorder(), proxy_size=512).segment(image)
+        refined = ProxyBackend(
+            _SizeRecorder(), proxy_size=512, refine_edges=True
+        ).segment(image)
+
+        expected = np.zeros((1600, 2400), dtype=np.uint8)
+        expected[401:1200, 601:1800] = 255
+        plain_error = np.abs(np.asarray(plain["mask"]).astype(int) - expected).sum()
+        refined_error = np.abs(
+            np.asarray(refined["mask"]).astype(int) - expected
+        ).sum()
+        assert plain_error > 0
+        assert refined_error < plain_error / 10
+
+    def test_エッジケース_境界のないマスク(self) -> None:
+        """全体が前景のマスクはそのまま拡大されることを確認。"""
+        image = Image.new("RGB", (40, 20), "white")
+        proxy = image.reduce(4)
+
+        mask = refine_mask_edges(image, proxy, Image.new("L", proxy.size, 255))
+
+        assert mask.size == (40, 20)
+        assert (np.asarray(mask) == 255).all()
+
+    def test_異常系_縮小後の長辺が不正(self) -> None:
+        """proxy_sizeが1未満の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="長辺"):
+            ProxyBackend(FlatBackgroundBackend(), proxy_size=0)
+
+
+class TestCreateBackend:
+    """create_backend関数のテストクラス."""
+
+    @pytest.mark.parametrize(
+        ("method", "backend_type"),
+        [("flat", FlatBackgroundBackend), ("chroma", ChromaKeyBackend),
+         ("auto", AutoBackend)],
+    )
+    def test_正常系_名前からバックエンドを作成(
+        self, method: str, backend_type: type
+    ) -> None:
+        """rembgなしで作成できるバックエンドを確認。"""
+        assert isinstance(create_backend(method), backend_type)  # type: ignore[arg-type]
+
+    @pytest.mark.skipif(
+        importlib.util.find_spec("rembg") is not None,
+        reason="rembgがインストールされている",
+    )
+    def test_異常系_rembgが未インストール(self) -> None:
+        """rembgが未インストールの場合にImportErrorが発生することを確認。"""
+        with pytest.raises(ImportError, match="rembg"):
+            RembgBackend()
+
+    def test_正常系_縮小推論で包む(self) -> None:
+        """proxy_sizeを指定するとProxyBackendで包まれることを確認。"""
+        backend = create_backend("flat", proxy_size=256, refine_edges=True)
+
+        assert isinstance(backend, ProxyBackend)
+        assert isinstance(backend.inner, FlatBackgroundBackend)
+        assert backend.name == "flat"
+
+    def test_異常系_未対応の方法(self) -> None:
+        """未対応の方法でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="未対応"):
+            create_backend("unknown")  # type: ignore[arg-type]
+
+
+class TestRemoveBackground:
+    """remove_background/apply_mask関数のテストクラス."""
+
+    def test_正常系_マスクをアルファに合成(self) -> None:
+        """マスクがRGBAのアルファになることを確認。"""
+        image, result = remove_background(_sprite(), FlatBackgroundBackend())
+
+        assert image.mode == "RGBA"
+        assert np.array_equal(np.asarray(image)[..., 3], np.asarray(result["mask"]))
+
+    def test_正常系_元のアルファとの小さい方(self) -> None:
+        """元画像のアルファとマスクの小さい方が使われることを確認。"""
+        image = Image.new("RGBA", (4, 4), (10, 20, 30, 100))
+        mask = Image.new("L", (4, 4), 200)
+        mask.putpixel((0, 0), 50)
+
+        alpha = np.asarray(apply_mask(image, mask))[..., 3]
+
+        assert alpha[0, 0] == 50
+        assert alpha[1, 1] == 100
+
+    def test_異常系_マスクのサイズが異なる(self) -> None:
+        """マスクのサイズが画像と異なる場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="サイズ"):
+            apply_mask(Image.new("RGB", (4, 4)), Image.new("L", (5, 4)))
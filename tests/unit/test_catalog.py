@@ -0,0 +1,181 @@
+"""メディアカタログのテストモジュール."""
+
+import json
+import os
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from image_processor.core import catalog as catalog_module
+from image_processor.core.catalog import (
+    MediaCatalog,
+    parse_query,
+    probe_video,
+    read_image_header,
+)
+
+
+@pytest.fixture
+def media_dir(temp_dir: Path) -> Path:
+    """サイズ・形式・フレーム数の異なる画像を配置したディレクトリ。"""
+    Image.new("RGB", (3000, 100)).save(temp_dir / "wide.png")
+    Image.new("RGBA", (10, 20)).save(temp_dir / "small.png")
+    Image.new("RGB", (2500, 40)).save(temp_dir / "photo.jpg")
+    frames = [Image.new("RGB", (8, 8), (i * 80, 0, 0)) for i in range(3)]
+    frames[0].save(temp_dir / "anim.gif", save_all=True, append_images=frames[1:])
+    return temp_dir
+
+
+def _files(directory: Path) -> list[Path]:
+    return sorted(p for p in directory.iterdir() if p.suffix != ".db")
+
+
+class TestReadImageHeader:
+    """read_image_header関数のテストクラス."""
+
+    def test_正常系_ヘッダー情報(self, media_dir: Path) -> None:
+        """サイズ・モード・形式・フレーム数が取得できることを確認。"""
+        record = read_image_header(media_dir / "anim.gif")
+
+        assert record["kind"] == "image"
+        assert record["format"] == "gif"
+        assert (record["width"], record["height"]) == (8, 8)
+        assert record["frames"] == 3
+        assert record["size_bytes"] == (media_dir / "anim.gif").stat().st_size
+
+    def test_異常系_画像でないファイル(self, temp_dir: Path) -> None:
+        """画像でないファイルでOSErrorが発生することを確認。"""
+        path = temp_dir / "broken.png"
+        path.write_bytes(b"not an image")
+
+        with pytest.raises(OSError):
+            read_image_header(path)
+
+
+class TestProbeVideo:
+    """probe_video関数のテストクラス."""
+
+    def test_正常系_ffprobeの出力を解析(self, temp_dir: Path) -> None:
+        """ffprobeのJSON出力からサイズ・フレーム数・長さを取得できることを確認。"""
+        path = temp_dir / "clip.mp4"
+        path.write_bytes(b"\x00" * 16)
+        output = {
+            "streams": [
+                {"width": 1920, "height": 1080, "pix_fmt": "yuv420p",
+                 "avg_frame_rate": "30/1"}
+            ],
+            "format": {"duration": "2.5"},
+        }
+        completed = subprocess.CompletedProcess([], 0, json.dumps(output), "")
+
+        with patch("subprocess.run", return_value=completed):
+            record = probe_video(path)
+
+        assert record["kind"] == "video"
+        assert (record["width"], record["height"]) == (1920, 1080)
+        assert record["duration"] == 2.5
+        assert record["frames"] == 75
+
+    def test_異常系_ffprobeが存在しない(self, temp_dir: Path) -> None:
+        """ffprobeを実行できない場合にOSErrorが発生することを確認。"""
+        path = temp_dir / "clip.mp4"
+        path.write_bytes(b"\x00")
+
+        with pytest.raises(OSError):
+            probe_video(path, ffprobe_path=str(temp_dir / "missing-ffprobe"))
+
+
+class TestParseQuery:
+    """parse_query関数のテストクラス."""
+
+    def test_正常系_比較と論理演算(self) -> None:
+        """条件式がプレースホルダ付きのSQLに変換されることを確認。"""
+        sql, params = parse_query("width > 2000 and (format = jpg or not frames == 1)")
+
+        assert sql == (
+            "(width > ? AND ((format = ? COLLATE NOCASE OR NOT frames = ?)))"
+        )
+        assert params == [2000, "jpeg", 1]
+
+    def test_正常系_単位とワイルドカード(self) -> None:
+        """サイズの単位とワイルドカード一致が変換されることを確認。"""
+        sql, params = parse_query("size >= 1.5MB and name ~ '*koma*'")
+
+        assert "size_bytes >= ?" in sql
+        assert "name LIKE ?" in sql
+        assert params == [1.5 * 1024**2, "%koma%"]
+
+    @pytest.mark.parametrize(
+        "expression",
+        [
+            "",
+            "unknown = 1",
+            "width > png",
+            "format < png",
+            "width > 1; DROP TABLE media",
+            "width >",
+        ],
+    )
+    def test_異常系_不正な条件式(self, expression: str) -> None:
+        """不正な条件式でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError):
+            parse_query(expression)
+
+
+class TestMediaCatalog:
+    """MediaCatalogクラスのテストクラス."""
+
+    def test_正常系_条件で絞り込み(self, media_dir: Path) -> None:
+        """条件式に一致するファイルが元の順序で返されることを確認。"""
+        files = _files(media_dir)
+
+        with MediaCatalog() as catalog:
+            selected = catalog.select(files, "width > 2000")
+            png_only = catalog.select(files, "width > 2000 and format = png")
+
+        assert [p.name for p in selected] == ["photo.jpg", "wide.png"]
+        assert [p.name for p in png_only] == ["wide.png"]
+
+    def test_正常系_更新日時による差分更新(self, media_dir: Path) -> None:
+        """変更のないファイルは読み直さず、変更・削除されたファイルを反映することを確認。"""
+        files = _files(media_dir)
+        db_path = media_dir / "catalog.db"
+
+        with MediaCatalog(db_path) as catalog:
+            first = catalog.refresh(files)
+        assert first["added"] == 4
+
+        Image.new("RGB", (5, 5)).save(media_dir / "wide.png")
+        stat = (media_dir / "wide.png").stat()
+        os.utime(media_dir / "wide.png", (stat.st_atime, stat.st_mtime + 10))
+        (media_dir / "small.png").unlink()
+
+        with MediaCatalog(db_path) as catalog:
+            with patch.object(
+                catalog_module,
+                "read_media_header",
+                wraps=catalog_module.read_media_header,
+            ) as reader:
+                second = catalog.refresh(_files(media_dir), prune=True)
+            records = {r["path"].name: r for r in catalog.query()}
+
+        assert reader.call_count == 1
+        assert second["updated"] == 1
+        assert second["unchanged"] == 2
+        assert second["removed"] == 1
+        assert "small.png" not in records
+        assert records["wide.png"]["width"] == 5
+
+    def test_異常系_読み込めないファイルは失敗として数える(self, temp_dir: Path) -> None:
+        """読み込めないファイルがカタログに登録されないことを確認。"""
+        path = temp_dir / "broken.png"
+        path.write_bytes(b"not an image")
+
+        with MediaCatalog() as catalog:
+            stats = catalog.refresh([path])
+            assert catalog.query() == []
+
+        assert stats["failed"] == 1
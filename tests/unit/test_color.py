@@ -0,0 +1,355 @@
+"""ICCプロファイルによるカラーマネジメントのテストモジュール."""
+
+import struct
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageCms
+
+from image_processor.conversion.color import (
+    TransformCache,
+    apply_color_policy,
+    get_icc_profile,
+    to_srgb,
+)
+from image_processor.conversion.png_writer import save_png_parallel
+from image_processor.conversion.pyramid import save_pyramid_with_config
+from image_processor.processing.convert_pipeline import convert_files_pipelined
+from image_processor.processing.tiled import process_tiled
+
+# D50に順応したsRGBの原色（ICCプロファイルのrXYZ/gXYZ/bXYZ）
+_SRGB_RED = (0.4361, 0.2225, 0.0139)
+_SRGB_GREEN = (0.3851, 0.7169, 0.0971)
+_SRGB_BLUE = (0.1431, 0.0606, 0.7141)
+_D50 = (0.9642, 1.0, 0.8249)
+
+
+def _s15(value: float) -> bytes:
+    return struct.pack(">i", round(value * 65536))
+
+
+def _xyz_tag(xyz: tuple[float, float, float]) -> bytes:
+    return b"XYZ \x00\x00\x00\x00" + b"".join(_s15(v) for v in xyz)
+
+
+def _swapped_profile() -> bytes:
+    """赤と緑の原色を入れ替えたRGBプロファイルを作成。
+
+    このプロファイルの (255, 0, 0) はsRGBの緑を表すため、
+    sRGBへの変換が行われたかを画素の値で確認できる。
+    """
+    description = b"Swapped RG test\x00"
+    desc = (
+        b"desc\x00\x00\x00\x00"
+        + struct.pack(">I", len(description))
+        + description
+        + b"\x00" * 8
+        + b"\x00" * 3
+        + b"\x00" * 67
+    )
+    curve = b"curv\x00\x00\x00\x00" + struct.pack(">IH", 1, 0x0233) + b"\x00\x00"
+    tags = [
+        (b"desc", desc),
+        (b"wtpt", _xyz_tag(_D50)),
+        (b"rXYZ", _xyz_tag(_SRGB_GREEN)),
+        (b"gXYZ", _xyz_tag(_SRGB_RED)),
+        (b"bXYZ", _xyz_tag(_SRGB_BLUE)),
+        (b"rTRC", curve),
+        (b"gTRC", curve),
+        (b"bTRC", curve),
+    ]
+
+    offset = 128 + 4 + 12 * len(tags)
+    table = b""
+    body = b""
+    for signature, data in tags:
+        data += b"\x00" * (-len(data) % 4)
+        table += signature + struct.pack(">II", offset + len(body), len(data))
+        body += data
+    size = offset + len(body)
+
+    header = (
+        struct.pack(">I", size)
+        + b"\x00" * 4
+        + struct.pack(">I", 0x02100000)
+        + b"mntrRGB XYZ "
+        + b"\x00" * 12
+        + b"acsp"
+        + b"\x00" * 24
+        + struct.pack(">I", 0)
+        + b"".join(_s15(v) for v in _D50)
+        + b"\x00" * 48
+    )
+    assert len(header) == 128
+    return header + struct.pack(">I", len(tags)) + table + body
+
+
+def _srgb_profile() -> bytes:
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+
+
+def _tagged(mode: str, color: tuple[int, ...], profile: bytes) -> Image.Image:
+    image = Image.new(mode, (8, 8), color)
+    image.info["icc_profile"] = profile
+    return image
+
+
+def _save_tagged(path: Path, profile: bytes, **options: object) -> Path:
+    Image.new("RGB", (32, 24), (255, 0, 0)).save(
+        path, icc_profile=profile, **options
+    )
+    return path
+
+
+class TestTransformCache:
+    """TransformCacheクラスのテストクラス."""
+
+    def test_正常系_同じプロファイルは変換オブジェクトを再利用(self) -> None:
+        """2回目以降の取得がキャッシュから返されることを確認。"""
+        cache = TransformCache()
+        profile = _swapped_profile()
+
+        first = cache.get(profile, "RGB", "RGB")
+        second = cache.get(profile, "RGB", "RGB")
+
+        assert first is not None
+        assert first is second
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_正常系_インテントとモードごとに別のキー(self) -> None:
+        """インテントや画像モードが異なると別の変換オブジェクトになることを確認。"""
+        cache = TransformCache()
+        profile = _swapped_profile()
+
+        cache.get(profile, "RGB", "RGB")
+        cache.get(profile, "RGBA", "RGBA")
+        cache.get(profile, "RGB", "RGB", intent=ImageCms.Intent.RELATIVE_COLORIMETRIC)
+
+        assert len(cache) == 3
+        assert cache.misses == 3
+
+    def test_正常系_sRGBプロファイルは変換不要(self) -> None:
+        """sRGBのプロファイルにはNoneが返されることを確認。"""
+        cache = TransformCache()
+
+        assert cache.get(_srgb_profile(), "RGB", "RGB") is None
+        assert cache.get(_srgb_profile(), "RGB", "RGB") is None
+        assert cache.hits == 1
+
+    def test_エッジケース_上限を超えると古いものから削除(self) -> None:
+        """最大数を超えると最も古い変換オブジェクトが削除されることを確認。"""
+        cache = TransformCache(maxsize=1)
+        profile = _swapped_profile()
+
+        cache.get(profile, "RGB", "RGB")
+        cache.get(profile, "RGBA", "RGBA")
+        cache.get(profile, "RGB", "RGB")
+
+        assert len(cache) == 1
+        assert cache.misses == 3
+
+    def test_異常系_キャッシュサイズが0(self) -> None:
+        """キャッシュサイズが1未満でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="キャッシュサイズ"):
+            TransformCache(maxsize=0)
+
+
+class TestToSrgb:
+    """to_srgb関数のテストクラス."""
+
+    def test_正常系_プロファイルに従って変換(self) -> None:
+        """原色を入れ替えたプロファイルの赤がsRGBの緑になることを確認。"""
+        image = _tagged("RGB", (255, 0, 0), _swapped_profile())
+
+        converted = to_srgb(image, cache=TransformCache())
+
+        r, g, b = converted.getpixel((0, 0))  # type: ignore[misc]
+        assert g > 200 and r < 60 and b < 60
+        assert get_icc_profile(converted) is None
+
+    def test_正常系_アルファを保持(self) -> None:
+        """RGBA画像のアルファが変換後も保持されることを確認。"""
+        image = _tagged("RGBA", (255, 0, 0, 100), _swapped_profile())
+
+        converted = to_srgb(image, cache=TransformCache())
+
+        assert converted.mode == "RGBA"
+        assert converted.getpixel((0, 0))[3] == 100  # type: ignore[index]
+
+    def test_エッジケース_プロファイルなし(self) -> None:
+        """プロファイルのない画像はそのまま返されることを確認。"""
+        image = Image.new("RGB", (8, 8), (255, 0, 0))
+
+        assert to_srgb(image) is image
+
+    def test_エッジケース_壊れたプロファイルは無視(self) -> None:
+        """読み込めないプロファイルの画像はそのまま返されることを確認。"""
+        image = _tagged("RGB", (255, 0, 0), b"not a profile")
+
+        assert to_srgb(image, cache=TransformCache()) is image
+
+
+class TestApplyColorPolicy:
+    """apply_color_policy関数のテストクラス."""
+
+    def test_正常系_既定ではsRGBに変換してプロファイルを出力しない(self) -> None:
+        """preserve_metadata=Falseでは画素が変換されることを確認。"""
+        image = _tagged("RGB", (255, 0, 0), _swapped_profile())
+
+        converted, options = apply_color_policy(image, "JPEG")
+
+        assert options == {}
+        assert converted.getpixel((0, 0))[1] > 200  # type: ignore[index]
+
+    def test_正常系_引き継ぐ場合は画素を変換しない(self) -> None:
+        """preserve_metadata=Trueではプロファイルが保存オプションになることを確認。"""
+        profile = _swapped_profile()
+        image = _tagged("RGB", (255, 0, 0), profile)
+
+        converted, options = apply_color_policy(
+            image, "WEBP", preserve_metadata=True
+        )
+
+        assert converted is image
+        assert options["icc_profile"] == profile
+
+    def test_正常系_EXIFを引き継ぐ(self) -> None:
+        """EXIFが保存オプションに含まれることを確認。"""
+        image = Image.new("RGB", (8, 8))
+        exif = image.getexif()
+        exif[0x010F] = "TestMaker"
+        image.info["exif"] = exif.tobytes()
+
+        _, options = apply_color_policy(image, "JPEG", preserve_metadata=True)
+
+        assert options["exif"] == image.info["exif"]
+
+    def test_エッジケース_プロファイルを保持できない形式はsRGBに変換(self) -> None:
+        """GIFではpreserve_metadata=Trueでも画素が変換されることを確認。"""
+        image = _tagged("RGB", (255, 0, 0), _swapped_profile())
+
+        converted, options = apply_color_policy(image, "GIF", preserve_metadata=True)
+
+        assert "icc_profile" not in options
+        assert converted.getpixel((0, 0))[1] > 200  # type: ignore[index]
+
+
+class TestColorManagedConversion:
+    """変換処理へのカラーマネジメントの組み込みのテストクラス."""
+
+    def test_正常系_パイプライン変換でsRGBに変換(self, temp_dir: Path) -> None:
+        """パイプライン変換の出力がsRGBに変換されていることを確認。"""
+        source = _save_tagged(temp_dir / "wide.png", _swapped_profile())
+        output_dir = temp_dir / "out"
+
+        results = convert_files_pipelined([source], output_dir, "jpeg")
+
+        assert results[0]["status"] == "success"
+        with Image.open(output_dir / "wide.jpg") as img:
+            assert "icc_profile" not in img.info
+            assert img.getpixel((0, 0))[1] > 200  # type: ignore[index]
+
+    def test_正常系_パイプライン変換でメタデータを引き継ぐ(
+        self, temp_dir: Path
+    ) -> None:
+        """preserve_metadata=Trueでプロファイルが出力に埋め込まれることを確認。"""
+        profile = _swapped_profile()
+        source = _save_tagged(temp_dir / "wide.png", profile)
+        output_dir = temp_dir / "out"
+
+        convert_files_pipelined(
+            [source], output_dir, "webp", preserve_metadata=True
+        )
+
+        with Image.open(output_dir / "wide.webp") as img:
+            assert img.info["icc_profile"] == profile
+
+    def test_正常系_設定のpreserve_metadataで全サイズに引き継ぐ(
+        self, temp_dir: Path
+    ) -> None:
+        """ConversionConfigのpreserve_metadataがピラミッド出力に反映されることを確認。"""
+        profile = _swapped_profile()
+        source = _save_tagged(temp_dir / "wide.png", profile)
+
+        paths = save_pyramid_with_config(
+            source,
+            {
+                "format": "jpeg",
+                "sizes": [None, 16],
+                "output_dir": temp_dir,
+                "preserve_metadata": True,
+            },
+        )
+
+        for path in paths:
+            with Image.open(path) as img:
+                assert img.info["icc_profile"] == profile
+                assert np.asarray(img)[0, 0, 0] > 200
+
+    @pytest.mark.parametrize("extension", ["png", "jpg"])
+    def test_正常系_ストリップ処理でsRGBに変換(
+        self, temp_dir: Path, extension: str
+    ) -> None:
+        """ストリップ処理の出力も各ストリップがsRGBに変換されることを確認。"""
+        source = _save_tagged(temp_dir / "wide.png", _swapped_profile())
+        output = temp_dir / f"out.{extension}"
+
+        process_tiled(source, output, memory_budget=1)
+
+        with Image.open(output) as img:
+            assert "icc_profile" not in img.info
+            red, green, _ = img.getpixel((0, 23))  # type: ignore[misc]
+            assert green > 200 and red < 100
+
+    @pytest.mark.parametrize("extension", ["png", "jpg"])
+    def test_正常系_ストリップ処理でメタデータを引き継ぐ(
+        self, temp_dir: Path, extension: str
+    ) -> None:
+        """preserve_metadata=Trueで画素を変換せずにプロファイルとEXIFを埋め込むことを確認。"""
+        profile = _swapped_profile()
+        exif = Image.Exif()
+        exif[0x010F] = "TestMaker"
+        source = _save_tagged(temp_dir / "wide.png", profile, exif=exif.tobytes())
+        output = temp_dir / f"out.{extension}"
+
+        process_tiled(source, output, memory_budget=1, preserve_metadata=True)
+
+        with Image.open(output) as img:
+            assert img.info["icc_profile"] == profile
+            assert img.getexif()[0x010F] == "TestMaker"
+            assert np.asarray(img)[0, 0, 0] > 200
+
+    def test_正常系_並列PNGにプロファイルとEXIFを書き出す(
+        self, temp_dir: Path
+    ) -> None:
+        """引き継ぐプロファイルとEXIFが並列PNGのチャンクとして書き出されることを確認。"""
+        profile = _swapped_profile()
+        image = _tagged("RGB", (255, 0, 0), profile)
+        exif = image.getexif()
+        exif[0x010F] = "TestMaker"
+        image.info["exif"] = exif.tobytes()
+        converted, options = apply_color_policy(image, "PNG", preserve_metadata=True)
+        output = temp_dir / "out.png"
+
+        save_png_parallel(converted, output, **options)
+
+        with Image.open(output) as img:
+            assert img.info["icc_profile"] == profile
+            assert img.getexif()[0x010F] == "TestMaker"
+            assert img.getpixel((0, 0)) == (255, 0, 0)
+
+    def test_エッジケース_並列PNGはEXIFを明示した場合だけ書き出す(
+        self, temp_dir: Path
+    ) -> None:
+        """画像のinfoにEXIFがあっても、指定しなければ書き出さないことを確認。"""
+        image = Image.new("RGB", (8, 8))
+        exif = image.getexif()
+        exif[0x010F] = "TestMaker"
+        image.info["exif"] = exif.tobytes()
+        output = temp_dir / "out.png"
+
+        save_png_parallel(image, output)
+
+        with Image.open(output) as img:
+            assert 0x010F not in img.getexif()
@@ -0,0 +1,161 @@
+"""背景透過のマスクの保存と合成のテストモジュール."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from image_processor.processing.background import (
+    FlatBackgroundBackend,
+    remove_background,
+)
+from image_processor.processing.compositing import (
+    composite,
+    composite_files,
+    load_mask,
+    mask_path_for,
+    save_mask,
+)
+
+
+def _sprite() -> Image.Image:
+    """白背景に円を描いた画像を作成。"""
+    image = Image.new("RGB", (120, 80), (255, 255, 255))
+    ImageDraw.Draw(image).ellipse((30, 10, 90, 70), fill=(200, 40, 40))
+    return image
+
+
+def _soft_mask() -> Image.Image:
+    """前景255・背景0・境界が半透明のマスクを作成。"""
+    mask = Image.new("L", (120, 80), 0)
+    ImageDraw.Draw(mask).rectangle((40, 20, 80, 60), fill=255)
+    mask.putpixel((39, 40), 100)
+    return mask
+
+
+class TestSaveMask:
+    """save_mask関数のテストクラス."""
+
+    def test_正常系_8bitで半透明を保持(self, temp_dir: Path) -> None:
+        """8bitのマスクが値を変えずに保存されることを確認。"""
+        path = save_mask(_soft_mask(), temp_dir / "a_mask.png")
+
+        loaded = load_mask(path)
+        assert np.array_equal(np.asarray(loaded), np.asarray(_soft_mask()))
+
+    def test_正常系_1bitは閾値で2値にする(self, temp_dir: Path) -> None:
+        """1bitのマスクが128未満を背景、以上を前景とする2値になることを確認。"""
+        path = save_mask(_soft_mask(), temp_dir / "a_mask.png", bits=1)
+
+        with Image.open(path) as img:
+            assert img.mode == "1"
+        loaded = load_mask(path)
+        assert set(np.unique(np.asarray(loaded))) == {0, 255}
+        assert loaded.getpixel((39, 40)) == 0
+        assert loaded.getpixel((60, 40)) == 255
+
+    def test_正常系_RGBAのPNGより小さい(self, temp_dir: Path) -> None:
+        """マスクのPNGが透過画像のPNGの4分の1未満のサイズになることを確認。"""
+        rng = np.random.default_rng(0)
+        noise = (rng.random((60, 80, 3)) * 255).astype(np.uint8)
+        image = Image.new("RGB", (320, 240), (255, 255, 255))
+        image.paste(Image.fromarray(noise).resize((160, 120)), (80, 60))
+        rgba, result = remove_background(image, FlatBackgroundBackend())
+        rgba.save(temp_dir / "rgba.png")
+
+        save_mask(result["mask"], temp_dir / "a_mask.png")
+
+        mask_size = (temp_dir / "a_mask.png").stat().st_size
+        assert mask_size * 4 < (temp_dir / "rgba.png").stat().st_size
+
+    def test_異常系_未対応のビット数(self, temp_dir: Path) -> None:
+        """8・1以外のビット数でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="ビット数"):
+            save_mask(_soft_mask(), temp_dir / "a_mask.png", bits=4)  # type: ignore[arg-type]
+
+
+class TestComposite:
+    """composite関数のテストクラス."""
+
+    def test_正常系_背景なしは透過画像と同じ(self) -> None:
+        """背景なしの合成結果がremove_backgroundの結果と一致することを確認。"""
+        image = _sprite()
+        rgba, result = remove_background(image, FlatBackgroundBackend())
+
+        composited = composite(image, result["mask"])
+
+        assert composited.mode == "RGBA"
+        assert np.array_equal(np.asarray(composited), np.asarray(rgba))
+
+    def test_正常系_背景色に合成(self) -> None:
+        """前景は元の色、背景は指定色、半透明の画素は混色になることを確認。"""
+        composited = composite(_sprite(), _soft_mask(), (0, 0, 255))
+
+        assert composited.mode == "RGB"
+        assert composited.getpixel((5, 5)) == (0, 0, 255)
+        assert composited.getpixel((60, 40)) == (200, 40, 40)
+        red, _, blue = composited.getpixel((39, 40))
+        assert 0 < red < 255 and 0 < blue < 255
+
+    def test_正常系_背景画像を元画像のサイズに合わせる(self) -> None:
+        """サイズの異なる背景画像が元画像のサイズに拡大縮小されることを確認。"""
+        background = Image.new("RGB", (30, 30), (0, 128, 0))
+
+        composited = composite(_sprite(), _soft_mask(), background)
+
+        assert composited.size == (120, 80)
+        assert composited.getpixel((5, 5)) == (0, 128, 0)
+
+    def test_異常系_マスクのサイズが異なる(self) -> None:
+        """マスクのサイズが元画像と異なる場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="サイズ"):
+            composite(_sprite(), Image.new("L", (10, 10), 255))
+
+
+class TestCompositeFiles:
+    """composite_files関数のテストクラス."""
+
+    def test_正常系_マスクのディレクトリから一括で合成(self, temp_dir: Path) -> None:
+        """各画像に同じ名前のマスクが適用され、入力順に結果が返ることを確認。"""
+        mask_dir = temp_dir / "masks"
+        output_dir = temp_dir / "out"
+        mask_dir.mkdir()
+        output_dir.mkdir()
+        paths = []
+        for index in range(3):
+            path = temp_dir / f"img{index}.jpg"
+            _sprite().save(path)
+            save_mask(_soft_mask(), mask_path_for(path, mask_dir))
+            paths.append(path)
+
+        results = composite_files(
+            paths, mask_dir, output_dir, background=(255, 255, 255), output_format="jpg"
+        )
+
+        assert [r["status"] for r in results] == ["success"] * 3
+        assert [r["output_path"] for r in results] == [
+            output_dir / f"img{index}.jpg" for index in range(3)
+        ]
+        with Image.open(output_dir / "img0.jpg") as img:
+            assert img.format == "JPEG"
+
+    def test_異常系_マスクがない画像はエラー(self, temp_dir: Path) -> None:
+        """マスクがない画像だけがエラーになることを確認。"""
+        for name in ("a.png", "b.png"):
+            _sprite().save(temp_dir / name)
+        save_mask(_soft_mask(), mask_path_for(temp_dir / "a.png", temp_dir))
+        output_dir = temp_dir / "out"
+        output_dir.mkdir()
+
+        results = composite_files(
+            [temp_dir / "a.png", temp_dir / "b.png"], temp_dir, output_dir
+        )
+
+        assert [r["status"] for r in results] == ["success", "error"]
+        assert "マスクがありません" in str(results[1]["error_message"])
+
+    def test_異常系_透過できない形式で背景なし(self, temp_dir: Path) -> None:
+        """背景なしでJPEGを指定した場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="背景の指定"):
+            composite_files([], temp_dir, temp_dir, output_format="jpg")
@@ -0,0 +1,171 @@
+"""パイプライン変換のテストモジュール."""
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_processor.processing import convert_pipeline
+from image_processor.processing.convert_pipeline import (
+    FileData,
+    ImageEncoder,
+    convert_files_pipelined,
+    read_file,
+)
+from image_processor.processing.scheduler import MemoryBudget
+from image_processor.utils.profiling import PerformanceMonitor
+
+
+@pytest.fixture
+def input_files(temp_dir: Path) -> list[Path]:
+    """透過ありのPNGを複数配置した入力ディレクトリ。"""
+    input_dir = temp_dir / "input"
+    input_dir.mkdir()
+    paths = []
+    for i in range(6):
+        path = input_dir / f"img_{i}.png"
+        image = Image.new("RGBA", (40, 30), (i * 40, 100, 0, 255))
+        image.paste((0, 0, 0, 0), (0, 0, 10, 10))
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+class TestReadFile:
+    """read_file関数のテストクラス."""
+
+    def test_正常系_ファイル全体を読み込む(self, input_files: list[Path]) -> None:
+        """ファイルのバイト列と名前が得られることを確認。"""
+        item = read_file(input_files[0])
+
+        assert item["name"] == "img_0"
+        assert item["data"] == input_files[0].read_bytes()
+
+
+class TestImageEncoder:
+    """ImageEncoderクラスのテストクラス."""
+
+    def test_正常系_アニメーションは読み込み済みのバイト列から変換(
+        self, temp_dir: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """入力ファイルを読み直さず、作業メモリを確保したまま変換することを確認。"""
+        source = temp_dir / "anim.gif"
+        frames = [Image.new("RGB", (8, 8), (i * 100, 0, 0)) for i in range(3)]
+        frames[0].save(source, save_all=True, append_images=frames[1:])
+        item = FileData(name="anim", source=source, data=source.read_bytes())
+        source.unlink()
+        budget = MemoryBudget(10**9)
+        in_use = []
+        convert_animation = convert_pipeline.convert_animation
+
+        def spy(*args: Any, **kwargs: Any) -> Path:
+            in_use.append(budget.in_use)
+            return convert_animation(*args, **kwargs)
+
+        monkeypatch.setattr(convert_pipeline, "convert_animation", spy)
+        encoder = ImageEncoder(temp_dir, "webp", budget=budget)
+
+        encoded = encoder(item)
+
+        assert encoded["data"] is None
+        assert in_use[0] > 0
+        assert budget.in_use == 0
+        with Image.open(temp_dir / "anim.webp") as result:
+            assert result.n_frames == 3
+
+
+class TestConvertFilesPipelined:
+    """convert_files_pipelined関数のテストクラス."""
+
+    def test_正常系_全ファイルを変換(
+        self, temp_dir: Path, input_files: list[Path]
+    ) -> None:
+        """全ファイルが変換され、ステージごとの処理時間が記録されることを確認。"""
+        output_dir = temp_dir / "output"
+        monitor = PerformanceMonitor()
+
+        results = convert_files_pipelined(
+            input_files,
+            output_dir,
+            "jpg",
+            read_workers=2,
+            encode_workers=2,
+            read_ahead=1,
+            encode_queue=1,
+            write_queue=1,
+            monitor=monitor,
+        )
+
+        assert sorted(r["status"] for r in results) == ["success"] * len(input_files)
+        assert sorted(p.name for p in output_dir.iterdir()) == [
+            f"img_{i}.jpg" for i in range(len(input_files))
+        ]
+        with Image.open(output_dir / "img_2.jpg") as result:
+            assert result.mode == "RGB"
+            # 透過部分は白で合成される
+            assert min(result.getpixel((2, 2))) > 240
+        for stage in ("read", "encode", "write"):
+            assert monitor.get_stats(stage)["count"] == len(input_files)
+
+    def test_正常系_変換の適用(self, temp_dir: Path, input_files: list[Path]) -> None:
+        """デコード後の変換が適用されることを確認。"""
+        output_dir = temp_dir / "output"
+
+        convert_files_pipelined(
+            input_files[:1],
+            output_dir,
+            "png",
+            transform=lambda image: image.reduce(2),
+        )
+
+        with Image.open(output_dir / "img_0.png") as result:
+            assert result.size == (20, 15)
+
+    def test_正常系_アニメーションはフレーム単位で変換(self, temp_dir: Path) -> None:
+        """アニメーション画像がアニメーションのまま変換されることを確認。"""
+        source = temp_dir / "anim.gif"
+        frames = [Image.new("RGB", (8, 8), (i * 100, 0, 0)) for i in range(3)]
+        frames[0].save(source, save_all=True, append_images=frames[1:])
+        output_dir = temp_dir / "output"
+
+        results = convert_files_pipelined([source], output_dir, "webp")
+
+        assert results[0]["status"] == "success"
+        with Image.open(output_dir / "anim.webp") as result:
+            assert result.n_frames == 3
+            first = np.asarray(result.convert("RGB"))
+            assert first[..., 0].max() < 16
+
+    def test_異常系_壊れたファイルは失敗として記録(
+        self, temp_dir: Path, input_files: list[Path]
+    ) -> None:
+        """読み込めないファイルがあっても他のファイルの変換が続くことを確認。"""
+        broken = input_files[0].parent / "broken.png"
+        broken.write_bytes(b"not an image")
+
+        results = convert_files_pipelined(
+            [broken, *input_files], temp_dir / "output", "webp"
+        )
+
+        errors = [r for r in results if r["status"] == "error"]
+        assert [r["input_path"] for r in errors] == [broken]
+        assert errors[0]["error_message"].startswith("encode:")
+        assert len(results) == len(input_files) + 1
+
+    def test_異常系_画素数の上限超過(
+        self,
+        temp_dir: Path,
+        input_files: list[Path],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """メモリ上限を指定しても、画素数の上限を超える画像はエラーになることを確認。"""
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 40 * 30 - 1)
+
+        results = convert_files_pipelined(
+            input_files[:2], temp_dir / "output", "png", memory_budget=1
+        )
+
+        assert [r["status"] for r in results] == ["error", "error"]
+        assert "上限" in (results[0]["error_message"] or "")
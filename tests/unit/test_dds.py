@@ -0,0 +1,336 @@
+"""DDS読み込み・変換機能のテストモジュール."""
+
+import io
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_processor.conversion.dds import (
+    BLOCK_SIZES,
+    build_mip_chain,
+    convert_dds_files,
+    convert_to_dds_files,
+    decode_block_compressed,
+    encode_block_compressed,
+    encode_dds,
+    load_dds,
+    mip_levels,
+    parse_dds_header,
+    read_dds_info,
+    select_mip_level,
+)
+
+
+def _make_dds(
+    width: int,
+    height: int,
+    payload: bytes,
+    *,
+    fourcc: bytes = b"DXT1",
+    dxgi_format: int | None = None,
+    mip_count: int = 0,
+) -> bytes:
+    """ヘッダーと圧縮データからDDSファイルのバイト列を作成。"""
+    if dxgi_format is not None:
+        fourcc = b"DX10"
+    header = struct.pack("<7I", 124, 0x1007, height, width, 0, 0, mip_count)
+    header += b"\0" * 44
+    header += struct.pack("<2I4s5I", 32, 0x4, fourcc, 0, 0, 0, 0, 0)
+    header += struct.pack("<5I", 0x1000, 0, 0, 0, 0)
+    if dxgi_format is not None:
+        header += struct.pack("<5I", dxgi_format, 3, 0, 1, 0)
+    return b"DDS " + header + payload
+
+
+def _random_payload(width: int, height: int, fmt: str, seed: int = 0) -> bytes:
+    """指定形式のブロック数分のランダムな圧縮データを作成。"""
+    blocks = ((width + 3) // 4) * ((height + 3) // 4)
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, blocks * BLOCK_SIZES[fmt], dtype=np.uint8).tobytes()
+
+
+def _solid_bc1(width: int, height: int, color565: int) -> bytes:
+    """単色のBC1データを作成。"""
+    blocks = max((width + 3) // 4, 1) * max((height + 3) // 4, 1)
+    return struct.pack("<HHI", color565, color565, 0) * blocks
+
+
+def _mipmapped_dds(path: Path) -> Path:
+    """レベルごとに色の異なる 16x8 の3レベルのミップを持つDDSを作成。"""
+    payload = (
+        _solid_bc1(16, 8, 0xF800)  # 赤
+        + _solid_bc1(8, 4, 0x07E0)  # 緑
+        + _solid_bc1(4, 2, 0x001F)  # 青
+    )
+    path.write_bytes(_make_dds(16, 8, payload, mip_count=3))
+    return path
+
+
+class TestParseDdsHeader:
+    """parse_dds_header関数のテストクラス."""
+
+    def test_正常系_FourCC(self) -> None:
+        """FourCC形式のヘッダーが解析されることを確認。"""
+        info = parse_dds_header(_make_dds(64, 32, b"", fourcc=b"DXT5", mip_count=7))
+
+        assert info["width"] == 64
+        assert info["height"] == 32
+        assert info["mip_count"] == 7
+        assert info["format"] == "BC3"
+        assert info["data_offset"] == 128
+
+    def test_正常系_DX10拡張ヘッダー(self) -> None:
+        """DX10拡張ヘッダーのDXGI形式とsRGBが解析されることを確認。"""
+        info = parse_dds_header(_make_dds(8, 8, b"", dxgi_format=72))
+
+        assert info["format"] == "BC1"
+        assert info["srgb"] is True
+        assert info["data_offset"] == 148
+
+    def test_異常系_DDS以外(self) -> None:
+        """DDSでないデータでValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="DDS"):
+            parse_dds_header(b"\x89PNG" + b"\0" * 200)
+
+
+class TestMipLevels:
+    """ミップテーブルとレベル選択のテストクラス."""
+
+    def test_正常系_ミップテーブル(self, temp_dir: Path) -> None:
+        """各レベルのサイズと位置がヘッダーのみから計算されることを確認。"""
+        info = read_dds_info(_mipmapped_dds(temp_dir / "mips.dds"))
+
+        levels = mip_levels(info)
+
+        assert [(m["width"], m["height"]) for m in levels] == [(16, 8), (8, 4), (4, 2)]
+        assert [m["size"] for m in levels] == [64, 16, 8]
+        assert levels[1]["offset"] == 128 + 64
+
+    def test_正常系_最小サイズで選択(self, temp_dir: Path) -> None:
+        """長辺が指定サイズ以上の最小レベルが選ばれることを確認。"""
+        levels = mip_levels(read_dds_info(_mipmapped_dds(temp_dir / "mips.dds")))
+
+        assert select_mip_level(levels, min_size=5)["level"] == 1
+        assert select_mip_level(levels, min_size=100)["level"] == 0
+        assert select_mip_level(levels, level=9)["level"] == 2
+
+    def test_正常系_指定レベルのみデコード(self, temp_dir: Path) -> None:
+        """選択したミップレベルの画素がデコードされることを確認。"""
+        path = _mipmapped_dds(temp_dir / "mips.dds")
+
+        assert load_dds(path).getpixel((0, 0)) == (255, 0, 0, 255)
+        small = load_dds(path, min_size=8)
+        assert small.size == (8, 4)
+        assert small.getpixel((0, 0)) == (0, 255, 0, 255)
+        assert load_dds(path, mip_level=2).getpixel((0, 0)) == (0, 0, 255, 255)
+
+    def test_異常系_データ不足(self, temp_dir: Path) -> None:
+        """ミップのデータが途中で切れている場合ValueErrorが発生することを確認。"""
+        path = temp_dir / "truncated.dds"
+        path.write_bytes(_make_dds(16, 8, _solid_bc1(16, 8, 0), mip_count=3))
+
+        with pytest.raises(ValueError, match="不足"):
+            load_dds(path, mip_level=2)
+
+
+class TestDecodeBlockCompressed:
+    """decode_block_compressed関数のテストクラス."""
+
+    def test_正常系_BC1単色ブロック(self) -> None:
+        """BC1ブロックの端点色がそのまま展開されることを確認。"""
+        block = struct.pack("<HHI", 0xF800, 0x001F, 0x00000000)
+
+        image = decode_block_compressed(block, 4, 4, "BC1")
+
+        assert image.mode == "RGBA"
+        assert image.getpixel((3, 3)) == (255, 0, 0, 255)
+
+    def test_正常系_BC1透過ブロック(self) -> None:
+        """c0 <= c1 のBC1ブロックでインデックス3が透明になることを確認。"""
+        block = struct.pack("<HHI", 0x001F, 0xF800, 0xFFFFFFFF)
+
+        image = decode_block_compressed(block, 4, 4, "BC1")
+
+        assert image.getpixel((0, 0)) == (0, 0, 0, 0)
+
+    @pytest.mark.parametrize("fourcc,fmt,mode", [
+        (b"DXT1", "BC1", "RGBA"),
+        (b"DXT3", "BC2", "RGBA"),
+        (b"DXT5", "BC3", "RGBA"),
+    ])
+    def test_正常系_Pillowと一致(self, fourcc: bytes, fmt: str, mode: str) -> None:
+        """Pillowのデコード結果と一致することを確認（端数サイズ含む）。"""
+        width, height = 21, 13
+        payload = _random_payload(width, height, fmt)
+
+        with Image.open(io.BytesIO(_make_dds(width, height, payload, fourcc=fourcc))) as img:
+            expected = np.asarray(img.convert(mode))
+        decoded = decode_block_compressed(payload, width, height, fmt)
+
+        assert decoded.size == (width, height)
+        assert np.array_equal(np.asarray(decoded), expected)
+
+    def test_正常系_BC4とBC5(self) -> None:
+        """単一/2チャンネル形式のモードと端点値を確認。"""
+        bc4 = bytes([200, 10]) + b"\0" * 6
+
+        assert decode_block_compressed(bc4, 4, 4, "BC4").getpixel((0, 0)) == 200
+        assert decode_block_compressed(bc4 * 2, 4, 4, "BC5").getpixel((0, 0)) == (200, 200, 0)
+
+    def test_正常系_SNORM(self) -> None:
+        """SNORM形式が -127〜127 に128を加えた値になることを確認。"""
+        block = bytes([0x7F, 0x81]) + b"\0" * 6  # 127, -127
+
+        assert decode_block_compressed(block, 4, 4, "BC4S").getpixel((0, 0)) == 255
+
+    def test_異常系_データ不足(self) -> None:
+        """データ長が不足している場合ValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="不足"):
+            decode_block_compressed(b"\0" * 8, 8, 8, "BC1")
+
+    def test_異常系_未対応形式(self) -> None:
+        """NumPy未対応の形式でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="未対応"):
+            decode_block_compressed(b"\0" * 16, 4, 4, "BC7")
+
+
+class TestLoadDds:
+    """load_dds / convert_dds_files関数のテストクラス."""
+
+    def test_正常系_Pillow未対応形式のフォールバック(self, temp_dir: Path) -> None:
+        """Pillowが読めないBC3 sRGBがNumPyでデコードされることを確認。"""
+        payload = _random_payload(8, 8, "BC3")
+        path = temp_dir / "srgb.dds"
+        path.write_bytes(_make_dds(8, 8, payload, dxgi_format=78))
+
+        image = load_dds(path)
+
+        assert image.size == (8, 8)
+        assert np.array_equal(
+            np.asarray(image), np.asarray(decode_block_compressed(payload, 8, 8, "BC3"))
+        )
+
+    def test_正常系_一括変換(self, temp_dir: Path, output_dir: Path) -> None:
+        """複数ファイルがPNGに変換され、壊れたファイルはエラーになることを確認。"""
+        paths = []
+        for i in range(2):
+            path = temp_dir / f"tex_{i}.dds"
+            path.write_bytes(_make_dds(8, 4, _random_payload(8, 4, "BC1", i)))
+            paths.append(path)
+        broken = temp_dir / "broken.dds"
+        broken.write_bytes(b"not a dds")
+        paths.append(broken)
+
+        results = convert_dds_files(paths, output_dir, workers=2)
+
+        assert [r["status"] for r in results] == ["success", "success", "error"]
+        with Image.open(output_dir / "tex_0.png") as img:
+            assert img.size == (8, 4)
+
+
+def _psnr(a: Image.Image, b: Image.Image) -> float:
+    """2画像間のPSNRを計算。"""
+    diff = np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)
+    mse = float((diff ** 2).mean())
+    return 99.0 if mse == 0 else float(10 * np.log10(255 ** 2 / mse))
+
+
+def _gradient_image(size: int = 64) -> Image.Image:
+    """滑らかなRGBグラデーション画像を作成。"""
+    gray = Image.linear_gradient("L").resize((size, size))
+    return Image.merge("RGB", [gray, gray.transpose(Image.Transpose.ROTATE_90), gray])
+
+
+class TestDdsWriter:
+    """DDS書き込み機能のテストクラス."""
+
+    @pytest.mark.parametrize("compression", ["bc1", "bc3"])
+    def test_正常系_画質(self, compression: str) -> None:
+        """圧縮結果をデコードした画像が十分な画質であることを確認。"""
+        image = _gradient_image().convert("RGBA")
+
+        data = encode_block_compressed(image, compression)  # type: ignore[arg-type]
+        fmt = compression.upper()
+        decoded = decode_block_compressed(data, 64, 64, fmt).convert("RGB")
+
+        assert len(data) == 16 * 16 * BLOCK_SIZES[fmt]
+        assert _psnr(image.convert("RGB"), decoded) > 35
+
+    def test_正常系_単色は無劣化(self) -> None:
+        """565で表現できる単色ブロックが無劣化で圧縮されることを確認。"""
+        image = Image.new("RGBA", (6, 5), (255, 0, 255, 255))
+
+        data = encode_block_compressed(image, "bc1")
+
+        decoded = decode_block_compressed(data, 6, 5, "BC1")
+        assert decoded.getcolors() == [(30, (255, 0, 255, 255))]
+
+    def test_正常系_BC1の透過(self) -> None:
+        """BC1でアルファ128未満の画素が透明になることを確認。"""
+        image = Image.new("RGBA", (8, 8), (0, 0, 0, 0))
+        image.paste((0, 255, 0, 255), (0, 0, 4, 8))
+
+        decoded = decode_block_compressed(encode_block_compressed(image, "bc1"), 8, 8, "BC1")
+
+        assert decoded.getpixel((0, 0)) == (0, 255, 0, 255)
+        assert decoded.getpixel((7, 7))[3] == 0
+
+    def test_正常系_ミップチェーン(self) -> None:
+        """ミップチェーンが半分ずつ（切り捨て）1x1まで作られることを確認。"""
+        levels = build_mip_chain(Image.new("RGBA", (10, 3)))
+
+        assert [level.size for level in levels] == [(10, 3), (5, 1), (2, 1), (1, 1)]
+
+    def test_正常系_DDSファイル(self) -> None:
+        """エンコードしたDDSのヘッダーとミップが読み込めることを確認。"""
+        image = _gradient_image(32).convert("RGBA")
+        image.putalpha(128)
+
+        data = encode_dds(image)
+
+        info = parse_dds_header(data)
+        levels = mip_levels(info)
+        assert info["format"] == "BC3"
+        assert len(levels) == 6
+        assert levels[-1]["offset"] + levels[-1]["size"] == len(data)
+        with Image.open(io.BytesIO(data)) as img:
+            assert img.size == (32, 32)
+
+    def test_正常系_一括変換(self, temp_dir: Path, output_dir: Path) -> None:
+        """PNGがDDSに一括変換され、ミップを指定して読み戻せることを確認。"""
+        paths = []
+        for i in range(2):
+            path = temp_dir / f"tex_{i}.png"
+            _gradient_image(16).save(path)
+            paths.append(path)
+
+        results = convert_to_dds_files(paths, output_dir, workers=2)
+
+        assert all(r["status"] == "success" for r in results)
+        info = read_dds_info(output_dir / "tex_0.dds")
+        assert info["format"] == "BC1"
+        assert load_dds(output_dir / "tex_1.dds", mip_level=1).size == (8, 8)
+
+    def test_異常系_一括変換で想定外の例外(
+        self, temp_dir: Path, output_dir: Path
+    ) -> None:
+        """ValueError以外の例外でも該当ファイルのみエラー結果になることを確認。"""
+        good = temp_dir / "good.png"
+        _gradient_image(16).save(good)
+        # 巨大サイズを宣言したPNGはDecompressionBombErrorを送出する
+        ihdr = b"IHDR" + struct.pack(">IIBBBBB", 40000, 40000, 8, 2, 0, 0, 0)
+        bomb = temp_dir / "bomb.png"
+        bomb.write_bytes(
+            b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + ihdr
+            + struct.pack(">I", zlib.crc32(ihdr))
+            + struct.pack(">I", 0) + b"IEND" + struct.pack(">I", zlib.crc32(b"IEND"))
+        )
+
+        results = convert_to_dds_files([good, bomb], output_dir, workers=1)
+
+        assert [r["status"] for r in results] == ["success", "error"]
+        assert "DecompressionBombError" in (results[1]["error_message"] or "")
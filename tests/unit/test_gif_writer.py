@@ -0,0 +1,125 @@
+"""共通パレットのGIFエンコーダーのテストモジュール."""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_processor.conversion.gif_writer import (
+    TRANSPARENT_INDEX,
+    GifWriter,
+    build_palette,
+)
+
+
+def _moving_square(index: int) -> Image.Image:
+    """灰色の背景の上を赤い四角が移動する不透明なフレームを作成。"""
+    frame = Image.new("RGB", (64, 48), (128, 128, 128))
+    frame.paste((255, 0, 0), (index * 8, 10, index * 8 + 12, 22))
+    return frame
+
+
+def _decode(data: bytes) -> list[tuple[np.ndarray, int]]:
+    """GIFを合成済みのRGBAフレームと表示時間のリストに展開。"""
+    frames = []
+    with Image.open(io.BytesIO(data)) as img:
+        for index in range(img.n_frames):
+            img.seek(index)
+            img.load()
+            frames.append((np.asarray(img.convert("RGBA")), img.info["duration"]))
+    return frames
+
+
+class TestBuildPalette:
+    """build_palette関数のテストクラス."""
+
+    def test_正常系_サンプルの色を含む(self) -> None:
+        """サンプルに含まれる色がパレットに含まれることを確認。"""
+        samples = [
+            Image.new("RGB", (8, 8), (255, 0, 0)),
+            Image.new("RGB", (8, 8), (0, 0, 255)),
+        ]
+
+        palette = build_palette(samples)
+        colors = {tuple(palette[i : i + 3]) for i in range(0, len(palette), 3)}
+
+        assert {(255, 0, 0), (0, 0, 255)} <= colors
+
+    def test_正常系_透過ありは255色以下(self) -> None:
+        """透過ありのパレットが透過色の番号を空けることを確認。"""
+        rng = np.random.default_rng(0)
+        samples = [Image.fromarray(rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))]
+
+        palette = build_palette(samples, transparency=True)
+
+        assert len(palette) // 3 <= TRANSPARENT_INDEX
+
+    def test_エッジケース_全面透過のサンプル(self) -> None:
+        """不透明なピクセルがない場合も1色のパレットを返すことを確認。"""
+        palette = build_palette([Image.new("RGBA", (4, 4), (0, 0, 0, 0))])
+
+        assert len(palette) >= 3
+
+
+class TestGifWriter:
+    """GifWriterクラスのテストクラス."""
+
+    def test_正常系_差分の書き出しで元のフレームを再現(self) -> None:
+        """変化した範囲だけを書き出しても各フレームが再現されることを確認。"""
+        sources = [_moving_square(i) for i in range(4)]
+        buffer = io.BytesIO()
+
+        with GifWriter(buffer, (64, 48), build_palette(sources)) as writer:
+            for source in sources:
+                writer.write(source, 40)
+
+        frames = _decode(buffer.getvalue())
+        assert len(frames) == len(sources)
+        for (decoded, duration), source in zip(frames, sources, strict=True):
+            assert np.array_equal(decoded[..., :3], np.asarray(source))
+            assert duration == 40
+
+    def test_正常系_同じフレームは表示時間を加算(self) -> None:
+        """連続する同じフレームが1フレームにまとめられることを確認。"""
+        sources = [_moving_square(i) for i in (0, 0, 0, 1)]
+        buffer = io.BytesIO()
+
+        with GifWriter(buffer, (64, 48), build_palette(sources)) as writer:
+            for source in sources:
+                writer.write(source, 100)
+
+        assert writer.frames_written == 2
+        assert [duration for _, duration in _decode(buffer.getvalue())] == [300, 100]
+
+    def test_正常系_透過部分を背景に戻す(self) -> None:
+        """透過ありでは前のフレームの画素が残らないことを確認。"""
+        sources = []
+        for i in range(3):
+            frame = Image.new("RGBA", (30, 10), (0, 0, 0, 0))
+            frame.paste((0, 200, 0, 255), (i * 10, 0, i * 10 + 10, 10))
+            sources.append(frame)
+        buffer = io.BytesIO()
+
+        palette = build_palette(sources, transparency=True)
+        with GifWriter(buffer, (30, 10), palette, transparency=True) as writer:
+            for source in sources:
+                writer.write(source, 50)
+
+        decoded_frames = _decode(buffer.getvalue())
+        for (decoded, _), source in zip(decoded_frames, sources, strict=True):
+            assert np.array_equal(decoded[..., 3], np.asarray(source)[..., 3])
+
+    def test_異常系_サイズの異なるフレーム(self) -> None:
+        """キャンバスと異なるサイズのフレームでValueErrorが発生することを確認。"""
+        writer = GifWriter(io.BytesIO(), (64, 48), [0, 0, 0])
+
+        with pytest.raises(ValueError, match="サイズが一致しません"):
+            writer.write(Image.new("RGB", (10, 10)), 100)
+
+    def test_異常系_フレームなしで終了(self) -> None:
+        """フレームを追加せずに閉じた場合にValueErrorが発生することを確認。"""
+        writer = GifWriter(io.BytesIO(), (8, 8), [0, 0, 0])
+
+        with pytest.raises(ValueError, match="1枚も"):
+            writer.close()
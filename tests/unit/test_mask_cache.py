@@ -0,0 +1,181 @@
+"""背景透過のマスクの永続キャッシュのテストモジュール."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from image_processor.processing.background import (
+    FlatBackgroundBackend,
+    SegmentationResult,
+)
+from image_processor.processing.mask_cache import CachedBackend, MaskCache, content_hash
+from image_processor.types import BackgroundMethod
+
+
+def _sprite(color: tuple[int, int, int] = (200, 40, 40)) -> Image.Image:
+    image = Image.new("RGB", (64, 48), "white")
+    ImageDraw.Draw(image).ellipse((10, 8, 54, 40), fill=color)
+    return image
+
+
+def _noise_mask(seed: int, size: tuple[int, int] = (64, 48)) -> SegmentationResult:
+    """PNGで圧縮されにくい（サイズが一定以上になる）マスクを作成。"""
+    rng = np.random.default_rng(seed)
+    mask = Image.fromarray(rng.integers(0, 256, size[::-1], dtype=np.uint8), "L")
+    return SegmentationResult(mask=mask, confidence=0.5, backend="rembg")
+
+
+class _CountingBackend:
+    """呼び出し回数を数える単色背景の除去のバックエンド."""
+
+    name: BackgroundMethod = "flat"
+    cache_id = "counting"
+    resolution = 0
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        self.calls += 1
+        return FlatBackgroundBackend().segment(image)
+
+
+class TestContentHash:
+    """content_hash関数のテストクラス."""
+
+    def test_正常系_画素が同じなら形式が違っても同じ(self, temp_dir: Path) -> None:
+        """PNGとBMPで保存し直した画像のハッシュが一致することを確認。"""
+        image = _sprite()
+        for suffix in (".png", ".bmp"):
+            image.save(temp_dir / f"sprite{suffix}")
+
+        with Image.open(temp_dir / "sprite.png") as png, Image.open(
+            temp_dir / "sprite.bmp"
+        ) as bmp:
+            assert content_hash(png) == content_hash(bmp) == content_hash(image)
+
+    def test_正常系_画素が違えば異なる(self) -> None:
+        """1画素でも違えばハッシュが変わることを確認。"""
+        image = _sprite()
+        changed = image.copy()
+        changed.putpixel((0, 0), (254, 255, 255))
+
+        assert content_hash(image) != content_hash(changed)
+
+    def test_エッジケース_ストリップより高い画像(self) -> None:
+        """複数のストリップに分かれる画像でも、画素の違いを検出することを確認。"""
+        image = Image.new("L", (8, 600))
+        changed = image.copy()
+        changed.putpixel((3, 599), 1)
+
+        assert content_hash(image) != content_hash(changed)
+
+
+class TestMaskCache:
+    """MaskCacheクラスのテストクラス."""
+
+    def test_正常系_保存したマスクを取得(self, temp_dir: Path) -> None:
+        """保存したマスクと結果の情報が取得でき、再度開いても残ることを確認。"""
+        result = _noise_mask(0)
+        with MaskCache(temp_dir / "cache") as cache:
+            cache.put("abc", "rembg:isnet-anime", 1024, result)
+
+        with MaskCache(temp_dir / "cache") as cache:
+            cached = cache.get("abc", "rembg:isnet-anime", 1024)
+
+            assert cached is not None
+            assert np.array_equal(
+                np.asarray(cached["mask"]), np.asarray(result["mask"])
+            )
+            assert cached["confidence"] == 0.5
+            assert cached["backend"] == "rembg"
+            assert (cache.hits, cache.misses) == (1, 0)
+
+    @pytest.mark.parametrize(
+        ("content", "model", "resolution"),
+        [("xyz", "rembg:isnet-anime", 1024), ("abc", "rembg:u2net", 1024),
+         ("abc", "rembg:isnet-anime", 0)],
+    )
+    def test_正常系_キーのいずれかが違えばミス(
+        self, temp_dir: Path, content: str, model: str, resolution: int
+    ) -> None:
+        """内容・モデル・推論解像度のいずれかが違う場合はミスになることを確認。"""
+        with MaskCache(temp_dir / "cache") as cache:
+            cache.put("abc", "rembg:isnet-anime", 1024, _noise_mask(0))
+
+            assert cache.get(content, model, resolution) is None
+            assert cache.misses == 1
+
+    def test_正常系_上限を超えると最後に使われた日時の古いものから削除(
+        self, temp_dir: Path
+    ) -> None:
+        """取得したマスクは残り、使われていないマスクが削除されることを確認。"""
+        with MaskCache(temp_dir / "measure") as cache:
+            cache.put("a", "m", 0, _noise_mask(1))
+            entry_size = cache.total_bytes
+        with MaskCache(temp_dir / "cache", max_bytes=entry_size * 5 // 2) as cache:
+            cache.put("a", "m", 0, _noise_mask(1))
+            cache.put("b", "m", 0, _noise_mask(2))
+            assert cache.get("a", "m", 0) is not None
+
+            cache.put("c", "m", 0, _noise_mask(3))
+
+            assert len(cache) == 2
+            assert cache.get("b", "m", 0) is None
+            assert cache.get("a", "m", 0) is not None
+            assert cache.get("c", "m", 0) is not None
+            assert len(list((temp_dir / "cache").rglob("*.png"))) == 2
+
+    def test_エッジケース_マスクのファイルが消えている(self, temp_dir: Path) -> None:
+        """索引にあってもファイルがない場合はミスとして扱うことを確認。"""
+        with MaskCache(temp_dir / "cache") as cache:
+            cache.put("abc", "m", 0, _noise_mask(0))
+            for path in (temp_dir / "cache").rglob("*.png"):
+                path.unlink()
+
+            assert cache.get("abc", "m", 0) is None
+            assert len(cache) == 0
+
+    def test_異常系_上限が不正(self, temp_dir: Path) -> None:
+        """上限が1未満の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="上限"):
+            MaskCache(temp_dir / "cache", max_bytes=0)
+
+
+class TestCachedBackend:
+    """CachedBackendクラスのテストクラス."""
+
+    def test_正常系_キャッシュにあれば推論しない(self, temp_dir: Path) -> None:
+        """2回目以降は内側のバックエンドを呼ばずに同じマスクを返すことを確認。"""
+        inner = _CountingBackend()
+        with MaskCache(temp_dir / "cache") as cache:
+            backend = CachedBackend(inner, cache)
+            first = backend.segment(_sprite())
+            second = backend.segment(_sprite())
+
+        assert inner.calls == 1
+        assert second["backend"] == "flat"
+        assert np.array_equal(np.asarray(first["mask"]), np.asarray(second["mask"]))
+
+    def test_正常系_別のプロセスでもキャッシュを使う(self, temp_dir: Path) -> None:
+        """キャッシュを開き直した後も推論しないことを確認。"""
+        with MaskCache(temp_dir / "cache") as cache:
+            CachedBackend(_CountingBackend(), cache).segment(_sprite())
+
+        inner = _CountingBackend()
+        with MaskCache(temp_dir / "cache") as cache:
+            CachedBackend(inner, cache).segment(_sprite())
+
+        assert inner.calls == 0
+
+    def test_正常系_画像が違えば推論する(self, temp_dir: Path) -> None:
+        """内容の異なる画像では内側のバックエンドを呼ぶことを確認。"""
+        inner = _CountingBackend()
+        with MaskCache(temp_dir / "cache") as cache:
+            backend = CachedBackend(inner, cache)
+            backend.segment(_sprite())
+            backend.segment(_sprite((40, 40, 200)))
+
+        assert inner.calls == 2
@@ -0,0 +1,176 @@
+"""ガイデッドフィルタによるマスクの境界の補正のテストモジュール."""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from image_processor.processing.background import (
+    FlatBackgroundBackend,
+    create_backend,
+)
+from image_processor.processing.matting import (
+    MattingBackend,
+    clean_mask,
+    guided_refine,
+)
+
+FOREGROUND = np.array([40.0, 60.0, 200.0])
+BACKGROUND = np.array([230.0, 220.0, 200.0])
+
+
+def _scene() -> tuple[Image.Image, Image.Image]:
+    """なめらかな境界の四角形を2色で合成した画像と、その正解のアルファを作成。"""
+    large = Image.new("L", (1280, 960), 0)
+    ImageDraw.Draw(large).polygon(
+        [(160, 120), (1120, 200), (960, 880), (240, 800)], fill=255
+    )
+    alpha = large.resize((320, 240), Image.Resampling.LANCZOS)
+    weights = np.asarray(alpha, dtype=np.float64)[..., None] / 255
+    pixels = FOREGROUND * weights + BACKGROUND * (1 - weights)
+    return Image.fromarray(pixels.round().astype(np.uint8)), alpha
+
+
+def _coarse(alpha: Image.Image, factor: int = 4) -> Image.Image:
+    """正解のアルファを二値化して縮小・拡大した、境界の粗いマスクを作成。"""
+    binary = alpha.point(lambda value: 255 if value >= 128 else 0)
+    return binary.reduce(factor).resize(alpha.size, Image.Resampling.BILINEAR)
+
+
+def _error(mask: Image.Image, alpha: Image.Image) -> float:
+    """マスクと正解のアルファの平均絶対誤差。"""
+    refined = np.asarray(mask, dtype=np.float64)
+    return float(np.abs(refined - np.asarray(alpha, dtype=np.float64)).mean())
+
+
+class TestCleanMask:
+    """clean_mask関数のテストクラス."""
+
+    def test_正常系_オープニングで小さな点を取り除く(self) -> None:
+        """半径以下の前景の点が消え、大きな前景は残ることを確認。"""
+        mask = Image.new("L", (60, 40), 0)
+        ImageDraw.Draw(mask).rectangle((20, 10, 40, 30), fill=255)
+        mask.putpixel((5, 5), 255)
+
+        cleaned = clean_mask(mask, open_radius=1)
+
+        assert cleaned.getpixel((5, 5)) == 0
+        assert cleaned.getpixel((30, 20)) == 255
+        assert cleaned.getpixel((20, 10)) == 255
+
+    def test_正常系_クロージングで小さな穴を埋める(self) -> None:
+        """半径以下の穴が埋まり、背景は残ることを確認。"""
+        mask = Image.new("L", (60, 40), 0)
+        ImageDraw.Draw(mask).rectangle((20, 10, 40, 30), fill=255)
+        mask.putpixel((30, 20), 0)
+
+        cleaned = clean_mask(mask, close_radius=1)
+
+        assert cleaned.getpixel((30, 20)) == 255
+        assert cleaned.getpixel((5, 5)) == 0
+
+    def test_エッジケース_半径0は変更しない(self) -> None:
+        """半径が0の場合にマスクが変わらないことを確認。"""
+        _, alpha = _scene()
+
+        cleaned = clean_mask(alpha)
+
+        assert np.array_equal(np.asarray(cleaned), np.asarray(alpha))
+
+    def test_異常系_負の半径(self) -> None:
+        """半径が負の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="半径"):
+            clean_mask(Image.new("L", (8, 8)), open_radius=-1)
+
+
+class TestGuidedRefine:
+    """guided_refine関数のテストクラス."""
+
+    def test_正常系_粗い境界を元画像の色に合わせる(self) -> None:
+        """補正後のマスクの誤差が粗いマスクの半分未満になることを確認。"""
+        image, alpha = _scene()
+        coarse = _coarse(alpha)
+
+        refined = guided_refine(image, coarse)
+
+        assert refined.mode == "L"
+        assert refined.size == image.size
+        assert _error(refined, alpha) < _error(coarse, alpha) / 2
+
+    def test_正常系_境界から離れた画素は変更しない(self) -> None:
+        """帯の外の画素が元のマスクの値のままであることを確認。"""
+        image, alpha = _scene()
+        coarse = _coarse(alpha)
+
+        refined = guided_refine(image, coarse, radius=4)
+
+        assert refined.getpixel((2, 2)) == coarse.getpixel((2, 2))
+        assert refined.getpixel((160, 120)) == coarse.getpixel((160, 120))
+
+    @pytest.mark.parametrize("mode", ["RGBA", "P", "L"])
+    def test_正常系_RGB以外の画像(self, mode: str) -> None:
+        """RGB以外のモードの画像でも元のサイズのマスクを返すことを確認。"""
+        image, alpha = _scene()
+
+        refined = guided_refine(image.convert(mode), _coarse(alpha))
+
+        assert refined.size == image.size
+
+    @pytest.mark.parametrize("size", [(1, 50), (3, 3), (17, 5)])
+    def test_エッジケース_小さい画像(self, size: tuple[int, int]) -> None:
+        """縮小率より小さい画像でも処理できることを確認。"""
+        mask = Image.new("L", size, 0)
+        mask.putpixel((0, 0), 255)
+
+        refined = guided_refine(Image.new("RGB", size, (10, 20, 30)), mask)
+
+        assert refined.size == size
+
+    def test_エッジケース_境界がないマスク(self) -> None:
+        """全面が前景のマスクはそのまま返すことを確認。"""
+        image, _ = _scene()
+        mask = Image.new("L", image.size, 255)
+
+        refined = guided_refine(image, mask)
+
+        assert np.asarray(refined).min() == 255
+
+    def test_異常系_サイズが異なる(self) -> None:
+        """マスクのサイズが画像と異なる場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="サイズ"):
+            guided_refine(Image.new("RGB", (10, 10)), Image.new("L", (8, 8)))
+
+    def test_異常系_正則化が0(self) -> None:
+        """正則化が0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="正則化"):
+            guided_refine(Image.new("RGB", (8, 8)), Image.new("L", (8, 8)), epsilon=0)
+
+
+class TestMattingBackend:
+    """MattingBackendクラスのテストクラス."""
+
+    def test_正常系_内側のバックエンドのマスクを補正(self) -> None:
+        """単色背景の除去のマスクを補正し、信頼度とバックエンド名を引き継ぐことを確認。"""
+        image, _ = _scene()
+        inner = FlatBackgroundBackend()
+        backend = MattingBackend(inner, open_radius=1)
+
+        result = backend.segment(image)
+        expected = inner.segment(image)
+
+        assert result["backend"] == "flat"
+        assert result["confidence"] == expected["confidence"]
+        assert result["mask"].size == image.size
+        assert backend.cache_id.startswith(inner.cache_id + ":guided:")
+
+    def test_正常系_create_backendで指定(self) -> None:
+        """create_backendのmatting指定でMattingBackendが作成されることを確認。"""
+        backend = create_backend("flat", matting={"radius": 4, "close_radius": 2})
+
+        assert isinstance(backend, MattingBackend)
+        assert backend.radius == 4
+        assert backend.close_radius == 2
+
+    def test_異常系_半径が0(self) -> None:
+        """フィルタの半径が0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="半径"):
+            MattingBackend(FlatBackgroundBackend(), radius=0)
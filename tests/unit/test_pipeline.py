@@ -0,0 +1,251 @@
+"""パイプライン機能のテストモジュール."""
+
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from image_processor.conversion.formats import flatten_alpha
+from image_processor.processing.pipeline import (
+    ImageFileSink,
+    Pipeline,
+    PipelineItem,
+    image_file_source,
+    video_frame_source,
+)
+from image_processor.types import ProcessingResult
+from image_processor.utils.profiling import PerformanceMonitor
+
+
+def _make_items(count: int, size: tuple[int, int] = (32, 24)) -> list[PipelineItem]:
+    """テスト用のメモリ上画像を作成。"""
+    return [
+        PipelineItem(
+            name=f"img_{i}",
+            source=Path(f"img_{i}.png"),
+            image=Image.new("RGBA", size, (i * 10, 0, 0, 255)),
+        )
+        for i in range(count)
+    ]
+
+
+def _half_size(item: PipelineItem) -> PipelineItem:
+    """画像を半分に縮小する変換（プロセス実行用にモジュールレベルで定義）。"""
+    return PipelineItem(
+        name=item["name"],
+        source=item["source"],
+        image=item["image"].reduce(2),
+    )
+
+
+def _split_halves(item: PipelineItem) -> list[PipelineItem]:
+    """画像を上下2つに分割する展開変換。"""
+    width, height = item["image"].size
+    return [
+        PipelineItem(
+            name=f"{item['name']}_{i}",
+            source=item["source"],
+            image=item["image"].crop((0, i * height // 2, width, (i + 1) * height // 2)),
+        )
+        for i in range(2)
+    ]
+
+
+def _split_then_fail(item: PipelineItem) -> Iterator[PipelineItem]:
+    """img_1のみ1要素を生成した後に失敗する展開変換。"""
+    yield item
+    if item["name"] == "img_1":
+        raise ValueError("テスト用エラー")
+
+
+def _fail_on_second(item: PipelineItem) -> PipelineItem:
+    """img_1のみ失敗する変換。"""
+    if item["name"] == "img_1":
+        raise ValueError("テスト用エラー")
+    return item
+
+
+def _run_with_timeout(
+    pipeline: Pipeline, timeout: float = 30
+) -> list[ProcessingResult]:
+    """パイプラインを別スレッドで実行し、終了しない場合はテストを失敗させる。"""
+    results: list[ProcessingResult] = []
+    thread = threading.Thread(
+        target=lambda: results.extend(pipeline.run()), daemon=True
+    )
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "パイプラインが終了しません"
+    return results
+
+
+_FAILING_FFMPEG = """#!/bin/sh
+case "$*" in
+  *rawvideo*) echo "moov atom not found" >&2; exit 1 ;;
+  *) echo "  Stream #0:0: Video: h264, yuv420p, 4x2, 25 fps" >&2; exit 1 ;;
+esac
+"""
+
+
+class TestPipeline:
+    """Pipelineクラスのテストクラス."""
+
+    def test_正常系_スレッド実行(self, output_dir: Path) -> None:
+        """変換とシンクがスレッドで実行され全要素が出力されることを確認。"""
+        pipeline = Pipeline(_make_items(10))
+        pipeline.add_transform("half", _half_size, workers=3, queue_size=2)
+        pipeline.add_sink("save", ImageFileSink(output_dir, "png"), workers=2)
+
+        results = pipeline.run()
+
+        assert len(results) == 10
+        assert all(r["status"] == "success" for r in results)
+        for result in results:
+            assert result["output_path"] is not None
+            with Image.open(result["output_path"]) as img:
+                assert img.size == (16, 12)
+
+    def test_正常系_プロセス実行(self, output_dir: Path) -> None:
+        """プロセス実行のステージでも結果が得られることを確認。"""
+        pipeline = Pipeline(_make_items(4))
+        pipeline.add_transform("half", _half_size, workers=2, executor="process")
+        pipeline.add_sink("save", ImageFileSink(output_dir, "jpg"))
+
+        results = pipeline.run()
+
+        assert sorted(r["output_path"].name for r in results) == [
+            f"img_{i}.jpg" for i in range(4)
+        ]
+
+    def test_正常系_展開ステージ(self, output_dir: Path) -> None:
+        """expand指定のステージで1要素が複数要素に展開されることを確認。"""
+        pipeline = Pipeline(_make_items(3))
+        pipeline.add_transform("split", _split_halves, expand=True)
+        pipeline.add_sink("save", ImageFileSink(output_dir, "png"))
+
+        results = pipeline.run()
+
+        assert len(results) == 6
+        assert len(list(output_dir.glob("*.png"))) == 6
+
+    def test_正常系_ステージ毎の処理時間(self, output_dir: Path) -> None:
+        """各ステージの処理時間がPerformanceMonitorに記録されることを確認。"""
+        monitor = PerformanceMonitor()
+        pipeline = Pipeline(_make_items(5), monitor=monitor)
+        pipeline.add_transform("half", _half_size)
+        pipeline.add_sink("save", ImageFileSink(output_dir, "png"))
+
+        pipeline.run()
+
+        assert monitor.get_stats("source")["count"] == 5
+        assert monitor.get_stats("half")["count"] == 5
+        assert monitor.get_stats("save")["count"] == 5
+
+    def test_異常系_ステージのエラー(self, output_dir: Path) -> None:
+        """失敗した要素がエラー結果として記録され、他の要素は処理されることを確認。"""
+        pipeline = Pipeline(_make_items(3))
+        pipeline.add_transform("check", _fail_on_second, workers=2)
+        pipeline.add_sink("save", ImageFileSink(output_dir, "png"))
+
+        results = pipeline.run()
+
+        errors = [r for r in results if r["status"] == "error"]
+        assert len(results) == 3
+        assert len(errors) == 1
+        assert errors[0]["input_path"] == Path("img_1.png")
+        assert "check" in (errors[0]["error_message"] or "")
+
+    def test_異常系_展開ステージのエラー(self, output_dir: Path) -> None:
+        """展開の途中で失敗しても終了し、失敗した要素がエラーとして記録されることを確認。"""
+        pipeline = Pipeline(_make_items(3))
+        pipeline.add_transform("split", _split_then_fail, expand=True, workers=2)
+        pipeline.add_sink("save", ImageFileSink(output_dir, "png"))
+
+        results = _run_with_timeout(pipeline)
+
+        errors = [r for r in results if r["status"] == "error"]
+        assert len(results) == 4
+        assert len(errors) == 1
+        assert errors[0]["input_path"] == Path("img_1.png")
+        assert "split" in (errors[0]["error_message"] or "")
+
+    def test_異常系_展開ステージが反復できない値を返す(self, output_dir: Path) -> None:
+        """展開ステージの戻り値が反復できない場合もエラーとして記録されることを確認。"""
+        pipeline = Pipeline(_make_items(2))
+        pipeline.add_transform("split", lambda item: 1, expand=True)
+        pipeline.add_sink("save", ImageFileSink(output_dir, "png"))
+
+        results = _run_with_timeout(pipeline)
+
+        assert [r["status"] for r in results] == ["error", "error"]
+
+    def test_異常系_シンク未設定(self) -> None:
+        """シンクなしで実行するとValueErrorが発生することを確認。"""
+        pipeline = Pipeline(_make_items(1))
+        pipeline.add_transform("half", _half_size)
+
+        with pytest.raises(ValueError, match="シンク"):
+            pipeline.run()
+
+    def test_異常系_不正な並列数(self) -> None:
+        """並列数が1未満の場合ValueErrorが発生することを確認。"""
+        pipeline = Pipeline(_make_items(1))
+
+        with pytest.raises(ValueError, match="並列数"):
+            pipeline.add_transform("half", _half_size, workers=0)
+
+
+class TestPipelineHelpers:
+    """ソース・シンク補助関数のテストクラス."""
+
+    def test_正常系_画像ファイルソース(self, temp_dir: Path) -> None:
+        """画像ファイルがPipelineItemとして読み込まれることを確認。"""
+        path = temp_dir / "input.png"
+        Image.new("RGB", (8, 8), "red").save(path)
+
+        items = list(image_file_source([path]))
+
+        assert len(items) == 1
+        assert items[0]["name"] == "input"
+        assert items[0]["source"] == path
+        assert items[0]["image"].size == (8, 8)
+
+    def test_正常系_透過画像の平坦化(self) -> None:
+        """透過部分が背景色で塗られたRGB画像になることを確認。"""
+        image = Image.new("RGBA", (4, 4), (0, 0, 0, 0))
+
+        flattened = flatten_alpha(image, background=(10, 20, 30))
+
+        assert flattened.mode == "RGB"
+        assert flattened.getpixel((0, 0)) == (10, 20, 30)
+
+
+class TestVideoFrameSource:
+    """video_frame_source関数のテストクラス."""
+
+    def test_異常系_FFmpegの異常終了(self, temp_dir: Path) -> None:
+        """FFmpegが異常終了した場合に標準エラー出力を含むRuntimeErrorになることを確認。"""
+        ffmpeg = temp_dir / "ffmpeg"
+        ffmpeg.write_text(_FAILING_FFMPEG)
+        ffmpeg.chmod(0o755)
+
+        with pytest.raises(RuntimeError, match="moov atom not found"):
+            list(video_frame_source(temp_dir / "broken.mp4", ffmpeg_path=str(ffmpeg)))
+
+    def test_異常系_パイプラインでエラーとして記録(
+        self, temp_dir: Path, output_dir: Path
+    ) -> None:
+        """フレームを取得できない動画がパイプラインの結果でエラーになることを確認。"""
+        ffmpeg = temp_dir / "ffmpeg"
+        ffmpeg.write_text(_FAILING_FFMPEG)
+        ffmpeg.chmod(0o755)
+        source = video_frame_source(temp_dir / "broken.mp4", ffmpeg_path=str(ffmpeg))
+        pipeline = Pipeline(source, source_name="video")
+        pipeline.add_sink("save", ImageFileSink(output_dir, "png"))
+
+        results = _run_with_timeout(pipeline)
+
+        assert [r["status"] for r in results] == ["error"]
+        assert "moov atom not found" in (results[0]["error_message"] or "")
@@ -0,0 +1,158 @@
+"""並列PNGエンコーダーのテストモジュール."""
+
+import io
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_processor.conversion.png_writer import (
+    ApngWriter,
+    PngStripWriter,
+    adler32_combine,
+    encode_png_parallel,
+    save_png_parallel,
+    zlib_header,
+)
+
+
+def _sample_image(mode: str, size: tuple[int, int] = (67, 41)) -> Image.Image:
+    """ノイズとグラデーションを含むテスト画像を作成。"""
+    rng = np.random.default_rng(0)
+    channels = len(mode)
+    width, height = size
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)
+    data = np.broadcast_to(gradient[None, :, None], (height, width, channels)).copy()
+    data[height // 2 :] = rng.integers(0, 256, (height - height // 2, width, channels))
+    if channels == 1:
+        return Image.fromarray(data[:, :, 0], mode)
+    return Image.fromarray(data, mode)
+
+
+class TestEncodePngParallel:
+    """encode_png_parallel関数のテストクラス."""
+
+    @pytest.mark.parametrize("mode", ["L", "LA", "RGB", "RGBA"])
+    def test_正常系_Pillowで同一画素にデコード(self, mode: str) -> None:
+        """Pillowでデコードした画素が元画像と一致することを確認。"""
+        image = _sample_image(mode)
+
+        data = encode_png_parallel(image, strip_rows=5, workers=4)
+
+        with Image.open(io.BytesIO(data)) as decoded:
+            assert decoded.mode == mode
+            assert decoded.tobytes() == image.tobytes()
+
+    @pytest.mark.parametrize("filter_type", ["none", "sub", "up", "average", "paeth"])
+    def test_正常系_各フィルタ(self, filter_type: str) -> None:
+        """各フィルタ種別で正しくデコードできることを確認。"""
+        image = _sample_image("RGB")
+
+        data = encode_png_parallel(image, filter_type=filter_type, strip_rows=3)  # type: ignore[arg-type]
+
+        with Image.open(io.BytesIO(data)) as decoded:
+            assert decoded.tobytes() == image.tobytes()
+
+    def test_正常系_ファイル保存(self, temp_dir: Path) -> None:
+        """ファイルに保存した結果がPillowで読み込めることを確認。"""
+        image = _sample_image("RGBA", (300, 200))
+        image.info["dpi"] = (144, 144)
+        output_path = temp_dir / "out.png"
+
+        save_png_parallel(image, output_path, compress_level=1)
+
+        with Image.open(output_path) as decoded:
+            assert decoded.tobytes() == image.tobytes()
+            assert round(decoded.info["dpi"][0]) == 144
+
+    def test_異常系_未対応モード(self) -> None:
+        """未対応の画像モードでValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="未対応"):
+            encode_png_parallel(Image.new("P", (4, 4)))
+
+
+class TestPngStripWriter:
+    """PngStripWriterクラスのテストクラス."""
+
+    @pytest.mark.parametrize("mode", ["L", "LA", "RGB", "RGBA"])
+    def test_正常系_ストリップ単位の書き出し(self, mode: str) -> None:
+        """行数の揃わないストリップを順に書き出しても同一画素になることを確認。"""
+        image = _sample_image(mode)
+        buffer = io.BytesIO()
+
+        with PngStripWriter(buffer, image.size, mode, info={"dpi": (96, 96)}) as writer:
+            for top in range(0, image.height, 10):
+                bottom = min(top + 10, image.height)
+                writer.write(image.crop((0, top, image.width, bottom)))
+
+        with Image.open(io.BytesIO(buffer.getvalue())) as decoded:
+            assert decoded.mode == mode
+            assert decoded.tobytes() == image.tobytes()
+            assert round(decoded.info["dpi"][0]) == 96
+
+    def test_異常系_行数の不足(self) -> None:
+        """画像の高さに満たないまま閉じた場合にValueErrorが発生することを確認。"""
+        image = _sample_image("RGB")
+        writer = PngStripWriter(io.BytesIO(), image.size, "RGB")
+        writer.write(image.crop((0, 0, image.width, 10)))
+
+        with pytest.raises(ValueError, match="行数が不足"):
+            writer.close()
+
+    def test_異常系_幅の不一致(self) -> None:
+        """幅の異なるストリップでValueErrorが発生することを確認。"""
+        writer = PngStripWriter(io.BytesIO(), (10, 10), "RGB")
+
+        with pytest.raises(ValueError, match="幅またはモード"):
+            writer.write(Image.new("RGB", (9, 5)))
+
+
+class TestApngWriter:
+    """ApngWriterクラスのテストクラス."""
+
+    def test_正常系_フレームと表示時間(self) -> None:
+        """Pillowで読み込んだ各フレームの画素と表示時間が一致することを確認。"""
+        frames = [_sample_image("RGBA").rotate(i * 90) for i in range(3)]
+        buffer = io.BytesIO()
+
+        with ApngWriter(buffer, (67, 41), "RGBA", 3, loop=2) as writer:
+            for i, frame in enumerate(frames):
+                writer.write(frame, 40 + i * 10)
+
+        with Image.open(io.BytesIO(buffer.getvalue())) as decoded:
+            assert decoded.n_frames == 3
+            assert decoded.info["loop"] == 2
+            for i, frame in enumerate(frames):
+                decoded.seek(i)
+                assert decoded.info["duration"] == 40 + i * 10
+                assert decoded.convert("RGBA").tobytes() == frame.tobytes()
+
+    def test_異常系_フレーム数の不一致(self) -> None:
+        """指定したフレーム数に満たないまま閉じた場合にValueErrorが発生することを確認。"""
+        writer = ApngWriter(io.BytesIO(), (4, 4), "RGB", 2)
+        writer.write(Image.new("RGB", (4, 4)), 100)
+
+        with pytest.raises(ValueError, match="フレーム数が一致しません"):
+            writer.close()
+
+
+class TestZlibHelpers:
+    """zlibストリーム組み立て補助関数のテストクラス."""
+
+    def test_正常系_Adler32の合成(self) -> None:
+        """合成したAdler-32が連結データのAdler-32と一致することを確認。"""
+        first = bytes(range(256)) * 300
+        second = b"image_processor" * 5000
+
+        combined = adler32_combine(zlib.adler32(first), zlib.adler32(second), len(second))
+
+        assert combined == zlib.adler32(first + second)
+
+    @pytest.mark.parametrize("level", range(10))
+    def test_正常系_zlibヘッダーの検査値(self, level: int) -> None:
+        """zlibヘッダーがFCHECK条件を満たすことを確認。"""
+        cmf, flg = zlib_header(level)
+
+        assert (cmf * 256 + flg) % 31 == 0
@@ -0,0 +1,77 @@
+"""エンコーダープリセット機能のテストモジュール."""
+
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from image_processor.conversion.presets import (
+    PRESET_NAMES,
+    CalibrationResult,
+    calibrate_presets,
+    get_save_options,
+    recommend_preset,
+)
+
+
+class TestGetSaveOptions:
+    """get_save_options関数のテストクラス."""
+
+    def test_正常系_PNGプリセット(self) -> None:
+        """PNGのプリセットでcompress_levelが設定されることを確認。"""
+        assert get_save_options("png", "fastest") == {"compress_level": 1}
+        assert get_save_options("PNG", "smallest")["compress_level"] == 9
+
+    def test_正常系_JPEG画質指定(self) -> None:
+        """JPEGではプリセットと画質が両方反映されることを確認。"""
+        options = get_save_options("jpg", "balanced", quality=88)
+
+        assert options["optimize"] is True
+        assert options["quality"] == 88
+
+    def test_正常系_プリセット未指定(self) -> None:
+        """プリセット未指定の場合はPillowのデフォルト設定になることを確認。"""
+        assert get_save_options("webp") == {}
+
+    def test_正常系_PNGでは画質を無視(self) -> None:
+        """PNGでは画質指定が無視されることを確認。"""
+        assert "quality" not in get_save_options("png", "balanced", quality=90)
+
+    def test_異常系_未知のプリセット(self) -> None:
+        """未知のプリセット名でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="未知のプリセット"):
+            get_save_options("png", "ultra")  # type: ignore[arg-type]
+
+
+class TestCalibration:
+    """calibrate_presets / recommend_preset関数のテストクラス."""
+
+    def test_正常系_測定結果(self, temp_dir: Path) -> None:
+        """全プリセットについて時間とサイズが測定されることを確認。"""
+        files = []
+        for i in range(3):
+            path = temp_dir / f"sample_{i}.png"
+            Image.effect_noise((64, 64), 20 + i).convert("RGB").save(path)
+            files.append(path)
+
+        results = calibrate_presets(files, "png", sample_size=2)
+
+        assert [r["preset"] for r in results] == list(PRESET_NAMES)
+        assert all(r["image_count"] == 2 for r in results)
+        assert all(r["total_bytes"] > 0 for r in results)
+
+    def test_正常系_推奨プリセット(self) -> None:
+        """許容時間内で最小サイズのプリセットが選ばれることを確認。"""
+        results = [
+            CalibrationResult(preset="fastest", image_count=1, encode_time=1.0, total_bytes=300),
+            CalibrationResult(preset="balanced", image_count=1, encode_time=2.0, total_bytes=200),
+            CalibrationResult(preset="smallest", image_count=1, encode_time=9.0, total_bytes=190),
+        ]
+
+        assert recommend_preset(results) == "balanced"
+        assert recommend_preset(results, max_slowdown=10.0) == "smallest"
+
+    def test_異常系_対象ファイルなし(self) -> None:
+        """対象ファイルがない場合ValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError):
+            calibrate_presets([], "png")
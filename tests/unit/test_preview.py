@@ -0,0 +1,241 @@
+"""JPEGの埋め込みプレビューの取り出しのテストモジュール."""
+
+import io
+import struct
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from image_processor.conversion.preview import (
+    EmbeddedPreview,
+    list_embedded_previews,
+    load_preview,
+    select_preview,
+)
+from image_processor.conversion.pyramid import decode_for_size, save_thumbnails
+
+_MAIN_SIZE = (1200, 800)
+
+
+def _exif_with_thumbnail(thumbnail: Image.Image) -> bytes:
+    """IFD1にJPEGサムネイルを格納したEXIFを作成。"""
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, "JPEG")
+    data = buffer.getvalue()
+
+    def ifd(entries: list[tuple[int, int, int]], next_offset: int) -> bytes:
+        # (タグ, 型, 値) の列。値はすべて個数1
+        body = struct.pack("<H", len(entries))
+        for tag, kind, value in entries:
+            body += struct.pack("<HHII", tag, kind, 1, value)
+        return body + struct.pack("<I", next_offset)
+
+    ifd1_offset = 8 + 2 + 12 + 4
+    data_offset = ifd1_offset + 2 + 12 * 3 + 4
+    tiff = (
+        b"II*\x00"
+        + struct.pack("<I", 8)
+        + ifd([(0x0112, 3, 1)], ifd1_offset)
+        + ifd([(0x0103, 3, 6), (0x0201, 4, data_offset), (0x0202, 4, len(data))], 0)
+        + data
+    )
+    return b"Exif\x00\x00" + tiff
+
+
+def _camera_jpeg(
+    path: Path,
+    *,
+    thumbnail_size: tuple[int, int] | None = (150, 100),
+    preview_size: tuple[int, int] | None = (600, 400),
+) -> Path:
+    """EXIFサムネイルとMPFプレビューを埋め込んだカメラ風のJPEGを作成。
+
+    埋め込みプレビューは本画像と区別できるよう、色を変えて作る。
+    """
+    main = Image.new("RGB", _MAIN_SIZE, (200, 30, 30))
+    options: dict[str, object] = {}
+    if thumbnail_size is not None:
+        options["exif"] = _exif_with_thumbnail(
+            Image.new("RGB", thumbnail_size, (30, 200, 30))
+        )
+    if preview_size is not None:
+        preview = Image.new("RGB", preview_size, (30, 30, 200))
+        main.save(path, "MPO", save_all=True, append_images=[preview], **options)
+    else:
+        main.save(path, "JPEG", **options)
+    return path
+
+
+def _plain_jpeg(path: Path) -> Path:
+    """埋め込みプレビューのないJPEGを作成。"""
+    return _camera_jpeg(path, thumbnail_size=None, preview_size=None)
+
+
+class TestListEmbeddedPreviews:
+    """list_embedded_previews関数のテストクラス."""
+
+    def test_正常系_EXIFサムネイルとMPFプレビュー(self, temp_dir: Path) -> None:
+        """両方のプレビューが面積の小さい順に列挙されることを確認。"""
+        path = _camera_jpeg(temp_dir / "camera.jpg")
+
+        with Image.open(path) as img:
+            previews = list_embedded_previews(img)
+            assert img.tell() == 0
+
+        assert [(p["source"], p["width"], p["height"]) for p in previews] == [
+            ("exif_thumbnail", 150, 100),
+            ("mpf_preview", 600, 400),
+        ]
+
+    def test_エッジケース_プレビューなし(self, temp_dir: Path) -> None:
+        """プレビューのないJPEGとPNGでは空のリストになることを確認。"""
+        jpeg = _plain_jpeg(temp_dir / "plain.jpg")
+        png = temp_dir / "plain.png"
+        Image.new("RGB", (10, 10)).save(png)
+
+        for path in (jpeg, png):
+            with Image.open(path) as img:
+                assert list_embedded_previews(img) == []
+
+
+class TestSelectPreview:
+    """select_preview関数のテストクラス."""
+
+    previews = [
+        EmbeddedPreview(source="exif_thumbnail", width=160, height=120, frame=0),
+        EmbeddedPreview(source="mpf_preview", width=1920, height=1280, frame=1),
+    ]
+
+    def test_正常系_要求サイズ以上で最小のプレビュー(self) -> None:
+        """要求サイズを満たす最も小さいプレビューが選ばれることを確認。"""
+        selected = select_preview(self.previews, (6000, 4000), (1024, 683))
+
+        assert selected is not None
+        assert selected["source"] == "mpf_preview"
+
+    def test_エッジケース_縦横比の異なるサムネイルは使わない(self) -> None:
+        """黒帯付きの4:3のサムネイルは3:2の本画像に使われないことを確認。"""
+        selected = select_preview(self.previews, (6000, 4000), (150, 100))
+
+        assert selected is not None
+        assert selected["source"] == "mpf_preview"
+
+    def test_エッジケース_要求サイズより小さい(self) -> None:
+        """要求サイズを満たすプレビューがない場合Noneになることを確認。"""
+        assert select_preview(self.previews, (6000, 4000), (3000, 2000)) is None
+
+
+class TestLoadPreview:
+    """load_preview関数のテストクラス."""
+
+    @pytest.mark.parametrize("index", [0, 1])
+    def test_正常系_プレビューをデコード(self, temp_dir: Path, index: int) -> None:
+        """プレビューの画素がデコードされ、本画像のEXIFを引き継ぐことを確認。"""
+        path = _camera_jpeg(temp_dir / "camera.jpg")
+
+        with Image.open(path) as img:
+            preview = list_embedded_previews(img)[index]
+            image = load_preview(img, preview)
+
+        assert image.size == (preview["width"], preview["height"])
+        assert "exif" in image.info
+        expected = (30, 200, 30) if index == 0 else (30, 30, 200)
+        assert all(
+            abs(a - b) < 8
+            for a, b in zip(image.getpixel((5, 5)), expected, strict=True)  # type: ignore[arg-type]
+        )
+
+
+class TestDecodeForSize:
+    """decode_for_size関数と埋め込みプレビューの選択のテストクラス."""
+
+    @pytest.mark.parametrize(
+        ("size", "source", "decoded_size"),
+        [
+            (150, "exif_thumbnail", (150, 100)),
+            (400, "mpf_preview", (600, 400)),
+            (600, "mpf_preview", (600, 400)),
+            (601, "full", (1200, 800)),
+            (None, "full", (1200, 800)),
+        ],
+    )
+    def test_正常系_要求サイズに応じたデコード方法(
+        self,
+        temp_dir: Path,
+        size: int | None,
+        source: str,
+        decoded_size: tuple[int, int],
+    ) -> None:
+        """要求サイズ以上で最も小さいデコード方法が選ばれることを確認。"""
+        path = _camera_jpeg(temp_dir / "camera.jpg")
+
+        decoded = decode_for_size(path, size)
+
+        assert decoded["source"] == source
+        assert decoded["original_size"] == _MAIN_SIZE
+        assert decoded["image"].size == decoded_size
+
+    def test_正常系_プレビューがなければ縮小デコード(self, temp_dir: Path) -> None:
+        """埋め込みプレビューのないJPEGはdraftで縮小デコードされることを確認。"""
+        path = _plain_jpeg(temp_dir / "plain.jpg")
+
+        decoded = decode_for_size(path, 150)
+
+        assert decoded["source"] == "draft"
+        assert decoded["image"].size == (150, 100)
+
+    def test_正常系_埋め込みプレビューを使わない(self, temp_dir: Path) -> None:
+        """use_embedded_preview=Falseで縮小デコードになることを確認。"""
+        path = _camera_jpeg(temp_dir / "camera.jpg")
+
+        decoded = decode_for_size(path, 150, use_embedded_preview=False)
+
+        assert decoded["source"] == "draft"
+
+
+class TestSaveThumbnails:
+    """save_thumbnails関数のテストクラス."""
+
+    def test_正常系_デコード方法を記録(self, temp_dir: Path) -> None:
+        """画像ごとのデコード方法と出力が結果に記録されることを確認。"""
+        camera = _camera_jpeg(temp_dir / "camera.jpg")
+        png = temp_dir / "art.png"
+        Image.new("RGB", (400, 300), "white").save(png)
+        output_dir = temp_dir / "out"
+
+        results = save_thumbnails(
+            [camera, png], output_dir, [300, 150], image_format="webp", workers=2
+        )
+
+        assert [r["decode_source"] for r in results] == ["mpf_preview", "full"]
+        assert [p.name for p in results[0]["output_paths"]] == [
+            "camera_300.webp",
+            "camera_150.webp",
+        ]
+        with Image.open(results[0]["output_paths"][1]) as img:
+            assert img.size == (150, 100)
+
+    def test_異常系_読み込めないファイルはエラー(self, temp_dir: Path) -> None:
+        """壊れたファイルがエラーの結果になることを確認。"""
+        broken = temp_dir / "broken.jpg"
+        broken.write_bytes(b"not an image")
+
+        results = save_thumbnails([broken], temp_dir / "out", [100])
+
+        assert results[0]["status"] == "error"
+        assert results[0]["decode_source"] is None
+
+    def test_異常系_画素数の上限超過(
+        self, temp_dir: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Pillowが警告だけを出す画素数でもエラーの結果になることを確認。"""
+        camera = _camera_jpeg(temp_dir / "camera.jpg")
+        width, height = _MAIN_SIZE
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", width * height - 1)
+
+        with pytest.warns(Image.DecompressionBombWarning):
+            results = save_thumbnails([camera], temp_dir / "out", [300])
+
+        assert results[0]["status"] == "error"
+        assert "上限" in (results[0]["error_message"] or "")
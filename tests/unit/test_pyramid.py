@@ -0,0 +1,105 @@
+"""複数サイズ出力機能のテストモジュール."""
+
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from image_processor.conversion.pyramid import (
+    build_pyramid,
+    save_pyramid,
+    save_pyramid_with_config,
+    target_size,
+)
+from image_processor.types import ConversionConfig
+
+
+class TestTargetSize:
+    """target_size関数のテストクラス."""
+
+    def test_正常系_長辺基準(self) -> None:
+        """長辺が指定サイズになり縦横比が維持されることを確認。"""
+        assert target_size((2000, 1000), 500) == (500, 250)
+        assert target_size((300, 1200), 600) == (150, 600)
+
+    def test_エッジケース_拡大しない(self) -> None:
+        """元画像より大きいサイズや未指定の場合は元のサイズになることを確認。"""
+        assert target_size((100, 50), 400) == (100, 50)
+        assert target_size((100, 50), None) == (100, 50)
+
+    def test_異常系_不正なサイズ(self) -> None:
+        """1未満のサイズでValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="サイズ"):
+            target_size((100, 50), 0)
+
+
+class TestBuildPyramid:
+    """build_pyramid関数のテストクラス."""
+
+    def test_正常系_各サイズ(self) -> None:
+        """指定した全サイズの画像が作られることを確認。"""
+        image = Image.linear_gradient("L").resize((800, 400)).convert("RGB")
+
+        pyramid = build_pyramid(image, [None, 400, 100, 30])
+
+        assert pyramid[None].size == (800, 400)
+        assert pyramid[400].size == (400, 200)
+        assert pyramid[100].size == (100, 50)
+        assert pyramid[30].size == (30, 15)
+
+    def test_正常系_JPEGの縮小デコード(self, temp_dir: Path) -> None:
+        """元サイズを含まないJPEGでも元画像基準のサイズで出力されることを確認。"""
+        path = temp_dir / "photo.jpg"
+        Image.linear_gradient("L").resize((1600, 1200)).convert("RGB").save(path)
+
+        pyramid = build_pyramid(path, [300, 150])
+
+        assert pyramid[300].size == (300, 225)
+        assert pyramid[150].size == (150, 112)
+
+    def test_異常系_サイズ未指定(self) -> None:
+        """サイズが空の場合ValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="出力サイズ"):
+            build_pyramid(Image.new("RGB", (10, 10)), [])
+
+
+class TestSavePyramid:
+    """save_pyramid / save_pyramid_with_config関数のテストクラス."""
+
+    def test_正常系_保存(self, temp_dir: Path, output_dir: Path) -> None:
+        """サイズごとのファイルが指定順に保存されることを確認。"""
+        path = temp_dir / "art.png"
+        Image.new("RGBA", (640, 480), (255, 0, 0, 128)).save(path)
+
+        outputs = save_pyramid(path, output_dir, [None, 320], image_format="jpg")
+
+        assert [p.name for p in outputs] == ["art_full.jpg", "art_320.jpg"]
+        with Image.open(outputs[1]) as img:
+            assert img.size == (320, 240)
+            assert img.mode == "RGB"
+
+    def test_異常系_画素数の上限超過(
+        self,
+        temp_dir: Path,
+        output_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Pillowが警告だけを出す画素数でもデコード前にエラーになることを確認。"""
+        path = temp_dir / "art.png"
+        Image.new("RGB", (100, 100), "blue").save(path)
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100 * 100 - 1)
+
+        with pytest.warns(Image.DecompressionBombWarning):
+            with pytest.raises(Image.DecompressionBombError, match="上限"):
+                save_pyramid(path, output_dir, [None, 50])
+
+    def test_正常系_ConversionConfig(self, temp_dir: Path, output_dir: Path) -> None:
+        """ConversionConfigのsizes/format/output_dirが使われることを確認。"""
+        path = temp_dir / "art.png"
+        Image.new("RGB", (100, 100), "blue").save(path)
+        config = ConversionConfig(format="webp", output_dir=output_dir, sizes=[50, 25])
+
+        outputs = save_pyramid_with_config(path, config)
+
+        assert [p.name for p in outputs] == ["art_50.webp", "art_25.webp"]
+        assert all(p.exists() for p in outputs)
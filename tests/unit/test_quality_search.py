@@ -0,0 +1,225 @@
+"""目標画質・目標サイズによる画質探索のテストモジュール."""
+
+import io
+import math
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_processor.conversion.quality_search import (
+    convert_files_to_target_quality,
+    psnr,
+    search_quality,
+    ssim,
+)
+
+
+def _detailed_image(width: int = 320, height: int = 240) -> Image.Image:
+    """グラデーションとノイズを含む、画質によってサイズが大きく変わる画像を作成。"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    array = np.stack([x * 255 / width, y * 255 / height, (x + y) % 256], axis=-1)
+    array = array + rng.normal(0, 10, array.shape)
+    return Image.fromarray(np.clip(array, 0, 255).astype(np.uint8))
+
+
+def _encoded_size(image: Image.Image, image_format: str, quality: int) -> int:
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=quality)
+    return buffer.tell()
+
+
+class TestMetrics:
+    """ssim/psnr関数のテストクラス."""
+
+    def test_正常系_同じ画像はSSIMが1でPSNRが無限大(self) -> None:
+        """同一画像でSSIM=1、PSNR=無限大になることを確認。"""
+        array = np.asarray(_detailed_image(64, 48))
+
+        assert ssim(array, array) == pytest.approx(1.0)
+        assert psnr(array, array) == math.inf
+
+    def test_正常系_劣化が大きいほど値が小さい(self) -> None:
+        """ノイズが大きいほどSSIM/PSNRが小さくなることを確認。"""
+        rng = np.random.default_rng(1)
+        reference = np.asarray(_detailed_image(64, 48)).astype(np.float64)
+        small = np.clip(reference + rng.normal(0, 2, reference.shape), 0, 255)
+        large = np.clip(reference + rng.normal(0, 20, reference.shape), 0, 255)
+
+        assert ssim(reference, large) < ssim(reference, small) < 1.0
+        assert psnr(reference, large) < psnr(reference, small)
+
+    def test_正常系_PSNRの既知の値(self) -> None:
+        """全画素の誤差が1のときPSNRが20*log10(255)になることを確認。"""
+        reference = np.zeros((8, 8), dtype=np.uint8)
+
+        assert psnr(reference, reference + 1) == pytest.approx(20 * math.log10(255))
+
+    def test_エッジケース_窓より小さい画像(self) -> None:
+        """7ピクセル未満の画像でもSSIMを計算できることを確認。"""
+        array = np.arange(12, dtype=np.uint8).reshape(3, 4)
+
+        assert ssim(array, array) == pytest.approx(1.0)
+
+    def test_異常系_形状が異なる(self) -> None:
+        """形状の異なる画像でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="形状"):
+            ssim(np.zeros((4, 4)), np.zeros((4, 5)))
+
+
+class TestSearchQuality:
+    """search_quality関数のテストクラス."""
+
+    @pytest.mark.parametrize("image_format", ["jpeg", "webp"])
+    def test_正常系_目標SSIMを満たす最小の画質(self, image_format: str) -> None:
+        """選ばれた画質が目標を満たし、1つ低い画質では満たさないことを確認。"""
+        image = _detailed_image()
+
+        data, result = search_quality(image, image_format, {"ssim": 0.95})
+
+        assert result["target_met"]
+        assert result["ssim"] >= 0.95
+        assert result["size"] == len(data)
+        if result["quality"] > 20:
+            _, lower = search_quality(
+                image,
+                image_format,
+                {"ssim": 0.95, "min_quality": result["quality"] - 1,
+                 "max_quality": result["quality"] - 1},
+            )
+            assert lower["ssim"] < 0.95
+
+    def test_正常系_目標サイズに収まる最大の画質(self) -> None:
+        """バイト数の上限に収まり、1つ高い画質では超えることを確認。"""
+        image = _detailed_image()
+        max_bytes = _encoded_size(image, "JPEG", 60)
+
+        data, result = search_quality(image, "jpeg", {"max_bytes": max_bytes})
+
+        assert result["target_met"]
+        assert len(data) <= max_bytes
+        assert _encoded_size(image, "JPEG", result["quality"] + 1) > max_bytes
+
+    def test_正常系_完全に透明な画素の色は評価しない(self) -> None:
+        """透明部分の色が失われるWebPでも、見える画素で目標を判定することを確認。"""
+        # 左半分は色がノイズの完全な透明、右半分は不透明な単色
+        rng = np.random.default_rng(1)
+        array = rng.integers(0, 256, (240, 320, 4), dtype=np.uint8)
+        array[..., 3] = 0
+        array[:, 160:] = (30, 120, 200, 255)
+        image = Image.fromarray(array)
+
+        _, result = search_quality(image, "webp", {"ssim": 0.95})
+
+        assert result["target_met"]
+        assert result["quality"] < 95
+
+    def test_正常系_試行回数は対数回(self) -> None:
+        """既定の範囲（20-95）の探索が8回以内の試行で終わることを確認。"""
+        _, result = search_quality(_detailed_image(), "jpeg", {"psnr": 35.0})
+
+        assert result["trials"] <= 8
+
+    def test_正常系_単純な画像は低い画質を選ぶ(self) -> None:
+        """単色に近い画像では探索範囲の最小画質が選ばれることを確認。"""
+        image = Image.new("RGB", (200, 150), (40, 80, 160))
+
+        _, result = search_quality(image, "jpeg", {"ssim": 0.95})
+
+        assert result["quality"] == 20
+
+    def test_エッジケース_目標を満たせない場合は最大画質(self) -> None:
+        """範囲内で目標を満たせない場合にtarget_metがFalseになることを確認。"""
+        _, result = search_quality(
+            _detailed_image(), "jpeg", {"psnr": 80.0, "max_quality": 50}
+        )
+
+        assert result["quality"] == 50
+        assert not result["target_met"]
+
+    def test_エッジケース_サイズの上限を優先(self) -> None:
+        """SSIMとサイズの両方を指定した場合にサイズの上限が優先されることを確認。"""
+        image = _detailed_image()
+        max_bytes = _encoded_size(image, "JPEG", 30)
+
+        data, result = search_quality(
+            image, "jpeg", {"ssim": 0.999, "max_bytes": max_bytes}
+        )
+
+        assert len(data) <= max_bytes
+        assert not result["target_met"]
+
+    def test_異常系_目標なし(self) -> None:
+        """目標を指定しない場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="目標"):
+            search_quality(_detailed_image(), "jpeg", {})
+
+    def test_異常系_画質を探索できないフォーマット(self) -> None:
+        """PNGを指定した場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="フォーマット"):
+            search_quality(_detailed_image(), "png", {"ssim": 0.9})
+
+    def test_異常系_画質の範囲が不正(self) -> None:
+        """最小画質が最大画質より大きい場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="画質の範囲"):
+            search_quality(
+                _detailed_image(),
+                "jpeg",
+                {"ssim": 0.9, "min_quality": 80, "max_quality": 40},
+            )
+
+
+class TestConvertFilesToTargetQuality:
+    """convert_files_to_target_quality関数のテストクラス."""
+
+    def test_正常系_画像ごとの画質を結果に記録(self, temp_dir: Path) -> None:
+        """画像ごとに異なる画質が選ばれ、結果に記録されることを確認。"""
+        detailed = temp_dir / "detailed.png"
+        flat = temp_dir / "flat.png"
+        _detailed_image().save(detailed)
+        Image.new("RGB", (320, 240), (200, 200, 220)).save(flat)
+        output_dir = temp_dir / "out"
+
+        results = convert_files_to_target_quality(
+            [detailed, flat], output_dir, "webp", {"ssim": 0.95}, workers=2
+        )
+
+        assert [r["input_path"] for r in results] == [detailed, flat]
+        assert all(r["status"] == "success" for r in results)
+        searches = [r["search"] for r in results]
+        assert searches[0] is not None and searches[1] is not None
+        assert searches[0]["quality"] > searches[1]["quality"]
+        for result in results:
+            assert result["output_path"] is not None
+            with Image.open(result["output_path"]) as img:
+                assert img.format == "WEBP"
+
+    def test_異常系_読み込めないファイルはエラー(self, temp_dir: Path) -> None:
+        """壊れたファイルがエラーの結果になることを確認。"""
+        broken = temp_dir / "broken.png"
+        broken.write_bytes(b"not an image")
+
+        results = convert_files_to_target_quality(
+            [broken], temp_dir / "out", "jpeg", {"ssim": 0.9}
+        )
+
+        assert results[0]["status"] == "error"
+        assert results[0]["search"] is None
+
+    def test_異常系_画素数の上限超過(
+        self, temp_dir: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Pillowが警告だけを出す画素数でもエラーの結果になることを確認。"""
+        path = temp_dir / "flat.png"
+        Image.new("RGB", (32, 32), (200, 200, 220)).save(path)
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 32 * 32 - 1)
+
+        with pytest.warns(Image.DecompressionBombWarning):
+            results = convert_files_to_target_quality(
+                [path], temp_dir / "out", "jpeg", {"ssim": 0.9}
+            )
+
+        assert results[0]["status"] == "error"
+        assert "上限" in (results[0]["error_message"] or "")
@@ -0,0 +1,130 @@
+"""パレット減色機能のテストモジュール."""
+
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from image_processor.conversion import quantize
+from image_processor.conversion.quantize import quantize_image, save_png_quantized
+
+
+def _flat_art() -> Image.Image:
+    """少数色・半透明を含むイラスト風の画像を作成。"""
+    image = Image.new("RGBA", (120, 80), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((10, 10, 70, 70), fill=(255, 0, 0, 255))
+    draw.rectangle((60, 20, 110, 60), fill=(0, 0, 255, 128))
+    return image
+
+
+def _gradient() -> Image.Image:
+    """256階調のグラデーション画像を作成。"""
+    gray = Image.linear_gradient("L").resize((128, 128))
+    return Image.merge("RGB", [gray, gray.transpose(Image.Transpose.ROTATE_90), gray])
+
+
+class TestQuantizeImage:
+    """quantize_image関数のテストクラス."""
+
+    def test_正常系_少数色は無劣化(self) -> None:
+        """色数が上限以下の画像が透過を含め無劣化でパレット化されることを確認。"""
+        image = _flat_art()
+
+        quantized = quantize_image(image)
+
+        assert quantized is not None
+        assert quantized.mode == "P"
+        buffer = io.BytesIO()
+        quantized.save(buffer, "PNG")
+        with Image.open(buffer) as reloaded:
+            restored = np.asarray(reloaded.convert("RGBA"))
+        assert np.array_equal(restored, np.asarray(image))
+
+    def test_正常系_不透明RGBAはRGBパレット(self) -> None:
+        """完全不透明なRGBA画像はRGBパレットになることを確認。"""
+        image = Image.new("RGBA", (8, 8), (10, 20, 30, 255))
+
+        quantized = quantize_image(image)
+
+        assert quantized is not None
+        assert quantized.palette is not None
+        assert quantized.palette.mode == "RGB"
+
+    def test_正常系_プロキシからパレット計算(self) -> None:
+        """色数が上限を超える場合も誤差内ならパレット化されることを確認。"""
+        quantized = quantize_image(_gradient(), max_colors=64, max_error=20.0, proxy_size=32)
+
+        assert quantized is not None
+        assert len(quantized.getcolors() or []) <= 64
+
+    def test_正常系_ディザリング(self) -> None:
+        """ディザリング指定でパレット画像が得られることを確認。"""
+        quantized = quantize_image(_gradient(), max_colors=8, dither=True, max_error=50.0)
+
+        assert quantized is not None
+        assert len(quantized.getcolors() or []) <= 8
+
+    def test_エッジケース_誤差超過でNone(self) -> None:
+        """減色誤差が許容値を超える場合Noneが返ることを確認。"""
+        assert quantize_image(_gradient(), max_colors=4, max_error=1.0) is None
+
+    def test_エッジケース_写真は全画素を調べずにNone(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """抽出した画素の見積もりで打ち切り、全一意色の割り当てを行わないことを確認。"""
+        rng = np.random.default_rng(0)
+        noise = Image.fromarray((rng.random((400, 400, 3)) * 255).astype(np.uint8))
+        sizes: list[int] = []
+        nearest = quantize._nearest_palette
+
+        def spy(
+            colors: np.ndarray, palette: np.ndarray
+        ) -> tuple[np.ndarray, np.ndarray]:
+            sizes.append(len(colors))
+            return nearest(colors, palette)
+
+        monkeypatch.setattr(quantize, "_nearest_palette", spy)
+
+        assert quantize_image(noise) is None
+        assert sizes and max(sizes) <= quantize._SAMPLE_PIXELS
+
+    def test_エッジケース_大きい少数色画像は見積もりで除外しない(self) -> None:
+        """抽出の対象になる大きさでも、誤差内の画像はパレット化されることを確認。"""
+        image = _gradient().resize((512, 512), Image.Resampling.NEAREST)
+
+        quantized = quantize_image(image, max_colors=64, max_error=20.0, proxy_size=32)
+
+        assert quantized is not None
+        assert quantized.size == (512, 512)
+
+    def test_異常系_不正な色数(self) -> None:
+        """色数が範囲外の場合ValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="色数"):
+            quantize_image(_flat_art(), max_colors=300)
+
+
+class TestSavePngQuantized:
+    """save_png_quantized関数のテストクラス."""
+
+    def test_正常系_PNG8で保存(self, temp_dir: Path) -> None:
+        """減色したPNGがフルカラーより小さく保存されることを確認。"""
+        image = _flat_art().resize((480, 320), Image.Resampling.NEAREST)
+        quantized_path = temp_dir / "quantized.png"
+        truecolor_path = temp_dir / "truecolor.png"
+
+        assert save_png_quantized(image, quantized_path) is True
+        image.save(truecolor_path)
+
+        with Image.open(quantized_path) as img:
+            assert img.mode == "P"
+        assert quantized_path.stat().st_size < truecolor_path.stat().st_size
+
+    def test_エッジケース_フォールバック(self, temp_dir: Path) -> None:
+        """誤差超過の場合は保存せずFalseが返ることを確認。"""
+        path = temp_dir / "skipped.png"
+
+        assert save_png_quantized(_gradient(), path, max_colors=4, max_error=1.0) is False
+        assert not path.exists()
@@ -0,0 +1,148 @@
+"""メモリ上限付きの並列実行のテストモジュール."""
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from image_processor.processing.scheduler import (
+    MemoryBudget,
+    estimate_memory,
+    run_with_memory_budget,
+    working_set_bytes,
+)
+
+
+def _save(directory: Path, name: str, size: tuple[int, int]) -> Path:
+    """指定サイズのPNGを保存。"""
+    path = directory / name
+    Image.new("RGB", size).save(path)
+    return path
+
+
+class _ConcurrencyRecorder:
+    """同時に実行中の処理の見積もり合計と件数を記録する処理関数."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.active: dict[Path, int] = {}
+        self.snapshots: list[dict[Path, int]] = []
+
+    def __call__(self, path: Path) -> Path:
+        with Image.open(path) as img:
+            nbytes = working_set_bytes(*img.size)
+        with self.lock:
+            self.active[path] = nbytes
+            self.snapshots.append(dict(self.active))
+        time.sleep(0.02)
+        with self.lock:
+            del self.active[path]
+        return path
+
+
+class TestEstimateMemory:
+    """estimate_memory関数のテストクラス."""
+
+    def test_正常系_ヘッダーからの見積もり(self, temp_dir: Path) -> None:
+        """画像サイズと操作の倍率から作業メモリが見積もられることを確認。"""
+        path = _save(temp_dir, "image.png", (300, 200))
+
+        estimate = estimate_memory(path)
+        removal = estimate_memory(path, operation="remove_background")
+
+        assert (estimate["width"], estimate["height"]) == (300, 200)
+        assert estimate["decoded_bytes"] == 300 * 200 * 4
+        assert estimate["working_bytes"] == working_set_bytes(300, 200)
+        assert removal["working_bytes"] > estimate["working_bytes"]
+
+    def test_異常系_画素数の上限超過(
+        self, temp_dir: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """MAX_IMAGE_PIXELSを超える画像でDecompressionBombErrorが発生することを確認。"""
+        path = _save(temp_dir, "image.png", (300, 200))
+        # Pillowは上限の2倍まではエラーにしないが、ここでは上限を超えた時点で拒否する
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 300 * 200 - 1)
+
+        with pytest.raises(Image.DecompressionBombError, match="上限"):
+            estimate_memory(path)
+
+
+class TestMemoryBudget:
+    """MemoryBudgetクラスのテストクラス."""
+
+    def test_正常系_上限を超える処理は単独で許可(self) -> None:
+        """実行中の処理がない場合は上限を超える見積もりも許可されることを確認。"""
+        budget = MemoryBudget(100)
+
+        with budget.reserve(500):
+            assert budget.in_use == 500
+            assert budget.running == 1
+        assert budget.in_use == 0
+
+    def test_正常系_空くまで待機(self) -> None:
+        """上限に収まらない処理が解放まで待機することを確認。"""
+        budget = MemoryBudget(100)
+        budget.acquire(80)
+        admitted = threading.Event()
+
+        def worker() -> None:
+            with budget.reserve(30):
+                admitted.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not admitted.wait(0.05)
+        budget.release(80)
+        assert admitted.wait(1.0)
+        thread.join()
+
+    def test_異常系_不正な上限(self) -> None:
+        """上限が0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="1以上"):
+            MemoryBudget(0)
+
+
+class TestRunWithMemoryBudget:
+    """run_with_memory_budget関数のテストクラス."""
+
+    def test_正常系_上限内で並列実行し巨大な画像は単独(self, temp_dir: Path) -> None:
+        """小さい画像は同時に、上限を超える画像は単独で実行されることを確認。"""
+        small = [_save(temp_dir, f"small_{i}.png", (50, 50)) for i in range(6)]
+        huge = _save(temp_dir, "huge.png", (400, 400))
+        paths = [*small[:3], huge, *small[3:]]
+        budget = working_set_bytes(50, 50) * 3
+        recorder = _ConcurrencyRecorder()
+
+        results = run_with_memory_budget(
+            recorder, paths, memory_budget=budget, workers=4
+        )
+
+        assert [r["input_path"] for r in results] == paths
+        assert all(r["status"] == "success" for r in results)
+        for snapshot in recorder.snapshots:
+            if huge in snapshot:
+                assert len(snapshot) == 1
+            else:
+                assert sum(snapshot.values()) <= budget
+        assert max(len(snapshot) for snapshot in recorder.snapshots) > 1
+
+    def test_異常系_失敗したファイルはエラーとして記録(self, temp_dir: Path) -> None:
+        """読み込めないファイルと処理中の例外がエラーの結果になることを確認。"""
+        good = _save(temp_dir, "good.png", (10, 10))
+        failing = _save(temp_dir, "failing.png", (10, 10))
+        broken = temp_dir / "broken.png"
+        broken.write_bytes(b"not an image")
+
+        def process(path: Path) -> Path:
+            if path == failing:
+                raise RuntimeError("テスト用エラー")
+            return path
+
+        results = run_with_memory_budget(
+            process, [good, broken, failing], memory_budget=1024**2, workers=2
+        )
+
+        assert [r["status"] for r in results] == ["success", "error", "error"]
+        assert results[2]["error_message"] == "テスト用エラー"
@@ -0,0 +1,163 @@
+"""セッションを読み込んだワーカープロセスによる並列実行のテストモジュール."""
+
+import functools
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from image_processor.processing.background import (
+    SegmentationBackend,
+    create_backend,
+    remove_background,
+)
+from image_processor.processing.session_pool import (
+    measure_backend_cost,
+    plan_session_pool,
+    run_with_session_pool,
+)
+
+
+def _cut_out(path: Path, backend: SegmentationBackend) -> Path:
+    """背景を透過し、ワーカーのスレッド数の設定をファイル名に含めて保存する。"""
+    with Image.open(path) as img:
+        rgba, _ = remove_background(img, backend)
+    if path.stem == "broken":
+        raise ValueError("壊れた画像です")
+    output = path.with_name(f"{path.stem}_omp{os.environ['OMP_NUM_THREADS']}.png")
+    rgba.save(output)
+    return output
+
+
+def _sprite(path: Path) -> Path:
+    """白背景に四角形を描いた画像を保存する。"""
+    image = Image.new("RGB", (48, 32), (255, 255, 255))
+    image.paste((200, 40, 40), (12, 8, 36, 24))
+    image.save(path)
+    return path
+
+
+class TestPlanSessionPool:
+    """plan_session_pool関数のテストクラス."""
+
+    def test_正常系_コアをワーカーに均等に分ける(self) -> None:
+        """ワーカー数がコア数/最小スレッド数になり、コアが均等に分かれることを確認。"""
+        plan = plan_session_pool(1000, cores=16, min_threads=4)
+
+        assert plan["workers"] == 4
+        assert plan["intra_op_threads"] == 4
+        assert plan["inter_op_threads"] == 1
+        assert plan["chunksize"] == 63
+
+    def test_正常系_読み込み時間に見合わないワーカーは作らない(self) -> None:
+        """推論時間の合計が読み込み時間の数倍しかない場合にワーカー数が減ることを確認。"""
+        plan = plan_session_pool(
+            10, per_image_seconds=1.0, load_seconds=4.0, cores=16, min_threads=2
+        )
+
+        assert plan["workers"] == 2
+        assert plan["intra_op_threads"] == 8
+
+    def test_正常系_ワーカー数を指定(self) -> None:
+        """指定したワーカー数でコアが分かれることを確認。"""
+        plan = plan_session_pool(100, cores=12, workers=3)
+
+        assert plan["workers"] == 3
+        assert plan["intra_op_threads"] == 4
+
+    def test_エッジケース_画像数よりワーカーを増やさない(self) -> None:
+        """画像数がワーカー数の上限より少ない場合を確認。"""
+        plan = plan_session_pool(2, cores=32, workers=8)
+
+        assert plan["workers"] == 2
+        assert plan["intra_op_threads"] == 16
+        assert plan["chunksize"] == 1
+
+    def test_異常系_画像数が0(self) -> None:
+        """画像数が0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="画像数"):
+            plan_session_pool(0)
+
+    def test_異常系_ワーカー数が0(self) -> None:
+        """ワーカー数が0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="ワーカー数"):
+            plan_session_pool(10, workers=0)
+
+
+class TestMeasureBackendCost:
+    """measure_backend_cost関数のテストクラス."""
+
+    def test_正常系_読み込みと推論の時間を測る(self, temp_dir: Path) -> None:
+        """スレッド数を渡してバックエンドを作成し、時間を返すことを確認。"""
+        calls: list[dict[str, int]] = []
+
+        def factory(
+            *, intra_op_threads: int, inter_op_threads: int
+        ) -> SegmentationBackend:
+            calls.append(
+                {
+                    "intra_op_threads": intra_op_threads,
+                    "inter_op_threads": inter_op_threads,
+                }
+            )
+            return create_backend("flat")
+
+        with Image.open(_sprite(temp_dir / "a.png")) as img:
+            cost = measure_backend_cost(factory, img, threads=3)
+
+        assert calls == [{"intra_op_threads": 3, "inter_op_threads": 1}]
+        assert cost["load_seconds"] >= 0
+        assert cost["per_image_seconds"] > 0
+
+
+class TestRunWithSessionPool:
+    """run_with_session_pool関数のテストクラス."""
+
+    def test_正常系_ワーカーで処理しスレッド数を設定(self, temp_dir: Path) -> None:
+        """各ワーカーが割り当てのスレッド数で、入力順に結果を返すことを確認。"""
+        paths = [_sprite(temp_dir / f"img{i}.png") for i in range(5)]
+        plan = plan_session_pool(len(paths), cores=4, workers=2)
+
+        results = run_with_session_pool(
+            _cut_out,
+            paths,
+            backend_factory=functools.partial(create_backend, "flat"),
+            plan=plan,
+        )
+
+        assert [r["input_path"] for r in results] == paths
+        assert all(r["status"] == "success" for r in results)
+        for result in results:
+            assert result["output_path"] is not None
+            assert result["output_path"].stem.endswith("_omp2")
+            with Image.open(result["output_path"]) as img:
+                assert img.mode == "RGBA"
+                assert img.getpixel((0, 0))[3] == 0
+                assert img.getpixel((24, 16))[3] == 255
+
+    def test_異常系_失敗したファイルはエラーの結果になる(self, temp_dir: Path) -> None:
+        """1ファイルの例外で他のファイルの処理が止まらないことを確認。"""
+        paths = [
+            _sprite(temp_dir / "ok.png"),
+            _sprite(temp_dir / "broken.png"),
+            _sprite(temp_dir / "ok2.png"),
+        ]
+
+        results = run_with_session_pool(
+            _cut_out,
+            paths,
+            backend_factory=functools.partial(create_backend, "flat"),
+            plan=plan_session_pool(len(paths), cores=2, workers=1),
+        )
+
+        assert [r["status"] for r in results] == ["success", "error", "success"]
+        assert results[1]["error_message"] == "壊れた画像です"
+
+    def test_エッジケース_入力が空(self) -> None:
+        """入力が空の場合はワーカーを起動せずに空のリストを返すことを確認。"""
+        plan = plan_session_pool(1, cores=1)
+
+        assert run_with_session_pool(
+            _cut_out, [], backend_factory=create_backend, plan=plan
+        ) == []
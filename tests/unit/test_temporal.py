@@ -0,0 +1,173 @@
+"""動画の背景透過でのマスクの時間方向の再利用のテストモジュール."""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from image_processor.processing.background import (
+    FlatBackgroundBackend,
+    SegmentationResult,
+)
+from image_processor.processing.temporal import (
+    TemporalMaskBackend,
+    estimate_shift,
+    shift_mask,
+    shifted_difference,
+)
+from image_processor.types import BackgroundMethod
+
+
+def _texture(width: int = 128, height: int = 96) -> np.ndarray:
+    """移動量の推定に使う、なめらかなランダム模様（0-1）を作成。"""
+    rng = np.random.default_rng(0)
+    noise = (rng.random((height // 8, width // 8)) * 255).astype(np.uint8)
+    small = Image.fromarray(noise)
+    return np.asarray(small.resize((width, height), Image.Resampling.BICUBIC)) / 255
+
+
+def _frame(
+    offset: int = 0, background: tuple[int, int, int] = (255, 255, 255)
+) -> Image.Image:
+    """単色背景の上にキャラクター風の図形を描いたフレームを作成。"""
+    image = Image.new("RGB", (320, 180), background)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((60 + offset, 40, 120 + offset, 160), fill=(40, 80, 200))
+    draw.ellipse((140 + offset, 30, 220 + offset, 150), fill=(240, 190, 170))
+    return image
+
+
+class _CountingBackend:
+    """呼び出し回数を数える単色背景の除去のバックエンド."""
+
+    name: BackgroundMethod = "flat"
+    cache_id = "counting"
+    resolution = 0
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def segment(self, image: Image.Image) -> SegmentationResult:
+        self.calls += 1
+        return FlatBackgroundBackend().segment(image)
+
+
+class TestEstimateShift:
+    """estimate_shift/shifted_difference関数のテストクラス."""
+
+    @pytest.mark.parametrize("shift", [(0, 0), (5, -3), (-12, 7)])
+    def test_正常系_平行移動量を推定(self, shift: tuple[int, int]) -> None:
+        """画面全体を移動した画像の移動量が推定できることを確認。"""
+        reference = _texture()
+        target = np.roll(reference, (shift[1], shift[0]), axis=(0, 1))
+
+        assert estimate_shift(reference, target) == shift
+        assert shifted_difference(reference, target, shift) == pytest.approx(0.0)
+
+    def test_正常系_移動を補正しないと差が大きい(self) -> None:
+        """移動量を補正しない場合の差が補正した場合より大きいことを確認。"""
+        reference = _texture()
+        target = np.roll(reference, 6, axis=1)
+
+        assert shifted_difference(reference, target) > 0.05
+
+    def test_エッジケース_重なりが半分未満(self) -> None:
+        """重なりが面積の半分未満の場合は差が最大になることを確認。"""
+        reference = _texture()
+
+        assert shifted_difference(reference, reference, (100, 0)) == 1.0
+
+    def test_異常系_形状が異なる(self) -> None:
+        """形状の異なる画像でValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="形状"):
+            estimate_shift(np.zeros((4, 4)), np.zeros((4, 5)))
+
+
+class TestShiftMask:
+    """shift_mask関数のテストクラス."""
+
+    def test_正常系_平行移動して端の値で埋める(self) -> None:
+        """マスクが移動し、空いた部分が端の値で埋まることを確認。"""
+        mask = Image.fromarray(np.arange(12, dtype=np.uint8).reshape(3, 4), "L")
+
+        shifted = np.asarray(shift_mask(mask, (1, -1)))
+
+        assert shifted.tolist() == [[4, 4, 5, 6], [8, 8, 9, 10], [8, 8, 9, 10]]
+
+
+class TestTemporalMaskBackend:
+    """TemporalMaskBackendクラスのテストクラス."""
+
+    def test_正常系_止め絵ではマスクを再利用(self) -> None:
+        """同じフレームが続く場合は最初の1回だけ推論することを確認。"""
+        inner = _CountingBackend()
+        backend = TemporalMaskBackend(inner)
+
+        results = [backend.segment(_frame()) for _ in range(8)]
+
+        assert inner.calls == 1
+        assert (backend.inferred, backend.reused) == (1, 7)
+        assert all(r["mask"].size == (320, 180) for r in results)
+
+    def test_正常系_一定間隔で推論し直す(self) -> None:
+        """max_intervalフレームごとに推論することを確認。"""
+        inner = _CountingBackend()
+        backend = TemporalMaskBackend(inner, max_interval=4)
+
+        for _ in range(10):
+            backend.segment(_frame())
+
+        assert inner.calls == 3
+
+    def test_正常系_カットが変わると推論(self) -> None:
+        """背景が変わったフレームでは推論し直すことを確認。"""
+        inner = _CountingBackend()
+        backend = TemporalMaskBackend(inner)
+
+        for image in [_frame(), _frame(), _frame(background=(0, 0, 0)), _frame()]:
+            backend.segment(image)
+
+        assert inner.calls == 3
+
+    def test_正常系_パンでは移動したマスクを再利用(self) -> None:
+        """平行移動したフレームで、推論と同じマスクを再利用できることを確認。"""
+        inner = _CountingBackend()
+        backend = TemporalMaskBackend(inner, compare_size=320)
+        backend.segment(_frame())
+
+        reused = backend.segment(_frame(offset=8))
+        expected = FlatBackgroundBackend().segment(_frame(offset=8))
+
+        assert inner.calls == 1
+        difference = np.abs(
+            np.asarray(reused["mask"]).astype(int)
+            - np.asarray(expected["mask"]).astype(int)
+        )
+        assert difference.mean() < 1.0
+
+    def test_正常系_移動の補正なしでは推論(self) -> None:
+        """motion=Falseでは平行移動したフレームで推論することを確認。"""
+        inner = _CountingBackend()
+        backend = TemporalMaskBackend(inner, motion=False)
+
+        backend.segment(_frame())
+        backend.segment(_frame(offset=8))
+
+        assert inner.calls == 2
+
+    def test_エッジケース_resetでキーフレームを破棄(self) -> None:
+        """reset後のフレームは推論することを確認。"""
+        inner = _CountingBackend()
+        backend = TemporalMaskBackend(inner)
+        backend.segment(_frame())
+
+        backend.reset()
+        backend.segment(_frame())
+
+        assert inner.calls == 2
+
+    def test_異常系_パラメータが範囲外(self) -> None:
+        """閾値やキーフレームの間隔が範囲外の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="閾値"):
+            TemporalMaskBackend(_CountingBackend(), threshold=2.0)
+        with pytest.raises(ValueError, match="間隔"):
+            TemporalMaskBackend(_CountingBackend(), max_interval=0)
@@ -0,0 +1,232 @@
+"""ストリップ単位の省メモリ変換のテストモジュール."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_processor.processing.tiled import (
+    iter_strips,
+    process_tiled,
+    strip_rows_for_budget,
+)
+
+
+def _noise_image(mode: str, size: tuple[int, int] = (37, 203)) -> Image.Image:
+    """ノイズのテスト画像を作成。"""
+    return Image.effect_noise(size, 60).convert("RGB").convert(mode)
+
+
+def _join(strips: list[Image.Image]) -> Image.Image:
+    """ストリップを縦に連結する。"""
+    joined = Image.new(strips[0].mode, (strips[0].width, sum(s.height for s in strips)))
+    top = 0
+    for strip in strips:
+        joined.paste(strip, (0, top))
+        top += strip.height
+    if strips[0].mode == "P":
+        joined.putpalette(strips[0].getpalette() or [])
+    return joined
+
+
+class TestStripRowsForBudget:
+    """strip_rows_for_budget関数のテストクラス."""
+
+    def test_正常系_上限に比例した行数(self) -> None:
+        """メモリ上限を倍にすると行数も倍になることを確認。"""
+        budget = 16 * 1024 * 1024
+        rows = strip_rows_for_budget(1000, "RGB", budget)
+
+        assert rows > 1
+        doubled = strip_rows_for_budget(1000, "RGB", budget * 2)
+        assert doubled in (rows * 2, rows * 2 + 1)
+
+    def test_エッジケース_上限が小さい場合は1行(self) -> None:
+        """上限が1行分に満たない場合も1行を返すことを確認。"""
+        assert strip_rows_for_budget(10000, "RGBA", 1) == 1
+
+    def test_異常系_不正な上限(self) -> None:
+        """上限が0の場合にValueErrorが発生することを確認。"""
+        with pytest.raises(ValueError, match="1以上"):
+            strip_rows_for_budget(100, "RGB", 0)
+
+
+class TestIterStrips:
+    """iter_strips関数のテストクラス."""
+
+    @pytest.mark.parametrize(
+        ("mode", "image_format"),
+        [
+            ("RGB", "BMP"),
+            ("P", "BMP"),
+            ("1", "BMP"),
+            ("RGB", "PPM"),
+            ("RGBA", "TIFF"),
+            ("L", "TGA"),
+            ("RGBA", "PNG"),
+        ],
+    )
+    def test_正常系_全体の読み込みと一致(
+        self, temp_dir: Path, mode: str, image_format: str
+    ) -> None:
+        """非圧縮形式の行単位読み込みと全体デコードの結果が一致することを確認。"""
+        path = temp_dir / f"image.{image_format.lower()}"
+        _noise_image(mode).save(path, image_format)
+
+        strips = list(iter_strips(path, 16))
+
+        with Image.open(path) as expected:
+            assert [s.height for s in strips[:-1]] == [16] * (len(strips) - 1)
+            joined = _join(strips)
+            assert joined.size == expected.size
+            assert np.array_equal(
+                np.asarray(joined.convert("RGBA")), np.asarray(expected.convert("RGBA"))
+            )
+
+    def test_正常系_切り抜き範囲(self, temp_dir: Path) -> None:
+        """切り抜き範囲の行と列だけが返されることを確認。"""
+        path = temp_dir / "image.bmp"
+        image = _noise_image("RGB")
+        image.save(path)
+        box = (3, 50, 30, 190)
+
+        joined = _join(list(iter_strips(path, 32, box=box)))
+
+        assert joined.tobytes() == image.crop(box).tobytes()
+
+    @pytest.mark.parametrize("mode", ["L", "LA", "RGB", "RGBA", "P"])
+    @pytest.mark.parametrize("box", [None, (3, 50, 30, 190)])
+    def test_正常系_PNGの逐次展開(
+        self,
+        temp_dir: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        mode: str,
+        box: tuple[int, int, int, int] | None,
+    ) -> None:
+        """PNGを全体をデコードせずに読み、全体のデコードと一致することを確認。"""
+        path = temp_dir / "image.png"
+        image = _noise_image(mode)
+        image.save(path, transparency=3) if mode == "P" else image.save(path)
+        with Image.open(path) as decoded:
+            expected = decoded.crop(box or (0, 0, *decoded.size))
+
+        def fail_load(self: Image.Image) -> None:
+            raise AssertionError("全体をデコードしています")
+
+        monkeypatch.setattr("PIL.PngImagePlugin.PngImageFile.load", fail_load)
+        strips = list(iter_strips(path, 7, box=box))
+
+        assert np.array_equal(np.asarray(_join(strips)), np.asarray(expected))
+        if mode == "P":
+            assert strips[0].getpalette() == expected.getpalette()
+            assert strips[0].info["transparency"] == 3
+
+    def test_エッジケース_逐次展開できないPNGは全体をデコード(
+        self, temp_dir: Path, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """16bitのPNGは全体をデコードし、警告を出すことを確認。"""
+        path = temp_dir / "image.png"
+        pixels = np.arange(0, 60000, 300, dtype=np.uint16).reshape(10, 20)
+        image = Image.fromarray(pixels)
+        image.save(path)
+
+        joined = _join(list(iter_strips(path, 3)))
+
+        assert joined.tobytes() == image.tobytes()
+        assert "全体をデコード" in caplog.text
+
+    def test_異常系_範囲外の切り抜き(self, temp_dir: Path) -> None:
+        """画像の範囲外を指定した場合にValueErrorが発生することを確認。"""
+        path = temp_dir / "image.bmp"
+        _noise_image("RGB").save(path)
+
+        with pytest.raises(ValueError, match="範囲外"):
+            list(iter_strips(path, 16, box=(0, 0, 38, 10)))
+
+
+class TestProcessTiled:
+    """process_tiled関数のテストクラス."""
+
+    @pytest.mark.parametrize("mode", ["RGB", "RGBA", "P", "1"])
+    def test_正常系_PNGの逐次書き出し(self, temp_dir: Path, mode: str) -> None:
+        """ストリップ単位で書き出したPNGが元画像と一致することを確認。"""
+        source = temp_dir / "source.tiff"
+        image = _noise_image(mode)
+        image.save(source)
+        output = temp_dir / "output.png"
+
+        process_tiled(source, output, memory_budget=37 * 4 * 42 * 10)
+
+        with Image.open(output) as result:
+            assert np.array_equal(
+                np.asarray(result.convert("RGBA")), np.asarray(image.convert("RGBA"))
+            )
+
+    def test_正常系_JPEG出力で透過を合成(
+        self, temp_dir: Path, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """JPEG出力時に透過部分が背景色で合成され、メモリの警告が出ることを確認。"""
+        source = temp_dir / "source.png"
+        image = Image.new("RGBA", (40, 300), (255, 0, 0, 0))
+        image.paste((0, 0, 255, 255), (0, 0, 20, 300))
+        image.save(source)
+
+        output = process_tiled(
+            source,
+            temp_dir / "output.jpg",
+            background=(0, 255, 0),
+            memory_budget=40 * 4 * 42 * 7,
+        )
+
+        with Image.open(output) as result:
+            assert result.mode == "RGB"
+            red, green, blue = result.getpixel((30, 150))
+            assert green > 240 and red < 16 and blue < 16
+            red, green, blue = result.getpixel((5, 150))
+            assert blue > 240 and red < 16 and green < 16
+        assert "出力画像全体をメモリに持ちます" in caplog.text
+
+    def test_正常系_切り抜きと変換(self, temp_dir: Path) -> None:
+        """切り抜き範囲とストリップごとの変換が適用されることを確認。"""
+        source = temp_dir / "source.bmp"
+        image = _noise_image("RGB")
+        image.save(source)
+        box = (5, 10, 25, 200)
+
+        output = process_tiled(
+            source,
+            temp_dir / "output.png",
+            box=box,
+            memory_budget=1,
+            transform=lambda strip: strip.convert("L"),
+        )
+
+        with Image.open(output) as result:
+            assert result.tobytes() == image.crop(box).convert("L").tobytes()
+
+    def test_異常系_サイズを変える変換(self, temp_dir: Path) -> None:
+        """ストリップのサイズを変える変換でValueErrorが発生することを確認。"""
+        source = temp_dir / "source.bmp"
+        _noise_image("RGB").save(source)
+
+        with pytest.raises(ValueError, match="サイズが変わって"):
+            process_tiled(
+                source,
+                temp_dir / "output.png",
+                transform=lambda strip: strip.resize((10, 10)),
+            )
+
+    def test_異常系_画素数の上限超過(
+        self, temp_dir: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Pillowが警告だけを出す画素数でもデコード前にエラーになることを確認。"""
+        source = temp_dir / "source.bmp"
+        _noise_image("RGB").save(source)
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 37 * 203 - 1)
+
+        with pytest.warns(Image.DecompressionBombWarning):
+            with pytest.raises(Image.DecompressionBombError, match="上限"):
+                process_tiled(source, temp_dir / "output.png")
+
+        assert not (temp_dir / "output.png").exists()
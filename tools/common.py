@@ -2,11 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import argparse
 from pathlib import Path
 from typing import List, Optional
 import logging
 
+# src配下のimage_processorパッケージを未インストールでも利用できるようにする
+_SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+if str(_SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(_SRC_DIR))
+
+PRESET_CHOICES = ['fastest', 'balanced', 'smallest']
+
 def setup_logging(log_file: Optional[str] = None) -> None:
     """ログ設定をセットアップ"""
     log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -49,6 +57,129 @@ def create_base_parser(description: str) -> argparse.ArgumentParser:
                        help='詳細な出力を表示')
     return parser
 
+def add_preset_argument(parser: argparse.ArgumentParser) -> None:
+    """エンコーダープリセットの引数を追加"""
+    parser.add_argument('--preset', choices=PRESET_CHOICES, default=None,
+                       help='エンコーダープリセット (未指定時はPillowのデフォルト設定)')
+
+def add_quantize_arguments(parser: argparse.ArgumentParser) -> None:
+    """パレット減色（PNG-8）出力の引数を追加"""
+    parser.add_argument('--quantize', action='store_true',
+                       help='PNG出力を透過付きパレット(PNG-8)に減色する（誤差が大きい画像はフルカラーで保存）')
+    parser.add_argument('--max-colors', type=int, default=256,
+                       help='減色時の最大色数 (デフォルト: 256)')
+    parser.add_argument('--dither', action='store_true',
+                       help='減色時にディザリングを行う（不透明な画像のみ）')
+    parser.add_argument('--max-error', type=float, default=4.0,
+                       help='減色を許容する誤差RMSE (デフォルト: 4.0)')
+
+def add_tile_memory_argument(parser: argparse.ArgumentParser) -> None:
+    """巨大画像のストリップ処理（省メモリモード）の引数を追加"""
+    parser.add_argument('--tile-memory', type=int, default=None, metavar='MB',
+                       help='画像を縦方向のストリップに分けて処理するときの作業メモリのMB数（巨大画像向け。PNG/非圧縮の入力をPNGに変換する場合のみこの程度に収まる）')
+
+def get_tile_memory(args: argparse.Namespace) -> Optional[int]:
+    """引数からストリップ処理のメモリ上限（バイト）を取得（未指定時はNone）"""
+    if args.tile_memory is None:
+        return None
+    if args.tile_memory < 1:
+        raise ValueError(f"--tile-memoryは1以上である必要があります: {args.tile_memory}")
+    return args.tile_memory * 1024 * 1024
+
+def get_quantize_options(args: argparse.Namespace) -> Optional[dict]:
+    """引数から減色オプションを取得（--quantize未指定時はNone）"""
+    if not args.quantize:
+        return None
+    return {'max_colors': args.max_colors, 'dither': args.dither, 'max_error': args.max_error}
+
+def add_pipeline_arguments(parser: argparse.ArgumentParser) -> None:
+    """読み込み・変換・書き出しを並行に行うパイプラインモードの引数を追加"""
+    parser.add_argument('--pipeline', action='store_true',
+                       help='読み込み・変換・書き出しを別スレッドで並行に行う（NFSなど遅延の大きいストレージ向け）')
+    parser.add_argument('--read-threads', type=int, default=4,
+                       help='パイプラインの読み込みスレッド数 (デフォルト: 4)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='デコード・エンコードのスレッド数（--pipeline/--memory-budget/画質探索時） (デフォルト: CPUコア数)')
+    parser.add_argument('--read-ahead', type=int, default=8,
+                       help='読み込みステージの先読み件数 (デフォルト: 8)')
+    parser.add_argument('--write-queue', type=int, default=8,
+                       help='書き出し待ちのエンコード済みファイルの上限 (デフォルト: 8)')
+
+def get_pipeline_options(args: argparse.Namespace) -> Optional[dict]:
+    """引数からパイプラインの設定を取得（--pipeline未指定時はNone）"""
+    if not args.pipeline:
+        return None
+    for name in ('read_threads', 'workers', 'read_ahead', 'write_queue'):
+        value = getattr(args, name)
+        if value is not None and value < 1:
+            raise ValueError(f"--{name.replace('_', '-')}は1以上である必要があります: {value}")
+    return {'read_workers': args.read_threads, 'encode_workers': args.workers,
+            'read_ahead': args.read_ahead, 'write_queue': args.write_queue}
+
+def add_memory_budget_arguments(parser: argparse.ArgumentParser) -> None:
+    """メモリ上限付きの並列処理の引数を追加"""
+    parser.add_argument('--memory-budget', type=int, default=None, metavar='MB',
+                       help='同時に処理する画像の作業メモリの見積もり合計をこのMB数に抑えて並列処理する')
+    parser.add_argument('--max-pixels', type=int, default=None,
+                       help='処理する画像の最大画素数 (デフォルト: PillowのMAX_IMAGE_PIXELS、0で無制限)')
+
+def get_memory_budget(args: argparse.Namespace) -> Optional[int]:
+    """引数からメモリ上限（バイト）を取得し、画素数の上限を設定（未指定時はNone）"""
+    if args.max_pixels is not None:
+        if args.max_pixels < 0:
+            raise ValueError(f"--max-pixelsは0以上である必要があります: {args.max_pixels}")
+        from PIL import Image
+        Image.MAX_IMAGE_PIXELS = args.max_pixels or None
+    if args.memory_budget is None:
+        return None
+    if args.memory_budget < 1:
+        raise ValueError(f"--memory-budgetは1以上である必要があります: {args.memory_budget}")
+    return args.memory_budget * 1024 * 1024
+
+def add_quality_target_arguments(parser: argparse.ArgumentParser) -> None:
+    """目標画質・目標サイズによる画質探索の引数を追加"""
+    parser.add_argument('--target-ssim', type=float, default=None,
+                       help='JPEG/WebPの画質を探索し、SSIMがこの値以上になる最小の画質で保存 (例: 0.95)')
+    parser.add_argument('--target-psnr', type=float, default=None,
+                       help='JPEG/WebPの画質を探索し、PSNR(dB)がこの値以上になる最小の画質で保存 (例: 40)')
+    parser.add_argument('--max-kb', type=int, default=None,
+                       help='JPEG/WebPの画質を探索し、このKB数に収まる最大の画質で保存')
+
+def get_quality_target(args: argparse.Namespace) -> Optional[dict]:
+    """引数から画質探索の目標を取得（いずれも未指定時はNone）"""
+    target = {}
+    if args.target_ssim is not None:
+        if not 0 < args.target_ssim <= 1:
+            raise ValueError(f"--target-ssimは0より大きく1以下である必要があります: {args.target_ssim}")
+        target['ssim'] = args.target_ssim
+    if args.target_psnr is not None:
+        if args.target_psnr <= 0:
+            raise ValueError(f"--target-psnrは0より大きい必要があります: {args.target_psnr}")
+        target['psnr'] = args.target_psnr
+    if args.max_kb is not None:
+        if args.max_kb < 1:
+            raise ValueError(f"--max-kbは1以上である必要があります: {args.max_kb}")
+        target['max_bytes'] = args.max_kb * 1024
+    return target or None
+
+def add_catalog_arguments(parser: argparse.ArgumentParser) -> None:
+    """メディアカタログによる入力ファイルの絞り込み引数を追加"""
+    parser.add_argument('--select', type=str, default=None, metavar='QUERY',
+                       help='ヘッダー情報の条件で入力ファイルを絞り込む (例: "width > 2000 and format = png")')
+    parser.add_argument('--catalog', type=str, default=None, metavar='DB',
+                       help='ヘッダー情報を保存するカタログ(SQLite)のパス。指定時は変更のないファイルを読み直さない')
+
+def select_files(args: argparse.Namespace, files: List[Path]) -> List[Path]:
+    """--selectの条件に一致するファイルを返す（未指定時はそのまま）"""
+    if not args.select:
+        return files
+    from image_processor.core.catalog import MediaCatalog
+
+    with MediaCatalog(args.catalog or ':memory:') as catalog:
+        selected = catalog.select(files, args.select)
+    logging.info(f"条件に一致したファイル: {len(selected)}/{len(files)}個 ({args.select})")
+    return selected
+
 def validate_directories(input_dir: str, output_dir: str) -> bool:
     """入力・出力ディレクトリの検証"""
     if not os.path.exists(input_dir):
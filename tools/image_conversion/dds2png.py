@@ -2,68 +2,113 @@
 # -*- coding: utf-8 -*-
 """
 DDSファイルをPNGファイルに変換するツール
-依存関係: pip install Wand, ImageMagickのインストールも必要
+デフォルトはPillow + NumPyによるプロセス内デコード（追加の依存関係なし）
+--backend wand を指定する場合: pip install Wand, ImageMagickのインストールも必要
 """
 
 import sys
 import logging
 from pathlib import Path
 
-try:
-    from wand.image import Image as WandImage
-except ImportError:
-    print("Error: wandライブラリがインストールされていません。")
-    print("以下のコマンドでインストールしてください:")
-    print("pip install Wand")
-    print("また、ImageMagickもシステムにインストールする必要があります。")
-    sys.exit(1)
-
 # 親ディレクトリのcommon.pyをインポート
 sys.path.append(str(Path(__file__).parent.parent))
-from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension, remove_file_safely
+from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension, remove_file_safely, add_preset_argument
+from image_processor.conversion.dds import convert_dds_files, read_dds_info
+
+def convert_dds_to_png_wand(input_file: Path, output_dir: str) -> bool:
+    """DDSファイルをPNGに変換（Wand/ImageMagick使用）"""
+    try:
+        from wand.image import Image as WandImage
+    except ImportError:
+        logging.error("wandライブラリがインストールされていません。pip install Wand を実行し、"
+                      "ImageMagickもシステムにインストールしてください。")
+        return False
 
-def convert_dds_to_png(input_file: Path, output_dir: str) -> bool:
-    """DDSファイルをPNGに変換"""
     try:
         with WandImage(filename=str(input_file)) as img:
             png_filename = input_file.stem + '.png'
             output_path = Path(output_dir) / png_filename
-            
+
             img.save(filename=str(output_path))
             logging.info(f"変換完了: {input_file.name} -> {png_filename}")
             return True
-            
+
     except Exception as e:
         logging.error(f"変換エラー {input_file.name}: {e}")
         return False
 
+def convert_native(dds_files: list, output_dir: str, workers: int = None, preset: str = None,
+                   mip_level: int = None, min_size: int = None) -> list:
+    """DDSファイルをPNGに一括変換（プロセス内デコード）し、成功したファイルを返す"""
+    results = convert_dds_files(dds_files, Path(output_dir), workers=workers, preset=preset,
+                                mip_level=mip_level, min_size=min_size)
+    converted = []
+    for result in results:
+        if result['status'] == 'success':
+            logging.info(f"変換完了: {result['input_path'].name} -> {result['output_path'].name}")
+            converted.append(result['input_path'])
+        else:
+            logging.error(f"変換エラー {result['input_path'].name}: {result['error_message']}")
+    return converted
+
+def print_dds_info(dds_files: list) -> None:
+    """DDSファイルのヘッダー情報を表示（画素データはデコードしない）"""
+    print(f"{'ファイル':<32} {'サイズ':>11} {'形式':>8} {'ミップ数':>8}")
+    for dds_file in dds_files:
+        try:
+            info = read_dds_info(dds_file)
+        except (OSError, ValueError) as e:
+            logging.error(f"ヘッダー読み込みエラー {dds_file.name}: {e}")
+            continue
+        size = f"{info['width']}x{info['height']}"
+        print(f"{dds_file.name:<32} {size:>11} {info['format']:>8} {info['mip_count']:>8}")
+
 def main():
     parser = create_base_parser("DDSファイルをPNGファイルに変換")
     parser.add_argument('--keep-original', action='store_true',
                        help='変換後も元のDDSファイルを保持')
+    parser.add_argument('--backend', choices=['native', 'wand'], default='native',
+                       help='デコード方式 (デフォルト: native = Pillow/NumPy, wand = ImageMagick)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='nativeバックエンドの並列プロセス数 (デフォルト: CPU数)')
+    mip_group = parser.add_mutually_exclusive_group()
+    mip_group.add_argument('--mip-level', type=int, default=None,
+                          help='出力するミップレベル (0が最大、nativeバックエンドのみ)')
+    mip_group.add_argument('--min-size', type=int, default=None,
+                          help='長辺がこのピクセル数以上の最小ミップを出力 (プレビュー用、nativeバックエンドのみ)')
+    parser.add_argument('--info', action='store_true',
+                       help='変換せずにヘッダー情報（サイズ・形式・ミップ数）のみ表示')
+    add_preset_argument(parser)
     args = parser.parse_args()
-    
+
     setup_logging()
-    
+
     if not validate_directories(args.input, args.output):
         sys.exit(1)
-    
+
     dds_files = get_files_by_extension(args.input, ['.dds'])
-    
+
     if not dds_files:
         logging.warning(f"DDSファイルが見つかりません: {args.input}")
         return
-    
+
+    if args.info:
+        print_dds_info(dds_files)
+        return
+
     logging.info(f"{len(dds_files)}個のDDSファイルを処理します")
-    
-    converted_count = 0
-    for dds_file in dds_files:
-        if convert_dds_to_png(dds_file, args.output):
-            converted_count += 1
-            if not args.keep_original:
-                remove_file_safely(str(dds_file))
-    
-    logging.info(f"変換完了: {converted_count}/{len(dds_files)}個のファイル")
+
+    if args.backend == 'native':
+        converted = convert_native(dds_files, args.output, args.workers, args.preset,
+                                   args.mip_level, args.min_size)
+    else:
+        converted = [f for f in dds_files if convert_dds_to_png_wand(f, args.output)]
+
+    if not args.keep_original:
+        for dds_file in converted:
+            remove_file_safely(str(dds_file))
+
+    logging.info(f"変換完了: {len(converted)}/{len(dds_files)}個のファイル")
 
 if __name__ == "__main__":
     main()
@@ -1,22 +1,77 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-画像フォーマット変換ツール（JPG, WebP, PNG間の変換）
+画像フォーマット変換ツール（JPG, WebP, PNG, GIF間の変換）
+アニメーション画像（GIF/WebP/APNG）はフレームを1枚ずつ読み込んで変換する
 """
 
 import sys
 import logging
+from collections import Counter
 from pathlib import Path
 from PIL import Image
 
 # 親ディレクトリのcommon.pyをインポート
 sys.path.append(str(Path(__file__).parent.parent))
-from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension, remove_file_safely
+from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension, remove_file_safely, add_preset_argument, add_quantize_arguments, get_quantize_options, add_tile_memory_argument, get_tile_memory, add_catalog_arguments, select_files, add_pipeline_arguments, get_pipeline_options, add_memory_budget_arguments, get_memory_budget, add_quality_target_arguments, get_quality_target
+from image_processor.conversion.presets import get_save_options
+from image_processor.conversion.png_writer import is_supported_mode, save_png_parallel
+from image_processor.conversion.quantize import save_png_quantized
+from image_processor.conversion.pyramid import save_pyramid, save_thumbnails
+from image_processor.processing.tiled import process_tiled
+from image_processor.processing.convert_pipeline import convert_files_pipelined
+from image_processor.processing.scheduler import check_pixels, run_with_memory_budget
+from image_processor.conversion.animation import ANIMATED_FORMATS, convert_animation, save_frames
+from image_processor.conversion.color import apply_color_policy
+from image_processor.conversion.quality_search import SEARCHABLE_FORMATS, convert_files_to_target_quality
 
-def convert_image(input_file: Path, output_dir: str, target_format: str, keep_original: bool = False) -> bool:
+def convert_animated_image(input_file: Path, output_dir: str, target_format: str,
+                           keep_original: bool = False, preset: str = None,
+                           split_frames: bool = False) -> bool:
+    """アニメーション画像をアニメーションのまま、またはフレームごとの画像に変換"""
+    try:
+        if split_frames:
+            output_paths = save_frames(input_file, Path(output_dir), image_format=target_format,
+                                       preset=preset)
+            logging.info(f"フレーム分解完了: {input_file.name} -> {len(output_paths)}フレーム")
+        else:
+            ext_map = {'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+            output_path = Path(output_dir) / (input_file.stem + ext_map[target_format.upper()])
+            convert_animation(input_file, output_path, image_format=target_format, preset=preset)
+            logging.info(f"変換完了: {input_file.name} -> {output_path.name} (アニメーション)")
+            output_paths = [output_path]
+
+        # 元ファイルの削除（形式が変わる場合のみ）
+        if not keep_original and input_file.suffix.lower() != output_paths[0].suffix.lower():
+            remove_file_safely(str(input_file))
+
+        return True
+
+    except Exception as e:
+        logging.error(f"変換エラー {input_file.name}: {e}")
+        return False
+
+def convert_image(input_file: Path, output_dir: str, target_format: str, keep_original: bool = False,
+                  preset: str = None, parallel_png: bool = False, quantize: dict = None,
+                  split_frames: bool = False, preserve_metadata: bool = False) -> bool:
     """画像を指定フォーマットに変換"""
     try:
+        # --max-pixelsの上限はPillowの警告（上限の2倍まで）で済ませず、デコード前にエラーにする
+        with Image.open(input_file) as img:
+            check_pixels(*img.size)
+            animated = getattr(img, 'n_frames', 1) > 1
+        if animated:
+            if split_frames or target_format.upper() in ANIMATED_FORMATS:
+                return convert_animated_image(input_file, output_dir, target_format,
+                                              keep_original, preset, split_frames)
+            logging.warning(f"{target_format}はアニメーションに対応していないため先頭フレームのみ変換します: "
+                            f"{input_file.name} (--framesでフレームごとに出力)")
+
         with Image.open(input_file) as img:
+            # 埋め込みICCプロファイルに従ってsRGBに変換（引き継ぐ場合はプロファイルとEXIFを保存オプションへ）
+            img, metadata = apply_color_policy(img, target_format.upper(),
+                                               preserve_metadata=preserve_metadata)
+
             # RGBAモードの場合、JPGに変換する時はRGBに変換
             if target_format.upper() == 'JPEG' and img.mode in ('RGBA', 'LA', 'P'):
                 background = Image.new('RGB', img.size, (255, 255, 255))
@@ -26,14 +81,24 @@ def convert_image(input_file: Path, output_dir: str, target_format: str, keep_or
                 img = background
             
             # 拡張子を決定
-            ext_map = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+            ext_map = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
             new_ext = ext_map.get(target_format.upper(), '.png')
             
             output_filename = input_file.stem + new_ext
             output_path = Path(output_dir) / output_filename
             
             # 保存
-            img.save(output_path, target_format.upper())
+            save_options = dict(get_save_options(target_format, preset), **metadata)
+            if quantize and target_format.upper() == 'PNG' and \
+                    save_png_quantized(img, output_path, **quantize, **save_options):
+                logging.debug(f"PNG-8で保存: {output_filename}")
+            elif parallel_png and target_format.upper() == 'PNG' and is_supported_mode(img.mode):
+                # --keep-metadataで引き継ぐICCプロファイルとEXIFもチャンクとして書き出す
+                save_png_parallel(img, output_path,
+                                  compress_level=save_options.get('compress_level', 6),
+                                  icc_profile=metadata.get('icc_profile'), exif=metadata.get('exif'))
+            else:
+                img.save(output_path, target_format.upper(), **save_options)
             logging.info(f"変換完了: {input_file.name} -> {output_filename}")
             
             # 元ファイルの削除（形式が変わる場合のみ）
@@ -46,17 +111,162 @@ def convert_image(input_file: Path, output_dir: str, target_format: str, keep_or
         logging.error(f"変換エラー {input_file.name}: {e}")
         return False
 
+def convert_image_tiled(input_file: Path, output_dir: str, target_format: str, memory_budget: int,
+                        keep_original: bool = False, preset: str = None,
+                        preserve_metadata: bool = False) -> bool:
+    """画像をストリップ単位で変換（巨大画像向けの省メモリモード）"""
+    try:
+        ext_map = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+        new_ext = ext_map.get(target_format.upper(), '.png')
+        output_path = Path(output_dir) / (input_file.stem + new_ext)
+
+        process_tiled(input_file, output_path, image_format=target_format,
+                      memory_budget=memory_budget, preset=preset,
+                      preserve_metadata=preserve_metadata)
+        logging.info(f"変換完了: {input_file.name} -> {output_path.name}")
+
+        # 元ファイルの削除（形式が変わる場合のみ）
+        if not keep_original and input_file.suffix.lower() != new_ext.lower():
+            remove_file_safely(str(input_file))
+
+        return True
+
+    except Exception as e:
+        logging.error(f"変換エラー {input_file.name}: {e}")
+        return False
+
+def parse_sizes(values: list) -> list:
+    """--sizesの値をサイズのリストに変換（'full'は元のサイズ=None）"""
+    sizes = []
+    for value in values:
+        if value.lower() == 'full':
+            sizes.append(None)
+        elif value.isdigit() and int(value) > 0:
+            sizes.append(int(value))
+        else:
+            raise ValueError(f"不正なサイズ指定です: {value}")
+    return sizes
+
+def convert_image_sizes(input_file: Path, output_dir: str, target_format: str, sizes: list,
+                        keep_original: bool = False, preset: str = None,
+                        preserve_metadata: bool = False, use_embedded_preview: bool = True) -> bool:
+    """1回のデコードで複数サイズの画像に変換"""
+    try:
+        output_paths = save_pyramid(input_file, Path(output_dir), sizes,
+                                    image_format=target_format, preset=preset,
+                                    preserve_metadata=preserve_metadata,
+                                    use_embedded_preview=use_embedded_preview)
+        logging.info(f"変換完了: {input_file.name} -> {', '.join(p.name for p in output_paths)}")
+
+        # 元ファイルの削除（形式が変わる場合のみ）
+        if not keep_original and input_file.suffix.lower() != output_paths[0].suffix.lower():
+            remove_file_safely(str(input_file))
+
+        return True
+
+    except Exception as e:
+        logging.error(f"変換エラー {input_file.name}: {e}")
+        return False
+
+def convert_images_sizes(image_files: list, output_dir: str, target_format: str, sizes: list,
+                         keep_original: bool = False, preset: str = None,
+                         preserve_metadata: bool = False, use_embedded_preview: bool = True,
+                         workers: int = None) -> int:
+    """複数の画像を並列に複数サイズへ変換し、デコード方法（埋め込みプレビュー/縮小デコード）を記録して成功数を返す"""
+    results = save_thumbnails(image_files, Path(output_dir), sizes, image_format=target_format,
+                              preset=preset, preserve_metadata=preserve_metadata,
+                              use_embedded_preview=use_embedded_preview, workers=workers)
+    converted_count = 0
+    for result in results:
+        if result['status'] != 'success':
+            logging.error(f"変換エラー {result['input_path'].name}: {result['error_message']}")
+            continue
+        converted_count += 1
+        logging.info(f"変換完了: {result['input_path'].name} -> "
+                     f"{', '.join(p.name for p in result['output_paths'])} "
+                     f"(デコード: {result['decode_source']})")
+
+        # 元ファイルの削除（形式が変わる場合のみ）
+        if not keep_original and result['input_path'].suffix.lower() != result['output_path'].suffix.lower():
+            remove_file_safely(str(result['input_path']))
+
+    sources = Counter(result['decode_source'] for result in results if result['status'] == 'success')
+    logging.info("デコード方法: " + ", ".join(f"{source}={count}" for source, count in sources.most_common()))
+    return converted_count
+
+def convert_images_pipelined(image_files: list, output_dir: str, target_format: str,
+                             pipeline_options: dict, keep_original: bool = False,
+                             preset: str = None) -> int:
+    """読み込み・変換・書き出しを並行に実行して変換し、成功数を返す"""
+    results = convert_files_pipelined(image_files, Path(output_dir), target_format,
+                                      preset=preset, **pipeline_options)
+    converted_count = 0
+    for result in results:
+        if result['status'] != 'success':
+            logging.error(f"変換エラー {result['input_path'].name}: {result['error_message']}")
+            continue
+        converted_count += 1
+        logging.info(f"変換完了: {result['input_path'].name} -> {result['output_path'].name}")
+
+        # 元ファイルの削除（形式が変わる場合のみ）
+        if not keep_original and result['input_path'].suffix.lower() != result['output_path'].suffix.lower():
+            remove_file_safely(str(result['input_path']))
+    return converted_count
+
+def convert_images_to_target_quality(image_files: list, output_dir: str, target_format: str,
+                                     quality_target: dict, keep_original: bool = False,
+                                     preset: str = None, preserve_metadata: bool = False,
+                                     workers: int = None) -> int:
+    """画像ごとに目標画質・目標サイズを満たす画質を探索して並列に変換し、成功数を返す"""
+    results = convert_files_to_target_quality(image_files, Path(output_dir), target_format,
+                                              quality_target, preset=preset,
+                                              preserve_metadata=preserve_metadata, workers=workers)
+    converted_count = 0
+    for result in results:
+        if result['status'] != 'success':
+            logging.error(f"変換エラー {result['input_path'].name}: {result['error_message']}")
+            continue
+        converted_count += 1
+        search = result['search']
+        logging.info(f"変換完了: {result['input_path'].name} -> {result['output_path'].name} "
+                     f"(quality={search['quality']}, SSIM={search['ssim']:.4f}, "
+                     f"PSNR={search['psnr']:.1f}dB, {search['size'] / 1024:.1f}KB, 試行{search['trials']}回)")
+        if not search['target_met']:
+            logging.warning(f"探索範囲内に目標を満たす画質がありません: {result['input_path'].name}")
+
+        # 元ファイルの削除（形式が変わる場合のみ）
+        if not keep_original and result['input_path'].suffix.lower() != result['output_path'].suffix.lower():
+            remove_file_safely(str(result['input_path']))
+    return converted_count
+
 def main():
     parser = create_base_parser("画像フォーマット変換ツール")
     parser.add_argument('-f', '--format', 
-                       choices=['png', 'jpg', 'jpeg', 'webp'],
+                       choices=['png', 'jpg', 'jpeg', 'webp', 'gif'],
                        default='png',
                        help='変換先フォーマット (デフォルト: png)')
     parser.add_argument('--keep-original', action='store_true',
                        help='変換後も元ファイルを保持')
     parser.add_argument('--extensions', nargs='+',
-                       default=['.jpg', '.jpeg', '.png', '.webp'],
+                       default=['.jpg', '.jpeg', '.png', '.webp', '.gif'],
                        help='処理対象の拡張子')
+    add_preset_argument(parser)
+    parser.add_argument('--parallel-png', action='store_true',
+                       help='PNG出力をマルチスレッドで圧縮する（大きな画像向け）')
+    add_quantize_arguments(parser)
+    parser.add_argument('--sizes', nargs='+', default=None,
+                       help='複数サイズを1回のデコードで出力 (長辺ピクセル数、fullは元サイズ。例: full 1024 512 256)')
+    parser.add_argument('--keep-metadata', action='store_true',
+                       help='ICCプロファイルとEXIFを出力に引き継ぐ (未指定時は埋め込みプロファイルに従ってsRGBに変換)')
+    parser.add_argument('--no-embedded-preview', action='store_true',
+                       help='--sizes指定時にJPEGの埋め込みプレビュー(EXIFサムネイル/MPF)を使わず、縮小デコードのみ行う')
+    parser.add_argument('--frames', action='store_true',
+                       help='アニメーション画像をフレームごとの画像に分解して出力 (<ファイル名>_0000.<拡張子>)')
+    add_tile_memory_argument(parser)
+    add_pipeline_arguments(parser)
+    add_memory_budget_arguments(parser)
+    add_quality_target_arguments(parser)
+    add_catalog_arguments(parser)
     args = parser.parse_args()
     
     setup_logging()
@@ -64,10 +274,43 @@ def main():
     if not validate_directories(args.input, args.output):
         sys.exit(1)
     
+    sizes = None
+    if args.sizes:
+        try:
+            sizes = parse_sizes(args.sizes)
+        except ValueError as e:
+            parser.error(str(e))
+
+    try:
+        tile_memory = get_tile_memory(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if tile_memory and (sizes or args.quantize or args.parallel_png or args.frames):
+        parser.error('--tile-memoryは--sizes/--quantize/--parallel-png/--framesと同時に指定できません')
+
+    try:
+        pipeline_options = get_pipeline_options(args)
+        memory_budget = get_memory_budget(args)
+        quality_target = get_quality_target(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if pipeline_options and (tile_memory or sizes or args.quantize or args.parallel_png or args.frames):
+        parser.error('--pipelineは--tile-memory/--sizes/--quantize/--parallel-png/--framesと同時に指定できません')
+
     # JPEGとJPGを統一
     target_format = 'JPEG' if args.format.lower() in ['jpg', 'jpeg'] else args.format.upper()
+
+    if quality_target:
+        if target_format not in SEARCHABLE_FORMATS:
+            parser.error('--target-ssim/--target-psnr/--max-kbはjpg/webp出力でのみ指定できます')
+        if pipeline_options or tile_memory or sizes or args.frames:
+            parser.error('--target-ssim/--target-psnr/--max-kbは--pipeline/--tile-memory/--sizes/--framesと同時に指定できません')
     
     image_files = get_files_by_extension(args.input, args.extensions)
+    try:
+        image_files = select_files(args, image_files)
+    except ValueError as e:
+        parser.error(str(e))
     
     if not image_files:
         logging.warning(f"対象ファイルが見つかりません: {args.input}")
@@ -75,10 +318,52 @@ def main():
     
     logging.info(f"{len(image_files)}個のファイルを{target_format}形式に変換します")
     
-    converted_count = 0
-    for image_file in image_files:
-        if convert_image(image_file, args.output, target_format, args.keep_original):
-            converted_count += 1
+    if quality_target:
+        converted_count = convert_images_to_target_quality(image_files, args.output, target_format,
+                                                           quality_target, args.keep_original,
+                                                           args.preset, args.keep_metadata,
+                                                           args.workers)
+        logging.info(f"変換完了: {converted_count}/{len(image_files)}個のファイル")
+        return
+
+    if sizes and not memory_budget:
+        converted_count = convert_images_sizes(image_files, args.output, target_format, sizes,
+                                               args.keep_original, args.preset, args.keep_metadata,
+                                               not args.no_embedded_preview, args.workers)
+        logging.info(f"変換完了: {converted_count}/{len(image_files)}個のファイル")
+        return
+
+    if pipeline_options:
+        converted_count = convert_images_pipelined(image_files, args.output, target_format,
+                                                   dict(pipeline_options, memory_budget=memory_budget,
+                                                        preserve_metadata=args.keep_metadata),
+                                                   args.keep_original, args.preset)
+        logging.info(f"変換完了: {converted_count}/{len(image_files)}個のファイル")
+        return
+
+    def convert_one(image_file: Path) -> bool:
+        if tile_memory:
+            return convert_image_tiled(image_file, args.output, target_format, tile_memory,
+                                       args.keep_original, args.preset, args.keep_metadata)
+        if sizes:
+            return convert_image_sizes(image_file, args.output, target_format, sizes,
+                                       args.keep_original, args.preset, args.keep_metadata,
+                                       not args.no_embedded_preview)
+        return convert_image(image_file, args.output, target_format, args.keep_original,
+                             args.preset, args.parallel_png, get_quantize_options(args),
+                             args.frames, args.keep_metadata)
+
+    if memory_budget:
+        # ヘッダーから見積もった作業メモリの合計が上限に収まる範囲で並列に変換
+        def convert_or_raise(image_file: Path) -> None:
+            if not convert_one(image_file):
+                raise RuntimeError(f"変換に失敗しました: {image_file.name}")
+
+        results = run_with_memory_budget(convert_or_raise, image_files,
+                                         memory_budget=memory_budget, workers=args.workers)
+        converted_count = sum(1 for result in results if result['status'] == 'success')
+    else:
+        converted_count = sum(1 for image_file in image_files if convert_one(image_file))
     
     logging.info(f"変換完了: {converted_count}/{len(image_files)}個のファイル")
 
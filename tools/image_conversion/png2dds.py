@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PNGなどの画像をDDSファイル（BC1/BC3圧縮 + ミップマップ）に変換するツール
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+# 親ディレクトリのcommon.pyをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension, remove_file_safely
+from image_processor.conversion.dds import convert_to_dds_files
+
+def main():
+    parser = create_base_parser("画像をDDSファイルに変換")
+    parser.add_argument('-c', '--compression', choices=['auto', 'bc1', 'bc3'], default='auto',
+                       help='圧縮形式 (デフォルト: auto = 半透明を含む画像はbc3、それ以外はbc1)')
+    parser.add_argument('--no-mipmaps', action='store_true',
+                       help='ミップマップを生成しない')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='並列プロセス数 (デフォルト: CPU数)')
+    parser.add_argument('--keep-original', action='store_true',
+                       help='変換後も元ファイルを保持')
+    parser.add_argument('--extensions', nargs='+',
+                       default=['.png'],
+                       help='処理対象の拡張子 (デフォルト: .png)')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if not validate_directories(args.input, args.output):
+        sys.exit(1)
+
+    image_files = get_files_by_extension(args.input, args.extensions)
+
+    if not image_files:
+        logging.warning(f"対象ファイルが見つかりません: {args.input}")
+        return
+
+    logging.info(f"{len(image_files)}個のファイルをDDS形式に変換します")
+
+    compression = None if args.compression == 'auto' else args.compression
+    results = convert_to_dds_files(image_files, Path(args.output), workers=args.workers,
+                                   compression=compression, mipmaps=not args.no_mipmaps)
+
+    converted_count = 0
+    for result in results:
+        if result['status'] == 'success':
+            logging.info(f"変換完了: {result['input_path'].name} -> {result['output_path'].name}")
+            converted_count += 1
+            if not args.keep_original:
+                remove_file_safely(str(result['input_path']))
+        else:
+            logging.error(f"変換エラー {result['input_path'].name}: {result['error_message']}")
+
+    logging.info(f"変換完了: {converted_count}/{len(image_files)}個のファイル")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+エンコーダープリセットのキャリブレーションツール
+手元の画像をサンプリングしてプリセットごとの時間とサイズを測定し、推奨プリセットを表示する
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+# 親ディレクトリのcommon.pyをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+from common import setup_logging, create_base_parser, get_files_by_extension
+from image_processor.conversion.presets import calibrate_presets, recommend_preset
+from image_processor.core.common import format_file_size
+
+def main():
+    parser = create_base_parser("エンコーダープリセットのキャリブレーション")
+    parser.add_argument('-f', '--format',
+                       choices=['png', 'jpg', 'jpeg', 'webp'],
+                       default='png',
+                       help='測定する出力フォーマット (デフォルト: png)')
+    parser.add_argument('--sample', type=int, default=20,
+                       help='サンプリングする画像数 (デフォルト: 20)')
+    parser.add_argument('--quality', type=int, default=None,
+                       help='JPEG/WebPの画質 (未指定時はPillowのデフォルト)')
+    parser.add_argument('--max-slowdown', type=float, default=3.0,
+                       help='最速プリセットに対して許容する時間の倍率 (デフォルト: 3.0)')
+    parser.add_argument('--extensions', nargs='+',
+                       default=['.jpg', '.jpeg', '.png', '.webp'],
+                       help='サンプリング対象の拡張子')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    image_files = get_files_by_extension(args.input, args.extensions)
+    if not image_files:
+        logging.warning(f"対象ファイルが見つかりません: {args.input}")
+        return
+
+    results = calibrate_presets(image_files, args.format,
+                                sample_size=args.sample, quality=args.quality)
+    if results[0]['image_count'] == 0:
+        logging.error("読み込める画像がありませんでした")
+        sys.exit(1)
+
+    print(f"\n--- {args.format.upper()} プリセット測定結果 ({results[0]['image_count']}枚) ---")
+    print(f"{'preset':<10} {'時間':>10} {'サイズ':>10}")
+    for result in results:
+        print(f"{result['preset']:<10} {result['encode_time']:>9.3f}s "
+              f"{format_file_size(result['total_bytes']):>10}")
+
+    recommended = recommend_preset(results, max_slowdown=args.max_slowdown)
+    print(f"\n推奨プリセット: {recommended} (--preset {recommended})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保存済みのマスクを元画像に合成するツール（remove_img.py --mask-only の出力を使う）
+依存関係: pip install pillow
+"""
+
+import sys
+import logging
+from pathlib import Path
+from PIL import Image, ImageColor
+
+# 親ディレクトリのcommon.pyをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension, add_preset_argument, add_catalog_arguments, select_files, add_memory_budget_arguments, get_memory_budget
+from image_processor.processing.compositing import MASK_SUFFIX, composite_files
+
+def main():
+    parser = create_base_parser("保存済みのマスクを元画像に合成")
+    parser.add_argument('--masks', type=str, default=None, metavar='DIR',
+                       help='マスク (<名前>_mask.png) のディレクトリ (デフォルト: 入力ディレクトリ)')
+    parser.add_argument('--background', type=str, default=None,
+                       help='合成する背景: 色（"#ffffff" / "white"）または背景画像のパス。'
+                            '省略すると透過のまま出力')
+    parser.add_argument('-f', '--format', choices=['png', 'webp', 'tiff', 'jpg'], default='png',
+                       help='出力フォーマット。jpgは--backgroundが必要 (デフォルト: png)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='並列に合成するスレッド数 (デフォルト: CPU数)')
+    add_preset_argument(parser)
+    add_memory_budget_arguments(parser)
+    add_catalog_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+
+    try:
+        memory_budget = get_memory_budget(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers is not None and args.workers < 1:
+        parser.error(f"--workersは1以上である必要があります: {args.workers}")
+
+    background = None
+    if args.background:
+        if Path(args.background).is_file():
+            with Image.open(args.background) as img:
+                background = img.convert("RGB")
+        else:
+            try:
+                background = ImageColor.getrgb(args.background)[:3]
+            except ValueError:
+                parser.error(f"--backgroundの色を解釈できず、ファイルも存在しません: {args.background}")
+
+    if not validate_directories(args.input, args.output):
+        sys.exit(1)
+    mask_dir = Path(args.masks or args.input)
+
+    # マスク自体は元画像として扱わない
+    image_files = [path for path in get_files_by_extension(args.input, ['.jpg', '.jpeg', '.png', '.webp'])
+                   if not path.name.endswith(MASK_SUFFIX)]
+    try:
+        image_files = select_files(args, image_files)
+    except ValueError as e:
+        parser.error(str(e))
+    if not image_files:
+        logging.warning(f"処理対象ファイルが見つかりません: {args.input}")
+        return
+
+    logging.info(f"{len(image_files)}個の画像にマスクを合成します")
+    try:
+        results = composite_files(image_files, mask_dir, Path(args.output), background=background,
+                                  output_format=args.format, preset=args.preset,
+                                  workers=args.workers, memory_budget=memory_budget)
+    except ValueError as e:
+        parser.error(str(e))
+
+    processed_count = sum(1 for result in results if result['status'] == 'success')
+    logging.info(f"処理完了: {processed_count}/{len(image_files)}個のファイル")
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,10 @@ from typing import List, Tuple
 
 # 親ディレクトリのcommon.pyをインポート
 sys.path.append(str(Path(__file__).parent.parent))
-from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension
+from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension, add_preset_argument, add_tile_memory_argument, get_tile_memory, add_catalog_arguments, select_files, add_quality_target_arguments, get_quality_target
+from image_processor.conversion.presets import get_save_options
+from image_processor.conversion.quality_search import search_quality
+from image_processor.processing.tiled import process_tiled
 
 # 学マス4コマのデフォルト座標 (x1, y1, x2, y2)
 DEFAULT_COORDINATES = [
@@ -23,16 +26,28 @@ DEFAULT_COORDINATES = [
     (104, 1923, 799, 2443)  # 4コマ目
 ]
 
-def split_koma_image(input_file: Path, output_dir: str, coordinates: List[Tuple[int, int, int, int]]) -> bool:
-    """4コマ漫画を各コマに分割"""
+def split_koma_image(input_file: Path, output_dir: str, coordinates: List[Tuple[int, int, int, int]],
+                     output_format: str = 'jpg', quality: int = 95, preset: str = None,
+                     quality_target: dict = None) -> bool:
+    """4コマ漫画を各コマに分割（quality_target指定時はコマごとに画質を探索）"""
     try:
+        save_format = 'JPEG' if output_format == 'jpg' else output_format.upper()
+        save_options = get_save_options(output_format, preset, quality=quality)
         with Image.open(input_file) as img:
             base_name = input_file.stem
+            if save_format == 'JPEG' and img.mode != 'RGB':
+                img = img.convert('RGB')
             
             for i, (x1, y1, x2, y2) in enumerate(coordinates, 1):
                 cropped = img.crop((x1, y1, x2, y2))
-                output_path = Path(output_dir) / f"{base_name}_koma{i}.jpg"
-                cropped.save(output_path, 'JPEG', quality=95)
+                output_path = Path(output_dir) / f"{base_name}_koma{i}.{output_format}"
+                if quality_target:
+                    data, search = search_quality(cropped, save_format, quality_target, preset=preset)
+                    output_path.write_bytes(data)
+                    logging.info(f"{output_path.name}: quality={search['quality']}, "
+                                 f"SSIM={search['ssim']:.4f}, {search['size'] / 1024:.1f}KB")
+                else:
+                    cropped.save(output_path, save_format, **save_options)
                 
             logging.info(f"分割完了: {input_file.name} -> {len(coordinates)}コマ")
             return True
@@ -41,6 +56,23 @@ def split_koma_image(input_file: Path, output_dir: str, coordinates: List[Tuple[
         logging.error(f"分割エラー {input_file.name}: {e}")
         return False
 
+def split_koma_image_tiled(input_file: Path, output_dir: str, coordinates: List[Tuple[int, int, int, int]],
+                           memory_budget: int, output_format: str = 'jpg', quality: int = 95,
+                           preset: str = None) -> bool:
+    """4コマ漫画を各コマに分割（コマの範囲の行だけをストリップ単位で処理する省メモリモード）"""
+    try:
+        for i, box in enumerate(coordinates, 1):
+            output_path = Path(output_dir) / f"{input_file.stem}_koma{i}.{output_format}"
+            process_tiled(input_file, output_path, image_format=output_format, box=box,
+                          memory_budget=memory_budget, preset=preset, quality=quality)
+
+        logging.info(f"分割完了: {input_file.name} -> {len(coordinates)}コマ")
+        return True
+
+    except Exception as e:
+        logging.error(f"分割エラー {input_file.name}: {e}")
+        return False
+
 def parse_coordinates(coord_str: str) -> List[Tuple[int, int, int, int]]:
     """座標文字列をパース"""
     try:
@@ -60,9 +92,21 @@ def main():
                        help='出力フォーマット (デフォルト: jpg)')
     parser.add_argument('--quality', type=int, default=95,
                        help='JPEG品質 1-100 (デフォルト: 95)')
+    add_preset_argument(parser)
+    add_quality_target_arguments(parser)
+    add_tile_memory_argument(parser)
+    add_catalog_arguments(parser)
     args = parser.parse_args()
     
     setup_logging()
+
+    try:
+        tile_memory = get_tile_memory(args)
+        quality_target = get_quality_target(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if quality_target and (args.format != 'jpg' or tile_memory):
+        parser.error('--target-ssim/--target-psnr/--max-kbはjpg出力でのみ指定でき、--tile-memoryと同時に指定できません')
     
     if not validate_directories(args.input, args.output):
         sys.exit(1)
@@ -81,6 +125,10 @@ def main():
     
     # 画像ファイルを取得
     image_files = get_files_by_extension(args.input, ['.jpg', '.jpeg', '.png'])
+    try:
+        image_files = select_files(args, image_files)
+    except ValueError as e:
+        parser.error(str(e))
     
     if not image_files:
         logging.warning(f"画像ファイルが見つかりません: {args.input}")
@@ -90,7 +138,13 @@ def main():
     
     processed_count = 0
     for image_file in image_files:
-        if split_koma_image(image_file, args.output, coordinates):
+        if tile_memory:
+            success = split_koma_image_tiled(image_file, args.output, coordinates, tile_memory,
+                                             args.format, args.quality, args.preset)
+        else:
+            success = split_koma_image(image_file, args.output, coordinates, args.format,
+                                       args.quality, args.preset, quality_target)
+        if success:
             processed_count += 1
     
     logging.info(f"分割完了: {processed_count}/{len(image_files)}個の画像")
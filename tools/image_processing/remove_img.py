@@ -2,47 +2,82 @@
 # -*- coding: utf-8 -*-
 """
 画像・動画の背景透過処理ツール
-依存関係: pip install rembg pillow tqdm
+依存関係: pip install pillow tqdm（--method rembg / auto の場合は pip install rembg も必要）
 """
 
 import sys
 import logging
+import functools
 import subprocess
 from pathlib import Path
-from PIL import Image
+from PIL import Image, ImageColor
 from tqdm import tqdm
 
-try:
-    from rembg import remove, new_session
-except ImportError:
-    print("Error: rembgライブラリがインストールされていません。")
-    print("pip install rembg を実行してインストールしてください。")
-    sys.exit(1)
-
 # 親ディレクトリのcommon.pyをインポート
 sys.path.append(str(Path(__file__).parent.parent))
-from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension
+from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension, add_preset_argument, add_quantize_arguments, get_quantize_options, add_catalog_arguments, select_files, add_memory_budget_arguments, get_memory_budget
+from image_processor.conversion.formats import format_from_path
+from image_processor.conversion.presets import get_save_options
+from image_processor.conversion.quantize import save_png_quantized
+from image_processor.processing.scheduler import check_pixels, run_with_memory_budget
+from image_processor.processing.background import (DEFAULT_AUTO_THRESHOLD, DEFAULT_PROXY_SIZE,
+                                                   create_backend, remove_background)
+from image_processor.processing.compositing import mask_path_for, save_mask
+from image_processor.processing.matting import DEFAULT_GUIDED_EPSILON, DEFAULT_GUIDED_RADIUS
+from image_processor.processing.mask_cache import DEFAULT_MASK_CACHE_BYTES, CachedBackend, MaskCache
+from image_processor.processing.session_pool import (DEFAULT_MIN_THREADS_PER_WORKER, measure_backend_cost,
+                                                     plan_session_pool, run_with_session_pool)
+from image_processor.processing.temporal import (DEFAULT_KEYFRAME_INTERVAL, DEFAULT_REUSE_THRESHOLD,
+                                                 TemporalMaskBackend)
+from image_processor.video.alpha_encoder import ALPHA_CODECS, encode_alpha_video, video_extension
 
-def remove_background_from_image(input_file: Path, output_dir: str, session) -> bool:
-    """画像の背景を透過処理"""
+def remove_background_from_image(input_file: Path, output_dir: str, backend, preset: str = None,
+                                 quantize: dict = None, mask_bits: int = None) -> bool:
+    """画像の背景を透過処理（mask_bits指定時はマスクだけを <名前>_mask.png に保存）"""
     try:
         with Image.open(input_file) as img:
-            # RGBA形式に変換
-            img = img.convert("RGBA")
-            processed_img = remove(img, session=session)
+            # --max-pixelsの上限はPillowの警告（上限の2倍まで）で済ませず、デコード前にエラーにする
+            check_pixels(*img.size)
+            if mask_bits is not None:
+                segmentation = backend.segment(img)
+                output_path = save_mask(segmentation['mask'], mask_path_for(input_file, Path(output_dir)),
+                                        bits=mask_bits, preset=preset)
+                logging.info(f"マスク保存完了: {output_path.name} ({segmentation['backend']}, "
+                             f"信頼度 {segmentation['confidence']:.3f})")
+                return True
+
+            processed_img, segmentation = remove_background(img, backend)
             
             output_path = Path(output_dir) / input_file.name
-            processed_img.save(output_path)
+            image_format = format_from_path(output_path)
+            save_options = get_save_options(image_format, preset)
+            if not (quantize and image_format == 'PNG' and
+                    save_png_quantized(processed_img, output_path, **quantize, **save_options)):
+                processed_img.save(output_path, **save_options)
             
-            logging.info(f"背景透過完了: {input_file.name}")
+            logging.info(f"背景透過完了: {input_file.name} ({segmentation['backend']}, "
+                         f"信頼度 {segmentation['confidence']:.3f})")
             return True
             
     except Exception as e:
         logging.error(f"背景透過エラー {input_file.name}: {e}")
         return False
 
-def process_video_frames(input_file: Path, output_dir: str, session, fps: int = 30) -> bool:
-    """動画のフレームを抽出し背景透過処理"""
+def remove_in_worker(input_file: Path, backend, output_dir: str, preset: str = None,
+                     quantize: dict = None, mask_bits: int = None) -> Path:
+    """ワーカープロセスで画像の背景を透過処理（失敗時は例外）"""
+    if not remove_background_from_image(input_file, output_dir, backend, preset, quantize, mask_bits):
+        raise RuntimeError(f"背景透過に失敗しました: {input_file.name}")
+    if mask_bits is not None:
+        return mask_path_for(input_file, Path(output_dir))
+    return Path(output_dir) / input_file.name
+
+def process_video_frames(input_file: Path, output_dir: str, backend, fps: int = 30,
+                         temporal: dict = None, codec: str = 'vp9', encode_workers: int = None) -> bool:
+    """動画のフレームを抽出し背景透過処理（temporal指定時はキーフレームのマスクを再利用）
+
+    出力はアルファを保持する形式（vp9=WebM, prores/qtrle=MOV, webp=アニメーションWebP）
+    """
     try:
         temp_dir = Path(output_dir) / "temp_frames"
         temp_dir.mkdir(exist_ok=True)
@@ -61,38 +96,35 @@ def process_video_frames(input_file: Path, output_dir: str, session, fps: int =
             return False
         
         # 抽出されたフレームを処理
-        frame_files = list(temp_dir.glob(f"{input_file.stem}_*.png"))
+        frame_files = sorted(temp_dir.glob(f"{input_file.stem}_*.png"))
         if not frame_files:
             logging.error("フレームが抽出されませんでした")
             return False
         
         logging.info(f"{len(frame_files)}フレームを背景透過処理中...")
         
+        if temporal is not None:
+            backend = TemporalMaskBackend(backend, **temporal)
         for frame_file in tqdm(frame_files, desc="フレーム処理"):
-            remove_background_from_image(frame_file, str(temp_dir), session)
-        
-        # 透過処理済みフレームを動画に再合成
-        output_video = Path(output_dir) / f"{input_file.stem}_transparent.mp4"
-        cmd = [
-            "ffmpeg", "-r", "30",
-            "-i", str(temp_dir / f"{input_file.stem}_%04d.png"),
-            "-c:v", "libx264", "-pix_fmt", "yuv420p",
-            "-y", str(output_video)
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
+            remove_background_from_image(frame_file, str(temp_dir), backend)
+        if temporal is not None:
+            logging.info(f"マスクの推論: {backend.inferred}フレーム、再利用: {backend.reused}フレーム")
         
-        # 一時ファイルの削除
-        for frame_file in temp_dir.glob("*.png"):
-            frame_file.unlink()
-        temp_dir.rmdir()
-        
-        if result.returncode == 0:
+        # 透過処理済みフレームをアルファ付きの動画に再合成（チャンクごとに並列エンコード）
+        output_video = Path(output_dir) / f"{input_file.stem}_transparent{video_extension(codec)}"
+        try:
+            encode_alpha_video(frame_pattern, len(frame_files), output_video, fps=fps,
+                               codec=codec, workers=encode_workers)
             logging.info(f"動画透過処理完了: {output_video.name}")
             return True
-        else:
-            logging.error(f"動画合成エラー: {result.stderr}")
+        except RuntimeError as e:
+            logging.error(f"動画合成エラー: {e}")
             return False
+        finally:
+            # 一時ファイルの削除
+            for frame_file in temp_dir.glob("*.png"):
+                frame_file.unlink()
+            temp_dir.rmdir()
             
     except Exception as e:
         logging.error(f"動画処理エラー {input_file.name}: {e}")
@@ -104,13 +136,122 @@ def main():
                        choices=['isnet-general-use', 'isnet-anime', 'birefnet-general', 'birefnet-general-lite'],
                        default='isnet-anime',
                        help='使用するrembgモデル (デフォルト: isnet-anime)')
+    parser.add_argument('--method', choices=['rembg', 'flat', 'chroma', 'auto'], default='rembg',
+                       help='背景透過の方法: rembg=ニューラルネットワーク, flat=単色背景の除去, '
+                            'chroma=クロマキー, auto=単色背景の信頼度が高い画像だけflat '
+                            '(デフォルト: rembg)')
+    parser.add_argument('--tolerance', type=int, default=None,
+                       help='flat/chroma/autoで背景色とみなす許容誤差 '
+                            '(デフォルト: flat/autoは24, chromaは48)')
+    parser.add_argument('--key-color', default='#00ff00',
+                       help='chromaの背景色 (例: "#00ff00", "blue", デフォルト: #00ff00)')
+    parser.add_argument('--auto-threshold', type=float, default=DEFAULT_AUTO_THRESHOLD,
+                       help='autoで単色背景の除去を採用する信頼度の下限 '
+                            f'(0-1, デフォルト: {DEFAULT_AUTO_THRESHOLD})')
+    parser.add_argument('--proxy-size', type=int, nargs='?', const=DEFAULT_PROXY_SIZE, default=None,
+                       help='長辺がこのピクセル数程度になるよう縮小した画像で推論し、マスクだけを'
+                            f'元のサイズに拡大する (値を省略すると{DEFAULT_PROXY_SIZE})')
+    parser.add_argument('--refine-edges', action='store_true',
+                       help='--proxy-size使用時、境界付近のアルファを元画像の色で補正する')
+    parser.add_argument('--matting', action='store_true',
+                       help='マスクの境界を元画像の色をガイドにしたガイデッドフィルタで補正する'
+                            '（髪の毛や線画の境界。rembgのalpha_mattingより大幅に速い）')
+    parser.add_argument('--matting-radius', type=int, default=DEFAULT_GUIDED_RADIUS,
+                       help='--matting使用時のフィルタの半径(px)。補正する境界の帯の幅もこの程度 '
+                            f'(デフォルト: {DEFAULT_GUIDED_RADIUS})')
+    parser.add_argument('--matting-epsilon', type=float, default=DEFAULT_GUIDED_EPSILON,
+                       help='--matting使用時の正則化。小さいほど色の境界に沿う '
+                            f'(デフォルト: {DEFAULT_GUIDED_EPSILON})')
+    parser.add_argument('--mask-open', type=int, default=0, metavar='PX',
+                       help='--matting使用時、補正の前にこの半径以下の前景の点・細い突起を取り除く (デフォルト: 0)')
+    parser.add_argument('--mask-close', type=int, default=0, metavar='PX',
+                       help='--matting使用時、補正の前にこの半径以下の穴・切れ目を埋める (デフォルト: 0)')
+    parser.add_argument('--temporal', action='store_true',
+                       help='動画で、最後に推論したフレームとの差が小さいフレームはマスクを再利用する')
+    parser.add_argument('--temporal-threshold', type=float, default=DEFAULT_REUSE_THRESHOLD,
+                       help='マスクを再利用する、縮小した輝度の平均絶対差(0-1)の上限 '
+                            f'(デフォルト: {DEFAULT_REUSE_THRESHOLD})')
+    parser.add_argument('--keyframe-interval', type=int, default=DEFAULT_KEYFRAME_INTERVAL,
+                       help='--temporal使用時、このフレーム数ごとに必ず推論し直す '
+                            f'(デフォルト: {DEFAULT_KEYFRAME_INTERVAL})')
+    parser.add_argument('--no-motion', action='store_true',
+                       help='--temporal使用時、画面全体の平行移動（パン）の補正を行わない')
+    parser.add_argument('--mask-cache', type=str, default=None, metavar='DIR',
+                       help='推論したマスクを保存するキャッシュのディレクトリ。画素・モデル・推論解像度が'
+                            '同じ画像は推論せずにキャッシュのマスクを使う')
+    parser.add_argument('--mask-cache-mb', type=int, default=DEFAULT_MASK_CACHE_BYTES // (1024 * 1024),
+                       help='マスクのキャッシュの上限(MB)。超えた分は最後に使われた日時の古いものから削除 '
+                            f'(デフォルト: {DEFAULT_MASK_CACHE_BYTES // (1024 * 1024)})')
+    parser.add_argument('--mask-only', action='store_true',
+                       help='透過画像の代わりにマスクだけを <名前>_mask.png に保存する（合成はapply_mask.pyで行う）')
+    parser.add_argument('--mask-bits', type=int, choices=[8, 1], default=8,
+                       help='--mask-only使用時のマスクのビット数: 8=グレースケール（境界の半透明を保持）, '
+                            '1=2値（最小） (デフォルト: 8)')
     parser.add_argument('--fps', type=int, default=30,
                        help='動画処理時のFPS (デフォルト: 30)')
+    parser.add_argument('--video-codec', choices=list(ALPHA_CODECS), default='vp9',
+                       help='透過動画の出力形式: vp9=WebM(VP9), prores=MOV(ProRes 4444), '
+                            'qtrle=MOV(Animation, 可逆), webp=アニメーションWebP (デフォルト: vp9)')
+    parser.add_argument('--encode-workers', type=int, default=None,
+                       help='動画を分割して同時にエンコードするFFmpegの数 (デフォルト: CPU数)')
     parser.add_argument('--clear-output', action='store_true',
                        help='処理前に出力ディレクトリを空にする')
+    add_preset_argument(parser)
+    add_quantize_arguments(parser)
+    parser.add_argument('--workers', type=int, default=1,
+                       help='画像を並列に処理するスレッド数 (デフォルト: 1)')
+    parser.add_argument('--session-workers', type=int, nargs='?', const=0, default=None, metavar='N',
+                       help='モデルを読み込んだN個のワーカープロセスで画像を処理する。Nを省略すると'
+                            'CPUコア数と1枚あたりの推論時間の実測値から自動で決める')
+    parser.add_argument('--cpu-budget', type=int, default=None,
+                       help='--session-workers使用時、ワーカー全体で使うCPUコア数。'
+                            'ワーカーごとの推論スレッド数はこれをワーカー数で割った値 (デフォルト: CPU数)')
+    add_memory_budget_arguments(parser)
+    add_catalog_arguments(parser)
     args = parser.parse_args()
     
     setup_logging()
+
+    try:
+        memory_budget = get_memory_budget(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers < 1:
+        parser.error(f"--workersは1以上である必要があります: {args.workers}")
+    temporal = None
+    if args.temporal:
+        if not 0.0 <= args.temporal_threshold <= 1.0:
+            parser.error(f"--temporal-thresholdは0から1の範囲である必要があります: {args.temporal_threshold}")
+        if args.keyframe_interval < 1:
+            parser.error(f"--keyframe-intervalは1以上である必要があります: {args.keyframe_interval}")
+        temporal = {'threshold': args.temporal_threshold, 'max_interval': args.keyframe_interval,
+                    'motion': not args.no_motion}
+    if args.session_workers is not None:
+        if args.session_workers < 0:
+            parser.error(f"--session-workersは1以上である必要があります: {args.session_workers}")
+        if memory_budget or args.workers > 1 or args.mask_cache:
+            parser.error("--session-workersは--workers・--memory-budget・--mask-cacheと同時に指定できません")
+    mask_bits = args.mask_bits if args.mask_only else None
+    if args.cpu_budget is not None and args.cpu_budget < 1:
+        parser.error(f"--cpu-budgetは1以上である必要があります: {args.cpu_budget}")
+    if args.encode_workers is not None and args.encode_workers < 1:
+        parser.error(f"--encode-workersは1以上である必要があります: {args.encode_workers}")
+    if args.fps < 1:
+        parser.error(f"--fpsは1以上である必要があります: {args.fps}")
+    if args.mask_cache_mb < 1:
+        parser.error(f"--mask-cache-mbは1以上である必要があります: {args.mask_cache_mb}")
+    matting = None
+    if args.matting:
+        matting = {'radius': args.matting_radius, 'epsilon': args.matting_epsilon,
+                   'open_radius': args.mask_open, 'close_radius': args.mask_close}
+    elif args.mask_open or args.mask_close:
+        parser.error("--mask-open・--mask-closeは--mattingと同時に指定する必要があります")
+    if args.refine_edges and args.proxy_size is None:
+        parser.error("--refine-edgesは--proxy-sizeと同時に指定する必要があります")
+    try:
+        key_color = ImageColor.getrgb(args.key_color)[:3]
+    except ValueError:
+        parser.error(f"--key-colorの色を解釈できません: {args.key_color}")
     
     if not validate_directories(args.input, args.output):
         sys.exit(1)
@@ -122,13 +263,34 @@ def main():
             if file.is_file():
                 file.unlink()
     
-    # rembgセッション初期化
-    session = new_session(args.model)
-    logging.info(f"rembgモデル '{args.model}' を使用します")
+    # 背景透過のバックエンド初期化（rembgのモデルは最初に推論が必要になったときに読み込む）
+    try:
+        backend = create_backend(args.method, model=args.model, tolerance=args.tolerance,
+                                 key_color=key_color, threshold=args.auto_threshold,
+                                 proxy_size=args.proxy_size, refine_edges=args.refine_edges,
+                                 matting=matting)
+    except ImportError as e:
+        logging.error(str(e))
+        sys.exit(1)
+    except ValueError as e:
+        parser.error(str(e))
+    mask_cache = None
+    if args.mask_cache:
+        mask_cache = MaskCache(args.mask_cache, max_bytes=args.mask_cache_mb * 1024 * 1024)
+        backend = CachedBackend(backend, mask_cache)
+    if args.method in ('rembg', 'auto'):
+        logging.info(f"背景透過の方法 '{args.method}'、rembgモデル '{args.model}' を使用します")
+    else:
+        logging.info(f"背景透過の方法 '{args.method}' を使用します")
     
     # 画像ファイルの処理
     image_files = get_files_by_extension(args.input, ['.jpg', '.jpeg', '.png', '.webp'])
     video_files = get_files_by_extension(args.input, ['.mp4', '.avi', '.mov'])
+    try:
+        image_files = select_files(args, image_files)
+        video_files = select_files(args, video_files)
+    except ValueError as e:
+        parser.error(str(e))
     
     total_files = len(image_files) + len(video_files)
     if total_files == 0:
@@ -140,16 +302,52 @@ def main():
     processed_count = 0
     
     # 画像処理
-    for image_file in tqdm(image_files, desc="画像処理"):
-        if remove_background_from_image(image_file, args.output, session):
-            processed_count += 1
+    if args.session_workers is not None and image_files:
+        # ワーカーごとに推論スレッド数を指定したセッションを1回だけ読み込み、画像をまとめて渡す
+        backend_factory = functools.partial(
+            create_backend, args.method, model=args.model, tolerance=args.tolerance,
+            key_color=key_color, threshold=args.auto_threshold,
+            proxy_size=args.proxy_size, refine_edges=args.refine_edges, matting=matting)
+        cost = {'per_image_seconds': 0.0, 'load_seconds': 0.0}
+        if args.session_workers == 0 and len(image_files) > 1:
+            with Image.open(image_files[0]) as img:
+                cost = measure_backend_cost(backend_factory, img, threads=DEFAULT_MIN_THREADS_PER_WORKER)
+            logging.info(f"モデルの読み込み: {cost['load_seconds']:.2f}秒、"
+                         f"1枚あたりの推論: {cost['per_image_seconds']:.2f}秒")
+        plan = plan_session_pool(len(image_files), cores=args.cpu_budget,
+                                 workers=args.session_workers or None, **cost)
+        worker = functools.partial(remove_in_worker, output_dir=args.output, preset=args.preset,
+                                   quantize=get_quantize_options(args), mask_bits=mask_bits)
+        results = run_with_session_pool(worker, image_files, backend_factory=backend_factory, plan=plan)
+        processed_count += sum(1 for result in results if result['status'] == 'success')
+    elif memory_budget or args.workers > 1:
+        # ヘッダーから見積もった作業メモリの合計が上限に収まる範囲で並列に処理
+        def remove_or_raise(image_file: Path) -> None:
+            if not remove_background_from_image(image_file, args.output, backend, args.preset,
+                                                get_quantize_options(args), mask_bits):
+                raise RuntimeError(f"背景透過に失敗しました: {image_file.name}")
+
+        results = run_with_memory_budget(remove_or_raise, image_files,
+                                         memory_budget=memory_budget or sys.maxsize,
+                                         workers=args.workers, operation="remove_background")
+        processed_count += sum(1 for result in results if result['status'] == 'success')
+    else:
+        for image_file in tqdm(image_files, desc="画像処理"):
+            if remove_background_from_image(image_file, args.output, backend, args.preset,
+                                            get_quantize_options(args), mask_bits):
+                processed_count += 1
     
     # 動画処理
     for video_file in video_files:
-        if process_video_frames(video_file, args.output, session, args.fps):
+        if process_video_frames(video_file, args.output, backend, args.fps, temporal,
+                                args.video_codec, args.encode_workers):
             processed_count += 1
     
     logging.info(f"処理完了: {processed_count}/{total_files}個のファイル")
+    if mask_cache is not None:
+        logging.info(f"マスクのキャッシュ: ヒット{mask_cache.hits}件、ミス{mask_cache.misses}件 "
+                     f"({len(mask_cache)}件、{mask_cache.total_bytes / 1024 / 1024:.1f}MB)")
+        mask_cache.close()
 
 if __name__ == "__main__":
     main()
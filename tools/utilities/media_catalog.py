@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+メディアカタログ作成ツール
+画像のヘッダー（と動画のffprobe情報）だけを読み、サイズ・モード・形式・フレーム数・
+ファイルサイズをSQLiteに保存して、バッチ処理前の確認や絞り込みに使う
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+# 親ディレクトリのcommon.pyをインポート
+sys.path.append(str(Path(__file__).parent.parent))
+from common import setup_logging, create_base_parser, get_files_by_extension
+from image_processor.core.catalog import MediaCatalog
+from image_processor.core.common import format_file_size
+
+DEFAULT_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tiff', '.dds',
+                      '.mp4', '.avi', '.mov', '.mkv']
+
+def print_records(records: list) -> None:
+    """カタログの内容を一覧表示"""
+    print(f"{'ファイル':<32} {'サイズ':>11} {'形式':>6} {'モード':>8} {'フレーム':>8} {'容量':>10}")
+    for record in records:
+        size = f"{record['width']}x{record['height']}" if record['width'] else '-'
+        frames = record['frames'] if record['frames'] is not None else '-'
+        print(f"{record['path'].name:<32} {size:>11} {record['format'] or '-':>6} "
+              f"{record['mode'] or '-':>8} {frames:>8} {format_file_size(record['size_bytes']):>10}")
+
+    total_bytes = sum(record['size_bytes'] for record in records)
+    total_pixels = sum((record['width'] or 0) * (record['height'] or 0) * (record['frames'] or 1)
+                       for record in records)
+    print(f"合計: {len(records)}ファイル, {format_file_size(total_bytes)}, "
+          f"{total_pixels / 1e6:.1f}メガピクセル")
+
+def main():
+    parser = create_base_parser("メディアカタログ作成ツール（ヘッダーのみ読み込み）")
+    parser.add_argument('--catalog', type=str, default='media_catalog.db',
+                       help='カタログ(SQLite)のパス (デフォルト: media_catalog.db)')
+    parser.add_argument('--select', type=str, default=None, metavar='QUERY',
+                       help='表示する条件 (例: "width > 2000 and format = png")')
+    parser.add_argument('--extensions', nargs='+', default=DEFAULT_EXTENSIONS,
+                       help='対象の拡張子')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='ヘッダー読み込みのスレッド数')
+    parser.add_argument('--recursive', action='store_true',
+                       help='サブディレクトリも対象にする')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    input_dir = Path(args.input)
+    if not input_dir.exists():
+        logging.error(f"入力ディレクトリが存在しません: {input_dir}")
+        sys.exit(1)
+
+    if args.recursive:
+        files = sorted(p for p in input_dir.rglob('*') if p.suffix.lower() in args.extensions)
+    else:
+        files = get_files_by_extension(args.input, args.extensions)
+
+    with MediaCatalog(args.catalog) as catalog:
+        stats = catalog.refresh(files, workers=args.workers, prune=True)
+        logging.info(f"カタログ更新: 追加{stats['added']} 更新{stats['updated']} "
+                     f"変更なし{stats['unchanged']} 削除{stats['removed']} 失敗{stats['failed']}")
+        try:
+            records = catalog.query(args.select)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # 今回の入力ディレクトリのファイルのみ表示
+    targets = {path.resolve() for path in files}
+    print_records([record for record in records if record['path'] in targets])
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,8 @@ from pathlib import Path
 # 親ディレクトリのcommon.pyをインポート
 sys.path.append(str(Path(__file__).parent.parent))
 from common import setup_logging, create_base_parser, validate_directories, get_files_by_extension
+from PIL import Image
+from image_processor.conversion.animation import assemble_animation
 
 def extract_frames_from_video(input_file: Path, output_dir: str, interval: int = 1, 
                             quality: int = 2, format: str = 'jpg') -> bool:
@@ -42,6 +44,37 @@ def extract_frames_from_video(input_file: Path, output_dir: str, interval: int =
         logging.error(f"フレーム抽出エラー {input_file.name}: {e}")
         return False
 
+def iter_preview_frames(frame_files: list, width: int = None):
+    """プレビュー用にフレームを1枚ずつ読み込み、指定幅より大きければ縮小"""
+    for frame_file in frame_files:
+        with Image.open(frame_file) as img:
+            if width and img.width > width:
+                height = max(1, round(img.height * width / img.width))
+                yield img.resize((width, height), Image.Resampling.LANCZOS)
+            else:
+                yield img.convert("RGB")
+
+def create_preview(input_file: Path, output_dir: str, format: str = 'jpg',
+                   preview_format: str = 'webp', duration: int = 200, width: int = None) -> bool:
+    """抽出済みのフレームからアニメーションのプレビューを作成"""
+    try:
+        frame_files = sorted(Path(output_dir).glob(f"{input_file.stem}_*.{format}"))
+        if not frame_files:
+            logging.warning(f"プレビュー用のフレームがありません: {input_file.name}")
+            return False
+
+        output_path = Path(output_dir) / f"{input_file.stem}_preview.{preview_format}"
+        # 縮小しない場合はファイルパスのまま渡し、GIFのパレットを全体から等間隔に作成する
+        frames = iter_preview_frames(frame_files, width) if width else frame_files
+        assemble_animation(frames, output_path, duration=duration,
+                           frame_count=len(frame_files))
+        logging.info(f"プレビュー作成: {output_path.name} ({len(frame_files)}フレーム)")
+        return True
+
+    except Exception as e:
+        logging.error(f"プレビュー作成エラー {input_file.name}: {e}")
+        return False
+
 def main():
     parser = create_base_parser("動画フレーム抽出ツール")
     parser.add_argument('-n', '--interval', type=int, default=1,
@@ -50,6 +83,12 @@ def main():
                        help='画質設定 1-31 (低いほど高品質、デフォルト: 2)')
     parser.add_argument('-f', '--format', choices=['jpg', 'png'], default='jpg',
                        help='出力フォーマット (デフォルト: jpg)')
+    parser.add_argument('--preview', choices=['gif', 'webp'], default=None,
+                       help='抽出したフレームからアニメーションのプレビューを作成')
+    parser.add_argument('--preview-duration', type=int, default=200,
+                       help='プレビューの1フレームの表示時間（ミリ秒） (デフォルト: 200)')
+    parser.add_argument('--preview-width', type=int, default=None,
+                       help='プレビューの最大幅（px）。超える場合は縮小')
     args = parser.parse_args()
     
     setup_logging()
@@ -71,6 +110,9 @@ def main():
         if extract_frames_from_video(video_file, args.output, args.interval, 
                                    args.quality, args.format):
             processed_count += 1
+            if args.preview:
+                create_preview(video_file, args.output, args.format, args.preview,
+                               args.preview_duration, args.preview_width)
     
     logging.info(f"フレーム抽出完了: {processed_count}/{len(video_files)}個の動画")
 